@@ -21,6 +21,9 @@ from monasca_log_api.reference.common import validation
 _TENANT_ID_PARAM = 'tenant_id'
 """Name of the query-param pointing at project-id (tenant-id)"""
 
+_NOT_SET = object()
+"""Marks lazily computed attribute that has not been computed yet"""
+
 
 class Request(falcon.Request):
     """Variation of falcon.Request with context
@@ -28,11 +31,35 @@ class Request(falcon.Request):
     Following class enhances :py:class:`falcon.Request` with
     :py:class:`context.RequestContext`.
 
+    Note:
+        Context is created on first access, hence requests
+        that never use it (i.e. healthcheck or version) do not
+        pay for its construction.
+
     """
 
     def __init__(self, env, options=None):
         super(Request, self).__init__(env, options)
-        self.context = context.RequestContext.from_environ(self.env)
+        # falcon.Request sets up its own context in __init__,
+        # drop it to have RequestContext created on demand
+        self._context = None
+        self._cross_project_id = _NOT_SET
+
+    @property
+    def context(self):
+        """Returns context of the request
+
+        :return: request context
+        :rtype: context.RequestContext
+
+        """
+        if self._context is None:
+            self._context = context.RequestContext.from_environ(self.env)
+        return self._context
+
+    @context.setter
+    def context(self, value):
+        self._context = value
 
     def validate(self, content_types):
         """Performs common request validation
@@ -77,7 +104,10 @@ class Request(falcon.Request):
         :rtype: str
 
         """
-        return self.get_param(_TENANT_ID_PARAM, required=False)
+        if self._cross_project_id is _NOT_SET:
+            self._cross_project_id = self.get_param(_TENANT_ID_PARAM,
+                                                    required=False)
+        return self._cross_project_id
 
     @property
     def user_id(self):
@@ -18,6 +18,7 @@ from oslo_log import log
 
 from monasca_log_api.monitoring import client
 from monasca_log_api.monitoring import metrics
+from monasca_log_api.monitoring import prometheus
 
 LOG = log.getLogger(__name__)
 
@@ -56,6 +57,33 @@ class LogsApi(object):
             dimensions=dimensions
         )
 
+        # prometheus histograms and counters
+        registry = prometheus.get_registry()
+
+        self._request_size_histogram = registry.histogram(
+            name=metrics.PROMETHEUS_REQUEST_SIZE_METRIC,
+            documentation='Size of received payloads in bytes',
+            buckets=prometheus.SIZE_BUCKETS,
+            labels=dimensions
+        )
+        self._bulk_size_histogram = registry.histogram(
+            name=metrics.PROMETHEUS_BULK_SIZE_METRIC,
+            documentation='Amount of logs received in single request',
+            buckets=prometheus.COUNT_BUCKETS,
+            labels=dimensions
+        )
+        self._processing_time_histogram = registry.histogram(
+            name=metrics.PROMETHEUS_PROCESSING_TIME_METRIC,
+            documentation='Time needed to process request in seconds',
+            buckets=prometheus.TIME_BUCKETS,
+            labels=dimensions
+        )
+        self._requests_rejected_counter = registry.counter(
+            name=metrics.PROMETHEUS_REJECTED_METRIC,
+            documentation='Amount of requests rejected entirely',
+            labels=dimensions
+        )
+
         LOG.info('Initializing LogsApi %s!' % self.version)
 
     def on_post(self, req, res):
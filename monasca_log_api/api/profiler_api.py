@@ -0,0 +1,47 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import falcon
+from oslo_log import log
+
+LOG = log.getLogger(__name__)
+
+
+class ProfilerApi(object):
+    """Profiler Api
+
+    ProfilerApi allows administrators to profile running
+    API process on demand.
+
+    """
+
+    def __init__(self):
+        super(ProfilerApi, self).__init__()
+        LOG.info('Initializing ProfilerApi!')
+
+    def on_post(self, req, res):
+        """Starts profiling of the process on POST.
+
+        :param falcon.Request req: current request
+        :param falcon.Response res: current response
+        """
+        res.status = falcon.HTTP_501
+
+    def on_get(self, req, res):
+        """Returns profiling report on GET.
+
+        :param falcon.Request req: current request
+        :param falcon.Response res: current response
+        """
+        res.status = falcon.HTTP_501
@@ -0,0 +1,392 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Asyncio (ASGI) application of monasca-log-api.
+
+Requires Python 3.5 or newer. Module uses ``async`` syntax, hence
+it must not be imported with Python 2.7, tests of it are skipped there
+and lint (tox -e pep8) runs with Python 3.
+
+"""
+
+import asyncio
+from concurrent import futures
+import functools
+import io
+import os
+import sys
+from urllib import parse
+
+import falcon
+from monasca_common.rest import utils as rest_utils
+from oslo_config import cfg
+from oslo_context import context
+from oslo_log import log
+import paste.deploy
+
+from monasca_log_api.reference.common import validation
+from monasca_log_api.reference.v3.common import helpers
+from monasca_log_api.reference.v3 import logs
+from monasca_log_api import server
+from monasca_log_api import uri_map
+
+LOG = log.getLogger(__name__)
+CONF = cfg.CONF
+CONF.import_group('service', 'monasca_log_api.reference.v2.common.service')
+
+_DEFAULT_EXECUTOR_WORKERS = 32
+_AUTHORIZED_KEY = 'monasca_log_api.asgi.authorized'
+_FORWARDED_HEADERS = ('x-openstack-request-id',)
+_TENANT_ID_PARAM = 'tenant_id'
+
+asgi_opts = [
+    cfg.IntOpt('executor_workers',
+               default=_DEFAULT_EXECUTOR_WORKERS,
+               min=1,
+               help=('Amount of threads running blocking operations '
+                     '(authentication, publishing to kafka, endpoints '
+                     'other than logs), default to %d'
+                     % _DEFAULT_EXECUTOR_WORKERS))
+]
+asgi_group = cfg.OptGroup(name='asgi', title='asgi')
+
+cfg.CONF.register_group(asgi_group)
+cfg.CONF.register_opts(asgi_opts, asgi_group)
+
+
+def sink_factory(global_conf, **local_conf):
+    """Returns WSGI application terminating authentication pipeline.
+
+    Application marks request as having passed all the filters
+    in front of it.
+
+    :param global_conf: global configuration
+    :param local_conf: local configuration
+    """
+    server.configure(global_conf)
+
+    def sink(environ, start_response):
+        environ[_AUTHORIZED_KEY] = True
+        start_response('204 No Content', [])
+        return []
+
+    return sink
+
+
+class _Request(object):
+    """Subset of request data required by :py:mod:`validation`"""
+
+    def __init__(self, scope):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.query = parse.parse_qs(scope.get('query_string', b'')
+                                    .decode('latin-1'))
+        self.headers = {name.decode('latin-1').lower(): value.decode(
+            'latin-1') for name, value in scope.get('headers', [])}
+        self.content_type = self.headers.get('content-type')
+        content_length = self.headers.get('content-length')
+        self.content_length = (int(content_length)
+                               if content_length and content_length.isdigit()
+                               else None)
+
+    def get_param(self, name):
+        values = self.query.get(name)
+        return values[0] if values else None
+
+
+class AsyncLogs(logs.Logs):
+    """Asynchronous variation of v3 :py:class:`logs.Logs`.
+
+    Request body is read without blocking the event loop.
+    Validation and envelopes are the same as in synchronous
+    API, logs are transformed and published to kafka in the
+    executor, so that waiting for the broker costs a coroutine
+    rather than a worker. Kafka producer is not thread-safe,
+    therefore every thread of the executor owns its own producer.
+
+    """
+
+    def __init__(self, executor):
+        super(AsyncLogs, self).__init__(per_thread_producer=True)
+        self._executor = executor
+
+    async def on_post_async(self, req, environ, receive):
+        """Processes logs sent in the request.
+
+        :param _Request req: current request
+        :param dict environ: WSGI environment after authentication
+        :param receive: ASGI receive callable
+        :return: status of the response
+        :rtype: str
+        """
+        loop = asyncio.get_event_loop()
+        with self._logs_processing_time.time(name=None), \
+                self._processing_time_histogram.time():
+            try:
+                validation.validate_content_type(
+                    req, self.SUPPORTED_CONTENT_TYPES)
+                validation.validate_payload_size(req)
+
+                ctx = context.RequestContext.from_environ(environ)
+                cross_tenant_id = req.get_param(_TENANT_ID_PARAM)
+                validation.validate_cross_tenant(
+                    tenant_id=ctx.tenant,
+                    roles=ctx.roles,
+                    cross_tenant_id=cross_tenant_id
+                )
+
+                body = await read_body(receive, req.content_length)
+                request_body = helpers.decode_json_msg_body(
+                    body, self._interner)
+                log_list = helpers.get_logs(request_body)
+                global_dimensions = helpers.get_global_dimensions(
+                    request_body)
+            except Exception as ex:
+                LOG.error('Entire bulk package has been rejected')
+                LOG.exception(ex)
+
+                self._bulks_rejected_counter.increment(value=1)
+                self._requests_rejected_counter.inc()
+
+                raise ex
+
+            self._bulks_rejected_counter.increment(value=0)
+            self._logs_size_gauge.send(name=None, value=req.content_length)
+            self._request_size_histogram.observe(req.content_length)
+            self._bulk_size_histogram.observe(len(log_list))
+
+            try:
+                await loop.run_in_executor(
+                    self._executor,
+                    functools.partial(
+                        self._processor.send_message,
+                        logs=log_list,
+                        global_dimensions=global_dimensions,
+                        log_tenant_id=ctx.tenant or cross_tenant_id
+                    )
+                )
+            except Exception as ex:
+                return getattr(ex, 'status', falcon.HTTP_500)
+
+            return falcon.HTTP_204
+
+
+async def read_body(receive, content_length):
+    """Reads request body.
+
+    :param receive: ASGI receive callable
+    :param int content_length: declared length of the body
+    :return: request body
+    :rtype: bytes
+    :raises falcon.HTTPBadRequest: if body is longer than declared
+    """
+    body = bytearray()
+    more_body = True
+    while more_body:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            raise falcon.HTTPBadRequest('Bad request',
+                                        'Client disconnected')
+        body.extend(message.get('body', b''))
+        more_body = message.get('more_body', False)
+        if len(body) > content_length:
+            raise falcon.HTTPBadRequest(
+                'Bad request',
+                'Request body is longer than Content-Length')
+    return bytes(body)
+
+
+def to_environ(scope, body=b''):
+    """Creates WSGI environment from ASGI scope.
+
+    :param dict scope: ASGI connection scope
+    :param bytes body: request body
+    :rtype: dict
+    """
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'],
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': 'HTTP/%s' % scope.get('http_version', '1.1'),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE' or name == 'CONTENT_LENGTH':
+            environ[name] = value
+        else:
+            key = 'HTTP_%s' % name
+            environ[key] = ('%s,%s' % (environ[key], value)
+                            if key in environ else value)
+    return environ
+
+
+def call_wsgi(app, environ):
+    """Calls WSGI application and collects its response.
+
+    :return: status, headers and body of the response
+    :rtype: tuple
+    """
+    response = []
+
+    def start_response(status, headers, exc_info=None):
+        response[:] = [status, headers]
+
+    result = app(environ, start_response)
+    try:
+        body = b''.join(result)
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+    return response[0], response[1], body
+
+
+class Application(object):
+    """ASGI application of the API.
+
+    Logs sent to **/v3.0/logs** are handled natively by
+    :py:class:`.AsyncLogs`. Before the body is read, request goes
+    through the same filters as in WSGI pipeline (validation,
+    authentication and roles), those are synchronous, hence they
+    run in the executor.
+
+    Every other request is passed to WSGI application in the
+    executor.
+
+    """
+
+    def __init__(self, auth_app, wsgi_app, executor, logs_resource=None):
+        self._auth_app = auth_app
+        self._wsgi_app = wsgi_app
+        self._executor = executor
+        self._logs = logs_resource or AsyncLogs(executor)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self._executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _http(self, scope, receive, send):
+        path = scope['path']
+        if len(path) > 1:
+            path = path.rstrip('/')
+        if path == uri_map.V3_LOGS_URI and scope['method'] == 'POST':
+            await self._post_logs(scope, receive, send)
+        else:
+            await self._delegate(scope, receive, send)
+
+    async def _post_logs(self, scope, receive, send):
+        loop = asyncio.get_event_loop()
+        environ = to_environ(scope)
+
+        status, headers, body = await loop.run_in_executor(
+            self._executor, call_wsgi, self._auth_app, environ)
+        if not environ.get(_AUTHORIZED_KEY):
+            await _send_response(send, status, headers, body)
+            return
+
+        headers = [(name, value) for name, value in headers
+                   if name.lower() in _FORWARDED_HEADERS]
+        try:
+            status = await self._logs.on_post_async(_Request(scope),
+                                                    environ, receive)
+            body = b''
+        except falcon.HTTPError as ex:
+            status = ex.status
+            headers.append(('Content-Type', 'application/json'))
+            headers.extend((ex.headers or {}).items())
+            body = rest_utils.as_json(ex.to_dict()).encode('utf-8')
+        except Exception as ex:
+            LOG.exception(ex)
+            status, body = falcon.HTTP_500, b''
+
+        await _send_response(send, status, headers, body)
+
+    async def _delegate(self, scope, receive, send):
+        loop = asyncio.get_event_loop()
+        body = bytearray()
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            body.extend(message.get('body', b''))
+            more_body = message.get('more_body', False)
+
+        environ = to_environ(scope, bytes(body))
+        status, headers, body = await loop.run_in_executor(
+            self._executor, call_wsgi, self._wsgi_app, environ)
+        await _send_response(send, status, headers, body)
+
+
+async def _send_response(send, status, headers, body):
+    await send({
+        'type': 'http.response.start',
+        'status': int(status.split(' ', 1)[0]),
+        'headers': [(name.lower().encode('latin-1'),
+                     value.encode('latin-1'))
+                    for name, value in headers
+                    if name.lower() != 'content-length'] +
+                   [(b'content-length', str(len(body)).encode('latin-1'))]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def get_asgi_app(config_base_path=None):
+    """Creates ASGI application.
+
+    Uses ``asgi_auth`` pipeline of **log-api-config.ini** for
+    authentication and ``main`` pipeline for remaining endpoints.
+
+    :param str config_base_path: directory with configuration files
+    :rtype: Application
+    """
+    if config_base_path is None:
+        config_base_path = os.path.join(
+            os.path.dirname(os.path.realpath(__file__)), '../../etc/monasca')
+    global_conf = {'config_file': (
+        os.path.join(config_base_path, 'log-api-config.conf'))}
+
+    auth_app = paste.deploy.loadapp('config:log-api-config.ini',
+                                    name='asgi_auth',
+                                    relative_to=config_base_path,
+                                    global_conf=global_conf)
+    wsgi_app = server.get_wsgi_app(config_base_path)
+    executor = futures.ThreadPoolExecutor(CONF.asgi.executor_workers)
+
+    return Application(auth_app, wsgi_app, executor)
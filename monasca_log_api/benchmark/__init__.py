@@ -0,0 +1 @@
+"""Performance harness of monasca-log-api"""
@@ -0,0 +1,437 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""End-to-end throughput benchmark of monasca-log-api.
+
+Application is created with :py:func:`monasca_log_api.server.get_wsgi_app`
+from the same pipeline as **log-api-config.ini**, except that:
+
+* keystone authentication is replaced with filter passing requests
+  through, identity comes from the headers sent by the benchmark
+* ``rate_limit`` filter is left out, otherwise the benchmark would
+  measure configured limits instead of the API
+* kafka producer is replaced with :py:class:`.NullProducer`
+
+Requests are sent to the application in-process, by ``concurrency``
+threads, hence the numbers describe cost of the API itself, without
+network and broker ::
+
+    python -m monasca_log_api.benchmark.load --api v3 --bulk-size 100 \\
+        --message-size 256 --dimensions 5 --concurrency 4 --duration 10
+
+"""
+
+from __future__ import print_function
+
+import argparse
+import io
+import json
+import math
+import os
+import random
+import shutil
+import string
+import sys
+import tempfile
+import threading
+import warnings
+
+from oslo_utils import timeutils
+import six
+
+from monasca_log_api.reference.common import log_publisher
+from monasca_log_api import server
+
+_PIPELINE = """
+[DEFAULT]
+name = monasca_log_api
+
+[pipeline:main]
+pipeline = request_id validation auth roles admission api
+
+[app:api]
+paste.app_factory = monasca_log_api.server:launch
+
+[filter:auth]
+paste.filter_factory = monasca_log_api.benchmark.load:auth_filter_factory
+
+[filter:roles]
+paste.filter_factory = %(roles)s
+
+[filter:validation]
+paste.filter_factory = %(validation)s
+
+[filter:admission]
+paste.filter_factory = %(admission)s
+
+[filter:request_id]
+paste.filter_factory = oslo_middleware.request_id:RequestId.factory
+""" % {
+    'roles': ('monasca_log_api.middleware.role_middleware:'
+              'RoleMiddleware.factory'),
+    'validation': ('monasca_log_api.middleware.validation_middleware:'
+                   'ValidationMiddleware.factory'),
+    'admission': ('monasca_log_api.middleware.admission_middleware:'
+                  'AdmissionMiddleware.factory')
+}
+
+_CONFIG = """
+[DEFAULT]
+use_stderr = True
+default_log_levels = monasca_log_api=WARNING,monascastatsd=CRITICAL
+
+[dispatcher]
+logs = monasca_log_api.reference.v2.logs:Logs
+logs_v3 = monasca_log_api.reference.v3.logs:Logs
+versions = monasca_log_api.reference.versions:Versions
+healthchecks = monasca_log_api.reference.healthchecks:HealthChecks
+
+[monitoring]
+aggregate = True
+
+[service]
+region = benchmark
+max_log_size = 1048576
+
+[log_publisher]
+kafka_url = null
+topics = logs
+
+[kafka_healthcheck]
+kafka_url = null
+
+[roles_middleware]
+path = /
+default_roles = user
+agent_roles = monasca-agent
+"""
+
+IDENTITY_HEADERS = {
+    'X-Identity-Status': 'Confirmed',
+    'X-Roles': 'user'
+}
+"""Headers authorizing request in the benchmark pipeline"""
+
+_V2_URI = '/v2.0/log/single'
+_V3_URI = '/v3.0/logs'
+_TENANT_ID = 'benchmark'
+_PERCENTILES = (50, 90, 99)
+
+
+class NullProducer(object):
+    """Producer discarding messages, counts what it received."""
+
+    def __init__(self, url=None):
+        self._lock = threading.Lock()
+        self.messages = 0
+        self.bytes = 0
+
+    def publish(self, topic, messages, key=None):
+        size = sum(len(m) for m in messages)
+        with self._lock:
+            self.messages += len(messages)
+            self.bytes += size
+
+
+def auth_filter_factory(global_conf, **local_conf):
+    """Returns authentication filter passing every request through."""
+    return lambda app: app
+
+
+def install_null_producer():
+    """Makes :py:class:`log_publisher.LogPublisher` use NullProducer.
+
+    :return: producer shared by all publishers
+    :rtype: NullProducer
+    """
+    null_producer = NullProducer()
+    log_publisher.producer.KafkaProducer = lambda url: null_producer
+    return null_producer
+
+
+def write_config(config_dir):
+    """Writes configuration of the benchmark.
+
+    :param str config_dir: directory configuration is written to
+    :return: path of **log-api-config.conf**
+    :rtype: str
+    """
+    with open(os.path.join(config_dir, 'log-api-config.ini'), 'w') as f:
+        f.write(_PIPELINE)
+    config_file = os.path.join(config_dir, 'log-api-config.conf')
+    with open(config_file, 'w') as f:
+        f.write(_CONFIG)
+    return config_file
+
+
+def create_app(config_dir):
+    """Creates application with stubbed authentication.
+
+    :param str config_dir: directory configuration is written to
+    :return: WSGI application
+    """
+    write_config(config_dir)
+    return server.get_wsgi_app(config_base_path=config_dir)
+
+
+def _random_string(rnd, size):
+    return ''.join(rnd.choice(string.ascii_letters + ' ')
+                   for _ in range(size))
+
+
+def _dimensions(rnd, count):
+    return {'dim_%d' % i: _random_string(rnd, 8) for i in range(count)}
+
+
+def make_request(api, bulk_size, message_size, dimensions, seed=0):
+    """Creates request sent by the benchmark.
+
+    :param str api: v2 or v3
+    :param int bulk_size: amount of logs in v3 request
+    :param int message_size: length of log message
+    :param int dimensions: amount of dimensions of each log
+    :return: path, headers and body of the request
+    :rtype: tuple
+    """
+    rnd = random.Random(seed)
+    headers = {
+        'Content-Type': 'application/json',
+        'X-Tenant-Id': _TENANT_ID,
+        'X-Project-Id': _TENANT_ID
+    }
+    headers.update(IDENTITY_HEADERS)
+    if api == 'v2':
+        headers['X-Application-Type'] = 'benchmark'
+        headers['X-Dimensions'] = ','.join(
+            '%s:%s' % item
+            for item in sorted(_dimensions(rnd, max(dimensions, 1)).items()))
+        body = {'message': _random_string(rnd, message_size)}
+        return _V2_URI, headers, json.dumps(body).encode('utf-8')
+
+    body = {
+        'dimensions': {'hostname': 'benchmark'},
+        'logs': [{'message': _random_string(rnd, message_size),
+                  'dimensions': _dimensions(rnd, dimensions)}
+                 for _ in range(bulk_size)]
+    }
+    return _V3_URI, headers, json.dumps(body).encode('utf-8')
+
+
+def make_environ(path, headers, body, method='POST', query=''):
+    """Creates WSGI environment of the request."""
+    environ = {
+        'REQUEST_METHOD': method,
+        'SCRIPT_NAME': '',
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '5607',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False
+    }
+    for name, value in six.iteritems(headers):
+        key = name.upper().replace('-', '_')
+        if key == 'CONTENT_LENGTH':
+            continue
+        if key != 'CONTENT_TYPE':
+            key = 'HTTP_%s' % key
+        environ[key] = value
+    return environ
+
+
+class _Worker(threading.Thread):
+
+    def __init__(self, app, request, deadline, requests):
+        super(_Worker, self).__init__()
+        self.daemon = True
+        self._app = app
+        self._request = request
+        self._deadline = deadline
+        self._requests = requests
+        self.latencies = []
+        self.statuses = {}
+
+    def run(self):
+        path, headers, body = self._request
+        while (len(self.latencies) < self._requests and
+               timeutils.now() < self._deadline):
+            start = timeutils.now()
+            code = call_app(self._app, make_environ(path, headers, body))
+            self.latencies.append(timeutils.now() - start)
+            self.statuses[code] = self.statuses.get(code, 0) + 1
+
+
+def call_app(app, environ):
+    """Calls WSGI application.
+
+    :return: status code of the response
+    :rtype: str
+    """
+    status = []
+
+    def start_response(s, h, exc_info=None):
+        status[:] = [s]
+
+    result = app(environ, start_response)
+    for _ in result:
+        pass
+    if hasattr(result, 'close'):
+        result.close()
+    return status[0].split(' ', 1)[0]
+
+
+def percentile(values, p):
+    """Returns p-th percentile (nearest rank) of sorted values."""
+    if not values:
+        return None
+    rank = int(math.ceil(p / 100.0 * len(values)))
+    return values[min(max(rank, 1), len(values)) - 1]
+
+
+def run(app, request, logs_per_request, concurrency, duration, requests):
+    """Sends requests to the application and measures throughput.
+
+    :param app: WSGI application
+    :param tuple request: path, headers and body of request
+    :param int logs_per_request: amount of logs in single request
+    :param int concurrency: amount of threads sending requests
+    :param float duration: maximum duration (seconds)
+    :param int requests: maximum amount of requests per thread
+    :return: report
+    :rtype: dict
+    """
+    start = timeutils.now()
+    workers = [_Worker(app, request, start + duration, requests)
+               for _ in range(concurrency)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = timeutils.now() - start
+
+    latencies = [latency for worker in workers
+                 for latency in worker.latencies]
+    statuses = {}
+    for worker in workers:
+        for code, count in six.iteritems(worker.statuses):
+            statuses[code] = statuses.get(code, 0) + count
+    succeeded = statuses.get('204', 0)
+
+    return summarize(latencies, statuses, elapsed,
+                     logs=succeeded * logs_per_request,
+                     size=succeeded * len(request[2]))
+
+
+def summarize(latencies, statuses, elapsed, logs, size):
+    """Creates report of the run.
+
+    :param list latencies: latency of each request (seconds)
+    :param dict statuses: amount of responses per status code
+    :param float elapsed: duration of the run (seconds)
+    :param int logs: amount of accepted logs
+    :param int size: size of accepted requests (bytes)
+    :rtype: dict
+    """
+    latencies = sorted(latencies)
+    report = {
+        'requests': len(latencies),
+        'statuses': statuses,
+        'elapsed': elapsed,
+        'req_per_s': len(latencies) / elapsed,
+        'logs_per_s': logs / elapsed,
+        'bytes_per_s': size / elapsed,
+        'latency_mean': (sum(latencies) / len(latencies)
+                         if latencies else None),
+        'latency_max': latencies[-1] if latencies else None
+    }
+    for p in _PERCENTILES:
+        report['latency_p%d' % p] = percentile(latencies, p)
+    return report
+
+
+def format_report(report):
+    lines = [
+        'requests:   %d in %.2fs %s' % (
+            report['requests'], report['elapsed'], report['statuses']),
+        'throughput: %.1f req/s, %.1f logs/s, %.1f KiB/s' % (
+            report['req_per_s'], report['logs_per_s'],
+            report['bytes_per_s'] / 1024.0)
+    ]
+    if report['latency_mean'] is not None:
+        lines.append('latency:    mean %.2fms, %s, max %.2fms' % (
+            report['latency_mean'] * 1000,
+            ', '.join('p%d %.2fms' % (p, report['latency_p%d' % p] * 1000)
+                      for p in _PERCENTILES),
+            report['latency_max'] * 1000))
+    return '\n'.join(lines)
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(
+        description='End-to-end throughput benchmark of monasca-log-api')
+    parser.add_argument('--api', choices=['v2', 'v3'], default='v3')
+    parser.add_argument('--bulk-size', type=int, default=100,
+                        help='Logs per v3 request')
+    parser.add_argument('--message-size', type=int, default=256,
+                        help='Length of log message')
+    parser.add_argument('--dimensions', type=int, default=5,
+                        help='Dimensions per log')
+    parser.add_argument('--concurrency', type=int, default=1,
+                        help='Threads sending requests')
+    parser.add_argument('--duration', type=float, default=10.0,
+                        help='Maximum duration of the run (seconds)')
+    parser.add_argument('--requests', type=int, default=sys.maxsize,
+                        help='Maximum amount of requests per thread')
+    parser.add_argument('--warmup', type=int, default=10,
+                        help='Requests sent before measurement')
+    parser.add_argument('--json', action='store_true',
+                        help='Print report as JSON')
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    args = parse_args(args)
+    # v2 is deprecated and warns on every request
+    warnings.simplefilter('ignore')
+    config_dir = tempfile.mkdtemp(prefix='monasca-log-api-benchmark')
+    try:
+        null_producer = install_null_producer()
+        app = create_app(config_dir)
+        request = make_request(args.api, args.bulk_size, args.message_size,
+                               args.dimensions)
+        logs_per_request = args.bulk_size if args.api == 'v3' else 1
+
+        run(app, request, logs_per_request, 1, args.duration, args.warmup)
+        report = run(app, request, logs_per_request, args.concurrency,
+                     args.duration, args.requests)
+        report['published'] = null_producer.messages
+    finally:
+        shutil.rmtree(config_dir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(report, indent=2, sort_keys=True))
+    else:
+        print(format_report(report))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,317 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Micro-benchmarks of functions executed for every log.
+
+Each case is timed with :py:mod:`timeit`, the best of several repeats
+is taken. To make results comparable between machines, time of each
+case is divided by time of :py:func:`.reference` workload, measured
+right after it. Case and reference are measured in several rounds,
+the median of their ratios is the result of the case.
+
+Normalized results are compared with **baseline.json**, the run fails
+if any case is slower than its baseline by more than the tolerance.
+Tolerance of noisy cases can be widened in ``tolerances`` of the
+baseline ::
+
+    python -m monasca_log_api.benchmark.micro
+    python -m monasca_log_api.benchmark.micro --update-baseline
+
+"""
+
+from __future__ import print_function
+
+import argparse
+import collections
+import copy
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+
+from monasca_log_api.benchmark import load
+from monasca_log_api.monitoring import client
+from monasca_log_api.reference.common import buffer_pool
+from monasca_log_api.reference.common import interning
+from monasca_log_api.reference.common import log_publisher
+from monasca_log_api.reference.common import model
+from monasca_log_api.reference.common import validation
+from monasca_log_api.reference.v2.common import service
+from monasca_log_api.reference.v3.common import bulk_processor
+from monasca_log_api.reference.v3.common import helpers
+from monasca_log_api import server
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             'baseline.json')
+DEFAULT_TOLERANCE = 0.25
+_MIN_TIME = 0.1
+_REPEAT = 7
+_ROUNDS = 7
+
+_DIMENSIONS = {'hostname': 'devstack', 'component': 'monasca-log-api',
+               'service': 'monitoring', 'path': '/var/log/monasca/api.log',
+               'level': 'INFO'}
+_MESSAGE = ('2017-04-11 10:01:02.345 1234 INFO monasca_log_api.server '
+            '[req-c7dd5a84] Request processed in 12ms') * 2
+
+CASES = collections.OrderedDict()
+"""Cases of the suite, each creates function to be measured"""
+
+
+def case(name):
+    def register(factory):
+        CASES[name] = factory
+        return factory
+    return register
+
+
+def reference():
+    """Pure python workload results are normalized with."""
+    data = {}
+    for i in range(100):
+        data['key_%d' % i] = str(i) * 3
+    return sorted(data.items())
+
+
+def _log():
+    return {'message': _MESSAGE, 'dimensions': dict(_DIMENSIONS)}
+
+
+@case('LogPublisher._truncate')
+def _truncate():
+    publisher = log_publisher.LogPublisher()
+    envelope = model.Envelope.new_envelope(_log(), 'tenant', 'region')
+    return lambda: publisher._truncate(envelope)
+
+
+@case('BulkProcessor._transform_message')
+def _transform_message():
+    statsd = client.get_client()
+    processor = bulk_processor.BulkProcessor(
+        statsd.get_counter('in'), statsd.get_counter('rejected'))
+    global_dims = {'hostname': 'devstack'}
+    logs = [_log() for _ in range(1000)]
+
+    def transform():
+        for log_element in logs:
+            processor._transform_message(log_element, global_dims, 'tenant')
+    return transform, len(logs)
+
+
+@case('validation.validate_dimensions')
+def _validate_dimensions():
+    return lambda: validation.validate_dimensions(_DIMENSIONS)
+
+
+@case('service.parse_dimensions')
+def _parse_dimensions():
+    dimensions = ','.join('%s:%s' % item for item in _DIMENSIONS.items())
+    return lambda: service.parse_dimensions(dimensions)
+
+
+@case('LogCreator.new_log')
+def _new_log():
+    creator = service.LogCreator()
+    dimensions = ','.join('%s:%s' % item for item in _DIMENSIONS.items())
+    body = _MESSAGE.encode('utf-8')
+
+    def new_log():
+        creator.new_log('monasca-log-api', dimensions, io.BytesIO(body),
+                        content_type='text/plain')
+    return new_log
+
+
+@case('Envelope.new_envelope')
+def _new_envelope():
+    logs = [_log() for _ in range(1000)]
+
+    def new_envelope():
+        for log_element in logs:
+            model.Envelope.new_envelope(log_element, 'tenant', 'region',
+                                        {'hostname': 'devstack'})
+    return new_envelope, len(logs)
+
+
+@case('helpers.read_json_msg_body')
+def _read_json_msg_body():
+    body = json.dumps({'dimensions': {'hostname': 'devstack'},
+                       'logs': [_log() for _ in range(100)]}).encode('utf-8')
+
+    class Request(object):
+        stream = None
+        content_length = len(body)
+
+    req = Request()
+    pool = buffer_pool.BufferPool(buffer_size=len(body), max_buffers=1)
+
+    def read():
+        req.stream = io.BytesIO(body)
+        helpers.read_json_msg_body(req, pool=pool)
+    return read, 100
+
+
+@case('Interner.intern_bulk')
+def _intern_bulk():
+    interner = interning.Interner(max_size=1000, max_length=64)
+    body = {'dimensions': {'hostname': 'devstack'},
+            'logs': [_log() for _ in range(100)]}
+    return lambda: interner.intern_bulk(body), 100
+
+
+def measure(fn, calls=1):
+    """Measures time of single call.
+
+    :param fn: function to measure
+    :param int calls: amount of calls a single execution of fn stands for
+    :return: best time of call (seconds)
+    :rtype: float
+    """
+    timer = timeit.Timer(fn)
+    number = 1
+    while timer.timeit(number) < _MIN_TIME:
+        number *= 2
+    return min(timer.repeat(_REPEAT, number)) / number / calls
+
+
+def median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2.0
+
+
+def run(names=None, rounds=_ROUNDS):
+    """Runs the suite.
+
+    :param list names: cases to run, all if not set
+    :param int rounds: times each case is measured
+    :return: normalized result of each case
+    :rtype: dict
+    """
+    results = {}
+    for name, factory in CASES.items():
+        if names and name not in names:
+            continue
+        fn = factory()
+        calls = 1
+        if isinstance(fn, tuple):
+            fn, calls = fn
+        # reference is measured next to each case, so that both
+        # are equally affected by frequency scaling or noisy neighbours
+        # rounds disturbed by background load are outliers of ratios,
+        # median ignores them
+        ratios = []
+        for _ in range(rounds):
+            elapsed = measure(fn, calls)
+            ratios.append(elapsed / measure(reference))
+        results[name] = median(ratios)
+    return results
+
+
+def compare(results, baseline, tolerance, tolerances=None):
+    """Compares results with the baseline.
+
+    :param dict results: normalized results
+    :param dict baseline: normalized results of the baseline
+    :param float tolerance: allowed slowdown
+    :param dict tolerances: allowed slowdown of particular cases
+    :return: list of (name, result, baseline, change, regressed)
+    :rtype: list
+    """
+    tolerances = tolerances or {}
+    comparison = []
+    for name, result in sorted(results.items()):
+        expected = baseline.get(name)
+        change = result / expected - 1 if expected else None
+        regressed = (change is not None and
+                     change > tolerances.get(name, tolerance))
+        comparison.append((name, result, expected, change, regressed))
+    return comparison
+
+
+def format_comparison(comparison):
+    lines = ['%-36s %10s %10s %8s' % ('case', 'result', 'baseline',
+                                      'change')]
+    for name, result, expected, change, regressed in comparison:
+        lines.append('%-36s %10.4f %10s %8s%s' % (
+            name, result,
+            '%.4f' % expected if expected else '-',
+            '%+.1f%%' % (change * 100) if change is not None else '-',
+            ' REGRESSION' if regressed else ''))
+    return '\n'.join(lines)
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(
+        description='Micro-benchmarks of monasca-log-api hot functions')
+    parser.add_argument('--baseline', default=BASELINE_FILE,
+                        help='File with baseline results')
+    parser.add_argument('--tolerance', type=float, default=None,
+                        help=('Allowed slowdown of all cases, default to '
+                              'the ones stored in baseline or %.2f'
+                              % DEFAULT_TOLERANCE))
+    parser.add_argument('--update-baseline', action='store_true',
+                        help='Store results as new baseline')
+    parser.add_argument('--rounds', type=int, default=_ROUNDS,
+                        help=('Times each case is measured, median is '
+                              'taken'))
+    parser.add_argument('--case', action='append', dest='cases',
+                        choices=list(CASES), help='Run only given case')
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    args = parse_args(args)
+
+    config_dir = tempfile.mkdtemp(prefix='monasca-log-api-benchmark')
+    try:
+        load.install_null_producer()
+        server.configure({'config_file': load.write_config(config_dir)})
+        results = run(args.cases, args.rounds)
+    finally:
+        shutil.rmtree(config_dir, ignore_errors=True)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    tolerance = (args.tolerance if args.tolerance is not None
+                 else baseline.get('tolerance', DEFAULT_TOLERANCE))
+    tolerances = ({} if args.tolerance is not None
+                  else baseline.get('tolerances', {}))
+
+    if args.update_baseline:
+        stored = copy.deepcopy(baseline.get('results', {}))
+        stored.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump({'tolerance': tolerance,
+                       'tolerances': baseline.get('tolerances', {}),
+                       'results': stored}, f, indent=2, sort_keys=True)
+            f.write('\n')
+
+    comparison = compare(results, baseline.get('results', {}), tolerance,
+                         tolerances)
+    print(format_comparison(comparison))
+    if not args.update_baseline and any(c[4] for c in comparison):
+        print('Regression beyond tolerance detected')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,251 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Replays traffic captured by
+:py:class:`monasca_log_api.middleware.capture_middleware.CaptureMiddleware`.
+
+Requests are sent with the intervals they were captured with,
+divided by ``speed`` (``0`` sends them as fast as possible).
+
+If ``--url`` is given, requests are sent to running instance,
+headers (i.e. **X-Auth-Token**) can be added with ``--header``.
+Otherwise requests are sent to the application loaded in-process,
+the same way as in :py:mod:`monasca_log_api.benchmark.load` ::
+
+    python -m monasca_log_api.benchmark.replay --speed 2 \\
+        /var/lib/monasca-log-api/capture/*.jsonl.gz
+
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import warnings
+
+from oslo_utils import timeutils
+import six
+from six.moves import http_client
+from six.moves import queue
+from six.moves.urllib import parse
+
+from monasca_log_api.benchmark import load
+from monasca_log_api.middleware import capture_middleware
+from monasca_log_api import uri_map
+
+_SKIPPED_HEADERS = {'content-length', 'host'}
+
+
+def count_logs(record):
+    """Returns amount of logs in captured request."""
+    if record['path'].rstrip('/') != uri_map.V3_LOGS_URI:
+        return 1
+    try:
+        return len(json.loads(record['body'])['logs'])
+    except (ValueError, KeyError, TypeError):
+        return 0
+
+
+def schedule(captures, speed):
+    """Computes when each request should be sent.
+
+    :param list captures: captured requests sorted by time
+    :param float speed: replay speed, 0 means as fast as possible
+    :return: list of (offset, record), offset in seconds from start
+    :rtype: list
+    """
+    if not captures:
+        return []
+    first = captures[0]['time']
+    return [((record['time'] - first) / speed if speed else 0, record)
+            for record in captures]
+
+
+class HttpSender(object):
+    """Sends requests to running instance, connection per thread."""
+
+    def __init__(self, url, headers=None):
+        url = parse.urlparse(url)
+        self._host = url.hostname
+        self._port = url.port
+        self._https = url.scheme == 'https'
+        self._headers = headers or {}
+        self._local = threading.local()
+
+    def __call__(self, record):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            cls = (http_client.HTTPSConnection if self._https
+                   else http_client.HTTPConnection)
+            connection = cls(self._host, self._port)
+            self._local.connection = connection
+
+        headers = {name: value for name, value
+                   in six.iteritems(record['headers'])
+                   if name.lower() not in _SKIPPED_HEADERS}
+        headers.update(self._headers)
+        path = record['path']
+        if record.get('query'):
+            path = '%s?%s' % (path, record['query'])
+        try:
+            connection.request(record['method'], path,
+                               record['body'].encode('utf-8'), headers)
+            response = connection.getresponse()
+            response.read()
+            return str(response.status)
+        except Exception:
+            connection.close()
+            self._local.connection = None
+            raise
+
+
+class AppSender(object):
+    """Sends requests to in-process application."""
+
+    def __init__(self, app, headers=None):
+        self._app = app
+        self._headers = dict(load.IDENTITY_HEADERS)
+        self._headers.update(headers or {})
+
+    def __call__(self, record):
+        headers = dict(record['headers'])
+        headers.update(self._headers)
+        environ = load.make_environ(record['path'], headers,
+                                    record['body'].encode('utf-8'),
+                                    method=record['method'],
+                                    query=record.get('query', ''))
+        return load.call_app(self._app, environ)
+
+
+def replay(captures, send, speed=1.0, concurrency=1):
+    """Replays captured requests.
+
+    :param list captures: captured requests sorted by time
+    :param send: callable sending single request, returns status code
+    :param float speed: replay speed, 0 means as fast as possible
+    :param int concurrency: amount of threads sending requests
+    :return: report, see :py:func:`load.summarize`
+    :rtype: dict
+    """
+    pending = queue.Queue(maxsize=concurrency * 2)
+    lock = threading.Lock()
+    latencies = []
+    statuses = {}
+    totals = {'logs': 0, 'size': 0, 'lag': 0.0}
+
+    def worker():
+        while True:
+            item = pending.get()
+            if item is None:
+                return
+            scheduled, record = item
+            start = timeutils.now()
+            try:
+                code = send(record)
+            except Exception:
+                code = 'error'
+            latency = timeutils.now() - start
+            with lock:
+                latencies.append(latency)
+                statuses[code] = statuses.get(code, 0) + 1
+                totals['lag'] = max(totals['lag'], start - scheduled)
+                if code == '204':
+                    totals['logs'] += count_logs(record)
+                    totals['size'] += len(record['body'].encode('utf-8'))
+
+    workers = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in workers:
+        thread.daemon = True
+        thread.start()
+
+    start = timeutils.now()
+    for offset, record in schedule(captures, speed):
+        delay = start + offset - timeutils.now()
+        if delay > 0:
+            time.sleep(delay)
+        pending.put((start + offset, record))
+    for _ in workers:
+        pending.put(None)
+    for thread in workers:
+        thread.join()
+    elapsed = timeutils.now() - start
+
+    report = load.summarize(latencies, statuses, elapsed,
+                            logs=totals['logs'], size=totals['size'])
+    report['max_lag'] = totals['lag']
+    return report
+
+
+def _header(value):
+    name, _, header_value = value.partition(':')
+    if not header_value:
+        raise argparse.ArgumentTypeError('%s is not NAME:VALUE' % value)
+    return name.strip(), header_value.strip()
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(
+        description='Replays requests captured by monasca-log-api')
+    parser.add_argument('files', nargs='+', help='Capture files')
+    parser.add_argument('--url',
+                        help=('Instance to send requests to, application '
+                              'is loaded in-process if not set'))
+    parser.add_argument('--header', type=_header, action='append',
+                        default=[], help='Header to add, NAME:VALUE')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help=('Replay speed relative to captured rate, '
+                              '0 sends requests as fast as possible'))
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help='Threads sending requests')
+    parser.add_argument('--json', action='store_true',
+                        help='Print report as JSON')
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    args = parse_args(args)
+    # v2 is deprecated and warns on every request
+    warnings.simplefilter('ignore')
+    captures = capture_middleware.read_captures(args.files)
+    headers = dict(args.header)
+
+    config_dir = None
+    try:
+        if args.url:
+            send = HttpSender(args.url, headers)
+        else:
+            config_dir = tempfile.mkdtemp(prefix='monasca-log-api-replay')
+            load.install_null_producer()
+            send = AppSender(load.create_app(config_dir), headers)
+        report = replay(captures, send, args.speed, args.concurrency)
+    finally:
+        if config_dir:
+            shutil.rmtree(config_dir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(report, indent=2, sort_keys=True))
+    else:
+        print(load.format_report(report))
+        print('max lag:    %.2fms behind schedule'
+              % (report['max_lag'] * 1000))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,160 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Reloading of configuration without restarting workers.
+
+Options registered with ``mutable=True`` are reloaded from configuration
+files either when the process receives **SIGHUP** or, if
+``[reload] check_interval`` is set, when any of the files changes.
+Components holding such options register hooks with
+:py:meth:`oslo_config.cfg.ConfigOpts.register_mutate_hook` and apply
+new values in place, neither the application nor kafka connections
+are rebuilt.
+
+Currently mutable options:
+
+* ``[log_publisher] topics``
+* ``[log_publisher] max_message_size``
+* ``[service] max_log_size``
+
+Note:
+    Gunicorn master process restarts all workers on **SIGHUP**,
+    signal must be sent to the workers (children of the master)
+    instead, i.e. ``pkill -HUP -P <master pid>``, or configuration
+    files should be watched with ``[reload] check_interval``.
+
+"""
+
+import os
+import signal
+import threading
+import time
+
+from oslo_config import cfg
+from oslo_log import log
+
+LOG = log.getLogger(__name__)
+CONF = cfg.CONF
+
+reload_opts = [
+    cfg.BoolOpt('on_sighup',
+                default=True,
+                help='Reloads mutable options when process receives SIGHUP'),
+    cfg.IntOpt('check_interval',
+               default=0,
+               min=0,
+               help=('Interval (in seconds) of checking if configuration '
+                     'files have changed, changes are reloaded, '
+                     '0 disables checking'))
+]
+reload_group = cfg.OptGroup(name='reload', title='reload')
+
+cfg.CONF.register_group(reload_group)
+cfg.CONF.register_opts(reload_opts, reload_group)
+
+_LOCK = threading.Lock()
+_SETUP_LOCK = threading.Lock()
+_SETUP_DONE = False
+
+
+def reload_config(conf=CONF):
+    """Reloads mutable options from configuration files.
+
+    Changes of options that are not mutable are logged and ignored.
+
+    :return: True if configuration was reloaded
+    :rtype: bool
+    """
+    with _LOCK:
+        LOG.info('Reloading configuration')
+        try:
+            conf.mutate_config_files()
+        except Exception as ex:
+            LOG.error('Failed to reload configuration, keeping current one')
+            LOG.exception(ex)
+            return False
+        return True
+
+
+def setup(conf=CONF):
+    """Sets up reloading of the process configuration.
+
+    Call is idempotent.
+    """
+    global _SETUP_DONE
+    with _SETUP_LOCK:
+        if _SETUP_DONE:
+            return
+        _SETUP_DONE = True
+
+    if conf.reload.on_sighup:
+        try:
+            signal.signal(signal.SIGHUP, _on_sighup)
+        except ValueError:
+            # not the main thread of the process
+            LOG.warning('Cannot handle SIGHUP, configuration will not '
+                        'be reloaded on signal')
+    if conf.reload.check_interval:
+        watcher = FilesWatcher(config_files(conf))
+        thread = threading.Thread(target=_watch,
+                                  args=(watcher, conf.reload.check_interval))
+        thread.daemon = True
+        thread.start()
+
+
+def config_files(conf=CONF):
+    """Returns configuration files of the process."""
+    # options exist only once configuration has been loaded
+    files = list(getattr(conf, 'default_config_files', None) or [])
+    if 'config_file' in conf:
+        files.extend(conf.config_file or [])
+    return [f for f in files if os.path.exists(f)]
+
+
+class FilesWatcher(object):
+    """Detects modifications of the files."""
+
+    def __init__(self, files):
+        self._files = files
+        self._mtimes = self._stat()
+
+    def changed(self):
+        mtimes = self._stat()
+        changed = mtimes != self._mtimes
+        self._mtimes = mtimes
+        return changed
+
+    def _stat(self):
+        mtimes = []
+        for f in self._files:
+            try:
+                mtimes.append(os.stat(f).st_mtime)
+            except OSError:
+                mtimes.append(None)
+        return mtimes
+
+
+def _on_sighup(signum, frame):
+    # signal handler may interrupt code holding locks,
+    # hence reload happens in separate thread
+    thread = threading.Thread(target=reload_config)
+    thread.daemon = True
+    thread.start()
+
+
+def _watch(watcher, interval):
+    while True:
+        time.sleep(interval)
+        if watcher.changed():
+            reload_config()
@@ -0,0 +1,82 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Green threads (eventlet) serving mode.
+
+Green mode requires standard library to be monkey patched before
+anything else is imported, therefore :py:func:`monkey_patch` must be
+called at the very beginning of the entry point, i.e.::
+
+    from monasca_log_api import green
+    green.monkey_patch()
+
+    from monasca_log_api import server
+
+Gunicorn eventlet worker (``worker_class = eventlet``) patches the
+process on its own before loading the application.
+
+Eventlet is imported only once it is needed, so that processes not
+serving green threads do not load it.
+
+"""
+
+import sys
+import threading
+
+
+def monkey_patch():
+    """Patches standard library to cooperate with eventlet.
+
+    Call is idempotent.
+    """
+    if not is_patched():
+        import eventlet
+        eventlet.monkey_patch()
+
+
+def is_patched():
+    """Checks if process runs in green mode.
+
+    :rtype: bool
+    """
+    patcher = sys.modules.get('eventlet.patcher')
+    return patcher is not None and patcher.is_monkey_patched('socket')
+
+
+def execute(fn, *args, **kwargs):
+    """Executes blocking function without stalling other greenlets.
+
+    In green mode function is executed in native thread pool and
+    calling greenlet yields until it completes. Otherwise function
+    is simply called.
+
+    """
+    if is_patched():
+        from eventlet import tpool
+        return tpool.execute(fn, *args, **kwargs)
+    return fn(*args, **kwargs)
+
+
+def native_local():
+    """Returns storage local to native threads.
+
+    In green mode :py:class:`threading.local` is local to greenlets,
+    this one is local to native threads of :py:func:`execute`, so that
+    objects that must not cross threads (i.e. sockets registered with
+    hub of the thread) can be kept per native thread.
+    """
+    if is_patched():
+        from eventlet import patcher
+        return patcher.original('threading').local()
+    return threading.local()
@@ -22,6 +22,8 @@ from monasca_common.kafka_lib import client
 LOG = log.getLogger(__name__)
 CONF = cfg.CONF
 
+_DEFAULT_PROBE_INTERVAL = 10
+
 kafka_check_opts = [
     cfg.StrOpt('kafka_url',
                required=True,
@@ -29,7 +31,15 @@ kafka_check_opts = [
     cfg.ListOpt('kafka_topics',
                 required=True,
                 default=['logs'],
-                help='Verify existence of configured topics')
+                help='Verify existence of configured topics'),
+    cfg.IntOpt('probe_interval',
+               default=_DEFAULT_PROBE_INTERVAL,
+               min=0,
+               help=('Interval (in seconds) of checking kafka in the '
+                     'background, healthcheck requests are answered with '
+                     'the latest result. If set to 0, kafka is checked '
+                     'on every request. Default to %d'
+                     % _DEFAULT_PROBE_INTERVAL))
 ]
 kafka_check_group = cfg.OptGroup(name='kafka_healthcheck',
                                  title='kafka_healthcheck')
@@ -38,8 +48,11 @@ cfg.CONF.register_group(kafka_check_group)
 cfg.CONF.register_opts(kafka_check_opts, kafka_check_group)
 
 
-CheckResult = collections.namedtuple('CheckResult', ['healthy', 'message'])
-"""Result from the healthcheck, contains healthy(boolean) and message"""
+CheckResult = collections.namedtuple('CheckResult',
+                                     ['healthy', 'message', 'age'])
+"""Result from the healthcheck, contains healthy(boolean), message
+and age (seconds) of the result if it has been cached"""
+CheckResult.__new__.__defaults__ = (None,)
 
 
 # TODO(feature) monasca-common candidate
@@ -0,0 +1,108 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import os
+import threading
+import time
+
+from oslo_log import log
+from oslo_utils import timeutils
+
+from monasca_log_api.healthcheck import kafka_check
+
+LOG = log.getLogger(__name__)
+
+_STALE_FACTOR = 3
+"""Result older than that many intervals is considered stale"""
+
+
+class Prober(object):
+    """Runs healthcheck periodically in the background.
+
+    Prober exposes same interface as wrapped healthcheck, however
+    :py:meth:`.Prober.healthcheck` never calls the check, it returns
+    the latest result (with its age) instead. Hence answering
+    healthcheck requests is cheap and cannot pile up on slow
+    peripheral component.
+
+    Result is reported unhealthy if it is older than few intervals,
+    meaning that check is stuck.
+
+    Note:
+        Background thread is started lazily with first healthcheck
+        and restarted if process has been forked since then, so that
+        each worker probes on its own. That first healthcheck runs
+        the check synchronously, hence freshly started worker does
+        not report itself unhealthy only because it has not probed
+        yet.
+
+    """
+
+    def __init__(self, check, interval, name='healthcheck'):
+        self._check = check
+        self._interval = interval
+        self._name = name
+        self._lock = threading.Lock()
+        self._pid = None
+        self._latest = None
+
+    def healthcheck(self):
+        self._ensure_started()
+
+        result, result_time = self._latest
+        age = timeutils.now() - result_time
+        if age > _STALE_FACTOR * self._interval:
+            return kafka_check.CheckResult(
+                healthy=False,
+                message='%s stale, last result %s' % (self._name,
+                                                      result.message),
+                age=age
+            )
+        return kafka_check.CheckResult(healthy=result.healthy,
+                                       message=result.message,
+                                       age=age)
+
+    def _ensure_started(self):
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            self.probe()
+            self._pid = pid
+            thread = threading.Thread(target=self._run,
+                                      name='%s-prober' % self._name)
+            thread.daemon = True
+            thread.start()
+
+    def _run(self):
+        pid = os.getpid()
+        while True:
+            time.sleep(self._interval)
+            if self._pid != pid:
+                return
+            self.probe()
+
+    def probe(self):
+        """Runs the check once and stores the result."""
+        try:
+            result = self._check.healthcheck()
+        except Exception as ex:
+            LOG.exception(ex)
+            result = kafka_check.CheckResult(
+                healthy=False,
+                message='%s failed, %s' % (self._name, ex)
+            )
+        self._latest = (result, timeutils.now())
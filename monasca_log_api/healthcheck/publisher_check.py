@@ -0,0 +1,248 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import math
+import threading
+
+from oslo_config import cfg
+from oslo_log import log
+from oslo_utils import timeutils
+
+from monasca_log_api.healthcheck import kafka_check
+
+LOG = log.getLogger(__name__)
+CONF = cfg.CONF
+
+_DEFAULT_WINDOW = 60
+_DEFAULT_MIN_SUCCESS_RATE = 0.9
+_DEFAULT_MAX_IN_FLIGHT = 8
+_DEFAULT_MAX_LATENCY = 5.0
+_EWMA_ALPHA = 0.2
+_LATENCY_DECAY_TIME = 10.0
+"""Time (in seconds) in which latency decays e times if nothing is published"""
+
+publisher_check_opts = [
+    cfg.IntOpt('window',
+               default=_DEFAULT_WINDOW,
+               min=1,
+               help=('Length (in seconds) of the window success rate of '
+                     'publishing is calculated for, default to %d'
+                     % _DEFAULT_WINDOW)),
+    cfg.FloatOpt('min_success_rate',
+                 default=_DEFAULT_MIN_SUCCESS_RATE,
+                 min=0.0,
+                 max=1.0,
+                 help=('Minimal success rate of publishing for worker to be '
+                       'ready, default to %.1f' % _DEFAULT_MIN_SUCCESS_RATE)),
+    cfg.IntOpt('max_in_flight',
+               default=_DEFAULT_MAX_IN_FLIGHT,
+               min=1,
+               help=('Maximum amount of batches being published at once '
+                     'for worker to be ready, default to %d'
+                     % _DEFAULT_MAX_IN_FLIGHT)),
+    cfg.FloatOpt('max_latency',
+                 default=_DEFAULT_MAX_LATENCY,
+                 min=0.0,
+                 help=('Maximum average time (in seconds) of publishing '
+                       'batch for worker to be ready, default to %.1f'
+                       % _DEFAULT_MAX_LATENCY))
+]
+publisher_check_group = cfg.OptGroup(name='publisher_healthcheck',
+                                     title='publisher_healthcheck')
+
+cfg.CONF.register_group(publisher_check_group)
+cfg.CONF.register_opts(publisher_check_opts, publisher_check_group)
+
+_STATS = None
+_STATS_LOCK = threading.Lock()
+
+
+def get_stats():
+    """Returns publishing statistics of the worker.
+
+    :rtype: PublisherStats
+    """
+    global _STATS
+    if _STATS is None:
+        with _STATS_LOCK:
+            if _STATS is None:
+                _STATS = PublisherStats()
+    return _STATS
+
+
+class PublisherStats(object):
+    """Statistics of publishing logs to kafka.
+
+    Statistics are recorded by
+    :py:class:`monasca_log_api.reference.common.log_publisher.LogPublisher`
+    around every batch sent with the producer:
+
+    * success rate - within current and previous window
+    * in-flight - amount of batches being published at the moment
+    * queue depth - amount of messages in in-flight batches
+    * latency - exponentially weighted moving average of time
+      needed to publish batch, decaying with time passed since
+      last batch, so that single slow burst does not mark idle
+      worker congested for good
+    * last error - with the time it happened
+
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._window_start = timeutils.now()
+        self._current = [0, 0]
+        self._previous = [0, 0]
+        self._in_flight = 0
+        self._queue_depth = 0
+        self._latency = None
+        self._latency_time = None
+        self._last_error = None
+        self._last_error_time = None
+
+    def begin(self, messages):
+        """Records start of publishing.
+
+        :param int messages: amount of messages in the batch
+        :return: start time to be passed to :py:meth:`.end`
+        :rtype: float
+        """
+        with self._lock:
+            self._in_flight += 1
+            self._queue_depth += messages
+        return timeutils.now()
+
+    def end(self, start_time, messages, error=None):
+        """Records end of publishing.
+
+        :param float start_time: value returned from :py:meth:`.begin`
+        :param int messages: amount of messages in the batch
+        :param Exception error: error publishing failed with, if any
+        """
+        now = timeutils.now()
+        duration = now - start_time
+        with self._lock:
+            self._in_flight -= 1
+            self._queue_depth -= messages
+            self._rotate(now)
+            if error is None:
+                self._current[0] += 1
+            else:
+                self._current[1] += 1
+                self._last_error = repr(error)
+                self._last_error_time = now
+            latency = self._decayed_latency(now)
+            self._latency = (duration if latency is None else
+                             _EWMA_ALPHA * duration +
+                             (1 - _EWMA_ALPHA) * latency)
+            self._latency_time = now
+
+    def snapshot(self):
+        """Returns current statistics.
+
+        :rtype: dict
+        """
+        now = timeutils.now()
+        with self._lock:
+            self._rotate(now)
+            succeeded = self._current[0] + self._previous[0]
+            failed = self._current[1] + self._previous[1]
+            return {
+                'published': succeeded,
+                'failed': failed,
+                'success_rate': (float(succeeded) / (succeeded + failed)
+                                 if succeeded + failed else None),
+                'in_flight': self._in_flight,
+                'queue_depth': self._queue_depth,
+                'latency': self._decayed_latency(now),
+                'last_error': self._last_error,
+                'last_error_age': (now - self._last_error_time
+                                   if self._last_error_time is not None
+                                   else None)
+            }
+
+    def _decayed_latency(self, now):
+        if self._latency is None:
+            return None
+        elapsed = max(0.0, now - self._latency_time)
+        return self._latency * math.exp(-elapsed / _LATENCY_DECAY_TIME)
+
+    def _rotate(self, now):
+        elapsed = now - self._window_start
+        window = CONF.publisher_healthcheck.window
+        if elapsed < window:
+            return
+        self._previous = self._current if elapsed < 2 * window else [0, 0]
+        self._current = [0, 0]
+        self._window_start = now
+
+
+class PublisherHealthCheck(object):
+    """Evaluates readiness of the worker from publishing statistics.
+
+    Worker is considered not ready if any of following is true:
+
+    * too many batches are being published at once, meaning
+      producer is saturated
+    * average latency of publishing exceeds the limit
+    * success rate within the window is below the limit
+
+    If no batch has been published within the window and producer
+    is not saturated, status is unknown and :py:attr:`CheckResult.healthy`
+    is None. Readiness should be then determined by other checks.
+
+    Example of configuration:
+
+    .. code-block:: ini
+
+      [publisher_healthcheck]
+      window = 60
+      min_success_rate = 0.9
+      max_in_flight = 8
+      max_latency = 5.0
+
+    """
+
+    def __init__(self, stats=None):
+        self._stats = stats or get_stats()
+
+    def stats(self):
+        """Returns statistics the check is evaluated from."""
+        return self._stats.snapshot()
+
+    def healthcheck(self, stats=None):
+        conf = CONF.publisher_healthcheck
+        stats = stats or self.stats()
+
+        if stats['in_flight'] > conf.max_in_flight:
+            return self._unhealthy('%d batches in flight'
+                                   % stats['in_flight'])
+        if stats['success_rate'] is None:
+            return kafka_check.CheckResult(healthy=None,
+                                           message='No recent publishing')
+        if stats['latency'] > conf.max_latency:
+            return self._unhealthy('Average latency %.3fs'
+                                   % stats['latency'])
+        if stats['success_rate'] < conf.min_success_rate:
+            return self._unhealthy('Success rate %.2f, last error %s'
+                                   % (stats['success_rate'],
+                                      stats['last_error']))
+
+        return kafka_check.CheckResult(healthy=True, message='OK')
+
+    @staticmethod
+    def _unhealthy(reason):
+        error_str = 'Publisher: %s' % reason
+        LOG.warning(error_str)
+        return kafka_check.CheckResult(healthy=False, message=error_str)
@@ -0,0 +1,322 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import threading
+
+import falcon
+from oslo_config import cfg
+from oslo_log import log
+from oslo_middleware import base as om
+from oslo_utils import timeutils
+from webob import dec
+from webob import response
+
+from monasca_log_api.healthcheck import publisher_check
+from monasca_log_api.middleware import role_middleware
+from monasca_log_api.monitoring import client
+from monasca_log_api.monitoring import metrics
+from monasca_log_api import uri_map
+
+CONF = cfg.CONF
+LOG = log.getLogger(__name__)
+
+_DEFAULT_MAX_IN_FLIGHT_BYTES = 64 * 1024 * 1024
+_DEFAULT_MAX_IN_FLIGHT_REQUESTS = 64
+_DEFAULT_TARGET_LATENCY = 1.0
+_DEFAULT_MIN_BUDGET = 0.1
+_DEFAULT_ADJUST_INTERVAL = 1.0
+_DEFAULT_RETRY_AFTER = 5
+_DEFAULT_AGENT_WEIGHT = 3
+_DEFAULT_USER_WEIGHT = 1
+
+_DECREASE_FACTOR = 0.5
+"""Budget is multiplied by that factor when publishing is congested"""
+_INCREASE_STEP = 0.05
+"""Fraction of full budget restored in each interval without congestion"""
+
+AGENT_LANE = 'agent'
+"""Lane of requests sent with one of agent roles"""
+USER_LANE = 'user'
+"""Lane of all other requests"""
+
+_LOGS_PATHS = {uri_map.V2_LOGS_URI, uri_map.V3_LOGS_URI}
+_LOGS_METHODS = {'POST'}
+
+admission_opts = [
+    cfg.IntOpt('max_in_flight_bytes',
+               default=_DEFAULT_MAX_IN_FLIGHT_BYTES,
+               min=1,
+               help=('Maximum sum of Content-Length of logs requests '
+                     'processed by the worker at once, default to %d'
+                     % _DEFAULT_MAX_IN_FLIGHT_BYTES)),
+    cfg.IntOpt('max_in_flight_requests',
+               default=_DEFAULT_MAX_IN_FLIGHT_REQUESTS,
+               min=1,
+               help=('Maximum amount of logs requests processed by the '
+                     'worker at once, default to %d'
+                     % _DEFAULT_MAX_IN_FLIGHT_REQUESTS)),
+    cfg.FloatOpt('target_latency',
+                 default=_DEFAULT_TARGET_LATENCY,
+                 min=0.0,
+                 help=('Average time (in seconds) of publishing batch '
+                       'above which budget is tightened, 0 disables '
+                       'adapting budget, default to %.1f'
+                       % _DEFAULT_TARGET_LATENCY)),
+    cfg.FloatOpt('min_budget',
+                 default=_DEFAULT_MIN_BUDGET,
+                 min=0.0,
+                 max=1.0,
+                 help=('Fraction of full budget that budget is never '
+                       'tightened below, default to %.1f'
+                       % _DEFAULT_MIN_BUDGET)),
+    cfg.FloatOpt('adjust_interval',
+                 default=_DEFAULT_ADJUST_INTERVAL,
+                 min=0.0,
+                 help=('Interval (in seconds) of adapting budget, '
+                       'default to %.1f' % _DEFAULT_ADJUST_INTERVAL)),
+    cfg.IntOpt('retry_after',
+               default=_DEFAULT_RETRY_AFTER,
+               min=1,
+               help=('Value of Retry-After header of rejected requests, '
+                     'default to %d' % _DEFAULT_RETRY_AFTER)),
+    cfg.IntOpt('agent_weight',
+               default=_DEFAULT_AGENT_WEIGHT,
+               min=0,
+               help=('Weight of agent lane, fraction of budget '
+                     'guaranteed to requests sent by agents is '
+                     'agent_weight / (agent_weight + user_weight), '
+                     'default to %d' % _DEFAULT_AGENT_WEIGHT)),
+    cfg.IntOpt('user_weight',
+               default=_DEFAULT_USER_WEIGHT,
+               min=0,
+               help=('Weight of user lane, fraction of budget '
+                     'guaranteed to requests sent by other users is '
+                     'user_weight / (agent_weight + user_weight), '
+                     'default to %d' % _DEFAULT_USER_WEIGHT))
+]
+admission_group = cfg.OptGroup(name='admission', title='admission')
+
+CONF.register_group(admission_group)
+CONF.register_opts(admission_opts, admission_group)
+CONF.import_opt('max_log_size',
+                'monasca_log_api.reference.v2.common.service',
+                group='service')
+
+
+class AdmissionController(object):
+    """Budget of logs requests processed by the worker at once.
+
+    Budget is split between lanes (:py:data:`AGENT_LANE` and
+    :py:data:`USER_LANE`) according to their weights, each lane is
+    guaranteed its own part. Parts of idle lanes (without requests
+    in flight) are lent to busy ones, so that single lane can use
+    whole budget. Once idle lane receives request, lending stops and
+    borrowing lane shrinks back to its part as its requests complete.
+    That way agents keep publishing while users flood the endpoint
+    and vice versa.
+
+    Request is admitted if, together with requests of its lane already
+    in flight, it fits into both bytes and requests budget available
+    to the lane. Request arriving at idle lane is always admitted,
+    so that any request accepted by
+    :py:func:`validation.validate_payload_size` can be processed
+    and lending stops right away.
+
+    Budget adapts to publishing latency
+    (see :py:class:`publisher_check.PublisherStats`) with additive
+    increase, multiplicative decrease. If average latency exceeds
+    ``target_latency`` or producer is saturated, budget is halved,
+    otherwise it grows back towards full budget. Adaptation happens
+    lazily, at most once per ``adjust_interval``.
+
+    """
+
+    def __init__(self, max_bytes, max_requests, target_latency=0.0,
+                 min_budget=_DEFAULT_MIN_BUDGET,
+                 adjust_interval=_DEFAULT_ADJUST_INTERVAL, weights=None,
+                 stats=None):
+        self._max_bytes = max_bytes
+        self._max_requests = max_requests
+        self._target_latency = target_latency
+        self._min_budget = min_budget
+        self._adjust_interval = adjust_interval
+        self._stats = stats or publisher_check.get_stats()
+
+        weights = weights or {AGENT_LANE: _DEFAULT_AGENT_WEIGHT,
+                              USER_LANE: _DEFAULT_USER_WEIGHT}
+        total_weight = float(sum(weights.values()))
+        self._shares = {lane: (weight / total_weight if total_weight
+                               else 0.0)
+                        for lane, weight in weights.items()}
+
+        self._lock = threading.Lock()
+        self._in_flight = {lane: [0, 0] for lane in weights}
+        self._budget = 1.0
+        self._adjusted = timeutils.now()
+
+    @classmethod
+    def from_conf(cls):
+        conf = CONF.admission
+        return cls(max_bytes=conf.max_in_flight_bytes,
+                   max_requests=conf.max_in_flight_requests,
+                   target_latency=conf.target_latency,
+                   min_budget=conf.min_budget,
+                   adjust_interval=conf.adjust_interval,
+                   weights={AGENT_LANE: conf.agent_weight,
+                            USER_LANE: conf.user_weight})
+
+    @property
+    def budget(self):
+        """Fraction of full budget currently available."""
+        return self._budget
+
+    def acquire(self, size, lane=USER_LANE, now=None):
+        """Tries to admit request.
+
+        :param int size: size of the request
+        :param str lane: lane of the request
+        :return: True if request was admitted and must be released
+                 with :py:meth:`.release`
+        :rtype: bool
+        """
+        now = timeutils.now() if now is None else now
+        size = size or 0
+        with self._lock:
+            self._adjust(now)
+            in_flight = self._in_flight[lane]
+            if in_flight[0]:
+                share = self._available_share(lane) * self._budget
+                if in_flight[0] + 1 > max(1, int(self._max_requests * share)):
+                    return False
+                if in_flight[1] + size > self._max_bytes * share:
+                    return False
+            in_flight[0] += 1
+            in_flight[1] += size
+            return True
+
+    def _available_share(self, lane):
+        """Share of the lane and shares lent by idle lanes."""
+        share = self._shares[lane]
+        for other, in_flight in self._in_flight.items():
+            if other != lane and not in_flight[0]:
+                share += self._shares[other]
+        return share
+
+    def release(self, size, lane=USER_LANE):
+        size = size or 0
+        with self._lock:
+            self._in_flight[lane][0] -= 1
+            self._in_flight[lane][1] -= size
+
+    def _adjust(self, now):
+        if not self._target_latency:
+            return
+        if now - self._adjusted < self._adjust_interval:
+            return
+        self._adjusted = now
+
+        stats = self._stats.snapshot()
+        congested = (
+            stats['in_flight'] > CONF.publisher_healthcheck.max_in_flight or
+            (stats['latency'] or 0) > self._target_latency
+        )
+        budget = self._budget
+        if congested:
+            budget = max(self._min_budget, budget * _DECREASE_FACTOR)
+        else:
+            budget = min(1.0, budget + _INCREASE_STEP)
+        if budget != self._budget:
+            LOG.debug('Admission budget changed from %.2f to %.2f',
+                      self._budget, budget)
+        self._budget = budget
+
+
+class AdmissionMiddleware(om.ConfigurableMiddleware):
+    """Sheds logs requests exceeding in-flight budget of the worker.
+
+    Every logs request holds its **Content-Length** of the budget
+    until the API responds (see :py:class:`.AdmissionController`),
+    requests without it hold ``[service] max_log_size``.
+    Requests that do not fit are rejected with **503** and
+    **Retry-After** header, before body is read.
+
+    Lane of the request is determined with
+    :py:func:`role_middleware.is_agent_request`, therefore middleware
+    must be placed after roles middleware, right in front of the API ::
+
+        [pipeline:main]
+        pipeline = request_id validation auth roles admission api
+
+    Configuration example
+
+    .. code-block:: cfg
+
+        [admission]
+        max_in_flight_bytes = 67108864
+        max_in_flight_requests = 64
+        target_latency = 1.0
+        min_budget = 0.1
+        agent_weight = 3
+        user_weight = 1
+
+    """
+
+    def __init__(self, application, conf=None, controller=None):
+        super(AdmissionMiddleware, self).__init__(application, conf)
+        self._controller = controller or AdmissionController.from_conf()
+        self._retry_after = CONF.admission.retry_after
+        self._shed_counter = client.get_client().get_counter(
+            metrics.REQUESTS_SHED_METRIC)
+        LOG.info('AdmissionMiddleware initialized')
+
+    @dec.wsgify(RequestClass=om.NoContentTypeRequest)
+    def __call__(self, req):
+        if not self._is_logs_request(req):
+            return req.get_response(self.application)
+
+        size = req.content_length
+        if size is None:
+            # body of unknown length (chunked) may be as big as allowed
+            size = CONF.service.max_log_size
+        lane = (AGENT_LANE if role_middleware.is_agent_request(req.environ)
+                else USER_LANE)
+        if not self._controller.acquire(size, lane):
+            return self._reject(req, lane)
+        try:
+            return req.get_response(self.application)
+        finally:
+            self._controller.release(size, lane)
+
+    def _reject(self, req, lane):
+        LOG.debug('%s %s shed in %s lane, budget %.2f', req.method,
+                  req.path, lane, self._controller.budget)
+        self._shed_counter.increment(dimensions={'lane': lane})
+        ex = falcon.HTTPServiceUnavailable(
+            'Service unavailable',
+            'Too many logs are being processed, try again later',
+            retry_after=self._retry_after)
+        res = response.Response(status=ex.status,
+                                json_body=ex.to_dict(),
+                                content_type='application/json')
+        res.headers.update(ex.headers)
+        return res
+
+    @staticmethod
+    def _is_logs_request(req):
+        if req.method not in _LOGS_METHODS:
+            return False
+        path = req.path
+        if len(path) > 1:
+            path = path.rstrip('/')
+        return path in _LOGS_PATHS
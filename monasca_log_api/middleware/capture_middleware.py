@@ -0,0 +1,259 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import atexit
+import gzip
+import json
+import os
+import random
+import threading
+import time
+import zlib
+
+from oslo_config import cfg
+from oslo_log import log
+from oslo_middleware import base as om
+
+from monasca_log_api import uri_map
+
+CONF = cfg.CONF
+LOG = log.getLogger(__name__)
+
+_DEFAULT_DIRECTORY = '/var/lib/monasca-log-api/capture'
+_DEFAULT_SAMPLE_RATE = 0.01
+_DEFAULT_MAX_FILE_SIZE = 64 * 1024 * 1024
+_DEFAULT_MAX_FILES = 10
+_DEFAULT_MAX_FILE_AGE = 300
+
+_CAPTURED_PATHS = {uri_map.V2_LOGS_URI, uri_map.V3_LOGS_URI}
+_CAPTURED_METHODS = {'POST'}
+_SKIPPED_HEADERS = {'x-auth-token', 'x-service-token', 'x-subject-token',
+                    'authorization', 'cookie'}
+"""Headers carrying credentials, never written to capture files"""
+
+capture_opts = [
+    cfg.StrOpt('directory',
+               default=_DEFAULT_DIRECTORY,
+               help=('Directory captured requests are written to, default '
+                     'to %s' % _DEFAULT_DIRECTORY)),
+    cfg.FloatOpt('sample_rate',
+                 default=_DEFAULT_SAMPLE_RATE,
+                 min=0.0,
+                 max=1.0,
+                 help=('Fraction of logs requests that are captured, '
+                       'default to %.2f' % _DEFAULT_SAMPLE_RATE)),
+    cfg.IntOpt('max_file_size',
+               default=_DEFAULT_MAX_FILE_SIZE,
+               min=1,
+               help=('Amount of (uncompressed) bytes written to single '
+                     'file before it is rotated, default to %d'
+                     % _DEFAULT_MAX_FILE_SIZE)),
+    cfg.IntOpt('max_file_age',
+               default=_DEFAULT_MAX_FILE_AGE,
+               min=1,
+               help=('Seconds after which file is rotated, even if '
+                     'max_file_size has not been reached. Captured '
+                     'requests are complete on disk only once file is '
+                     'rotated, default to %d' % _DEFAULT_MAX_FILE_AGE)),
+    cfg.IntOpt('max_files',
+               default=_DEFAULT_MAX_FILES,
+               min=1,
+               help=('Amount of files kept by each worker, oldest ones '
+                     'are removed, default to %d' % _DEFAULT_MAX_FILES))
+]
+capture_group = cfg.OptGroup(name='capture', title='capture')
+
+CONF.register_group(capture_group)
+CONF.register_opts(capture_opts, capture_group)
+
+
+def read_captures(paths):
+    """Reads requests from capture files.
+
+    Files of running or killed workers have not been closed,
+    requests found before truncated tail of such file are read.
+
+    :param list paths: capture files
+    :return: captured requests sorted by time
+    :rtype: list
+    """
+    captures = []
+    for path in paths:
+        captures.extend(_read_capture(path))
+    captures.sort(key=lambda c: c['time'])
+    return captures
+
+
+def _read_capture(path):
+    captures = []
+    with gzip.open(path, 'rb') as f:
+        try:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                captures.append(json.loads(line.decode('utf-8')))
+        except (EOFError, IOError, zlib.error) as ex:
+            LOG.warning('Capture file %s is truncated, read %d requests, '
+                        '%s', path, len(captures), ex)
+    return captures
+
+
+class CaptureWriter(object):
+    """Writes captured requests to compressed files.
+
+    Each worker writes to its own files, named after its pid, one
+    JSON document per line. Files are rotated once ``max_file_size``
+    is written to them or they are older than ``max_file_age``, only
+    ``max_files`` newest files are kept. Lines are not flushed one by
+    one, current file is closed when it is rotated or when process
+    exits.
+
+    """
+
+    def __init__(self, directory, max_file_size, max_files,
+                 max_file_age=_DEFAULT_MAX_FILE_AGE):
+        self._directory = directory
+        self._max_file_size = max_file_size
+        self._max_files = max_files
+        self._max_file_age = max_file_age
+        self._lock = threading.Lock()
+        self._file = None
+        self._pid = None
+        self._opened = 0
+        self._written = 0
+        self._files = []
+        self._sequence = 0
+        atexit.register(self.close)
+
+    def write(self, record):
+        line = (json.dumps(record, sort_keys=True) + '\n').encode('utf-8')
+        with self._lock:
+            if (self._file is None or self._pid != os.getpid() or
+                    self._written >= self._max_file_size or
+                    time.time() - self._opened >= self._max_file_age):
+                self._rotate()
+            self._file.write(line)
+            self._written += len(line)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _rotate(self):
+        if self._file is not None and self._pid == os.getpid():
+            self._file.close()
+        if self._pid != os.getpid():
+            self._files = []
+        self._pid = os.getpid()
+
+        if not os.path.isdir(self._directory):
+            os.makedirs(self._directory)
+        self._sequence += 1
+        path = os.path.join(self._directory, 'capture-%d-%d-%d.jsonl.gz'
+                            % (self._pid, int(time.time()), self._sequence))
+        self._file = gzip.open(path, 'wb')
+        self._opened = time.time()
+        self._written = 0
+        self._files.append(path)
+        LOG.info('Capturing requests to %s', path)
+
+        while len(self._files) > self._max_files:
+            old_path = self._files.pop(0)
+            try:
+                os.remove(old_path)
+            except OSError as ex:
+                LOG.warning('Failed to remove %s, %s', old_path, ex)
+
+
+class CaptureMiddleware(om.ConfigurableMiddleware):
+    """Samples logs requests into capture files.
+
+    Captured requests can be replayed against local instance with
+    :py:mod:`monasca_log_api.benchmark.replay`, so that changes
+    can be benchmarked with production-shaped traffic.
+
+    Every record holds time, method, path, query string, headers
+    and body of the request. Headers carrying credentials
+    (see :py:data:`_SKIPPED_HEADERS`) are not written.
+
+    Middleware is meant to be placed right in front of the API,
+    after authentication, so that only accepted requests are
+    captured along with identity headers ::
+
+        [pipeline:main]
+        pipeline = request_id validation auth roles capture api
+
+    Configuration example
+
+    .. code-block:: cfg
+
+        [capture]
+        directory = /var/lib/monasca-log-api/capture
+        sample_rate = 0.01
+        max_file_size = 67108864
+        max_file_age = 300
+        max_files = 10
+
+    Warning:
+        Capture files contain logs sent by tenants, directory
+        should be protected accordingly.
+
+    """
+
+    def __init__(self, application, conf=None, writer=None):
+        super(CaptureMiddleware, self).__init__(application, conf)
+        capture = CONF.capture
+        self._sample_rate = capture.sample_rate
+        self._writer = writer or CaptureWriter(
+            directory=capture.directory,
+            max_file_size=capture.max_file_size,
+            max_files=capture.max_files,
+            max_file_age=capture.max_file_age
+        )
+        LOG.info('CaptureMiddleware initialized, sample_rate=%.4f',
+                 self._sample_rate)
+
+    def process_request(self, req):
+        if not self._should_capture(req):
+            return None
+        try:
+            self._writer.write(self._to_record(req))
+        except Exception as ex:
+            LOG.warning('Failed to capture request, %s', ex)
+        return None
+
+    def _should_capture(self, req):
+        if req.method not in _CAPTURED_METHODS:
+            return False
+        path = req.path
+        if len(path) > 1:
+            path = path.rstrip('/')
+        return (path in _CAPTURED_PATHS and
+                random.random() < self._sample_rate)
+
+    @staticmethod
+    def _to_record(req):
+        # webob buffers the body, API reads it again
+        body = req.body
+        return {
+            'time': time.time(),
+            'method': req.method,
+            'path': req.path,
+            'query': req.query_string,
+            'headers': {name: value for name, value in req.headers.items()
+                        if name.lower() not in _SKIPPED_HEADERS},
+            'body': body.decode('utf-8', 'replace')
+        }
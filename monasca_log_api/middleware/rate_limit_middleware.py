@@ -0,0 +1,334 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import contextlib
+import fcntl
+import hashlib
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+
+import falcon
+from oslo_config import cfg
+from oslo_log import log
+from oslo_middleware import base as om
+from webob import response
+
+from monasca_log_api.monitoring import client
+from monasca_log_api.monitoring import metrics
+from monasca_log_api.reference.v2.common import service
+from monasca_log_api import uri_map
+
+CONF = cfg.CONF
+LOG = log.getLogger(__name__)
+
+_DEFAULT_PATH = '/dev/shm/monasca-log-api.buckets'
+_DEFAULT_SLOTS = 4096
+_DEFAULT_REQUESTS_RATE = 10.0
+_DEFAULT_REQUESTS_BURST = 50.0
+_DEFAULT_BYTES_RATE = 5.0 * 1024 * 1024
+_DEFAULT_BYTES_BURST = 25.0 * 1024 * 1024
+
+_LIMITED_PATHS = {uri_map.V2_LOGS_URI, uri_map.V3_LOGS_URI}
+_LIMITED_METHODS = {'POST'}
+
+_SLOT = struct.Struct('<Qddd')
+"""Slot: key hash, request tokens, byte tokens, time of last update"""
+_PROBES = 8
+"""Amount of slots checked for a key before it shares a bucket"""
+TOO_LARGE = float('inf')
+"""Returned by :py:meth:`.TokenBuckets.consume` for request that
+can never be allowed, because it is bigger than burst of bytes"""
+
+rate_limit_opts = [
+    cfg.StrOpt('path',
+               default=_DEFAULT_PATH,
+               help=('File backing buckets shared by workers of the node, '
+                     'should reside in tmpfs. If empty, buckets are kept '
+                     'per worker. Default to %s' % _DEFAULT_PATH)),
+    cfg.IntOpt('slots',
+               default=_DEFAULT_SLOTS,
+               min=_PROBES,
+               help=('Amount of buckets that can be tracked at once, '
+                     'default to %d' % _DEFAULT_SLOTS)),
+    cfg.FloatOpt('requests_rate',
+                 default=_DEFAULT_REQUESTS_RATE,
+                 min=0.0,
+                 help=('Requests per second allowed for each bucket, '
+                       '0 disables the limit, default to %.1f'
+                       % _DEFAULT_REQUESTS_RATE)),
+    cfg.FloatOpt('requests_burst',
+                 default=_DEFAULT_REQUESTS_BURST,
+                 min=1.0,
+                 help=('Requests that can be sent at once, default to %.1f'
+                       % _DEFAULT_REQUESTS_BURST)),
+    cfg.FloatOpt('bytes_rate',
+                 default=_DEFAULT_BYTES_RATE,
+                 min=0.0,
+                 help=('Bytes (Content-Length) per second allowed for each '
+                       'bucket, 0 disables the limit, default to %d'
+                       % _DEFAULT_BYTES_RATE)),
+    cfg.FloatOpt('bytes_burst',
+                 default=_DEFAULT_BYTES_BURST,
+                 min=1.0,
+                 help=('Bytes that can be sent at once, bigger requests are '
+                       'rejected, default to %d'
+                       % _DEFAULT_BYTES_BURST)),
+    cfg.StrOpt('dimension',
+               default=None,
+               help=('If set, bucket is kept for each value of the '
+                     'dimension (i.e. hostname) within tenant. Dimension '
+                     'is read from X-Dimensions header, requests without '
+                     'it share the bucket of the tenant'))
+]
+rate_limit_group = cfg.OptGroup(name='rate_limit', title='rate_limit')
+
+CONF.register_group(rate_limit_group)
+CONF.register_opts(rate_limit_opts, rate_limit_group)
+
+
+def _hash(key):
+    value = struct.unpack('<Q', hashlib.md5(key.encode('utf-8'))
+                          .digest()[:8])[0]
+    return value or 1
+
+
+class TokenBuckets(object):
+    """Token buckets kept in memory shared between processes.
+
+    Every key has two buckets, one of requests and one of bytes.
+    Buckets are kept in fixed-size table of a memory mapped file,
+    so that all workers of the node consume the same tokens.
+    Table is guarded with an exclusive lock of the file.
+
+    If all candidate slots are taken by other keys, slot whose
+    buckets have refilled completely is reused (that is the same as
+    a new bucket). If none has, the key shares bucket updated least
+    recently among the candidates, so that tokens of a busy key are
+    never reset by an eviction.
+
+    """
+
+    def __init__(self, slots, requests_rate, requests_burst, bytes_rate,
+                 bytes_burst, path=None):
+        self._slots = slots
+        self._requests = (requests_rate, requests_burst)
+        self._bytes = (bytes_rate, bytes_burst)
+        self._lock = threading.Lock()
+
+        size = slots * _SLOT.size
+        if path:
+            self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            with self._locked():
+                if os.fstat(self._fd).st_size != size:
+                    os.ftruncate(self._fd, 0)
+                    os.ftruncate(self._fd, size)
+            self._mmap = mmap.mmap(self._fd, size)
+        else:
+            self._fd = None
+            self._mmap = mmap.mmap(-1, size)
+
+    @classmethod
+    def from_conf(cls):
+        conf = CONF.rate_limit
+        return cls(slots=conf.slots,
+                   requests_rate=conf.requests_rate,
+                   requests_burst=conf.requests_burst,
+                   bytes_rate=conf.bytes_rate,
+                   bytes_burst=conf.bytes_burst,
+                   path=conf.path)
+
+    def consume(self, key, size, now=None):
+        """Takes tokens for single request.
+
+        Tokens are taken only if both buckets hold enough of them.
+
+        :param str key: key of the buckets
+        :param int size: size of the request
+        :return: 0 if request is allowed, otherwise seconds after which
+                 it would be or :py:data:`TOO_LARGE` if it never would
+        :rtype: float
+        """
+        now = time.time() if now is None else now
+        key_hash = _hash(key)
+        requests_rate, requests_burst = self._requests
+        bytes_rate, bytes_burst = self._bytes
+        size = size or 0
+        if bytes_rate and size > bytes_burst:
+            return TOO_LARGE
+
+        with self._locked():
+            offset, slot_hash, requests, nbytes = self._find(key_hash, now)
+
+            wait = 0.0
+            if requests_rate and requests < 1:
+                wait = (1 - requests) / requests_rate
+            if bytes_rate and nbytes < size:
+                wait = max(wait, (size - nbytes) / bytes_rate)
+            if not wait:
+                requests -= 1 if requests_rate else 0
+                nbytes -= size if bytes_rate else 0
+
+            _SLOT.pack_into(self._mmap, offset, slot_hash, requests, nbytes,
+                            now)
+        return wait
+
+    def _find(self, key_hash, now):
+        """Finds slot of the key and refills its buckets.
+
+        :return: offset of the slot, hash the slot should be stored
+                 with, requests and bytes in the buckets
+        :rtype: tuple
+        """
+        requests_rate, requests_burst = self._requests
+        bytes_rate, bytes_burst = self._bytes
+        start = key_hash % self._slots
+        oldest = None
+        for probe in range(_PROBES):
+            offset = ((start + probe) % self._slots) * _SLOT.size
+            slot_hash, requests, nbytes, updated = _SLOT.unpack_from(
+                self._mmap, offset)
+            if slot_hash == 0:
+                return offset, key_hash, requests_burst, bytes_burst
+
+            elapsed = max(now - updated, 0)
+            requests = min(requests_burst,
+                           requests + elapsed * requests_rate)
+            nbytes = min(bytes_burst, nbytes + elapsed * bytes_rate)
+            if slot_hash == key_hash:
+                return offset, key_hash, requests, nbytes
+            if requests >= requests_burst and nbytes >= bytes_burst:
+                return offset, key_hash, requests, nbytes
+            if oldest is None or updated < oldest[0]:
+                oldest = (updated, offset, slot_hash, requests, nbytes)
+        return oldest[1:]
+
+    @contextlib.contextmanager
+    def _locked(self):
+        with self._lock:
+            if self._fd is None:
+                yield
+                return
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+
+class RateLimitMiddleware(om.ConfigurableMiddleware):
+    """Limits how fast each tenant can send logs.
+
+    Every tenant has token buckets of requests and of bytes
+    (see :py:class:`.TokenBuckets`). Request that finds either
+    bucket empty is rejected with **429** and **Retry-After**
+    header telling when enough tokens will be available. Request
+    bigger than burst of bytes can never be allowed and is rejected
+    with **413**.
+
+    Optionally buckets are kept per tenant and value of a dimension,
+    that way single host cannot exhaust limits of entire tenant.
+
+    Middleware needs identity of the tenant, therefore it should be
+    placed right after authentication ::
+
+        [pipeline:main]
+        pipeline = request_id validation auth roles rate_limit admission api
+
+    Configuration example
+
+    .. code-block:: cfg
+
+        [rate_limit]
+        path = /dev/shm/monasca-log-api.buckets
+        requests_rate = 10
+        requests_burst = 50
+        bytes_rate = 5242880
+        bytes_burst = 26214400
+        dimension = hostname
+
+    Note:
+        Middleware works only for logs endpoints. Requests without
+        tenant are passed further and rejected by other filters.
+
+    """
+
+    def __init__(self, application, conf=None, buckets=None):
+        super(RateLimitMiddleware, self).__init__(application, conf)
+        self._dimension = CONF.rate_limit.dimension
+        self._buckets = buckets or TokenBuckets.from_conf()
+        self._limited_counter = client.get_client().get_counter(
+            metrics.REQUESTS_RATE_LIMITED_METRIC)
+        LOG.info('RateLimitMiddleware initialized, dimension=%s',
+                 self._dimension)
+
+    def process_request(self, req):
+        if req.method not in _LIMITED_METHODS:
+            return None
+        path = req.path
+        if len(path) > 1:
+            path = path.rstrip('/')
+        if path not in _LIMITED_PATHS:
+            return None
+
+        tenant_id = (req.headers.get('X-Project-Id') or
+                     req.headers.get('X-Tenant-Id'))
+        if not tenant_id:
+            return None
+
+        key = tenant_id
+        dimension_value = self._get_dimension(req)
+        if dimension_value:
+            key = '%s/%s' % (tenant_id, dimension_value)
+
+        wait = self._buckets.consume(key, req.content_length)
+        if not wait:
+            return None
+
+        self._limited_counter.increment()
+        if wait == TOO_LARGE:
+            LOG.debug('%s sent request bigger than burst of bytes', key)
+            return self._error_response(falcon.HTTPRequestEntityTooLarge(
+                'Request too large',
+                'Request is bigger than %d bytes that %s can send at once'
+                % (CONF.rate_limit.bytes_burst, tenant_id)))
+
+        retry_after = int(math.ceil(wait))
+        LOG.debug('%s exceeded rate limit, retry after %ds', key, retry_after)
+        return self._error_response(falcon.HTTPTooManyRequests(
+            'Too many requests',
+            'Rate limit of %s has been exceeded' % tenant_id,
+            retry_after=retry_after))
+
+    @staticmethod
+    def _error_response(ex):
+        res = response.Response(status=ex.status,
+                                json_body=ex.to_dict(),
+                                content_type='application/json')
+        res.headers.update(ex.headers)
+        return res
+
+    def _get_dimension(self, req):
+        if not self._dimension:
+            return None
+        header = req.headers.get('X-Dimensions')
+        if not header:
+            return None
+        try:
+            return service.parse_dimensions(header).get(self._dimension)
+        except falcon.HTTPError:
+            return None
@@ -31,7 +31,14 @@ role_m_opts = [
                 default=None,
                 help=('List of roles, that if set, mean that request '
                       'comes from agent, thus is authorized in the same '
-                      'time'))
+                      'time')),
+    cfg.ListOpt(name='admin_path',
+                default=None,
+                help=('List of administrative paths, accessible only '
+                      'with one of admin_roles')),
+    cfg.ListOpt(name='admin_roles',
+                default=['monasca-log-api-admin'],
+                help='List of roles allowed to enter administrative paths')
 ]
 role_m_group = cfg.OptGroup(name='roles_middleware', title='roles_middleware')
 
@@ -41,6 +48,7 @@ CONF.register_opts(role_m_opts, role_m_group)
 _X_IDENTITY_STATUS = 'X-Identity-Status'
 _X_ROLES = 'X-Roles'
 _X_MONASCA_LOG_AGENT = 'X-MONASCA-LOG-AGENT'
+_X_MONASCA_LOG_ADMIN = 'X-MONASCA-LOG-ADMIN'
 _CONFIRMED_STATUS = 'Confirmed'
 
 
@@ -54,6 +62,24 @@ def _intersect(a, b):
     return list(set(a) & set(b))
 
 
+def is_agent_request(environ):
+    """Checks if request has been identified as coming from agent.
+
+    :param dict environ: WSGI environment of the request
+    :rtype: bool
+    """
+    return bool(environ.get(_X_MONASCA_LOG_AGENT, False))
+
+
+def is_admin_request(environ):
+    """Checks if request has been authorized for administrative path.
+
+    :param dict environ: WSGI environment of the request
+    :rtype: bool
+    """
+    return bool(environ.get(_X_MONASCA_LOG_ADMIN, False))
+
+
 class RoleMiddleware(om.ConfigurableMiddleware):
     """Authorization middleware for X-Roles header.
 
@@ -81,15 +107,23 @@ class RoleMiddleware(om.ConfigurableMiddleware):
         path = /v2.0/log
         default_roles = monasca-user
         agent_roles = monasca-log-agent
+        admin_path = /profiler
+        admin_roles = monasca-log-api-admin
 
     Configuration explained:
 
     * path (list) - path (or list of paths) middleware should be applied
     * agent_roles (list) - list of roles that identifies tenant as an agent
     * default_roles (list) - list of roles that should be authorized
+    * admin_path (list) - path (or list of paths) accessible only
+      for administrators
+    * admin_roles (list) - list of roles that identifies administrator
 
     Note:
         Being an agent means that tenant is automatically authorized.
+        That does not apply to administrative paths.
+        Requests authorized for administrative path are marked,
+        see :py:func:`is_admin_request`.
     Note:
         Middleware works only for configured paths and for all
         requests apart from HTTP method **OPTIONS**.
@@ -103,16 +137,25 @@ class RoleMiddleware(om.ConfigurableMiddleware):
         self._path = middleware.path
         self._default_roles = _ensure_lower_roles(middleware.default_roles)
         self._agent_roles = _ensure_lower_roles(middleware.agent_roles)
+        self._admin_path = middleware.admin_path
+        self._admin_roles = _ensure_lower_roles(middleware.admin_roles)
 
-        LOG.debug('RolesMiddleware initialized for paths=%s', self._path)
+        LOG.debug('RolesMiddleware initialized for paths=%s, admin_paths=%s',
+                  self._path, self._admin_path)
 
     def process_request(self, req):
-        if not self._can_apply_middleware(req):
+        is_admin_path = self._is_admin_path(req)
+        if not (is_admin_path or self._can_apply_middleware(req)):
             LOG.debug('%s skipped in role middleware', req.path)
             return None
 
         is_authenticated = self._is_authenticated(req)
-        is_authorized, is_agent = self._is_authorized(req)
+        if is_admin_path:
+            is_authorized, is_agent = self._is_admin(req), False
+            req.environ[_X_MONASCA_LOG_ADMIN] = (is_authenticated and
+                                                 is_authorized)
+        else:
+            is_authorized, is_agent = self._is_authorized(req)
         tenant_id = req.headers.get('X-Tenant-Id')
 
         req.environ[_X_MONASCA_LOG_AGENT] = is_agent
@@ -154,6 +197,14 @@ class RoleMiddleware(om.ConfigurableMiddleware):
 
         return is_authorized, is_agent
 
+    def _is_admin(self, req):
+        roles = req.headers.get(_X_ROLES)
+        if not roles:
+            LOG.warning('Couldn\'t locate %s header,or it was empty', _X_ROLES)
+            return False
+        roles = _ensure_lower_roles(roles.split(','))
+        return len(_intersect(roles, self._admin_roles)) > 0
+
     def _is_authenticated(self, req):
         headers = req.headers
         if _X_IDENTITY_STATUS in headers:
@@ -173,3 +224,9 @@ class RoleMiddleware(om.ConfigurableMiddleware):
                 if path.startswith(p):
                     return True
         return False  # if no configured paths, or nothing matches
+
+    def _is_admin_path(self, req):
+        if req.method == 'OPTIONS' or not self._admin_path:
+            return False
+        path = req.path
+        return any(path.startswith(p) for p in self._admin_path)
@@ -0,0 +1,122 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import collections
+
+import falcon
+from oslo_log import log
+from oslo_middleware import base as om
+from webob import response
+
+from monasca_log_api.reference.common import validation
+from monasca_log_api import uri_map
+
+LOG = log.getLogger(__name__)
+
+_ValidationRule = collections.namedtuple('ValidationRule',
+                                         ['methods', 'content_types'])
+"""Describes which methods and content types endpoint accepts"""
+
+_RULES = {
+    uri_map.V2_LOGS_URI: _ValidationRule(
+        methods={'POST'},
+        content_types={'application/json', 'text/plain'}
+    ),
+    uri_map.V3_LOGS_URI: _ValidationRule(
+        methods={'POST', 'GET'},
+        content_types={'application/json'}
+    )
+}
+"""Validation rules for each of logs endpoints"""
+
+_PASS_METHODS = {'OPTIONS'}
+"""Methods that are never validated by the middleware"""
+
+_BODY_METHODS = {'POST'}
+"""Methods content type and size are validated for"""
+
+_RequestInfo = collections.namedtuple('RequestInfo',
+                                      ['content_type', 'content_length'])
+"""Subset of request data required by :py:mod:`validation` functions"""
+
+
+class ValidationMiddleware(om.ConfigurableMiddleware):
+    """Early validation middleware.
+
+    ValidationMiddleware rejects requests sent to logs endpoints
+    that are bound to be rejected by the API anyway. It is meant to
+    be placed in front of the authentication filter so that
+    neither token validation nor roles check is paid for
+    such requests.
+
+    Middleware verifies (in that order):
+
+    * HTTP method
+    * :py:func:`validation.validate_content_type`
+    * :py:func:`validation.validate_payload_size`
+
+    Content type and payload size are validated only for methods
+    sending logs (see :py:data:`_BODY_METHODS`).
+
+    Note:
+        Validation of the payload itself still happens in the API.
+        Middleware never reads request body.
+    Note:
+        Middleware works only for logs endpoints and for all
+        requests apart from HTTP method **OPTIONS**.
+
+    """
+
+    def process_request(self, req):
+        rule = self._get_rule(req)
+        if rule is None:
+            return None
+
+        try:
+            self._validate(req, rule)
+        except falcon.HTTPError as ex:
+            LOG.debug('%s %s rejected before authentication, %s',
+                      req.method, req.path, ex.title)
+            res = response.Response(status=ex.status,
+                                    json_body=ex.to_dict(),
+                                    content_type='application/json')
+            if ex.headers:
+                res.headers.update(ex.headers)
+            return res
+
+        return None
+
+    @staticmethod
+    def _get_rule(req):
+        if req.method in _PASS_METHODS:
+            return None
+        path = req.path
+        if len(path) > 1:
+            path = path.rstrip('/')
+        return _RULES.get(path)
+
+    @staticmethod
+    def _validate(req, rule):
+        if req.method not in rule.methods:
+            raise falcon.HTTPMethodNotAllowed(sorted(rule.methods))
+        if req.method not in _BODY_METHODS:
+            return
+
+        req_info = _RequestInfo(
+            content_type=req.headers.get('Content-Type'),
+            content_length=req.content_length
+        )
+
+        validation.validate_content_type(req_info, rule.content_types)
+        validation.validate_payload_size(req_info)
@@ -0,0 +1,254 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import atexit
+import contextlib
+import threading
+import time
+import weakref
+
+from oslo_log import log
+from oslo_utils import timeutils
+import six
+
+LOG = log.getLogger(__name__)
+
+TIMER_MAX_SUFFIX = 'max'
+"""Suffix of the metric carrying maximum timing in the interval"""
+TIMER_COUNT_SUFFIX = 'count'
+"""Suffix of the counter carrying amount of timings in the interval"""
+
+_FLUSHED_CLIENTS = weakref.WeakSet()
+_FLUSHED_CLIENTS_LOCK = threading.Lock()
+_FLUSHING = []
+"""Interval of the thread flushing clients, once it is started"""
+
+
+def flush_periodically(client):
+    """Flushes client every its interval and at exit.
+
+    Single thread (and single exit handler) flushes all clients
+    of the process, clients are not kept alive by it. Thread is
+    started with the interval of the first client.
+
+    :param AggregatingClient client: client to flush
+    """
+    with _FLUSHED_CLIENTS_LOCK:
+        _FLUSHED_CLIENTS.add(client)
+        if _FLUSHING:
+            return
+        _FLUSHING.append(client.interval)
+    atexit.register(flush_all)
+    thread = threading.Thread(target=_flush_every, args=(client.interval,))
+    thread.daemon = True
+    thread.start()
+
+
+def flush_all():
+    """Flushes all clients registered with :py:func:`flush_periodically`"""
+    with _FLUSHED_CLIENTS_LOCK:
+        clients = list(_FLUSHED_CLIENTS)
+    for client in clients:
+        client.flush()
+
+
+def _flush_every(interval):
+    while True:
+        time.sleep(interval)
+        flush_all()
+
+
+def _dimensions_key(dimensions):
+    if not dimensions:
+        return None
+    return tuple(sorted(six.iteritems(dimensions)))
+
+
+class AggregatingClient(object):
+    """Aggregates metrics locally before sending them to statsd.
+
+    AggregatingClient exposes same interface as
+    :py:class:`monascastatsd.Client` (counters, gauges and timers),
+    however instead of sending every single event it accumulates
+    them in memory and flushes summaries to underlying client
+    once per configured interval:
+
+    * counters - sum of all increments
+    * gauges - maximum value sent
+    * timers - average under original name and maximum under
+      **.max** suffix, amount of timings is sent as counter
+      with **.count** suffix
+
+    Client does not flush on its own, see :py:func:`flush_periodically`.
+
+    """
+
+    def __init__(self, client, interval):
+        self._client = client
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._metrics = []
+
+    def get_counter(self, name, connection=None, dimensions=None):
+        return self._register(AggregatedCounter(
+            self,
+            self._client.get_counter(name=name,
+                                     connection=connection,
+                                     dimensions=dimensions)
+        ))
+
+    def get_gauge(self, name=None, connection=None, dimensions=None):
+        return self._register(AggregatedGauge(
+            self,
+            self._client.get_gauge(name=name,
+                                   connection=connection,
+                                   dimensions=dimensions)
+        ))
+
+    def get_timer(self, name=None, connection=None, dimensions=None):
+        def get_count_counter(timing_name):
+            return self._client.get_counter(
+                name='.'.join(part for part in
+                              (name, timing_name, TIMER_COUNT_SUFFIX)
+                              if part),
+                connection=connection,
+                dimensions=dimensions)
+
+        return self._register(AggregatedTimer(
+            self,
+            self._client.get_timer(name=name,
+                                   connection=connection,
+                                   dimensions=dimensions),
+            get_count_counter
+        ))
+
+    def flush(self):
+        """Sends accumulated summaries to statsd."""
+        with self._lock:
+            pending = [(metric, metric.drain()) for metric in self._metrics]
+
+        for metric, values in pending:
+            try:
+                metric.report(values)
+            except Exception as ex:
+                LOG.error('Failed to flush aggregated metric')
+                LOG.exception(ex)
+
+    def _register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def _record(self, fn, *args):
+        with self._lock:
+            fn(*args)
+
+
+class _AggregatedMetric(object):
+    def __init__(self, owner, metric):
+        self._owner = owner
+        self._metric = metric
+        self._values = {}
+
+    def drain(self):
+        values, self._values = self._values, {}
+        return values
+
+    def report(self, values):  # pragma: no cover
+        raise NotImplementedError()
+
+
+class AggregatedCounter(_AggregatedMetric):
+    """Counter summing increments between flushes"""
+
+    def increment(self, value=1, dimensions=None, sample_rate=1):
+        self._owner._record(self._add, value / float(sample_rate),
+                            dimensions)
+
+    def decrement(self, value=1, dimensions=None, sample_rate=1):
+        self._owner._record(self._add, -value / float(sample_rate),
+                            dimensions)
+
+    def _add(self, value, dimensions):
+        key = _dimensions_key(dimensions)
+        current = self._values.get(key)
+        self._values[key] = (current[0] + value if current else value,
+                             dimensions)
+
+    def report(self, values):
+        for value, dimensions in six.itervalues(values):
+            self._metric.increment(value=int(round(value)),
+                                   dimensions=dimensions)
+
+
+class AggregatedGauge(_AggregatedMetric):
+    """Gauge keeping maximum value sent between flushes"""
+
+    def send(self, name, value, dimensions=None, sample_rate=1):
+        self._owner._record(self._set, name, value, dimensions)
+
+    def _set(self, name, value, dimensions):
+        key = (name, _dimensions_key(dimensions))
+        current = self._values.get(key)
+        if current is None or value > current[0]:
+            self._values[key] = (value, dimensions)
+
+    def report(self, values):
+        for (name, _), (value, dimensions) in six.iteritems(values):
+            self._metric.send(name=name, value=value, dimensions=dimensions)
+
+
+class AggregatedTimer(_AggregatedMetric):
+    """Timer keeping average, maximum and count between flushes"""
+
+    def __init__(self, owner, metric, get_count_counter):
+        super(AggregatedTimer, self).__init__(owner, metric)
+        self._get_count_counter = get_count_counter
+        self._count_counters = {}
+
+    def timing(self, name, value, dimensions=None, sample_rate=1):
+        self._owner._record(self._observe, name, value, dimensions)
+
+    @contextlib.contextmanager
+    def time(self, name, dimensions=None, sample_rate=1):
+        start_time = timeutils.now()
+        yield
+        self.timing(name, timeutils.now() - start_time, dimensions,
+                    sample_rate)
+
+    def _observe(self, name, value, dimensions):
+        key = (name, _dimensions_key(dimensions))
+        summary = self._values.get(key)
+        if summary is None:
+            self._values[key] = [1, value, value, dimensions]
+        else:
+            summary[0] += 1
+            summary[1] += value
+            summary[2] = max(summary[2], value)
+
+    def report(self, values):
+        for (name, _), summary in six.iteritems(values):
+            count, total, maximum, dimensions = summary
+            self._metric.timing(name, total / count, dimensions=dimensions)
+            self._metric.timing(_sub_name(name, TIMER_MAX_SUFFIX), maximum,
+                                dimensions=dimensions)
+            counter = self._count_counters.get(name)
+            if counter is None:
+                counter = self._count_counters[name] = (
+                    self._get_count_counter(name))
+            counter.increment(value=count, dimensions=dimensions)
+
+
+def _sub_name(name, suffix):
+    return '%s.%s' % (name, suffix) if name else suffix
@@ -17,12 +17,15 @@ import monascastatsd
 from oslo_config import cfg
 from oslo_log import log
 
+from monasca_log_api.monitoring import aggregator
+
 LOG = log.getLogger(__name__)
 CONF = cfg.CONF
 
 _DEFAULT_HOST = '127.0.0.1'
 _DEFAULT_PORT = 8125
 _DEFAULT_BUFFER_SIZE = 50
+_DEFAULT_AGGREGATION_INTERVAL = 10
 _DEFAULT_DIMENSIONS = {
     'service': 'monitoring',
     'component': 'monasca-log-api'
@@ -42,7 +45,16 @@ monitoring_opts = [
                required=True,
                help=('Maximum number of metric to buffer before sending, '
                      'default to %d' % _DEFAULT_BUFFER_SIZE)),
-    cfg.DictOpt('dimensions')
+    cfg.DictOpt('dimensions'),
+    cfg.BoolOpt('aggregate',
+                default=False,
+                help=('Aggregate metrics in process and send only '
+                      'summaries to statsd once per aggregation_interval')),
+    cfg.IntOpt('aggregation_interval',
+               default=_DEFAULT_AGGREGATION_INTERVAL,
+               min=1,
+               help=('Interval (in seconds) of sending aggregated metrics, '
+                     'default to %d' % _DEFAULT_AGGREGATION_INTERVAL))
 ]
 
 monitoring_group = cfg.OptGroup(name='monitoring', title='monitoring')
@@ -63,6 +75,8 @@ def get_client(dimensions=None):
         statsd_host = 192.168.10.4
         statsd_port = 8125
         statsd_buffer = 50
+        aggregate = True
+        aggregation_interval = 10
 
     Dimensions are appended to following dictionary ::
 
@@ -75,9 +89,13 @@ def get_client(dimensions=None):
         Passed dimensions do not override those specified in
         dictionary above
 
+    Note:
+        If aggregation is enabled, client is wrapped with
+        :py:class:`aggregator.AggregatingClient`
+
     :param dict dimensions: Optional dimensions
     :return: statsd client
-    :rtype: monascastatsd.Client
+    :rtype: monascastatsd.Client|aggregator.AggregatingClient
     """
     dims = _DEFAULT_DIMENSIONS.copy()
     if dimensions:
@@ -100,4 +118,11 @@ def get_client(dimensions=None):
     LOG.debug('Created statsd client %s[%s] = %s:%d', _CLIENT_NAME, dims,
               CONF.monitoring.statsd_host, CONF.monitoring.statsd_port)
 
+    if CONF.monitoring.aggregate:
+        client = aggregator.AggregatingClient(
+            client=client,
+            interval=CONF.monitoring.aggregation_interval
+        )
+        aggregator.flush_periodically(client)
+
     return client
@@ -0,0 +1,313 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import heapq
+import itertools
+import threading
+import time
+
+from oslo_config import cfg
+from oslo_log import log
+from oslo_utils import timeutils
+import six
+
+from monasca_log_api.monitoring import client
+from monasca_log_api.monitoring import metrics
+
+LOG = log.getLogger(__name__)
+CONF = cfg.CONF
+
+TENANT = 'tenant'
+"""Accounting by tenant who sent logs"""
+COMPONENT = 'component'
+"""Accounting by **component** dimension of logs"""
+HOSTNAME = 'hostname'
+"""Accounting by **hostname** dimension of logs"""
+
+LOGS = 'logs'
+"""Measure of amount of logs"""
+BYTES = 'bytes'
+"""Measure of size of serialized logs"""
+
+KEYS = (TENANT, COMPONENT, HOSTNAME)
+MEASURES = (LOGS, BYTES)
+
+_DEFAULT_CAPACITY = 100
+_DEFAULT_TOP_N = 10
+_DEFAULT_WINDOW = 60
+
+heavy_hitters_opts = [
+    cfg.BoolOpt('enabled',
+                default=False,
+                help='Enables accounting of logs per tenant and dimensions'),
+    cfg.IntOpt('capacity',
+               default=_DEFAULT_CAPACITY,
+               min=1,
+               help=('Amount of keys tracked by each sketch, bounds memory '
+                     'used by accounting, default to %d' % _DEFAULT_CAPACITY)),
+    cfg.IntOpt('top_n',
+               default=_DEFAULT_TOP_N,
+               min=0,
+               help=('Amount of heaviest keys reported as metrics at the '
+                     'end of each window, default to %d' % _DEFAULT_TOP_N)),
+    cfg.IntOpt('window',
+               default=_DEFAULT_WINDOW,
+               min=1,
+               help=('Length (in seconds) of accounting window, default '
+                     'to %d' % _DEFAULT_WINDOW))
+]
+heavy_hitters_group = cfg.OptGroup(name='heavy_hitters',
+                                   title='heavy_hitters')
+
+cfg.CONF.register_group(heavy_hitters_group)
+cfg.CONF.register_opts(heavy_hitters_opts, heavy_hitters_group)
+
+_ACCOUNTING = None
+_ACCOUNTING_LOCK = threading.Lock()
+
+
+def get_accounting():
+    """Returns accounting of the worker.
+
+    :return: accounting or None if disabled
+    :rtype: Accounting
+    """
+    global _ACCOUNTING
+    if not CONF.heavy_hitters.enabled:
+        return None
+    if _ACCOUNTING is None:
+        with _ACCOUNTING_LOCK:
+            if _ACCOUNTING is None:
+                _ACCOUNTING = Accounting(
+                    capacity=CONF.heavy_hitters.capacity,
+                    window=CONF.heavy_hitters.window,
+                    top_n=CONF.heavy_hitters.top_n
+                )
+                _ACCOUNTING.start_reporting()
+    return _ACCOUNTING
+
+
+class SpaceSaving(object):
+    """Space-saving sketch of heaviest keys.
+
+    Sketch tracks at most ``capacity`` keys. Once it is full, new key
+    replaces the lightest one and inherits its weight as an error,
+    hence reported weight of any key overestimates real one by at
+    most its error. Any key heavier than ``total / capacity`` is
+    guaranteed to be tracked.
+
+    Lightest key is found with min-heap holding single entry per
+    tracked key. Entries are updated lazily: offering tracked key
+    only increases its counter, so its entry may understate the
+    weight. Entry popped from the heap is stale if weight of its key
+    has grown since, it is then pushed back with current weight.
+    Every entry is pushed back at most once per increase of its key,
+    hence offer costs amortized ``O(log capacity)``.
+
+    """
+
+    def __init__(self, capacity):
+        self._capacity = capacity
+        self._counters = {}
+        self._heap = []
+        self._sequence = itertools.count()
+        self.total = 0
+
+    def offer(self, key, weight=1):
+        self.total += weight
+        counter = self._counters.get(key)
+        if counter is not None:
+            counter[0] += weight
+            return
+        if len(self._counters) < self._capacity:
+            self._track(key, weight, 0)
+            return
+        min_weight = self._pop_lightest()
+        self._track(key, min_weight + weight, min_weight)
+
+    def _track(self, key, weight, error):
+        self._counters[key] = [weight, error]
+        heapq.heappush(self._heap, (weight, next(self._sequence), key))
+
+    def _pop_lightest(self):
+        heap = self._heap
+        while True:
+            weight, _, key = heap[0]
+            current = self._counters[key][0]
+            if current == weight:
+                heapq.heappop(heap)
+                del self._counters[key]
+                return weight
+            heapq.heapreplace(heap, (current, next(self._sequence), key))
+
+    def top(self, n=None):
+        """Returns heaviest keys.
+
+        :param int n: amount of keys to return, all if not set
+        :return: list of (key, weight, error) sorted by weight
+        :rtype: list
+        """
+        ranking = sorted(((key, counter[0], counter[1])
+                          for key, counter in six.iteritems(self._counters)),
+                         key=lambda item: item[1], reverse=True)
+        return ranking[:n] if n is not None else ranking
+
+
+class Accounting(object):
+    """Accounting of logs per tenant and dimensions.
+
+    For each of :py:data:`KEYS` there is one :py:class:`.SpaceSaving`
+    sketch per :py:data:`MEASURES`, so that memory (and cardinality
+    of reported metrics) is bounded regardless of amount of tenants
+    or hosts.
+
+    Sketches are reset at the end of every window. Before that,
+    ``top_n`` heaviest keys of every sketch are sent as statsd gauges
+    :py:data:`metrics.LOGS_HEAVY_HITTERS_METRIC` and
+    :py:data:`metrics.BYTES_HEAVY_HITTERS_METRIC` with **by**
+    and **key** dimensions.
+
+    Window end is verified each time log is recorded and by the
+    thread started with :py:meth:`.start_reporting`, so that gauges
+    are sent also if no log arrives after the window ends.
+
+    """
+
+    def __init__(self, capacity, window, top_n, statsd=None):
+        self._capacity = capacity
+        self._window = window
+        self._top_n = top_n
+        self._lock = threading.Lock()
+
+        statsd = statsd or client.get_client()
+        self._gauges = {
+            LOGS: statsd.get_gauge(metrics.LOGS_HEAVY_HITTERS_METRIC),
+            BYTES: statsd.get_gauge(metrics.BYTES_HEAVY_HITTERS_METRIC)
+        }
+
+        self._window_start = timeutils.now()
+        self._current = self._new_sketches()
+        self._previous = None
+
+    def start_reporting(self):
+        """Starts thread rotating the window once it ends."""
+        thread = threading.Thread(target=self._rotate_periodically)
+        thread.daemon = True
+        thread.start()
+
+    def rotate(self):
+        """Rotates the window if it has ended and reports it."""
+        with self._lock:
+            finished = self._rotate()
+        if finished is not None:
+            self._report(finished)
+
+    def _rotate_periodically(self):
+        while True:
+            with self._lock:
+                remaining = (self._window_start + self._window -
+                             timeutils.now())
+            time.sleep(max(remaining, 0))
+            self.rotate()
+
+    def record(self, tenant_id, dimensions, size):
+        """Records single log.
+
+        :param str tenant_id: tenant who sent the log
+        :param dict dimensions: dimensions of the log
+        :param int size: size of serialized log
+        """
+        dimensions = dimensions or {}
+        keys = ((TENANT, tenant_id),
+                (COMPONENT, dimensions.get(COMPONENT)),
+                (HOSTNAME, dimensions.get(HOSTNAME)))
+
+        with self._lock:
+            finished = self._rotate()
+            for name, value in keys:
+                if value is None:
+                    continue
+                sketches = self._current[name]
+                sketches[LOGS].offer(value)
+                sketches[BYTES].offer(value, size)
+
+        if finished is not None:
+            self._report(finished)
+
+    def report(self, limit=None):
+        """Returns heaviest keys of current and previous window.
+
+        :param int limit: amount of keys per sketch
+        :rtype: dict
+        """
+        with self._lock:
+            finished = self._rotate()
+            report = {
+                'window': self._window,
+                'current': self._describe(self._current, limit),
+                'previous': self._describe(self._previous, limit)
+            }
+
+        if finished is not None:
+            self._report(finished)
+        return report
+
+    def _new_sketches(self):
+        return {
+            name: {measure: SpaceSaving(self._capacity)
+                   for measure in MEASURES}
+            for name in KEYS
+        }
+
+    def _rotate(self):
+        now = timeutils.now()
+        if now - self._window_start < self._window:
+            return None
+        finished = self._current
+        self._previous = finished
+        self._current = self._new_sketches()
+        self._window_start = now
+        return finished
+
+    def _report(self, sketches):
+        if not self._top_n:
+            return
+        try:
+            for name, measures in six.iteritems(sketches):
+                for measure, sketch in six.iteritems(measures):
+                    for key, weight, _ in sketch.top(self._top_n):
+                        self._gauges[measure].send(
+                            name=None,
+                            value=weight,
+                            dimensions={'by': name, 'key': key}
+                        )
+        except Exception as ex:
+            LOG.error('Failed to report heavy hitters')
+            LOG.exception(ex)
+
+    @staticmethod
+    def _describe(sketches, limit):
+        if sketches is None:
+            return None
+        return {
+            name: {
+                measure: {
+                    'total': sketch.total,
+                    'top': [{'key': key, 'value': weight, 'error': error}
+                            for key, weight, error in sketch.top(limit)]
+                }
+                for measure, sketch in six.iteritems(measures)
+            }
+            for name, measures in six.iteritems(sketches)
+        }
@@ -29,6 +29,18 @@ LOGS_RECEIVED_BYTE_SIZE_METRICS = 'log.in_logs_bytes'
 """Metric sent with size of payloads(a.k.a. Content-Length)
  (in bytes) API receives"""
 
+REQUESTS_RATE_LIMITED_METRIC = 'log.in_requests_rate_limited'
+"""Metric sent with amount of requests rejected because tenant
+exceeded its rate limit"""
+
+REQUESTS_SHED_METRIC = 'log.in_requests_shed'
+"""Metric sent with amount of requests rejected because worker
+had too many logs in flight"""
+
+DIMENSIONS_INTERNED_METRIC = 'log.in_dimensions_interned'
+"""Metric sent with amount of dimensions names and values found in
+(result=hit) or added to (result=miss) interned strings pool"""
+
 LOGS_PROCESSING_TIME_METRIC = 'log.processing_time_ms'
 """Metric sent with time that log-api needed to process each received log.
 Metric does not include time needed to authorize requests."""
@@ -45,3 +57,39 @@ LOGS_PUBLISH_TIME_METRIC = 'log.publish_time_ms'
 
 LOGS_TRUNCATED_METRIC = 'log.out_logs_truncated_bytes'
 """Metric sent with amount of truncated bytes from log message"""
+
+LOGS_STAGE_TIME_METRIC = 'log.stage_time_ms'
+"""Metric sent with time that log-api spent in each processing stage.
+Sent only for sampled requests, stage is sent as dimension."""
+
+LOGS_HEAVY_HITTERS_METRIC = 'log.heavy_hitters_logs'
+"""Metric sent with amount of logs received from heaviest tenants,
+components and hosts in accounting window"""
+
+BYTES_HEAVY_HITTERS_METRIC = 'log.heavy_hitters_bytes'
+"""Metric sent with size of logs received from heaviest tenants,
+components and hosts in accounting window"""
+
+PROMETHEUS_REQUEST_SIZE_METRIC = 'monasca_log_api_request_size_bytes'
+"""Histogram of payloads sizes (a.k.a. Content-Length) API receives"""
+
+PROMETHEUS_BULK_SIZE_METRIC = 'monasca_log_api_bulk_size_logs'
+"""Histogram of amount of logs received in single request"""
+
+PROMETHEUS_PROCESSING_TIME_METRIC = 'monasca_log_api_processing_time_seconds'
+"""Histogram of time that log-api needed to process request"""
+
+PROMETHEUS_PUBLISH_TIME_METRIC = 'monasca_log_api_publish_time_seconds'
+"""Histogram of time that publishing took"""
+
+PROMETHEUS_REJECTED_METRIC = 'monasca_log_api_requests_rejected_total'
+"""Counter of requests rejected entirely"""
+
+PROMETHEUS_PUBLISHED_METRIC = 'monasca_log_api_out_logs_total'
+"""Counter of logs published to kafka"""
+
+PROMETHEUS_PUBLISHED_LOST_METRIC = 'monasca_log_api_out_logs_lost_total'
+"""Counter of logs lost due to critical error in publish phase"""
+
+PROMETHEUS_STAGE_TIME_METRIC = 'monasca_log_api_stage_time_seconds'
+"""Histogram of time spent in each processing stage"""
@@ -0,0 +1,291 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import collections
+import cProfile
+import errno
+import os
+import pstats
+import re
+import signal
+import sys
+import tempfile
+import threading
+import time
+
+from oslo_config import cfg
+from oslo_log import log
+from oslo_utils import timeutils
+import six
+
+LOG = log.getLogger(__name__)
+CONF = cfg.CONF
+
+_DEFAULT_MAX_DURATION = 60
+_DEFAULT_SAMPLING_INTERVAL = 10
+_DEFAULT_REPORT_DIR = '/var/lib/monasca-log-api/profiles'
+_PROFILE_ENV_KEY = 'monasca_log_api.profile'
+_REPORT_NAME_PATTERN = '%s-%d-%d.txt'
+_REPORT_NAME_RE = re.compile(r'^[a-z]+-\d+-\d+\.txt$')
+
+profiler_opts = [
+    cfg.IntOpt('max_duration',
+               default=_DEFAULT_MAX_DURATION,
+               min=1,
+               help=('Maximum time (in seconds) single profiling '
+                     'can take, default to %d' % _DEFAULT_MAX_DURATION)),
+    cfg.IntOpt('sampling_interval',
+               default=_DEFAULT_SAMPLING_INTERVAL,
+               min=1,
+               help=('Default interval (in milliseconds) between stack '
+                     'samples, default to %d' % _DEFAULT_SAMPLING_INTERVAL)),
+    cfg.StrOpt('report_dir',
+               default=_DEFAULT_REPORT_DIR,
+               help=('Directory, shared by all workers, profiling reports '
+                     'are written to, default to %s' % _DEFAULT_REPORT_DIR))
+]
+profiler_group = cfg.OptGroup(name='profiler', title='profiler')
+
+cfg.CONF.register_group(profiler_group)
+cfg.CONF.register_opts(profiler_opts, profiler_group)
+
+
+class ProfilerBusyException(Exception):
+    pass
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return '%s:%s' % (os.path.basename(code.co_filename), code.co_name)
+
+
+def _collapse(frame):
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    names.reverse()
+    return ';'.join(names)
+
+
+def new_report_name(mode):
+    """Returns name of the report of profiling started now."""
+    return _REPORT_NAME_PATTERN % (mode, os.getpid(),
+                                   int(time.time() * 1000))
+
+
+def write_report(name, report):
+    """Writes report into ``[profiler] report_dir``.
+
+    Report is written atomically, so that any worker can serve it
+    once it is found.
+    """
+    report_dir = CONF.profiler.report_dir
+    try:
+        if not os.path.isdir(report_dir):
+            os.makedirs(report_dir)
+        fd, tmp_path = tempfile.mkstemp(dir=report_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w') as tmp_file:
+            tmp_file.write(report)
+        os.rename(tmp_path, os.path.join(report_dir, name))
+        LOG.info('Profiling report %s written', name)
+    except (IOError, OSError) as ex:
+        LOG.error('Failed to write profiling report %s', name)
+        LOG.exception(ex)
+
+
+def read_report(name):
+    """Reads report from ``[profiler] report_dir``.
+
+    :param str name: name of the report
+    :return: report or None if it has not been written (yet)
+    :rtype: str
+    """
+    if not _REPORT_NAME_RE.match(name):
+        return None
+    try:
+        with open(os.path.join(CONF.profiler.report_dir, name)) as f:
+            return f.read()
+    except IOError as ex:
+        if ex.errno == errno.ENOENT:
+            return None
+        raise
+
+
+class StackSampler(object):
+    """Wall-clock sampler of stacks of all threads.
+
+    Sampler periodically captures stacks of the process and counts how
+    many times each stack has been seen. Sampling runs in the background
+    for given duration, so that worker keeps serving requests meanwhile,
+    once it is over, counter is handed to the callback. Result is rendered
+    in collapsed stack format, that can be directly fed to flamegraph
+    tools ::
+
+        server.py:run;logs.py:on_post;log_publisher.py:_truncate 12
+
+    Started from the main thread, sampler is driven by ``SIGALRM`` of
+    :py:func:`signal.setitimer`. Signal interrupts whatever the main
+    thread runs, that is request of sync worker or current greenlet of
+    eventlet worker, and stack of that frame is sampled along with
+    stacks of other threads. Started from any other thread (threaded
+    workers), sampler runs in its own thread instead.
+
+    """
+
+    def __init__(self, interval, on_done):
+        self._interval = interval
+        self._on_done = on_done
+        self._stacks = collections.Counter()
+        self._end_time = None
+        self._previous_handler = None
+
+    def start(self, duration):
+        """Starts sampling for given amount of seconds.
+
+        :param float duration: sampling duration (seconds)
+        """
+        self._end_time = timeutils.now() + duration
+        try:
+            self._previous_handler = signal.signal(signal.SIGALRM,
+                                                   self._on_signal)
+        except ValueError:
+            # signals can be handled only by the main thread
+            thread = threading.Thread(target=self._sample_in_thread)
+            thread.daemon = True
+            thread.start()
+            return
+        # interrupted system calls are restarted
+        signal.siginterrupt(signal.SIGALRM, False)
+        signal.setitimer(signal.ITIMER_REAL, self._interval, self._interval)
+
+    def _on_signal(self, signum, frame):
+        self._stacks[_collapse(frame)] += 1
+        self._sample_threads()
+        if timeutils.now() >= self._end_time:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, self._previous_handler)
+            self._on_done(self._stacks)
+
+    def _sample_in_thread(self):
+        while timeutils.now() < self._end_time:
+            self._sample_threads()
+            time.sleep(self._interval)
+        self._on_done(self._stacks)
+
+    def _sample_threads(self):
+        # thread running the sampler is the one seeing this very frame
+        own_frame = sys._getframe()
+        for frame in six.itervalues(sys._current_frames()):
+            if frame is not own_frame:
+                self._stacks[_collapse(frame)] += 1
+
+    @staticmethod
+    def render(stacks):
+        """Renders stacks in collapsed format."""
+        return ''.join('%s %d\n' % (stack, count)
+                       for stack, count in stacks.most_common())
+
+
+class OneShotProfile(object):
+    """Deterministic profile of single request.
+
+    Profile is armed by the profiler endpoint and taken by first
+    request that reaches :py:class:`.ProfilingHook` within given
+    time. Once that request completes, statistics are handed to the
+    callback. Profiler endpoint does not wait for that request, so
+    that even single-threaded worker gets to serve it.
+
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._armed = False
+        self._pending = False
+        self._expires = None
+        self._on_done = None
+
+    @property
+    def armed(self):
+        return self._armed
+
+    def arm(self, timeout, on_done):
+        """Arms profile of next request.
+
+        :param float timeout: how long to wait for a request (seconds)
+        :param on_done: callback receiving profile statistics
+        :raises ProfilerBusyException: if profiling is already armed
+                                        or profiled request is running
+        """
+        with self._lock:
+            if (self._pending or
+                    self._armed and timeutils.now() < self._expires):
+                raise ProfilerBusyException()
+            self._expires = timeutils.now() + timeout
+            self._on_done = on_done
+            self._armed = True
+
+    def take(self):
+        """Returns profiler if profile was armed and not taken yet."""
+        if not self._armed:
+            return None
+        with self._lock:
+            if not self._armed:
+                return None
+            self._armed = False
+            if timeutils.now() >= self._expires:
+                LOG.info('No request profiled within time given')
+                return None
+            self._pending = True
+        return cProfile.Profile()
+
+    def complete(self, profiler):
+        stream = six.StringIO()
+        stats = pstats.Stats(profiler, stream=stream)
+        stats.sort_stats('cumulative').print_stats()
+        try:
+            self._on_done(stream.getvalue())
+        finally:
+            self._pending = False
+
+
+ONE_SHOT_PROFILE = OneShotProfile()
+"""Single-request profile shared by the endpoint and the hook"""
+
+
+class ProfilingHook(object):
+    """Falcon middleware profiling request armed by the endpoint.
+
+    If :py:data:`ONE_SHOT_PROFILE` is not armed, hook
+    checks single flag per request.
+
+    """
+
+    def __init__(self, one_shot=ONE_SHOT_PROFILE, skip_path=None):
+        self._one_shot = one_shot
+        self._skip_path = skip_path
+
+    def process_request(self, req, resp):
+        if not self._one_shot.armed or req.path == self._skip_path:
+            return
+        profiler = self._one_shot.take()
+        if profiler is not None:
+            req.env[_PROFILE_ENV_KEY] = profiler
+            profiler.enable()
+
+    def process_response(self, req, resp, resource):
+        profiler = req.env.pop(_PROFILE_ENV_KEY, None)
+        if profiler is not None:
+            profiler.disable()
+            self._one_shot.complete(profiler)
@@ -0,0 +1,382 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import atexit
+import bisect
+import contextlib
+import errno
+import glob
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+
+from oslo_config import cfg
+from oslo_log import log
+from oslo_utils import timeutils
+import six
+
+LOG = log.getLogger(__name__)
+CONF = cfg.CONF
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+"""Content type of prometheus text exposition format"""
+
+TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                1.0, 2.5, 5.0, 10.0)
+"""Default buckets (in seconds) for time histograms"""
+
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+"""Default buckets (in bytes) for size histograms"""
+
+COUNT_BUCKETS = (1, 5, 10, 50, 100, 500, 1000, 5000, 10000)
+"""Default buckets for amount of elements"""
+
+_DEFAULT_DUMP_INTERVAL = 5
+_DUMP_FILE_PATTERN = 'metrics_%d.json'
+_DUMP_FILE_GLOB = 'metrics_*.json'
+_DUMP_FILE_RE = re.compile(r'metrics_(\d+)\.json$')
+
+prometheus_opts = [
+    cfg.StrOpt('multiprocess_dir',
+               default=None,
+               help=('Directory shared by all workers of the node, '
+                     'each worker periodically dumps its metrics there '
+                     'so that /metrics reports values aggregated across '
+                     'workers. If not set, only metrics of the worker '
+                     'serving the request are reported. Dumps of workers '
+                     'that are gone are removed.')),
+    cfg.IntOpt('dump_interval',
+               default=_DEFAULT_DUMP_INTERVAL,
+               min=1,
+               help=('Interval (in seconds) of dumping worker metrics '
+                     'into multiprocess_dir, default to %d'
+                     % _DEFAULT_DUMP_INTERVAL))
+]
+prometheus_group = cfg.OptGroup(name='prometheus', title='prometheus')
+
+cfg.CONF.register_group(prometheus_group)
+cfg.CONF.register_opts(prometheus_opts, prometheus_group)
+
+_REGISTRY = None
+_REGISTRY_LOCK = threading.Lock()
+
+
+def get_registry():
+    """Returns registry of the worker.
+
+    :return: registry
+    :rtype: Registry
+    """
+    global _REGISTRY
+    if _REGISTRY is None:
+        with _REGISTRY_LOCK:
+            if _REGISTRY is None:
+                _REGISTRY = Registry()
+                _REGISTRY.start_dumping()
+    return _REGISTRY
+
+
+def _labels_key(labels):
+    if not labels:
+        return ()
+    return tuple(sorted(six.iteritems(labels)))
+
+
+class Registry(object):
+    """Registry of prometheus metrics.
+
+    Registry keeps counters and histograms of single worker.
+    If ``[prometheus] multiprocess_dir`` is configured, snapshot
+    of the registry is dumped into that directory every
+    ``dump_interval`` (see :py:meth:`.Registry.start_dumping`) and
+    :py:meth:`.Registry.render` merges snapshots of all the workers
+    found there. Snapshot is removed when worker exits, snapshots
+    of workers that have been killed are removed by
+    :py:meth:`.Registry.render`.
+
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._families = {}
+
+    def counter(self, name, documentation, labels=None):
+        """Returns counter with given labels.
+
+        :param str name: name of the metric
+        :param str documentation: help of the metric
+        :param dict labels: labels of the counter
+        :rtype: Counter
+        """
+        family = self._get_family(name, 'counter', documentation, None)
+        return Counter(self, family, _labels_key(labels))
+
+    def histogram(self, name, documentation, buckets, labels=None):
+        """Returns histogram with given labels.
+
+        :param str name: name of the metric
+        :param str documentation: help of the metric
+        :param tuple buckets: upper bounds of buckets
+        :param dict labels: labels of the histogram
+        :rtype: Histogram
+        """
+        family = self._get_family(name, 'histogram', documentation,
+                                  tuple(sorted(buckets)))
+        return Histogram(self, family, _labels_key(labels))
+
+    def snapshot(self):
+        """Returns serializable snapshot of the registry."""
+        with self._lock:
+            return {
+                name: {
+                    'type': family['type'],
+                    'help': family['help'],
+                    'buckets': family['buckets'],
+                    'samples': [[list(key), _copy_value(value)]
+                                for key, value in
+                                six.iteritems(family['samples'])]
+                }
+                for name, family in six.iteritems(self._families)
+            }
+
+    def start_dumping(self):
+        """Starts dumping snapshots into multiprocess_dir.
+
+        Snapshot left by previous process with the same pid is
+        removed right away, so that it is not mixed with metrics
+        of this one.
+        """
+        if not CONF.prometheus.multiprocess_dir:
+            return
+        self.remove_dump()
+        atexit.register(self.remove_dump)
+        thread = threading.Thread(target=self._dump_periodically,
+                                  args=(CONF.prometheus.dump_interval,))
+        thread.daemon = True
+        thread.start()
+
+    def dump(self):
+        """Dumps snapshot of the registry into multiprocess_dir."""
+        mp_dir = CONF.prometheus.multiprocess_dir
+        if not mp_dir:
+            return
+        path = _dump_path(mp_dir, os.getpid())
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=mp_dir, suffix='.tmp')
+            with os.fdopen(fd, 'w') as tmp_file:
+                json.dump(self.snapshot(), tmp_file)
+            os.rename(tmp_path, path)
+        except (IOError, OSError) as ex:
+            LOG.error('Failed to dump metrics into %s', mp_dir)
+            LOG.exception(ex)
+
+    def remove_dump(self):
+        """Removes snapshot of the worker from multiprocess_dir."""
+        mp_dir = CONF.prometheus.multiprocess_dir
+        if mp_dir:
+            _remove(_dump_path(mp_dir, os.getpid()))
+
+    def render(self):
+        """Renders metrics in prometheus text exposition format.
+
+        :rtype: str
+        """
+        snapshots = [self.snapshot()]
+        mp_dir = CONF.prometheus.multiprocess_dir
+        if mp_dir:
+            self.dump()
+            snapshots = list(_load_snapshots(mp_dir)) or snapshots
+        return _render(_merge(snapshots))
+
+    def _get_family(self, name, metric_type, documentation, buckets):
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = self._families[name] = {
+                    'type': metric_type,
+                    'help': documentation,
+                    'buckets': buckets,
+                    'samples': {}
+                }
+            elif family['type'] != metric_type:
+                raise ValueError('Metric %s already registered as %s'
+                                 % (name, family['type']))
+            return family
+
+    def _record(self, fn, *args):
+        with self._lock:
+            fn(*args)
+
+    def _dump_periodically(self, interval):
+        while True:
+            time.sleep(interval)
+            self.dump()
+
+
+class Counter(object):
+    """Monotonic counter"""
+
+    def __init__(self, registry, family, labels):
+        self._registry = registry
+        self._samples = family['samples']
+        self._labels = labels
+
+    def inc(self, value=1):
+        self._registry._record(self._inc, value)
+
+    def _inc(self, value):
+        self._samples[self._labels] = self._samples.get(self._labels,
+                                                        0) + value
+
+
+class Histogram(object):
+    """Histogram of observed values with fixed buckets"""
+
+    def __init__(self, registry, family, labels):
+        self._registry = registry
+        self._samples = family['samples']
+        self._buckets = family['buckets']
+        self._labels = labels
+
+    def observe(self, value):
+        self._registry._record(self._observe, value)
+
+    @contextlib.contextmanager
+    def time(self):
+        """Observes time (in seconds) spent in the block."""
+        start_time = timeutils.now()
+        try:
+            yield
+        finally:
+            self.observe(timeutils.now() - start_time)
+
+    def _observe(self, value):
+        sample = self._samples.get(self._labels)
+        if sample is None:
+            # buckets counts (non cumulative), +Inf, sum
+            sample = self._samples[self._labels] = [0] * (
+                len(self._buckets) + 2)
+        sample[bisect.bisect_left(self._buckets, value)] += 1
+        sample[-1] += value
+
+
+def _copy_value(value):
+    return list(value) if isinstance(value, list) else value
+
+
+def _dump_path(mp_dir, pid):
+    return os.path.join(mp_dir, _DUMP_FILE_PATTERN % pid)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError as ex:
+        if ex.errno != errno.ENOENT:
+            LOG.warning('Failed to remove metrics dump %s, %s', path, ex)
+
+
+def _is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError as ex:
+        return ex.errno != errno.ESRCH
+    return True
+
+
+def _load_snapshots(mp_dir):
+    for path in glob.glob(os.path.join(mp_dir, _DUMP_FILE_GLOB)):
+        match = _DUMP_FILE_RE.search(path)
+        if match and not _is_alive(int(match.group(1))):
+            # worker has been killed, before it could remove the dump
+            LOG.info('Removing metrics dump of gone worker %s', path)
+            _remove(path)
+            continue
+        try:
+            with open(path) as snapshot_file:
+                yield json.load(snapshot_file)
+        except (IOError, OSError, ValueError) as ex:
+            LOG.warning('Skipping unreadable metrics dump %s, %s', path, ex)
+
+
+def _merge(snapshots):
+    merged = {}
+    for snapshot in snapshots:
+        for name, family in six.iteritems(snapshot):
+            target = merged.setdefault(name, {
+                'type': family['type'],
+                'help': family['help'],
+                'buckets': family['buckets'],
+                'samples': {}
+            })
+            samples = target['samples']
+            for labels, value in family['samples']:
+                key = tuple(tuple(label) for label in labels)
+                current = samples.get(key)
+                if current is None:
+                    samples[key] = _copy_value(value)
+                elif isinstance(current, list):
+                    samples[key] = [a + b for a, b in zip(current, value)]
+                else:
+                    samples[key] = current + value
+    return merged
+
+
+def _format_labels(labels, extra=None):
+    labels = list(labels)
+    if extra:
+        labels.append(extra)
+    if not labels:
+        return ''
+    return '{%s}' % ','.join(
+        '%s="%s"' % (name, _escape(value)) for name, value in labels)
+
+
+def _escape(value):
+    return (six.text_type(value).replace('\\', '\\\\')
+            .replace('\n', '\\n').replace('"', '\\"'))
+
+
+def _format_bound(bound):
+    return repr(float(bound))
+
+
+def _render(families):
+    lines = []
+    for name in sorted(families):
+        family = families[name]
+        lines.append('# HELP %s %s' % (name, family['help']))
+        lines.append('# TYPE %s %s' % (name, family['type']))
+        for labels in sorted(family['samples']):
+            value = family['samples'][labels]
+            if family['type'] == 'counter':
+                lines.append('%s%s %s' % (name, _format_labels(labels),
+                                          value))
+                continue
+            cumulative = 0
+            bounds = ([_format_bound(b) for b in family['buckets']] +
+                      ['+Inf'])
+            for bound, count in zip(bounds, value[:-1]):
+                cumulative += count
+                lines.append('%s_bucket%s %d' % (
+                    name, _format_labels(labels, ('le', bound)), cumulative))
+            lines.append('%s_sum%s %s' % (name, _format_labels(labels),
+                                          repr(float(value[-1]))))
+            lines.append('%s_count%s %d' % (name, _format_labels(labels),
+                                            cumulative))
+    lines.append('')
+    return '\n'.join(lines)
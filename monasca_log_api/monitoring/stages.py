@@ -0,0 +1,180 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import collections
+import contextlib
+import random
+
+from oslo_config import cfg
+from oslo_utils import timeutils
+import six
+
+from monasca_log_api.monitoring import metrics
+from monasca_log_api.monitoring import prometheus
+
+CONF = cfg.CONF
+
+VALIDATE_REQUEST = 'validate_request'
+"""Stage of validating request (content-type, content-length etc.)"""
+READ = 'read'
+"""Stage of reading request body"""
+DECODE = 'decode'
+"""Stage of decoding JSON body"""
+VALIDATE = 'validate'
+"""Stage of validating logs and their dimensions"""
+ENVELOPE = 'envelope'
+"""Stage of creating log envelopes"""
+SERIALIZE = 'serialize'
+"""Stage of serializing (and truncating) envelopes"""
+PRODUCE = 'produce'
+"""Stage of producing messages to kafka"""
+
+SERVER_TIMING_HEADER = 'Server-Timing'
+
+stage_timing_opts = [
+    cfg.FloatOpt('sample_rate',
+                 default=0.0,
+                 min=0.0,
+                 max=1.0,
+                 help=('Fraction of requests for which time spent in each '
+                       'processing stage is measured, 0 disables it')),
+    cfg.BoolOpt('server_timing_header',
+                default=False,
+                help=('Adds Server-Timing header with stages durations '
+                      'to responses of measured requests. Meant for '
+                      'debugging only.'))
+]
+stage_timing_group = cfg.OptGroup(name='stage_timing', title='stage_timing')
+
+cfg.CONF.register_group(stage_timing_group)
+cfg.CONF.register_opts(stage_timing_opts, stage_timing_group)
+
+
+class StageTimer(object):
+    """Measures time spent in processing stages of single request.
+
+    Durations are measured with monotonic clock and
+    accumulated per stage, so that stage entered multiple
+    times (i.e. once per log in bulk) is reported as
+    a sum.
+
+    """
+
+    def __init__(self):
+        self._durations = collections.OrderedDict()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start_time = timeutils.now()
+        try:
+            yield
+        finally:
+            self._durations[name] = (self._durations.get(name, 0.0) +
+                                     timeutils.now() - start_time)
+
+    @property
+    def durations(self):
+        """Returns durations (in seconds) of each stage."""
+        return self._durations
+
+    def server_timing(self):
+        """Returns value of Server-Timing header."""
+        return ', '.join('%s;dur=%.3f' % (name, duration * 1000)
+                         for name, duration in
+                         six.iteritems(self._durations))
+
+
+class _NullStageTimer(object):
+    """StageTimer used when request is not sampled"""
+
+    durations = {}
+
+    def stage(self, name):
+        return _NULL_STAGE
+
+    def server_timing(self):
+        return ''
+
+
+class _NullStage(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+NULL_TIMER = _NullStageTimer()
+"""Timer that does not measure anything"""
+
+
+class StageTimers(object):
+    """Creates and reports :py:class:`.StageTimer`.
+
+    Only fraction of requests (``[stage_timing] sample_rate``) is
+    measured, others get :py:data:`NULL_TIMER`.
+    Durations are reported as:
+
+    * statsd timer :py:data:`metrics.LOGS_STAGE_TIME_METRIC`
+      (in milliseconds) with **stage** dimension
+    * prometheus histogram :py:data:`metrics.PROMETHEUS_STAGE_TIME_METRIC`
+      with **stage** label
+
+    """
+
+    def __init__(self, statsd, dimensions):
+        self._dimensions = dimensions
+        self._statsd_timer = statsd.get_timer(
+            name=metrics.LOGS_STAGE_TIME_METRIC,
+            dimensions=dimensions
+        )
+        self._histograms = {}
+
+    def start(self):
+        """Returns timer for new request."""
+        sample_rate = CONF.stage_timing.sample_rate
+        if sample_rate and random.random() < sample_rate:
+            return StageTimer()
+        return NULL_TIMER
+
+    def report(self, timer, res=None):
+        """Reports durations measured by the timer.
+
+        :param StageTimer timer: timer of the request
+        :param falcon.Response res: response to add Server-Timing to
+        """
+        if timer is NULL_TIMER:
+            return
+        for stage, duration in six.iteritems(timer.durations):
+            self._statsd_timer.timing(name=None,
+                                      value=duration * 1000,
+                                      dimensions={'stage': stage})
+            self._get_histogram(stage).observe(duration)
+        if res is not None and CONF.stage_timing.server_timing_header:
+            res.append_header(SERVER_TIMING_HEADER, timer.server_timing())
+
+    def _get_histogram(self, stage):
+        histogram = self._histograms.get(stage)
+        if histogram is None:
+            labels = dict(self._dimensions, stage=stage)
+            histogram = self._histograms[stage] = (
+                prometheus.get_registry().histogram(
+                    name=metrics.PROMETHEUS_STAGE_TIME_METRIC,
+                    documentation='Time spent in processing stage in seconds',
+                    buckets=prometheus.TIME_BUCKETS,
+                    labels=labels
+                ))
+        return histogram
@@ -0,0 +1,194 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Publisher process of monasca-log-api.
+
+Reads messages written by request workers to the ring buffer and
+publishes them to kafka. Used if ``[log_publisher] transport`` is
+set to ``ring_buffer``, exactly one process should run per node ::
+
+    monasca-log-api-publisher --config-file /etc/monasca/log-api-config.conf
+
+"""
+
+import signal
+import sys
+import time
+
+from monasca_common.kafka import producer
+from oslo_config import cfg
+from oslo_log import log
+from oslo_utils import timeutils
+
+from monasca_log_api import config_reload
+from monasca_log_api.reference.common import ring_buffer
+
+LOG = log.getLogger(__name__)
+CONF = cfg.CONF
+CONF.import_group('log_publisher',
+                  'monasca_log_api.reference.common.log_publisher')
+
+_POLL_INTERVAL = 0.01
+_RETRY_INTERVAL = 1
+_MAX_RETRY_INTERVAL = 30
+_LOGGED_MESSAGE_LENGTH = 256
+
+
+class RingPublisher(object):
+    """Publishes messages from the ring buffer to kafka.
+
+    Messages are read in batches of at most ``batch_size``. Batch
+    that is not full is held back until ``linger`` passes since it
+    was first seen, so that kafka receives few large requests rather
+    than many small ones.
+
+    Messages are removed from the buffer only once they have been
+    published to all topics. If publishing fails, the same batch
+    is retried, waiting twice as long after each failure (up to
+    30 seconds), hence messages are delivered at least once.
+
+    After ``max_retries`` failed attempts messages of the batch are
+    published one by one. Those that kafka still rejects (i.e. too
+    large message) are logged and dropped, so that single message
+    cannot block all the others and fill the buffer up.
+
+    Topics are taken from configuration of publisher process,
+    topics configured for workers are not used.
+
+    """
+
+    def __init__(self, ring, kafka, topics, batch_size, linger,
+                 max_retries):
+        self._ring = ring
+        self._kafka = kafka
+        self._topics = topics
+        self._batch_size = batch_size
+        self._linger = linger
+        self._max_retries = max_retries
+        self._failures = 0
+        self._batch_started = None
+        self._stopped = False
+
+    def run(self):
+        while not self._stopped:
+            if not self.run_once():
+                time.sleep(_POLL_INTERVAL)
+
+    def run_once(self):
+        """Publishes single batch if it is ready.
+
+        :return: amount of published messages
+        :rtype: int
+        """
+        messages, position = self._ring.peek(self._batch_size)
+        if not messages:
+            self._batch_started = None
+            return 0
+
+        if len(messages) < self._batch_size:
+            now = timeutils.now()
+            if self._batch_started is None:
+                self._batch_started = now
+            if now - self._batch_started < self._linger:
+                return 0
+        self._batch_started = None
+
+        try:
+            self._publish(messages)
+            published = len(messages)
+        except Exception as ex:
+            LOG.exception(ex)
+            self._failures += 1
+            if self._failures <= self._max_retries:
+                interval = min(_RETRY_INTERVAL * 2 ** (self._failures - 1),
+                               _MAX_RETRY_INTERVAL)
+                LOG.error('Failed to publish %d messages, retrying in %ds',
+                          len(messages), interval)
+                time.sleep(interval)
+                return 0
+            published = self._publish_one_by_one(messages)
+
+        self._failures = 0
+        self._ring.commit(position)
+        LOG.debug('Published %d messages to %s topics',
+                  published, self._topics)
+        return published
+
+    def _publish(self, messages):
+        for topic in self._topics:
+            self._kafka.publish(topic, messages)
+
+    def _publish_one_by_one(self, messages):
+        published = 0
+        for message in messages:
+            try:
+                self._publish([message])
+                published += 1
+            except Exception as ex:
+                LOG.error('Dropping message kafka failed to accept %d '
+                          'times, %s: %s', self._max_retries + 1, ex,
+                          message[:_LOGGED_MESSAGE_LENGTH])
+        return published
+
+    def set_topics(self, topics):
+        if topics != self._topics:
+            LOG.info('Publishing to %s topics instead of %s',
+                     topics, self._topics)
+        self._topics = topics
+
+    def stop(self, *args):
+        self._stopped = True
+
+
+def main(args=None):
+    log.register_options(CONF)
+    log.set_defaults()
+    CONF(args=sys.argv[1:] if args is None else args,
+         project='monasca_log_api',
+         default_config_files=['/etc/monasca/log-api-config.conf'])
+    log.setup(CONF, 'monasca_log_api')
+
+    ring = ring_buffer.RingBuffer.from_conf()
+    try:
+        ring.acquire_consumer()
+    except ring_buffer.RingBufferBusyException as ex:
+        LOG.error(ex)
+        return 1
+
+    publisher = RingPublisher(
+        ring=ring,
+        kafka=producer.KafkaProducer(url=CONF.log_publisher.kafka_url),
+        topics=CONF.log_publisher.topics,
+        batch_size=CONF.ring_buffer.batch_size,
+        linger=CONF.ring_buffer.linger / 1000.0,
+        max_retries=CONF.ring_buffer.max_retries
+    )
+    signal.signal(signal.SIGTERM, publisher.stop)
+    signal.signal(signal.SIGINT, publisher.stop)
+    CONF.register_mutate_hook(
+        lambda conf, fresh: publisher.set_topics(conf.log_publisher.topics))
+    config_reload.setup()
+
+    LOG.info('Publishing messages from %s (%d bytes) to %s',
+             CONF.ring_buffer.path, ring.capacity,
+             CONF.log_publisher.kafka_url)
+    try:
+        publisher.run()
+    finally:
+        ring.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
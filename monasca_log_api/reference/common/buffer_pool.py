@@ -0,0 +1,218 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import threading
+
+from oslo_config import cfg
+from oslo_log import log
+import six
+
+LOG = log.getLogger(__name__)
+CONF = cfg.CONF
+
+_DEFAULT_BUFFER_SIZE = 1024 * 1024
+_DEFAULT_MAX_BUFFERS = 8
+_DEFAULT_MIN_SIZE = 4096
+_CHUNK_SIZE = 64 * 1024
+"""Size of chunks read from streams not supporting readinto"""
+
+buffer_pool_opts = [
+    cfg.BoolOpt('enabled',
+                default=True,
+                help=('Reads bodies of logs requests into buffers reused '
+                      'across requests of the worker')),
+    cfg.IntOpt('buffer_size',
+               default=_DEFAULT_BUFFER_SIZE,
+               min=1,
+               help=('Size (in bytes) of single buffer, bigger bodies are '
+                     'read without buffers, default to %d'
+                     % _DEFAULT_BUFFER_SIZE)),
+    cfg.IntOpt('min_size',
+               default=_DEFAULT_MIN_SIZE,
+               min=0,
+               help=('Size (in bytes) of the smallest body read into '
+                     'buffer, smaller bodies are cheaper to read directly, '
+                     'default to %d' % _DEFAULT_MIN_SIZE)),
+    cfg.IntOpt('max_buffers',
+               default=_DEFAULT_MAX_BUFFERS,
+               min=1,
+               help=('Amount of buffers allocated by the worker, bodies '
+                     'of requests above that are read without buffers, '
+                     'should match amount of requests processed at once, '
+                     'default to %d' % _DEFAULT_MAX_BUFFERS))
+]
+buffer_pool_group = cfg.OptGroup(name='buffer_pool', title='buffer_pool')
+
+cfg.CONF.register_group(buffer_pool_group)
+cfg.CONF.register_opts(buffer_pool_opts, buffer_pool_group)
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_pool():
+    """Returns buffer pool of the worker.
+
+    :return: pool or None if disabled
+    :rtype: BufferPool
+    """
+    global _POOL
+    if not CONF.buffer_pool.enabled:
+        return None
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                _POOL = BufferPool(buffer_size=CONF.buffer_pool.buffer_size,
+                                   max_buffers=CONF.buffer_pool.max_buffers,
+                                   min_size=CONF.buffer_pool.min_size)
+    return _POOL
+
+
+class BufferPool(object):
+    """Buffers request bodies are read into.
+
+    Reading body with ``stream.read()`` allocates new object sized
+    to the body for each request. Allocations of that size are served
+    directly by the system allocator and, interleaved with small ones,
+    fragment the heap, so that worker keeps its peak memory long after
+    big requests are gone. Pooled buffers are allocated once and reused,
+    see :py:func:`read_into`.
+
+    Buffers are allocated on first use, at most ``max_buffers`` of
+    them. Body is read without buffer if its length is unknown, it is
+    smaller than ``min_size``, it does not fit into the buffer or all
+    buffers are lent, so that overflow never allocates buffer sized
+    objects.
+
+    Example of configuration:
+
+    .. code-block:: ini
+
+      [buffer_pool]
+      enabled = True
+      buffer_size = 1048576
+      max_buffers = 8
+      min_size = 4096
+
+    """
+
+    def __init__(self, buffer_size, max_buffers, min_size=0):
+        self.buffer_size = buffer_size
+        self._min_size = min_size
+        self._max_buffers = max_buffers
+        self._lock = threading.Lock()
+        self._idle = []
+        self._allocated = 0
+
+    def acquire(self, content_length):
+        """Lends buffer body of given length can be read into.
+
+        :param int content_length: length of the body or None if unknown
+        :return: buffer to be released with :py:meth:`.release` or None
+        :rtype: bytearray
+        """
+        if (content_length is None or content_length < self._min_size or
+                content_length > self.buffer_size):
+            return None
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+            if self._allocated >= self._max_buffers:
+                return None
+            self._allocated += 1
+        return bytearray(self.buffer_size)
+
+    def release(self, buffer):
+        """Returns buffer to the pool.
+
+        Data read into the buffer must not be referenced afterwards.
+        """
+        with self._lock:
+            self._idle.append(buffer)
+
+    @property
+    def idle(self):
+        """Amount of idle buffers."""
+        return len(self._idle)
+
+    @property
+    def allocated(self):
+        """Amount of buffers allocated so far."""
+        return self._allocated
+
+
+def acquire(pool, content_length):
+    """Lends buffer of the pool, see :py:meth:`BufferPool.acquire`.
+
+    :param BufferPool pool: pool to lend buffer from, may be None
+    :param int content_length: length of the body or None if unknown
+    :return: buffer or None
+    """
+    if pool is None:
+        return None
+    return pool.acquire(content_length)
+
+
+def release(pool, buffer):
+    """Returns buffer lent with :py:func:`acquire`, if any."""
+    if buffer is not None:
+        pool.release(buffer)
+
+
+def fits(buffer, content_length):
+    """Checks if body of given length can be read into the buffer."""
+    return (buffer is not None and content_length is not None and
+            content_length <= len(buffer))
+
+
+def read_into(stream, content_length, buffer):
+    """Reads body of the request.
+
+    Body is read into the buffer if its length is known and it fits
+    into the buffer, otherwise it is read with ``stream.read()``.
+
+    :param stream: stream to read body from
+    :param int content_length: length of the body or None if unknown
+    :param bytearray buffer: buffer to read body into, may be None
+    :return: body, memoryview of the buffer or bytes
+    """
+    if not fits(buffer, content_length):
+        return stream.read()
+
+    view = memoryview(buffer)[:content_length]
+    readinto = getattr(stream, 'readinto', None)
+    position = 0
+    while position < content_length:
+        if readinto is not None:
+            count = readinto(view[position:])
+        else:
+            chunk = stream.read(min(_CHUNK_SIZE, content_length - position))
+            count = len(chunk)
+            view[position:position + count] = chunk
+        if not count:
+            break
+        position += count
+    return view[:position]
+
+
+def to_text(body, errors='strict'):
+    """Decodes UTF-8 body, without copying it into bytes first.
+
+    :param body: memoryview or bytes
+    :param str errors: error handling scheme, see :py:func:`codecs.decode`
+    :rtype: six.text_type
+    """
+    if six.PY2 and isinstance(body, memoryview):
+        body = body.tobytes()
+    return six.text_type(body, 'utf-8', errors)
@@ -0,0 +1,213 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import threading
+
+from oslo_config import cfg
+from oslo_log import log
+import six
+
+from monasca_log_api.monitoring import client
+from monasca_log_api.monitoring import metrics
+
+LOG = log.getLogger(__name__)
+CONF = cfg.CONF
+
+_DEFAULT_MAX_SIZE = 10000
+_DEFAULT_MAX_LENGTH = 64
+
+interning_opts = [
+    cfg.BoolOpt('enabled',
+                default=True,
+                help=('Replaces dimensions names and values of received '
+                      'logs with strings shared across requests')),
+    cfg.IntOpt('max_size',
+               default=_DEFAULT_MAX_SIZE,
+               min=1,
+               help=('Amount of strings kept by the worker, default '
+                     'to %d' % _DEFAULT_MAX_SIZE)),
+    cfg.IntOpt('max_length',
+               default=_DEFAULT_MAX_LENGTH,
+               min=1,
+               help=('Length of the longest string kept, longer values '
+                     'are rarely repeated, default to %d'
+                     % _DEFAULT_MAX_LENGTH))
+]
+interning_group = cfg.OptGroup(name='interning', title='interning')
+
+cfg.CONF.register_group(interning_group)
+cfg.CONF.register_opts(interning_opts, interning_group)
+
+_INTERNER = None
+_INTERNER_LOCK = threading.Lock()
+
+
+def get_interner():
+    """Returns strings interner of the worker.
+
+    :return: interner or None if disabled
+    :rtype: Interner
+    """
+    global _INTERNER
+    if not CONF.interning.enabled:
+        return None
+    if _INTERNER is None:
+        with _INTERNER_LOCK:
+            if _INTERNER is None:
+                _INTERNER = Interner(
+                    max_size=CONF.interning.max_size,
+                    max_length=CONF.interning.max_length,
+                    counter=client.get_client().get_counter(
+                        metrics.DIMENSIONS_INTERNED_METRIC)
+                )
+    return _INTERNER
+
+
+class Interner(object):
+    """Bounded pool of dimensions names and values.
+
+    Decoder creates new strings for every log of every request,
+    even though most dimensions (``hostname``, ``component``,
+    ``service`` and their values) repeat over and over. Interner
+    replaces them with instances kept in the pool, so that strings
+    decoded for the request are freed right away and logs held while
+    bulk is in flight share the same strings.
+
+    Pool is split into two generations of at most ``max_size / 2``
+    strings. Once the young generation is full, it becomes the old one
+    and the previous old generation is dropped. Strings found in the old
+    generation are moved back to the young one, hence frequent strings
+    survive while one-off values are evicted.
+
+    Amount of strings found in (``hit``) or missing from (``miss``)
+    the pool is sent with :py:data:`metrics.DIMENSIONS_INTERNED_METRIC`.
+
+    Example of configuration:
+
+    .. code-block:: ini
+
+      [interning]
+      enabled = True
+      max_size = 10000
+      max_length = 64
+
+    """
+
+    def __init__(self, max_size, max_length, counter=None):
+        self._generation_size = max(1, max_size // 2)
+        self._max_length = max_length
+        self._counter = counter
+        self._young = {}
+        self._old = {}
+
+    def __len__(self):
+        return len(self._young) + len(self._old)
+
+    def intern(self, value):
+        """Returns pooled instance of the string.
+
+        :param value: string to intern, other values are returned as is
+        :return: instance equal to the value
+        """
+        try:
+            pooled = self._young.get(value)
+        except TypeError:
+            return value
+        if pooled is None:
+            pooled, _ = self._add(value)
+        return pooled
+
+    def intern_dimensions(self, dimensions):
+        """Returns dimensions with interned names and values.
+
+        :param dict dimensions: dimensions to intern
+        :return: (dimensions, hits, misses), dimensions are new
+                 dictionary, or the value as is if it is not a dictionary
+        :rtype: tuple
+        """
+        if not isinstance(dimensions, dict):
+            return dimensions, 0, 0
+        young = self._young
+        interned = {}
+        misses = 0
+        try:
+            for key, value in six.iteritems(dimensions):
+                # strings seen recently are served with single lookup,
+                # everything else takes the slow path
+                pooled_key = young.get(key)
+                if pooled_key is None:
+                    pooled_key, missed = self._add(key)
+                    misses += missed
+                pooled_value = young.get(value)
+                if pooled_value is None:
+                    pooled_value, missed = self._add(value)
+                    misses += missed
+                interned[pooled_key] = pooled_value
+        except TypeError:
+            # unhashable value, left for validation to reject
+            return dimensions, 0, 0
+        return interned, 2 * len(interned) - misses, misses
+
+    def intern_bulk(self, request_body):
+        """Interns global dimensions and dimensions of every log.
+
+        Request body is modified in place, amount of hits and misses
+        is sent to metrics.
+
+        :param dict request_body: decoded v3 request body
+        """
+        if not isinstance(request_body, dict):
+            return
+        hits = misses = 0
+
+        if 'dimensions' in request_body:
+            dimensions, hits, misses = self.intern_dimensions(
+                request_body['dimensions'])
+            request_body['dimensions'] = dimensions
+        logs = request_body.get('logs')
+        if isinstance(logs, list):
+            intern_dimensions = self.intern_dimensions
+            for log_element in logs:
+                if (isinstance(log_element, dict) and
+                        'dimensions' in log_element):
+                    dimensions, hit, missed = intern_dimensions(
+                        log_element['dimensions'])
+                    log_element['dimensions'] = dimensions
+                    hits += hit
+                    misses += missed
+
+        if self._counter is not None:
+            self._counter.increment(value=hits,
+                                    dimensions={'result': 'hit'})
+            self._counter.increment(value=misses,
+                                    dimensions={'result': 'miss'})
+
+    def _add(self, value):
+        """Looks up old generation and adds value to young one.
+
+        :return: (pooled value, 1 if value was not pooled yet else 0)
+        :rtype: tuple
+        """
+        if (not isinstance(value, six.string_types) or
+                len(value) > self._max_length):
+            return value, 1
+        pooled = self._old.get(value)
+        missed = 0
+        if pooled is None:
+            pooled = value
+            missed = 1
+        if len(self._young) >= self._generation_size:
+            self._old, self._young = self._young, {}
+        self._young[pooled] = pooled
+        return pooled, missed
@@ -15,15 +15,23 @@
 
 import falcon
 import time
+import weakref
 
 from monasca_common.kafka import producer
 from monasca_common.rest import utils as rest_utils
 from oslo_config import cfg
 from oslo_log import log
 
+from monasca_log_api import green
+from monasca_log_api.healthcheck import publisher_check
 from monasca_log_api.monitoring import client
+from monasca_log_api.monitoring import heavy_hitters
 from monasca_log_api.monitoring import metrics
+from monasca_log_api.monitoring import prometheus
 from monasca_log_api.reference.common import model
+from monasca_log_api.reference.common import recent_logs
+from monasca_log_api.reference.common import ring_buffer
+from monasca_log_api.reference.common import tail
 
 LOG = log.getLogger(__name__)
 CONF = cfg.CONF
@@ -37,18 +45,40 @@ _TRUNCATED_PROPERTY_SIZE = len(
 _KAFKA_META_DATA_SIZE = 32
 _TRUNCATION_SAFE_OFFSET = 1
 
+KAFKA_TRANSPORT = 'kafka'
+"""Messages are published to kafka by the worker"""
+RING_BUFFER_TRANSPORT = 'ring_buffer'
+"""Messages are written to the ring buffer read by the publisher process"""
+
 log_publisher_opts = [
     cfg.StrOpt('kafka_url',
                required=True,
                help='Url to kafka server'),
     cfg.MultiStrOpt('topics',
                     default=['logs'],
+                    mutable=True,
                     help='Consumer topics'),
     cfg.IntOpt('max_message_size',
                default=_MAX_MESSAGE_SIZE,
                required=True,
+               mutable=True,
                help=('Message max size that can be sent '
-                     'to kafka, default to %d bytes' % _MAX_MESSAGE_SIZE))
+                     'to kafka, default to %d bytes' % _MAX_MESSAGE_SIZE)),
+    cfg.BoolOpt('publish_in_tpool',
+                default=True,
+                help=('In green threads mode, publish to kafka in native '
+                      'thread pool, so that slow broker does not stall '
+                      'other requests served by the worker. Every native '
+                      'thread of the pool owns its producer. Disable only '
+                      'if producer is known to be cooperative.')),
+    cfg.StrOpt('transport',
+               default=KAFKA_TRANSPORT,
+               choices=[KAFKA_TRANSPORT, RING_BUFFER_TRANSPORT],
+               help=('Where messages are published to. With %s workers '
+                     'write messages to shared memory and '
+                     'monasca-log-api-publisher sends them to kafka '
+                     'using topics from its own configuration, '
+                     'see [ring_buffer] section' % RING_BUFFER_TRANSPORT))
 ]
 
 log_publisher_group = cfg.OptGroup(name='log_publisher', title='log_publisher')
@@ -56,6 +86,19 @@ log_publisher_group = cfg.OptGroup(name='log_publisher', title='log_publisher')
 cfg.CONF.register_group(log_publisher_group)
 cfg.CONF.register_opts(log_publisher_opts, log_publisher_group)
 
+_PUBLISHERS = weakref.WeakSet()
+"""Publishers of the process, reloaded when configuration changes"""
+
+
+def _on_mutate(conf, fresh):
+    if not any(group == 'log_publisher' for group, _ in fresh):
+        return
+    for publisher in list(_PUBLISHERS):
+        publisher.reload()
+
+
+cfg.CONF.register_mutate_hook(_on_mutate)
+
 
 class InvalidMessageException(Exception):
     pass
@@ -78,16 +121,41 @@ class LogPublisher(object):
 
     .. _monasca_common: https://github.com/openstack/monasca-common
 
+    If ``transport`` is set to ``ring_buffer``, messages are not sent
+    to kafka by the worker but written to
+    :py:class:`monasca_log_api.reference.common.ring_buffer.RingBuffer`
+    instead. Single publisher process per node (``monasca-log-api-publisher``)
+    reads them and sends to kafka in large batches.
+
+    Producer is not thread-safe. Publisher that is called from many
+    native threads (i.e. executor of ASGI application) should be
+    created with ``per_thread_producer`` set, so that every thread
+    creates and owns its own producer.
+
     """
 
-    def __init__(self):
+    def __init__(self, per_thread_producer=False):
 
         self._topics = CONF.log_publisher.topics
         self.max_message_size = CONF.log_publisher.max_message_size
-
-        self._kafka_publisher = producer.KafkaProducer(
-            url=CONF.log_publisher.kafka_url
-        )
+        _PUBLISHERS.add(self)
+
+        self._native = None
+        if CONF.log_publisher.transport == RING_BUFFER_TRANSPORT:
+            self._kafka_publisher = None
+            self._ring_buffer = ring_buffer.RingBuffer.from_conf()
+        elif per_thread_producer or (CONF.log_publisher.publish_in_tpool
+                                     and green.is_patched()):
+            # producer's connections must not cross threads, every
+            # native thread creates and owns its own producer
+            self._kafka_publisher = None
+            self._native = green.native_local()
+            self._ring_buffer = None
+        else:
+            self._kafka_publisher = producer.KafkaProducer(
+                url=CONF.log_publisher.kafka_url
+            )
+            self._ring_buffer = None
 
         self._statsd = client.get_client()
 
@@ -105,8 +173,37 @@ class LogPublisher(object):
             metrics.LOGS_TRUNCATED_METRIC
         )
 
+        registry = prometheus.get_registry()
+        self._publish_time_histogram = registry.histogram(
+            name=metrics.PROMETHEUS_PUBLISH_TIME_METRIC,
+            documentation='Time needed to publish logs in seconds',
+            buckets=prometheus.TIME_BUCKETS
+        )
+        self._logs_published_total = registry.counter(
+            name=metrics.PROMETHEUS_PUBLISHED_METRIC,
+            documentation='Amount of logs published to kafka'
+        )
+        self._logs_lost_total = registry.counter(
+            name=metrics.PROMETHEUS_PUBLISHED_LOST_METRIC,
+            documentation='Amount of logs lost in publish phase'
+        )
+
+        self._accounting = heavy_hitters.get_accounting()
+        self._publisher_stats = publisher_check.get_stats()
+        self._recent_logs = recent_logs.get_recent_logs()
+        self._tail_hub = tail.get_hub()
+
         LOG.info('Initializing LogPublisher <%s>', self)
 
+    def reload(self):
+        """Applies reloaded ``topics`` and ``max_message_size``."""
+        topics = CONF.log_publisher.topics
+        if topics != self._topics:
+            LOG.info('Publishing to %s topics instead of %s',
+                     topics, self._topics)
+        self._topics = topics
+        self.max_message_size = CONF.log_publisher.max_message_size
+
     def send_message(self, messages):
         """Sends message to each configured topic.
 
@@ -142,6 +239,14 @@ class LogPublisher(object):
                 self._publish(send_messages)
 
             sent_counter = len(send_messages)
+            if self._recent_logs is not None:
+                for message in messages:
+                    self._recent_logs.record(message.meta['tenantId'],
+                                             [message.log])
+            if self._tail_hub is not None:
+                for message in messages:
+                    self._tail_hub.publish(message.meta['tenantId'],
+                                           [message.log])
         except Exception as ex:
             LOG.error('Failure in publishing messages to kafka')
             LOG.exception(ex)
@@ -160,6 +265,8 @@ class LogPublisher(object):
             (:py:func:`.LogPublisher._is_message_valid`)
         * truncating message if necessary
             (:py:func:`.LogPublisher._truncate`)
+        * accounting message if enabled
+            (:py:class:`heavy_hitters.Accounting`)
 
         :param model.Envelope message: instance of message
         :return: serialized message
@@ -167,7 +274,12 @@ class LogPublisher(object):
         """
         if not self._is_message_valid(message):
             raise InvalidMessageException()
-        return self._truncate(message)
+        msg_str = self._truncate(message)
+        if self._accounting is not None:
+            self._accounting.record(message.meta.get('tenantId'),
+                                    message.log.get('dimensions'),
+                                    len(msg_str))
+        return msg_str
 
     def _truncate(self, envelope):
         """Truncates the message if needed.
@@ -222,16 +334,46 @@ class LogPublisher(object):
 
         LOG.debug('Publishing %d messages', num_of_msg)
 
+        error = None
+        start_time = self._publisher_stats.begin(num_of_msg)
         try:
-            for topic in self._topics:
-                self._kafka_publisher.publish(
-                    topic,
-                    messages
-                )
-                LOG.debug('Sent %d messages to topic %s', num_of_msg, topic)
+            with self._publish_time_histogram.time():
+                if self._native is not None:
+                    green.execute(self._publish_to_topics, messages)
+                else:
+                    self._publish_to_topics(messages)
         except Exception as ex:
+            error = ex
             raise falcon.HTTPServiceUnavailable('Service unavailable',
-                                                ex.message, 60)
+                                                str(ex), 60)
+        finally:
+            self._publisher_stats.end(start_time, num_of_msg, error)
+
+    def _publish_to_topics(self, messages):
+        num_of_msg = len(messages)
+        if self._ring_buffer is not None:
+            self._ring_buffer.put(messages)
+            LOG.debug('Wrote %d messages to ring buffer', num_of_msg)
+            return
+        kafka_publisher = self._get_kafka_publisher()
+        for topic in self._topics:
+            kafka_publisher.publish(
+                topic,
+                messages
+            )
+            LOG.debug('Sent %d messages to topic %s',
+                      num_of_msg, topic)
+
+    def _get_kafka_publisher(self):
+        if self._native is None:
+            return self._kafka_publisher
+        kafka_publisher = getattr(self._native, 'producer', None)
+        if kafka_publisher is None:
+            kafka_publisher = producer.KafkaProducer(
+                url=CONF.log_publisher.kafka_url
+            )
+            self._native.producer = kafka_publisher
+        return kafka_publisher
 
     @staticmethod
     def _is_message_valid(message):
@@ -264,3 +406,5 @@ class LogPublisher(object):
 
         self._logs_published_counter.increment(value=send_count)
         self._logs_lost_counter.increment(value=failed_to_send)
+        self._logs_published_total.inc(send_count)
+        self._logs_lost_total.inc(failed_to_send)
@@ -0,0 +1,421 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import bisect
+import collections
+import datetime
+import itertools
+import threading
+
+from monasca_common.rest import utils as rest_utils
+from oslo_config import cfg
+from oslo_log import log
+from oslo_utils import timeutils
+import six
+
+from monasca_log_api.reference.common import ring_buffer
+
+LOG = log.getLogger(__name__)
+CONF = cfg.CONF
+
+_DEFAULT_CAPACITY = 1000
+_DEFAULT_MAX_TENANTS = 100
+_DEFAULT_MAX_AGE = 3600
+_DEFAULT_MAX_BYTES = 16 * 1024 * 1024
+_DEFAULT_PATH = '/dev/shm/monasca-log-api.recent'
+_DEFAULT_JOURNAL_SIZE = 32 * 1024 * 1024
+_COMPACT_THRESHOLD = 1024
+"""Amount of evicted entries after which storage lists are compacted"""
+
+recent_logs_opts = [
+    cfg.BoolOpt('enabled',
+                default=False,
+                help=('Keeps recently published logs in memory, so that '
+                      'they can be listed with GET /v3.0/logs')),
+    cfg.StrOpt('path',
+               default=_DEFAULT_PATH,
+               help=('File backing journal of published logs shared by '
+                     'workers of the node, should reside in tmpfs. If '
+                     'empty, every worker keeps logs it has published only '
+                     'and listing is refused if API is served by more '
+                     'than one worker process. Default to %s'
+                     % _DEFAULT_PATH)),
+    cfg.IntOpt('journal_size',
+               default=_DEFAULT_JOURNAL_SIZE,
+               min=1024,
+               help=('Capacity (in bytes) of the journal, oldest logs are '
+                     'evicted from it first, default to %d'
+                     % _DEFAULT_JOURNAL_SIZE)),
+    cfg.IntOpt('capacity',
+               default=_DEFAULT_CAPACITY,
+               min=1,
+               help=('Amount of logs kept for each tenant, oldest are '
+                     'evicted first, default to %d' % _DEFAULT_CAPACITY)),
+    cfg.IntOpt('max_tenants',
+               default=_DEFAULT_MAX_TENANTS,
+               min=1,
+               help=('Amount of tenants logs are kept for, logs of tenant '
+                     'that has not sent logs for the longest time are '
+                     'evicted first, default to %d' % _DEFAULT_MAX_TENANTS)),
+    cfg.IntOpt('max_age',
+               default=_DEFAULT_MAX_AGE,
+               min=1,
+               help=('Time (in seconds) logs are kept for, default to %d'
+                     % _DEFAULT_MAX_AGE)),
+    cfg.IntOpt('max_bytes',
+               default=_DEFAULT_MAX_BYTES,
+               min=1,
+               help=('Approximate size (length of messages and dimensions) '
+                     'of all logs kept, oldest logs of tenant that has '
+                     'not sent logs for the longest time are evicted '
+                     'first, default to %d' % _DEFAULT_MAX_BYTES))
+]
+recent_logs_group = cfg.OptGroup(name='recent_logs', title='recent_logs')
+
+cfg.CONF.register_group(recent_logs_group)
+cfg.CONF.register_opts(recent_logs_opts, recent_logs_group)
+
+_RECENT_LOGS = None
+_RECENT_LOGS_LOCK = threading.Lock()
+
+
+def get_recent_logs():
+    """Returns recent logs store of the worker.
+
+    :return: store or None if disabled
+    :rtype: RecentLogs
+    """
+    global _RECENT_LOGS
+    if not CONF.recent_logs.enabled:
+        return None
+    if _RECENT_LOGS is None:
+        with _RECENT_LOGS_LOCK:
+            if _RECENT_LOGS is None:
+                journal = None
+                if CONF.recent_logs.path:
+                    journal = ring_buffer.RingBuffer(
+                        CONF.recent_logs.path,
+                        CONF.recent_logs.journal_size)
+                _RECENT_LOGS = RecentLogs(
+                    capacity=CONF.recent_logs.capacity,
+                    max_tenants=CONF.recent_logs.max_tenants,
+                    max_age=CONF.recent_logs.max_age,
+                    max_bytes=CONF.recent_logs.max_bytes,
+                    journal=journal
+                )
+    return _RECENT_LOGS
+
+
+def isoformat(timestamp):
+    """Formats timestamp as ISO 8601 UTC time with milliseconds."""
+    value = datetime.datetime.utcfromtimestamp(timestamp)
+    return '%s.%03dZ' % (value.strftime('%Y-%m-%dT%H:%M:%S'),
+                         value.microsecond // 1000)
+
+
+def _size_of(message, dimensions):
+    size = len(message or '')
+    for key, value in six.iteritems(dimensions):
+        size += len(key) + len(value or '')
+    return size
+
+
+class TenantLogs(object):
+    """Recent logs of single tenant.
+
+    Logs are kept in order they were recorded in, each under
+    a sequence number. Inverted index maps every dimension
+    (and every dimension's value) to sequence numbers of logs
+    holding it, and the list of logs' timestamps allows to find
+    time range with binary search. Therefore query scans only
+    logs matching the most selective dimension within time range.
+
+    Evicted logs are removed from the front of every list,
+    storage lists are compacted once enough of them is evicted.
+    Approximate size of logs kept is tracked in ``size``.
+
+    """
+
+    def __init__(self, capacity):
+        self._capacity = capacity
+        self.size = 0
+        self._entries = []
+        self._times = []
+        self._start = 0
+        """Index of the first entry that has not been evicted"""
+        self._base = 0
+        """Sequence number of entry at index 0"""
+        self._postings = {}
+        self._keys = {}
+
+    def __len__(self):
+        return len(self._entries) - self._start
+
+    def record(self, timestamp, message, dimensions):
+        if self._times and timestamp < self._times[-1]:
+            # keeps times sorted if clock goes backwards
+            timestamp = self._times[-1]
+        seq = self._base + len(self._entries)
+        self._entries.append((timestamp, message, dimensions))
+        self._times.append(timestamp)
+        self.size += _size_of(message, dimensions)
+        for key, value in six.iteritems(dimensions):
+            self._postings.setdefault((key, value),
+                                      collections.deque()).append(seq)
+            self._keys.setdefault(key, collections.deque()).append(seq)
+        while len(self) > self._capacity:
+            self._evict()
+
+    def expire(self, min_timestamp):
+        """Evicts logs recorded before given time."""
+        while len(self) and self._times[self._start] < min_timestamp:
+            self._evict()
+
+    def evict_oldest(self):
+        """Evicts the oldest log."""
+        if len(self):
+            self._evict()
+
+    def query(self, dimensions=None, start_time=None, end_time=None,
+              offset=0, limit=10, ascending=False):
+        """Finds logs matching the criteria.
+
+        :param dict dimensions: dimension name to list of accepted
+                                values, empty list accepts any value
+        :param float start_time: minimal timestamp (inclusive)
+        :param float end_time: maximal timestamp (inclusive)
+        :param int offset: amount of matching logs to skip
+        :param int limit: maximal amount of logs to return
+        :param bool ascending: if True oldest logs are returned first
+        :return: (logs, has_more), logs as (timestamp, message, dimensions)
+        :rtype: tuple
+        """
+        lo = self._start
+        hi = len(self._entries)
+        if start_time is not None:
+            lo = bisect.bisect_left(self._times, start_time, lo, hi)
+        if end_time is not None:
+            hi = bisect.bisect_right(self._times, end_time, lo, hi)
+        lo_seq, hi_seq = self._base + lo, self._base + hi
+
+        dimensions = dimensions or {}
+        candidates = self._candidates(dimensions, lo_seq, hi_seq, ascending)
+
+        found = []
+        skipped = 0
+        for seq in candidates:
+            if seq >= hi_seq:
+                if ascending:
+                    break
+                continue
+            if seq < lo_seq:
+                if ascending:
+                    continue
+                break
+            entry = self._entries[seq - self._base]
+            if not self._matches(entry[2], dimensions):
+                continue
+            if skipped < offset:
+                skipped += 1
+                continue
+            if len(found) == limit:
+                return found, True
+            found.append(entry)
+        return found, False
+
+    def _candidates(self, dimensions, lo_seq, hi_seq, ascending):
+        """Picks the shortest posting stream of requested dimensions."""
+        best = None
+        for key, values in six.iteritems(dimensions):
+            if values:
+                postings = [self._postings.get((key, value), ())
+                            for value in values]
+            else:
+                postings = [self._keys.get(key, ())]
+            size = sum(len(p) for p in postings)
+            if best is None or size < best[0]:
+                best = (size, postings)
+
+        if best is None:
+            seqs = six.moves.range(lo_seq, hi_seq)
+            return seqs if ascending else reversed(seqs)
+        postings = best[1]
+        if len(postings) == 1:
+            return postings[0] if ascending else reversed(postings[0])
+        return sorted(itertools.chain(*postings), reverse=not ascending)
+
+    @staticmethod
+    def _matches(log_dimensions, dimensions):
+        for key, values in six.iteritems(dimensions):
+            if key not in log_dimensions:
+                return False
+            if values and log_dimensions[key] not in values:
+                return False
+        return True
+
+    def _evict(self):
+        seq = self._base + self._start
+        _, message, dimensions = self._entries[self._start]
+        self._entries[self._start] = None
+        self._start += 1
+        self.size -= _size_of(message, dimensions)
+        for key, value in six.iteritems(dimensions):
+            self._pop(self._postings, (key, value), seq)
+            self._pop(self._keys, key, seq)
+
+        if (self._start >= _COMPACT_THRESHOLD and
+                self._start * 2 >= len(self._entries)):
+            del self._entries[:self._start]
+            del self._times[:self._start]
+            self._base += self._start
+            self._start = 0
+
+    @staticmethod
+    def _pop(index, key, seq):
+        posting = index[key]
+        if posting[0] == seq:
+            posting.popleft()
+        if not posting:
+            del index[key]
+
+
+class RecentLogs(object):
+    """Recently published logs of the node.
+
+    Logs are kept per tenant (see :py:class:`.TenantLogs`), bounded by
+    amount of logs per tenant, amount of tenants, age of logs and
+    their total size.
+    Store is filled by
+    :py:class:`monasca_log_api.reference.common.log_publisher.LogPublisher`
+    (and its bulk variant) after logs have been published.
+
+    Published logs are appended to the journal, that is
+    :py:class:`monasca_log_api.reference.common.ring_buffer.RingBuffer`
+    in memory shared by workers of the node. Before the query, every
+    worker indexes logs appended to the journal since its previous
+    query, hence each worker lists logs published by all of them.
+
+    Example of configuration:
+
+    .. code-block:: ini
+
+      [recent_logs]
+      enabled = True
+      capacity = 1000
+      max_tenants = 100
+      max_age = 3600
+      max_bytes = 16777216
+      path = /dev/shm/monasca-log-api.recent
+      journal_size = 33554432
+
+    Note:
+        Without the journal every worker keeps logs it has published
+        only, hence listing is served only if the API runs in single
+        worker process, see
+        :py:meth:`monasca_log_api.reference.v3.logs.Logs.on_get`.
+
+    """
+
+    def __init__(self, capacity, max_tenants, max_age,
+                 max_bytes=_DEFAULT_MAX_BYTES, journal=None):
+        self._capacity = capacity
+        self._max_tenants = max_tenants
+        self._max_age = max_age
+        self._max_bytes = max_bytes
+        self._journal = journal
+        self._position = 0
+        self._size = 0
+        self._lock = threading.Lock()
+        self._tenants = collections.OrderedDict()
+
+    @property
+    def size(self):
+        """Approximate size of all logs kept."""
+        return self._size
+
+    @property
+    def shared(self):
+        """Tells whether logs of all workers of the node are kept."""
+        return self._journal is not None
+
+    def record(self, tenant_id, log_elements):
+        """Records published logs.
+
+        :param str tenant_id: tenant logs belong to
+        :param list log_elements: published logs (log part of envelopes)
+        """
+        now = timeutils.utcnow_ts(microsecond=True)
+        entries = [(log_element.get('message'),
+                    log_element.get('dimensions') or {})
+                   for log_element in log_elements]
+        if self._journal is not None:
+            self._journal.append([rest_utils.as_json(
+                [tenant_id, now, entries])])
+            return
+        with self._lock:
+            self._record(tenant_id, now, entries)
+
+    def _record(self, tenant_id, timestamp, entries):
+        tenant_logs = self._tenants.pop(tenant_id, None)
+        if tenant_logs is None:
+            tenant_logs = TenantLogs(self._capacity)
+        self._tenants[tenant_id] = tenant_logs
+
+        size = tenant_logs.size
+        for message, dimensions in entries:
+            tenant_logs.record(timestamp, message, dimensions)
+        self._size += tenant_logs.size - size
+
+        while len(self._tenants) > self._max_tenants:
+            _, evicted = self._tenants.popitem(last=False)
+            self._size -= evicted.size
+        while self._size > self._max_bytes:
+            self._evict_oldest()
+
+    def _sync(self):
+        """Indexes logs appended to the journal since previous sync."""
+        position = self._position
+        messages, self._position, skipped = self._journal.read(position)
+        if skipped and position:
+            LOG.warning('Logs evicted from journal before they were '
+                        'indexed, increase [recent_logs] journal_size')
+        for message in messages:
+            tenant_id, timestamp, entries = rest_utils.from_json(
+                message.decode('utf-8'))
+            self._record(tenant_id, timestamp, entries)
+
+    def _evict_oldest(self):
+        tenant_id, tenant_logs = next(six.iteritems(self._tenants))
+        size = tenant_logs.size
+        tenant_logs.evict_oldest()
+        self._size -= size - tenant_logs.size
+        if not len(tenant_logs):
+            del self._tenants[tenant_id]
+
+    def query(self, tenant_id, **kwargs):
+        """Finds logs of the tenant.
+
+        See :py:meth:`.TenantLogs.query` for arguments.
+        """
+        now = timeutils.utcnow_ts(microsecond=True)
+        with self._lock:
+            if self._journal is not None:
+                self._sync()
+            tenant_logs = self._tenants.get(tenant_id)
+            if tenant_logs is None:
+                return [], False
+            size = tenant_logs.size
+            tenant_logs.expire(now - self._max_age)
+            self._size -= size - tenant_logs.size
+            return tenant_logs.query(**kwargs)
@@ -0,0 +1,345 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import contextlib
+import fcntl
+import mmap
+import os
+import struct
+import threading
+
+from oslo_config import cfg
+from oslo_log import log
+import six
+
+LOG = log.getLogger(__name__)
+CONF = cfg.CONF
+
+_DEFAULT_PATH = '/dev/shm/monasca-log-api.ring'
+_DEFAULT_SIZE = 64 * 1024 * 1024
+_DEFAULT_BATCH_SIZE = 1000
+_DEFAULT_LINGER = 100
+_DEFAULT_MAX_RETRIES = 5
+
+_MAGIC = b'MLARING1'
+_HEADER = struct.Struct('<8sQQQ')
+"""Header: magic, capacity, head (write position), tail (read position)"""
+_HEADER_SIZE = 64
+_LENGTH = struct.Struct('<I')
+_WRAP = 0xFFFFFFFF
+"""Length marking that remaining space till the end is not used"""
+
+ring_buffer_opts = [
+    cfg.StrOpt('path',
+               default=_DEFAULT_PATH,
+               help=('File backing shared memory of the ring buffer, '
+                     'should reside in tmpfs, default to %s'
+                     % _DEFAULT_PATH)),
+    cfg.IntOpt('size',
+               default=_DEFAULT_SIZE,
+               min=1024,
+               help=('Capacity (in bytes) of the ring buffer, default '
+                     'to %d' % _DEFAULT_SIZE)),
+    cfg.IntOpt('batch_size',
+               default=_DEFAULT_BATCH_SIZE,
+               min=1,
+               help=('Maximum amount of messages publisher process sends '
+                     'in single batch, default to %d' % _DEFAULT_BATCH_SIZE)),
+    cfg.IntOpt('linger',
+               default=_DEFAULT_LINGER,
+               min=0,
+               help=('Time (in milliseconds) publisher process waits for '
+                     'batch to fill up before sending it, default to %d'
+                     % _DEFAULT_LINGER)),
+    cfg.IntOpt('max_retries',
+               default=_DEFAULT_MAX_RETRIES,
+               min=0,
+               help=('Amount of times publisher process retries batch '
+                     'kafka failed to accept, afterwards messages are sent '
+                     'one by one and those still failing are dropped, '
+                     'default to %d' % _DEFAULT_MAX_RETRIES))
+]
+ring_buffer_group = cfg.OptGroup(name='ring_buffer', title='ring_buffer')
+
+cfg.CONF.register_group(ring_buffer_group)
+cfg.CONF.register_opts(ring_buffer_opts, ring_buffer_group)
+
+
+class RingBufferFullException(Exception):
+    pass
+
+
+class RingBufferBusyException(Exception):
+    pass
+
+
+class RingBuffer(object):
+    """Multi-producer, single-consumer ring buffer in shared memory.
+
+    Buffer is a memory mapped file, shared by all processes that
+    open it. Each message is stored as its length followed by its
+    bytes. Producers append messages at the head, consumer reads
+    them from the tail.
+
+    Producers are serialized with an exclusive lock of the file
+    (and with a lock within the process). Consumer holds the lock
+    only to read and move positions, messages are copied outside
+    of it. Messages stay in the buffer until consumer commits them,
+    so messages peeked by the consumer that crashed before commit
+    are read again.
+
+    Note:
+        There may be only one consumer,
+        see :py:meth:`.RingBuffer.acquire_consumer`.
+
+    Alternatively buffer may serve as a journal read by many readers.
+    Messages are then added with :py:meth:`.RingBuffer.append`, that
+    evicts the oldest messages instead of failing if buffer is full,
+    and every reader follows the head with its own position,
+    see :py:meth:`.RingBuffer.read`.
+
+    """
+
+    def __init__(self, path, size):
+        self._path = path
+        self._lock = threading.Lock()
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._consumer_fd = None
+        with self._locked():
+            self._capacity = self._initialize(size)
+        self._mmap = mmap.mmap(self._fd, _HEADER_SIZE + self._capacity)
+
+    @classmethod
+    def from_conf(cls):
+        return cls(CONF.ring_buffer.path, CONF.ring_buffer.size)
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    def put(self, messages):
+        """Appends messages to the buffer.
+
+        Either all messages are appended or none of them.
+
+        :param list messages: serialized messages
+        :raises RingBufferFullException: if there is not enough space
+        """
+        records = [_to_bytes(message) for message in messages]
+        with self._locked():
+            _, _, head, tail = self._read_header()
+            positions = []
+            position = head
+            for record in records:
+                record_size = _LENGTH.size + len(record)
+                if record_size > self._capacity:
+                    raise RingBufferFullException(
+                        'Message of %d bytes exceeds capacity'
+                        % len(record))
+                position = self._skip_to_fit(position, record_size,
+                                             positions)
+                positions.append((position % self._capacity, record))
+                position += record_size
+            if position - tail > self._capacity:
+                raise RingBufferFullException(
+                    'Ring buffer has no space for %d messages'
+                    % len(records))
+
+            self._write(positions)
+            self._write_positions(head=position)
+
+    def peek(self, max_messages, max_bytes=None):
+        """Reads messages from the tail without removing them.
+
+        :param int max_messages: maximum amount of messages to read
+        :param int max_bytes: maximum size of messages to read
+        :return: messages and position to pass to :py:meth:`.commit`
+        :rtype: tuple
+        """
+        with self._locked():
+            _, _, head, tail = self._read_header()
+        return self._read(tail, head, max_messages, max_bytes)
+
+    def append(self, messages):
+        """Appends messages to the buffer used as a journal.
+
+        Oldest messages are evicted to make space for new ones,
+        messages exceeding capacity are skipped.
+
+        :param list messages: serialized messages
+        """
+        records = [_to_bytes(message) for message in messages]
+        with self._locked():
+            _, _, head, tail = self._read_header()
+            for record in records:
+                record_size = _LENGTH.size + len(record)
+                if record_size > self._capacity:
+                    LOG.warning('Skipping message of %d bytes exceeding '
+                                'capacity of %s', len(record), self._path)
+                    continue
+                positions = []
+                position = self._skip_to_fit(head, record_size, positions)
+                while position + record_size - tail > self._capacity:
+                    # space skipped at the end holds no message to evict
+                    tail = self._next(tail) if tail < head else position
+                positions.append((position % self._capacity, record))
+                self._write(positions)
+                head = position + record_size
+            self._write_positions(head=head, tail=tail)
+
+    def read(self, position, max_messages=None):
+        """Reads messages of the journal appended since position.
+
+        Messages are not removed, every reader keeps its own position.
+
+        :param int position: position returned from previous read,
+                             0 reads all messages kept
+        :param int max_messages: maximum amount of messages to read
+        :return: messages, position to pass to next read and flag
+                 telling whether some messages have been evicted
+                 before they could be read
+        :rtype: tuple
+        """
+        with self._locked():
+            _, _, head, tail = self._read_header()
+            messages, next_position = self._read(
+                max(position, tail), head, max_messages)
+        return messages, next_position, position < tail
+
+    def head(self):
+        """Returns position from which only new messages are read."""
+        with self._locked():
+            return self._read_header()[2]
+
+    def commit(self, position):
+        """Removes messages up to position returned from peek."""
+        with self._locked():
+            self._write_positions(tail=position)
+
+    def usage(self):
+        """Returns amount of bytes used in the buffer."""
+        with self._locked():
+            _, _, head, tail = self._read_header()
+        return head - tail
+
+    def acquire_consumer(self):
+        """Ensures there is only one consumer of the buffer.
+
+        :raises RingBufferBusyException: if another consumer is running
+        """
+        fd = os.open(self._path + '.consumer', os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except (IOError, OSError):
+            os.close(fd)
+            raise RingBufferBusyException(
+                'Another consumer of %s is running' % self._path)
+        self._consumer_fd = fd
+
+    def close(self):
+        self._mmap.close()
+        os.close(self._fd)
+        if self._consumer_fd is not None:
+            os.close(self._consumer_fd)
+
+    @contextlib.contextmanager
+    def _locked(self):
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _initialize(self, size):
+        file_size = os.fstat(self._fd).st_size
+        if file_size >= _HEADER_SIZE:
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            magic, capacity, _, _ = _HEADER.unpack(
+                os.read(self._fd, _HEADER.size))
+            if magic == _MAGIC:
+                if capacity != size:
+                    LOG.warning('Ring buffer %s has capacity %d, ignoring '
+                                'configured %d', self._path, capacity, size)
+                return capacity
+        LOG.info('Initializing ring buffer %s of %d bytes', self._path, size)
+        os.ftruncate(self._fd, _HEADER_SIZE + size)
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        os.write(self._fd, _HEADER.pack(_MAGIC, size, 0, 0))
+        return size
+
+    def _read_header(self):
+        return _HEADER.unpack_from(self._mmap, 0)
+
+    def _write_positions(self, head=None, tail=None):
+        magic, capacity, current_head, current_tail = self._read_header()
+        _HEADER.pack_into(self._mmap, 0, magic, capacity,
+                          current_head if head is None else head,
+                          current_tail if tail is None else tail)
+
+    def _write(self, positions):
+        for offset, record in positions:
+            if record is None:
+                _LENGTH.pack_into(self._mmap, _HEADER_SIZE + offset, _WRAP)
+                continue
+            offset = _HEADER_SIZE + offset
+            _LENGTH.pack_into(self._mmap, offset, len(record))
+            start = offset + _LENGTH.size
+            self._mmap[start:start + len(record)] = record
+
+    def _read(self, position, head, max_messages=None, max_bytes=None):
+        messages = []
+        size = 0
+        while position < head and (max_messages is None or
+                                   len(messages) < max_messages):
+            offset = position % self._capacity
+            if self._capacity - offset < _LENGTH.size:
+                position += self._capacity - offset
+                continue
+            (length,) = _LENGTH.unpack_from(self._mmap, _HEADER_SIZE + offset)
+            if length == _WRAP:
+                position += self._capacity - offset
+                continue
+            if messages and max_bytes and size + length > max_bytes:
+                break
+            start = _HEADER_SIZE + offset + _LENGTH.size
+            messages.append(self._mmap[start:start + length])
+            size += length
+            position += _LENGTH.size + length
+        return messages, position
+
+    def _next(self, position):
+        """Returns position of message following the one at position."""
+        offset = position % self._capacity
+        if self._capacity - offset < _LENGTH.size:
+            return position + self._capacity - offset
+        (length,) = _LENGTH.unpack_from(self._mmap, _HEADER_SIZE + offset)
+        if length == _WRAP:
+            return position + self._capacity - offset
+        return position + _LENGTH.size + length
+
+    def _skip_to_fit(self, position, record_size, positions):
+        offset = position % self._capacity
+        remaining = self._capacity - offset
+        if record_size <= remaining:
+            return position
+        if remaining >= _LENGTH.size:
+            positions.append((offset, None))
+        return position + remaining
+
+
+def _to_bytes(message):
+    if isinstance(message, six.text_type):
+        return message.encode('utf-8')
+    return bytes(message)
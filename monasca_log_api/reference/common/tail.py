@@ -0,0 +1,409 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import collections
+import mmap
+import os
+import struct
+import threading
+import time
+
+from monasca_common.rest import utils as rest_utils
+from oslo_config import cfg
+from oslo_log import log
+from oslo_utils import timeutils
+import six
+
+from monasca_log_api.reference.common import ring_buffer
+
+LOG = log.getLogger(__name__)
+CONF = cfg.CONF
+
+_DEFAULT_BUFFER_SIZE = 1000
+_DEFAULT_MAX_SUBSCRIBERS = 10
+_DEFAULT_KEEPALIVE = 15
+_DEFAULT_MAX_DURATION = 600
+_DEFAULT_PATH = '/dev/shm/monasca-log-api.tail'
+_DEFAULT_JOURNAL_SIZE = 8 * 1024 * 1024
+_POLL_INTERVAL = 0.1
+"""Interval (in seconds) of reading logs other workers published"""
+_WATCH_TTL = 1.0
+"""Time (in seconds) logs are journaled for after last sign of subscriber"""
+
+tail_opts = [
+    cfg.BoolOpt('enabled',
+                default=False,
+                help=('Allows to tail published logs. Tail is refused '
+                      'unless API is served by workers with threads or '
+                      'green threads')),
+    cfg.StrOpt('path',
+               default=_DEFAULT_PATH,
+               help=('File backing journal of published logs shared by '
+                     'workers of the node, should reside in tmpfs. If '
+                     'empty, every worker streams logs it has published '
+                     'only and tail is refused if API is served by more '
+                     'than one worker process. Default to %s'
+                     % _DEFAULT_PATH)),
+    cfg.IntOpt('journal_size',
+               default=_DEFAULT_JOURNAL_SIZE,
+               min=1024,
+               help=('Capacity (in bytes) of the journal, default to %d'
+                     % _DEFAULT_JOURNAL_SIZE)),
+    cfg.IntOpt('buffer_size',
+               default=_DEFAULT_BUFFER_SIZE,
+               min=1,
+               help=('Amount of logs buffered for each subscriber, if '
+                     'subscriber does not keep up, oldest logs are '
+                     'dropped, default to %d' % _DEFAULT_BUFFER_SIZE)),
+    cfg.IntOpt('max_subscribers',
+               default=_DEFAULT_MAX_SUBSCRIBERS,
+               min=1,
+               help=('Amount of subscribers worker serves at once, '
+                     'default to %d' % _DEFAULT_MAX_SUBSCRIBERS)),
+    cfg.IntOpt('keepalive',
+               default=_DEFAULT_KEEPALIVE,
+               min=1,
+               help=('Interval (in seconds) of keepalive comments sent '
+                     'when there are no logs, default to %d'
+                     % _DEFAULT_KEEPALIVE)),
+    cfg.IntOpt('max_duration',
+               default=_DEFAULT_MAX_DURATION,
+               min=1,
+               help=('Time (in seconds) after which stream is closed, '
+                     'client is expected to reconnect, default to %d'
+                     % _DEFAULT_MAX_DURATION))
+]
+tail_group = cfg.OptGroup(name='tail', title='tail')
+
+cfg.CONF.register_group(tail_group)
+cfg.CONF.register_opts(tail_opts, tail_group)
+
+_HUB = None
+_HUB_LOCK = threading.Lock()
+
+
+class TooManySubscribersException(Exception):
+    pass
+
+
+def get_hub():
+    """Returns tail hub of the worker.
+
+    :return: hub or None if disabled
+    :rtype: TailHub
+    """
+    global _HUB
+    if not CONF.tail.enabled:
+        return None
+    if _HUB is None:
+        with _HUB_LOCK:
+            if _HUB is None:
+                journal = watch = None
+                if CONF.tail.path:
+                    journal = ring_buffer.RingBuffer(CONF.tail.path,
+                                                     CONF.tail.journal_size)
+                    watch = Watch(CONF.tail.path + '.watched')
+                _HUB = TailHub(buffer_size=CONF.tail.buffer_size,
+                               max_subscribers=CONF.tail.max_subscribers,
+                               journal=journal,
+                               watch=watch)
+    return _HUB
+
+
+def compile_filter(dimensions):
+    """Compiles dimensions filter into predicate.
+
+    :param dict dimensions: dimension name to list of accepted values,
+                            empty list accepts any value
+    :return: predicate called with dimensions of the log
+    :rtype: callable
+    """
+    if not dimensions:
+        return lambda log_dimensions: True
+
+    present = tuple(key for key, values in six.iteritems(dimensions)
+                    if not values)
+    accepted = tuple((key, frozenset(values))
+                     for key, values in six.iteritems(dimensions) if values)
+
+    def matches(log_dimensions):
+        for key in present:
+            if key not in log_dimensions:
+                return False
+        for key, values in accepted:
+            if log_dimensions.get(key) not in values:
+                return False
+        return True
+
+    return matches
+
+
+class Subscription(object):
+    """Logs of single subscriber.
+
+    Logs are kept in bounded buffer, once it is full oldest logs
+    are dropped, so that publishing never waits for subscriber.
+    Logs may be offered by several threads at once, counting of
+    dropped logs is guarded by the lock.
+
+    """
+
+    def __init__(self, tenant_id, predicate, buffer_size):
+        self.tenant_id = tenant_id
+        self.predicate = predicate
+        self._buffer = collections.deque(maxlen=buffer_size)
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._dropped = 0
+
+    @property
+    def dropped(self):
+        return self._dropped
+
+    def offer(self, timestamp, log_element):
+        entry = (timestamp, log_element.get('message'),
+                 log_element.get('dimensions') or {})
+        with self._lock:
+            if len(self._buffer) == self._buffer.maxlen:
+                self._dropped += 1
+            self._buffer.append(entry)
+        self._event.set()
+
+    def poll(self, timeout):
+        """Waits for logs.
+
+        :param float timeout: maximal time to wait
+        :return: logs as (timestamp, message, dimensions), possibly empty
+        :rtype: list
+        """
+        if not self._buffer:
+            self._event.wait(timeout)
+        self._event.clear()
+        logs = []
+        while self._buffer:
+            logs.append(self._buffer.popleft())
+        return logs
+
+    def take_dropped(self):
+        with self._lock:
+            dropped, self._dropped = self._dropped, 0
+        return dropped
+
+
+class Watch(object):
+    """Time until which any worker of the node has subscribers.
+
+    Time is kept in memory shared by workers. Workers with
+    subscribers keep moving it forward, workers publishing logs
+    append them to the journal only until then, so that nothing
+    is journaled while nobody tails logs. Time written by a worker
+    that died expires on its own.
+
+    """
+
+    _TIME = struct.Struct('<d')
+
+    def __init__(self, path):
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if os.fstat(fd).st_size < self._TIME.size:
+                os.ftruncate(fd, self._TIME.size)
+            self._mmap = mmap.mmap(fd, self._TIME.size)
+        finally:
+            os.close(fd)
+
+    def extend(self, until):
+        self._TIME.pack_into(self._mmap, 0, until)
+
+    def is_watched(self, now):
+        return self._TIME.unpack_from(self._mmap, 0)[0] > now
+
+
+class TailHub(object):
+    """Distributes published logs to subscribers.
+
+    Subscribers are grouped by tenant, so that publishing logs of a
+    tenant nobody tails costs single dictionary lookup. Each
+    subscription filters logs with predicate compiled once,
+    see :py:func:`compile_filter`.
+
+    Hub is fed by
+    :py:class:`monasca_log_api.reference.common.log_publisher.LogPublisher`
+    (and its bulk variant) after logs have been published.
+
+    Published logs are appended to the journal, that is
+    :py:class:`monasca_log_api.reference.common.ring_buffer.RingBuffer`
+    in memory shared by workers of the node. Worker that has
+    subscribers reads logs appended by all workers in the background
+    and offers them to its subscribers, hence any worker streams logs
+    of the whole node. Logs are journaled only while any worker has
+    subscribers, see :py:class:`.Watch`.
+
+    Example of configuration:
+
+    .. code-block:: ini
+
+      [tail]
+      enabled = True
+      buffer_size = 1000
+      max_subscribers = 10
+      keepalive = 15
+      max_duration = 600
+      path = /dev/shm/monasca-log-api.tail
+      journal_size = 8388608
+
+    """
+
+    def __init__(self, buffer_size, max_subscribers, journal=None,
+                 watch=None):
+        self._buffer_size = buffer_size
+        self._max_subscribers = max_subscribers
+        self._journal = journal
+        self._watch = watch
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._count = 0
+        self._pid = None
+
+    @property
+    def shared(self):
+        """Tells whether logs of all workers of the node are streamed."""
+        return self._journal is not None
+
+    def subscribe(self, tenant_id, dimensions=None):
+        """Creates subscription of tenant's logs.
+
+        :param str tenant_id: tenant to tail logs of
+        :param dict dimensions: dimensions filter,
+                                see :py:func:`compile_filter`
+        :rtype: Subscription
+        :raises TooManySubscribersException: if limit is reached
+        """
+        subscription = Subscription(tenant_id, compile_filter(dimensions),
+                                    self._buffer_size)
+        with self._lock:
+            if self._count >= self._max_subscribers:
+                raise TooManySubscribersException()
+            subscribers = list(self._subscribers.get(tenant_id, ()))
+            subscribers.append(subscription)
+            # lists are replaced, never modified, publish reads them
+            # without lock
+            self._subscribers[tenant_id] = subscribers
+            self._count += 1
+        LOG.debug('Tail of %s subscribed', tenant_id)
+        if self._journal is not None:
+            self._watch.extend(timeutils.utcnow_ts(microsecond=True) +
+                               _WATCH_TTL)
+            self._ensure_reading()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = [s for s in
+                           self._subscribers.get(subscription.tenant_id, ())
+                           if s is not subscription]
+            if len(subscribers) == len(
+                    self._subscribers.get(subscription.tenant_id, ())):
+                return
+            if subscribers:
+                self._subscribers[subscription.tenant_id] = subscribers
+            else:
+                del self._subscribers[subscription.tenant_id]
+            self._count -= 1
+        LOG.debug('Tail of %s unsubscribed', subscription.tenant_id)
+
+    def publish(self, tenant_id, log_elements):
+        """Offers published logs to subscribers of the tenant.
+
+        :param str tenant_id: tenant logs belong to
+        :param list log_elements: published logs (log part of envelopes)
+        """
+        if self._journal is not None:
+            now = timeutils.utcnow_ts(microsecond=True)
+            if not self._watch.is_watched(now):
+                return
+            self._journal.append([rest_utils.as_json(
+                [tenant_id, now,
+                 [{'message': log_element.get('message'),
+                   'dimensions': log_element.get('dimensions') or {}}
+                  for log_element in log_elements]])])
+            return
+        subscribers = self._subscribers.get(tenant_id)
+        if not subscribers:
+            return
+        self._offer(subscribers, timeutils.utcnow_ts(microsecond=True),
+                    log_elements)
+
+    @staticmethod
+    def _offer(subscribers, timestamp, log_elements):
+        for subscription in subscribers:
+            predicate = subscription.predicate
+            for log_element in log_elements:
+                if predicate(log_element.get('dimensions') or {}):
+                    subscription.offer(timestamp, log_element)
+
+    def _ensure_reading(self):
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._pid = pid
+            thread = threading.Thread(target=self._read_journal,
+                                      args=(self._journal.head(),),
+                                      name='tail-journal-reader')
+            thread.daemon = True
+            thread.start()
+
+    def _read_journal(self, position):
+        pid = os.getpid()
+        while True:
+            time.sleep(_POLL_INTERVAL)
+            if self._pid != pid:
+                return
+            try:
+                if not self._subscribers:
+                    position = self._journal.head()
+                    continue
+                self._watch.extend(timeutils.utcnow_ts(microsecond=True) +
+                                   _WATCH_TTL)
+                position = self.read_journal(position)
+            except Exception as ex:
+                LOG.exception(ex)
+
+    def close(self):
+        """Stops reading the journal and closes it."""
+        self._pid = None
+        if self._journal is not None:
+            self._journal.close()
+
+    def read_journal(self, position):
+        """Offers logs appended to the journal to subscribers.
+
+        :param int position: position of previous read
+        :return: position to pass to the next read
+        :rtype: int
+        """
+        messages, position, skipped = self._journal.read(position)
+        if skipped:
+            LOG.warning('Logs evicted from journal before they were '
+                        'streamed, increase [tail] journal_size')
+        for message in messages:
+            tenant_id, timestamp, log_elements = rest_utils.from_json(
+                message.decode('utf-8'))
+            subscribers = self._subscribers.get(tenant_id)
+            if subscribers:
+                self._offer(subscribers, timestamp, log_elements)
+        return position
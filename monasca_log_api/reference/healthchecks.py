@@ -13,14 +13,31 @@
 # under the License.
 
 import falcon
+from oslo_config import cfg
 
 from monasca_common.rest import utils as rest_utils
 
 from monasca_log_api.api import healthcheck_api
 from monasca_log_api.healthcheck import kafka_check
+from monasca_log_api.healthcheck import prober
+from monasca_log_api.healthcheck import publisher_check
+
+CONF = cfg.CONF
 
 
 class HealthChecks(healthcheck_api.HealthChecksApi):
+    """HealthChecks Api
+
+    * HEAD (liveness) - worker is up and able to answer requests
+    * GET (readiness) - worker is able to publish logs
+
+    Readiness is derived from statistics of the actual producer
+    (see :py:class:`publisher_check.PublisherHealthCheck`). If worker
+    has not published anything recently, it falls back to
+    checking kafka directly.
+
+    """
+
     # response configuration
     CACHE_CONTROL = ['must-revalidate', 'no-cache', 'no-store']
 
@@ -31,6 +48,12 @@ class HealthChecks(healthcheck_api.HealthChecksApi):
 
     def __init__(self):
         self._kafka_check = kafka_check.KafkaHealthCheck()
+        probe_interval = CONF.kafka_healthcheck.probe_interval
+        if probe_interval:
+            self._kafka_check = prober.Prober(self._kafka_check,
+                                              probe_interval,
+                                              name='Kafka: healthcheck')
+        self._publisher_check = publisher_check.PublisherHealthCheck()
         super(HealthChecks, self).__init__()
 
     def on_head(self, req, res):
@@ -42,18 +65,29 @@ class HealthChecks(healthcheck_api.HealthChecksApi):
         # keep up good work and verify kafka status
 
         kafka_result = self._kafka_check.healthcheck()
+        publisher_stats = self._publisher_check.stats()
+        publisher_result = self._publisher_check.healthcheck(publisher_stats)
 
         # in case it'd be unhealthy,
         # message will contain error string
         status_data = {
-            'kafka': kafka_result.message
+            'kafka': kafka_result.message,
+            'publisher': publisher_result.message,
+            'publisher_stats': publisher_stats
         }
+        # age of the result, if it comes from background prober
+        if kafka_result.age is not None:
+            status_data['kafka_age'] = round(kafka_result.age, 3)
 
         # Really simple approach, ideally that should be
         # part of monasca-common with some sort of registration of
         # healthchecks concept
 
+        # live producer knows better, unless it has been idle
+        healthy = (kafka_result.healthy if publisher_result.healthy is None
+                   else publisher_result.healthy)
+
         res.status = (self.HEALTHY_CODE_GET
-                      if kafka_result.healthy else self.NOT_HEALTHY_CODE)
+                      if healthy else self.NOT_HEALTHY_CODE)
         res.cache_control = self.CACHE_CONTROL
         res.body = rest_utils.as_json(status_data)
@@ -0,0 +1,76 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import falcon
+from monasca_common.rest import utils as rest_utils
+
+from monasca_log_api.api import heavy_hitters_api
+from monasca_log_api.middleware import role_middleware
+from monasca_log_api.monitoring import heavy_hitters
+
+
+class HeavyHitters(heavy_hitters_api.HeavyHittersApi):
+    """Heavy hitters Api
+
+    Returns heaviest tenants, components and hosts (by amount
+    and by size of logs) of current and previous accounting window
+    of the worker serving the request, as JSON ::
+
+        {
+          "window": 60,
+          "current": {
+            "tenant": {
+              "logs": {
+                "total": 1200,
+                "top": [{"key": "abc", "value": 1000, "error": 0}]
+              },
+              "bytes": {...}
+            },
+            "component": {...},
+            "hostname": {...}
+          },
+          "previous": {...}
+        }
+
+    Amount of keys returned per sketch may be limited with
+    **limit** query parameter.
+
+    Note:
+        Endpoint reveals tenants identifiers, therefore it is
+        accessible only by administrators, request must be authorized by
+        :py:class:`role_middleware.RoleMiddleware` for one of
+        ``[roles_middleware] admin_path``.
+
+    """
+
+    CACHE_CONTROL = ['must-revalidate', 'no-cache', 'no-store']
+
+    def __init__(self):
+        self._accounting = heavy_hitters.get_accounting()
+        super(HeavyHitters, self).__init__()
+
+    def on_get(self, req, res):
+        if not role_middleware.is_admin_request(req.env):
+            raise falcon.HTTPForbidden(
+                'Forbidden', 'Heavy hitters require administrator role')
+        if self._accounting is None:
+            raise falcon.HTTPNotFound(
+                title='Accounting disabled',
+                description='Enable it with [heavy_hitters] enabled')
+
+        limit = req.get_param_as_int('limit', min=1)
+
+        res.status = falcon.HTTP_OK
+        res.cache_control = self.CACHE_CONTROL
+        res.body = rest_utils.as_json(self._accounting.report(limit))
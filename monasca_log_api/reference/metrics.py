@@ -0,0 +1,34 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import falcon
+
+from monasca_log_api.api import metrics_api
+from monasca_log_api.monitoring import prometheus
+
+
+class Metrics(metrics_api.MetricsApi):
+    """Metrics Api exposing metrics in prometheus text format"""
+
+    CACHE_CONTROL = ['must-revalidate', 'no-cache', 'no-store']
+
+    def __init__(self):
+        self._registry = prometheus.get_registry()
+        super(Metrics, self).__init__()
+
+    def on_get(self, req, res):
+        res.status = falcon.HTTP_OK
+        res.content_type = prometheus.CONTENT_TYPE
+        res.cache_control = self.CACHE_CONTROL
+        res.body = self._registry.render()
@@ -0,0 +1,147 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import threading
+
+import falcon
+from oslo_config import cfg
+from oslo_log import log
+
+from monasca_log_api.api import profiler_api
+from monasca_log_api.middleware import role_middleware
+from monasca_log_api.monitoring import profiler
+
+LOG = log.getLogger(__name__)
+CONF = cfg.CONF
+
+SAMPLE_MODE = 'sample'
+CPROFILE_MODE = 'cprofile'
+
+_DEFAULT_DURATION = 10
+
+
+class Profiler(profiler_api.ProfilerApi):
+    """Profiler Api
+
+    POST starts profiling of the worker serving the request and
+    returns name of the report right away. Supports following query
+    parameters:
+
+    * mode - either **sample** (default) or **cprofile**
+    * duration - how long (seconds) to sample stacks or to wait for
+      request to be profiled
+    * interval - interval (milliseconds) between stack samples
+
+    In **sample** mode stacks of the worker are sampled and written in
+    collapsed (flamegraph-ready) format. In **cprofile** mode next
+    request handled by the worker is profiled deterministically and
+    its statistics are written. Profiling does not occupy the worker,
+    so it profiles requests that the worker serves meanwhile.
+
+    Reports are written to ``[profiler] report_dir``, shared by all
+    workers, hence GET with ``report`` parameter returns the report
+    regardless of the worker serving it.
+
+    Note:
+        Endpoint is accessible only by administrators, request
+        must be authorized by
+        :py:class:`role_middleware.RoleMiddleware` for one of
+        ``[roles_middleware] admin_path``.
+
+    """
+
+    CACHE_CONTROL = ['must-revalidate', 'no-cache', 'no-store']
+
+    def __init__(self):
+        self._sampling_lock = threading.Lock()
+        self._one_shot = profiler.ONE_SHOT_PROFILE
+        super(Profiler, self).__init__()
+
+    def on_post(self, req, res):
+        self._authorize(req)
+
+        mode = req.get_param('mode') or SAMPLE_MODE
+        duration = req.get_param_as_int(
+            'duration', min=1, max=CONF.profiler.max_duration)
+        duration = duration or _DEFAULT_DURATION
+
+        if mode == SAMPLE_MODE:
+            interval = req.get_param_as_int('interval', min=1)
+            interval = interval or CONF.profiler.sampling_interval
+            name = self._sample(duration, interval / 1000.0)
+        elif mode == CPROFILE_MODE:
+            name = self._cprofile(duration)
+        else:
+            raise falcon.HTTPInvalidParam(
+                'Mode must be either %s or %s' % (SAMPLE_MODE, CPROFILE_MODE),
+                'mode')
+
+        res.status = falcon.HTTP_202
+        res.content_type = 'text/plain'
+        res.cache_control = self.CACHE_CONTROL
+        res.location = '%s?report=%s' % (req.path, name)
+        res.body = name
+
+    def on_get(self, req, res):
+        self._authorize(req)
+
+        name = req.get_param('report', required=True)
+        report = profiler.read_report(name)
+        if report is None:
+            raise falcon.HTTPNotFound(
+                title='No report',
+                description='Report %s has not been written (yet)' % name)
+
+        res.status = falcon.HTTP_OK
+        res.content_type = 'text/plain'
+        res.cache_control = self.CACHE_CONTROL
+        res.body = report
+
+    @staticmethod
+    def _authorize(req):
+        if not role_middleware.is_admin_request(req.env):
+            raise falcon.HTTPForbidden('Forbidden',
+                                       'Profiler requires administrator role')
+
+    def _sample(self, duration, interval):
+        if not self._sampling_lock.acquire(False):
+            raise falcon.HTTPConflict('Profiler busy',
+                                      'Sampling is already in progress')
+        name = profiler.new_report_name(SAMPLE_MODE)
+
+        def on_done(stacks):
+            try:
+                profiler.write_report(name,
+                                      profiler.StackSampler.render(stacks))
+            finally:
+                self._sampling_lock.release()
+
+        LOG.info('Sampling stacks for %d seconds', duration)
+        try:
+            profiler.StackSampler(interval, on_done).start(duration)
+        except Exception:
+            self._sampling_lock.release()
+            raise
+        return name
+
+    def _cprofile(self, duration):
+        name = profiler.new_report_name(CPROFILE_MODE)
+        LOG.info('Profiling next request within %d seconds', duration)
+        try:
+            self._one_shot.arm(
+                duration, lambda report: profiler.write_report(name, report))
+        except profiler.ProfilerBusyException:
+            raise falcon.HTTPConflict('Profiler busy',
+                                      'Profiling is already armed')
+        return name
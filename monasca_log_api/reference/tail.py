@@ -0,0 +1,146 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import falcon
+from monasca_common.rest import utils as rest_utils
+from oslo_config import cfg
+from oslo_log import log
+from oslo_utils import timeutils
+
+from monasca_log_api.api import tail_api
+from monasca_log_api import green
+from monasca_log_api.reference.common import recent_logs
+from monasca_log_api.reference.common import tail
+from monasca_log_api.reference.common import validation
+from monasca_log_api.reference.v3.common import helpers
+
+CONF = cfg.CONF
+LOG = log.getLogger(__name__)
+
+_KEEPALIVE = b': keepalive\n\n'
+
+
+class Tail(tail_api.TailApi):
+    """Tail Api
+
+    Streams logs of the tenant, as they are published by workers
+    of the node, as
+    `server-sent events <https://html.spec.whatwg.org/#server-sent-events>`_.
+    Every log is sent as a single event ::
+
+        data: {"timestamp": "2017-04-11T10:01:02.345Z",
+               "message": "...", "dimensions": {...}}
+
+    If client does not keep up, oldest buffered logs are dropped
+    and ``dropped`` event carrying amount of dropped logs is sent ::
+
+        event: dropped
+        data: {"count": 10}
+
+    Logs may be filtered with **dimensions** query parameter,
+    in the same format as for **GET /v3.0/logs**. Stream is closed
+    after ``[tail] max_duration``, client is expected to reconnect.
+
+    Note:
+        Every stream occupies a thread (or green thread) of the worker
+        for its whole duration. Therefore tail is refused with 501,
+        unless worker serves other requests meanwhile, that is with
+        threads (``wsgi.multithread``) or green threads. Without
+        journal shared by workers (``[tail] path`` is empty) only logs
+        published by the worker serving the request are streamed,
+        then tail is refused also if API runs in more than one worker
+        process (``wsgi.multiprocess``).
+
+    """
+
+    CACHE_CONTROL = ['no-cache']
+
+    def __init__(self):
+        self._hub = tail.get_hub()
+        self._keepalive = CONF.tail.keepalive
+        self._max_duration = CONF.tail.max_duration
+        super(Tail, self).__init__()
+
+    def on_get(self, req, res):
+        if self._hub is None:
+            raise falcon.HTTPNotFound(
+                title='Tail disabled',
+                description='Enable it with [tail] enabled')
+        if req.env.get('wsgi.multiprocess') and not self._hub.shared:
+            raise falcon.HTTPNotImplemented(
+                title='Tail not available',
+                description='Tail requires [tail] path or API served '
+                            'by single worker process')
+        if not (req.env.get('wsgi.multithread') or green.is_patched()):
+            raise falcon.HTTPNotImplemented(
+                title='Tail not available',
+                description='Tail requires worker serving requests with '
+                            'threads or green threads')
+
+        validation.validate_cross_tenant(
+            tenant_id=req.project_id,
+            roles=req.roles,
+            cross_tenant_id=req.cross_project_id
+        )
+        tenant_id = req.cross_project_id or req.project_id
+        dimensions = helpers.get_dimensions_filter(req)
+
+        try:
+            subscription = self._hub.subscribe(tenant_id, dimensions)
+        except tail.TooManySubscribersException:
+            raise falcon.HTTPServiceUnavailable(
+                'Service unavailable',
+                'Too many logs streams are open, try again later',
+                retry_after=self._keepalive)
+
+        res.status = falcon.HTTP_OK
+        res.content_type = 'text/event-stream'
+        res.cache_control = self.CACHE_CONTROL
+        res.set_header('X-Accel-Buffering', 'no')
+        res.stream = self._events(subscription)
+
+    def _events(self, subscription):
+        """Yields events until stream is closed.
+
+        Subscription is cancelled once generator is closed, that is when
+        stream reaches ``max_duration`` or client disconnects.
+        """
+        deadline = timeutils.now() + self._max_duration
+        try:
+            while True:
+                remaining = deadline - timeutils.now()
+                if remaining <= 0:
+                    break
+                logs = subscription.poll(min(self._keepalive, remaining))
+
+                chunk = []
+                dropped = subscription.take_dropped()
+                if dropped:
+                    chunk.append(_event({'count': dropped}, 'dropped'))
+                for timestamp, message, dimensions in logs:
+                    chunk.append(_event({
+                        'timestamp': recent_logs.isoformat(timestamp),
+                        'message': message,
+                        'dimensions': dimensions
+                    }))
+                yield b''.join(chunk) if chunk else _KEEPALIVE
+        finally:
+            self._hub.unsubscribe(subscription)
+
+
+def _event(data, name=None):
+    event = 'data: %s\n\n' % rest_utils.as_json(data)
+    if name:
+        event = 'event: %s\n%s' % (name, event)
+    return event.encode('utf-8')
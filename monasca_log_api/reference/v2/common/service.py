@@ -13,13 +13,19 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import collections
 import datetime
+import re
+import threading
 
+from monasca_common.rest import exceptions as rest_exceptions
 from monasca_common.rest import utils as rest_utils
 from oslo_config import cfg
 from oslo_log import log
+import six
 
 from monasca_log_api.api import exceptions
+from monasca_log_api.reference.common import buffer_pool
 from monasca_log_api.reference.common import model
 from monasca_log_api.reference.common import validation
 
@@ -27,6 +33,12 @@ LOG = log.getLogger(__name__)
 CONF = cfg.CONF
 
 _DEFAULT_MAX_LOG_SIZE = 1024 * 1024
+_DEFAULT_HEADERS_CACHE_SIZE = 4096
+_DEFAULT_CONTINUATION_PATTERNS = [
+    r'\s',
+    r'Traceback \(most recent call last\):',
+    r'Caused by:'
+]
 
 service_opts = [
     cfg.StrOpt('region',
@@ -34,8 +46,27 @@ service_opts = [
                help='Region'),
     cfg.IntOpt('max_log_size',
                default=_DEFAULT_MAX_LOG_SIZE,
+               mutable=True,
                help=('Refers to payload/envelope size. If either is exceeded'
-                     'API will throw an error'))
+                     'API will throw an error')),
+    cfg.IntOpt('headers_cache_size',
+               default=_DEFAULT_HEADERS_CACHE_SIZE,
+               min=0,
+               help=('Amount of distinct X-Dimensions and X-Application-Type '
+                     'headers of v2 requests kept parsed and validated, '
+                     '0 disables caching, default to %d'
+                     % _DEFAULT_HEADERS_CACHE_SIZE)),
+    cfg.BoolOpt('split_plain_text',
+                default=False,
+                help=('Splits text/plain body of v2 request into logs, '
+                      'one per line, and publishes them as single bulk')),
+    cfg.MultiStrOpt('continuation_patterns',
+                    default=_DEFAULT_CONTINUATION_PATTERNS,
+                    help=('Regular expressions matched at the beginning '
+                          'of the line, matching lines are appended to the '
+                          'previous log instead of starting new one, i.e. '
+                          'lines of stack traces. Used only if '
+                          'split_plain_text is enabled.'))
 ]
 service_group = cfg.OptGroup(name='service', title='service')
 
@@ -44,6 +75,8 @@ CONF.register_opts(service_opts, service_group)
 
 EPOCH_START = datetime.datetime(1970, 1, 1)
 
+_MISSING = object()
+
 
 class LogCreator(object):
     """Transforms logs,
@@ -56,12 +89,23 @@ class LogCreator(object):
     * :py:func:`LogCreator.new_log`
     * :py:func:`LogCreator.new_log_envelope`
 
+    Agents send the same X-Dimensions and X-Application-Type headers
+    for their whole lifetime, therefore validated headers are kept
+    in :py:class:`.LRUCache` of ``[service] headers_cache_size``.
+
     """
 
     def __init__(self):
         self._log = log.getLogger('service.LogCreator')
         self._log.info('Initializing LogCreator')
 
+        cache_size = CONF.service.headers_cache_size
+        self._application_types = LRUCache(cache_size)
+        self._dimensions = LRUCache(cache_size)
+        self._continuation = compile_patterns(
+            CONF.service.continuation_patterns)
+        self._buffer_pool = buffer_pool.get_pool()
+
     @staticmethod
     def _create_meta_info(tenant_id):
         """Creates meta block for log envelope.
@@ -87,7 +131,8 @@ class LogCreator(object):
                 dimensions,
                 payload,
                 content_type='application/json',
-                validate=True):
+                validate=True,
+                content_length=None):
         """Creates new log object.
 
         :param str application_type: origin of the log
@@ -96,29 +141,36 @@ class LogCreator(object):
         :param str content_type: actual content type used to send data to
                                  server
         :param bool validate: by default True, marks if log should be validated
+        :param int content_length: length of the payload, if known JSON
+                                   payload is read into pooled buffer
         :return: log object
         :rtype: dict
 
         :keyword: log_object
         """
 
-        payload = rest_utils.read_body(payload, content_type)
+        if content_type == rest_utils.JSON_CONTENT_TYPE:
+            payload = read_json_body(payload, content_length,
+                                     self._buffer_pool)
+        else:
+            payload = rest_utils.read_body(payload, content_type)
         if not payload:
             return None
 
-        # normalize_yet_again
-        application_type = parse_application_type(application_type)
-        dimensions = parse_dimensions(dimensions)
-
         if validate:
-            self._log.debug('Validation enabled, proceeding with validation')
-            validation.validate_application_type(application_type)
-            validation.validate_dimensions(dimensions)
+            application_type = self._application_types.get_or_create(
+                application_type, _validated_application_type)
+            dimensions = self._dimensions.get_or_create(
+                (dimensions, application_type), _validated_dimensions)
+        else:
+            # normalize_yet_again
+            application_type = parse_application_type(application_type)
+            dimensions = parse_dimensions(dimensions)
+            dimensions['component'] = application_type
 
         self._log.debug(
-            'application_type=%s,dimensions=%s' % (
-                application_type, dimensions)
-        )
+            'application_type=%s,dimensions=%s', application_type,
+            dimensions)
 
         log_object = {}
         if content_type == 'application/json':
@@ -128,11 +180,50 @@ class LogCreator(object):
 
         validation.validate_log_message(log_object)
 
-        dimensions['component'] = application_type
         log_object.update({'dimensions': dimensions})
 
         return log_object
 
+    def new_logs(self, application_type, dimensions, payload,
+                 content_length=None):
+        """Creates logs out of text/plain payload, one per line.
+
+        Lines matching ``[service] continuation_patterns`` are
+        appended to the previous log, see :py:func:`split_lines`.
+
+        :param str application_type: origin of the logs
+        :param str dimensions: dimensions header
+        :param stream payload: stream to read logs from
+        :param int content_length: length of the payload, if known payload
+                                   is read into pooled buffer
+        :return: (logs, dimensions), logs do not carry dimensions,
+                 dimensions are common to all of them
+        :rtype: tuple
+        """
+        application_type = self._application_types.get_or_create(
+            application_type, _validated_application_type)
+        dimensions = self._dimensions.get_or_create(
+            (dimensions, application_type), _validated_dimensions)
+
+        buffer = buffer_pool.acquire(self._buffer_pool, content_length)
+        try:
+            try:
+                payload = buffer_pool.read_into(payload, content_length,
+                                                buffer)
+            except Exception as ex:
+                raise rest_exceptions.UnreadableContentError(str(ex))
+            if not isinstance(payload, six.text_type):
+                payload = buffer_pool.to_text(payload, 'replace')
+        finally:
+            buffer_pool.release(self._buffer_pool, buffer)
+        messages = split_lines(payload, self._continuation) if payload else []
+        if not messages:
+            raise exceptions.HTTPUnprocessableEntity(
+                'Log property should have message')
+
+        return [{'message': message, 'dimensions': {}}
+                for message in messages], dimensions
+
     def new_log_envelope(self, log_object, tenant_id):
         return model.Envelope(
             log=log_object,
@@ -140,6 +231,126 @@ class LogCreator(object):
         )
 
 
+class LRUCache(object):
+    """Least recently used values, bounded by their amount."""
+
+    def __init__(self, size):
+        self._size = size
+        self._lock = threading.Lock()
+        self._values = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._values)
+
+    def get_or_create(self, key, factory):
+        """Returns value cached under the key.
+
+        Missing value is created with ``factory(key)``, exceptions
+        it raises are not cached.
+        """
+        if not self._size:
+            return factory(key)
+        with self._lock:
+            value = self._values.pop(key, _MISSING)
+            if value is not _MISSING:
+                self._values[key] = value
+                return value
+        value = factory(key)
+        with self._lock:
+            self._values[key] = value
+            while len(self._values) > self._size:
+                self._values.popitem(last=False)
+        return value
+
+
+class ReadOnlyDict(dict):
+    """Dictionary shared between logs, any modification fails."""
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError('%s is read-only' % self.__class__.__name__)
+
+    __setitem__ = __delitem__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+
+def _validated_application_type(app_type):
+    app_type = parse_application_type(app_type)
+    validation.validate_application_type(app_type)
+    return app_type
+
+
+def _validated_dimensions(key):
+    dimensions, application_type = key
+    dimensions = parse_dimensions(dimensions)
+    validation.validate_dimensions(dimensions)
+    dimensions['component'] = application_type
+    return ReadOnlyDict(dimensions)
+
+
+def read_json_body(payload, content_length=None, pool=None):
+    """Reads JSON payload the same way :py:func:`rest_utils.read_body` does.
+
+    If pool lends a buffer for the payload, payload is read into
+    the buffer and decoded straight out of it, see
+    :py:func:`buffer_pool.read_into`.
+
+    :param stream payload: payload to read
+    :param int content_length: length of the payload or None if unknown
+    :param buffer_pool.BufferPool pool: pool of buffers, may be None
+    :return: read data or None if empty
+    """
+    buffer = buffer_pool.acquire(pool, content_length)
+    if buffer is None:
+        return rest_utils.read_body(payload, rest_utils.JSON_CONTENT_TYPE)
+
+    try:
+        try:
+            content = buffer_pool.read_into(payload, content_length, buffer)
+        except Exception as ex:
+            raise rest_exceptions.UnreadableContentError(str(ex))
+        if not content:
+            return None
+        try:
+            content = buffer_pool.to_text(content)
+        except ValueError as ex:
+            raise rest_exceptions.DataConversionException(str(ex))
+    finally:
+        pool.release(buffer)
+    return rest_utils.from_json(content)
+
+
+def compile_patterns(patterns):
+    """Compiles patterns into single expression matching any of them.
+
+    :param list patterns: regular expressions
+    :return: compiled expression or None if there are no patterns
+    """
+    if not patterns:
+        return None
+    return re.compile('|'.join('(?:%s)' % p for p in patterns))
+
+
+def split_lines(text, continuation=None):
+    """Splits text into messages, one per line.
+
+    Line matching ``continuation`` (at its beginning) is appended
+    to the previous message, so that multi-line messages, such as
+    stack traces, stay in one piece. Blank lines are skipped.
+
+    :param str text: text to split
+    :param continuation: compiled expression or None
+    :return: messages
+    :rtype: list
+    """
+    messages = []
+    for line in text.splitlines():
+        if messages and continuation and continuation.match(line):
+            messages[-1].append(line)
+        elif line.strip():
+            messages.append([line])
+    return ['\n'.join(lines) for lines in messages]
+
+
 def parse_application_type(app_type):
     if app_type:
         app_type = app_type.strip()
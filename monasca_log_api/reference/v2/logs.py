@@ -14,14 +14,19 @@
 # under the License.
 
 import falcon
+from monasca_common.rest import utils as rest_utils
+from oslo_config import cfg
 import six
 
 from monasca_log_api.api import headers
 from monasca_log_api.api import logs_api
 from monasca_log_api.reference.common import log_publisher
 from monasca_log_api.reference.v2.common import service
+from monasca_log_api.reference.v3.common import bulk_processor
 from monasca_log_api import uri_map
 
+CONF = cfg.CONF
+
 _DEPRECATED_INFO = ('%s has been deprecated. Please use %s.'
                     % (uri_map.V2_LOGS_URI, uri_map.V3_LOGS_URI))
 
@@ -37,30 +42,55 @@ class Logs(logs_api.LogsApi):
         self._kafka_publisher = log_publisher.LogPublisher()
         super(Logs, self).__init__()
 
+        self._processor = None
+        if CONF.service.split_plain_text:
+            self._processor = bulk_processor.BulkProcessor(
+                logs_in_counter=self._logs_in_counter,
+                logs_rejected_counter=self._logs_rejected_counter
+            )
+
     @falcon.deprecated(_DEPRECATED_INFO)
     def on_post(self, req, res):
-        with self._logs_processing_time.time(name=None):
+        with self._logs_processing_time.time(name=None), \
+                self._processing_time_histogram.time():
             try:
                 req.validate(self.SUPPORTED_CONTENT_TYPES)
                 tenant_id = (req.project_id if req.project_id
                              else req.cross_project_id)
 
-                log = self.get_log(request=req)
-                envelope = self.get_envelope(
-                    log=log,
-                    tenant_id=tenant_id
-                )
+                if self._is_split(req):
+                    log_list, dimensions = self.get_logs(request=req)
+                else:
+                    log = self.get_log(request=req)
+                    envelope = self.get_envelope(
+                        log=log,
+                        tenant_id=tenant_id
+                    )
+                    log_list = None
 
                 self._logs_size_gauge.send(name=None,
                                            value=int(req.content_length))
-                self._logs_in_counter.increment()
+                if log_list is None:
+                    # bulk processor counts logs on its own
+                    self._logs_in_counter.increment()
+                self._request_size_histogram.observe(int(req.content_length))
+                self._bulk_size_histogram.observe(
+                    len(log_list) if log_list else 1)
             except Exception:
                 # any validation that failed means
                 # log is invalid and rejected
                 self._logs_rejected_counter.increment()
+                self._requests_rejected_counter.inc()
                 raise
 
-            self._kafka_publisher.send_message(envelope)
+            if log_list is None:
+                self._kafka_publisher.send_message(envelope)
+            else:
+                self._processor.send_message(
+                    logs=log_list,
+                    global_dimensions=dimensions,
+                    log_tenant_id=tenant_id
+                )
 
             res.status = falcon.HTTP_204
             res.add_link(
@@ -77,12 +107,25 @@ class Logs(logs_api.LogsApi):
             tenant_id=tenant_id
         )
 
+    def get_logs(self, request):
+        return self._log_creator.new_logs(
+            application_type=request.get_header(*headers.X_APPLICATION_TYPE),
+            dimensions=request.get_header(*headers.X_DIMENSIONS),
+            payload=request.stream,
+            content_length=request.content_length
+        )
+
+    def _is_split(self, request):
+        return (self._processor is not None and
+                request.content_type == rest_utils.TEXT_CONTENT_TYPE)
+
     def get_log(self, request):
         return self._log_creator.new_log(
             application_type=request.get_header(*headers.X_APPLICATION_TYPE),
             dimensions=request.get_header(*headers.X_DIMENSIONS),
             payload=request.stream,
-            content_type=request.content_type
+            content_type=request.content_type,
+            content_length=request.content_length
         )
 
 
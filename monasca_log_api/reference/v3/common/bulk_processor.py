@@ -15,6 +15,7 @@
 from oslo_config import cfg
 from oslo_log import log
 
+from monasca_log_api.monitoring import stages
 from monasca_log_api.reference.common import log_publisher
 from monasca_log_api.reference.common import model
 from monasca_log_api.reference.common import validation
@@ -32,13 +33,17 @@ class BulkProcessor(log_publisher.LogPublisher):
 
     """
 
-    def __init__(self, logs_in_counter, logs_rejected_counter):
+    def __init__(self, logs_in_counter, logs_rejected_counter,
+                 per_thread_producer=False):
         """Initializes BulkProcessor.
 
         :param logs_in_counter: V3 received logs counter
         :param logs_rejected_counter: V3 rejected logs counter
+        :param bool per_thread_producer: if set, each thread sending
+                                         logs owns its own producer
         """
-        super(BulkProcessor, self).__init__()
+        super(BulkProcessor, self).__init__(
+            per_thread_producer=per_thread_producer)
 
         assert logs_in_counter is not None
         assert logs_rejected_counter is not None
@@ -48,17 +53,20 @@ class BulkProcessor(log_publisher.LogPublisher):
 
         self.service_region = CONF.service.region
 
-    def send_message(self, logs, global_dimensions=None, log_tenant_id=None):
+    def send_message(self, logs, global_dimensions=None, log_tenant_id=None,
+                     stage_timer=stages.NULL_TIMER):
         """Sends bulk package to kafka
 
         :param list logs: received logs
         :param dict global_dimensions: global dimensions for each log
         :param str log_tenant_id: tenant who sent logs
+        :param stage_timer: timer measuring processing stages
         """
 
         num_of_msgs = len(logs) if logs else 0
         sent_count = 0
         to_send_msgs = []
+        sent_logs = []
 
         LOG.debug('Bulk package <logs=%d, dimensions=%s, tenant_id=%s>',
                   num_of_msgs, global_dimensions, log_tenant_id)
@@ -67,14 +75,23 @@ class BulkProcessor(log_publisher.LogPublisher):
             for log_el in logs:
                 t_el = self._transform_message(log_el,
                                                global_dimensions,
-                                               log_tenant_id)
+                                               log_tenant_id,
+                                               stage_timer)
                 if t_el:
                     to_send_msgs.append(t_el)
+                    sent_logs.append(log_el)
 
-            with self._publish_time_ms.time(name=None):
+            with self._publish_time_ms.time(name=None), \
+                    stage_timer.stage(stages.PRODUCE):
                 self._publish(to_send_msgs)
                 sent_count = len(to_send_msgs)
 
+            if self._recent_logs is not None:
+                # envelopes share log elements, dimensions are merged
+                self._recent_logs.record(log_tenant_id, sent_logs)
+            if self._tail_hub is not None:
+                self._tail_hub.publish(log_tenant_id, sent_logs)
+
         except Exception as ex:
             LOG.error('Failed to send bulk package <logs=%d, dimensions=%s>',
                       num_of_msgs, global_dimensions)
@@ -90,20 +107,25 @@ class BulkProcessor(log_publisher.LogPublisher):
         self._logs_in_counter.increment(value=in_counter)
         self._logs_rejected_counter.increment(value=rejected_counter)
 
-    def _transform_message(self, log_element, *args):
+    def _transform_message(self, log_element, global_dims, tenant_id,
+                           stage_timer=stages.NULL_TIMER):
         try:
-            validation.validate_log_message(log_element)
-
-            log_envelope = model.Envelope.new_envelope(
-                log=log_element,
-                tenant_id=args[1],
-                region=self.service_region,
-                dimensions=self._get_dimensions(log_element,
-                                                global_dims=args[0])
-            )
-
-            msg_payload = (super(BulkProcessor, self)
-                           ._transform_message(log_envelope))
+            with stage_timer.stage(stages.VALIDATE):
+                validation.validate_log_message(log_element)
+                dimensions = self._get_dimensions(log_element,
+                                                  global_dims=global_dims)
+
+            with stage_timer.stage(stages.ENVELOPE):
+                log_envelope = model.Envelope.new_envelope(
+                    log=log_element,
+                    tenant_id=tenant_id,
+                    region=self.service_region,
+                    dimensions=dimensions
+                )
+
+            with stage_timer.stage(stages.SERIALIZE):
+                msg_payload = (super(BulkProcessor, self)
+                               ._transform_message(log_envelope))
 
             return msg_payload
         except Exception as ex:
@@ -15,31 +15,64 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import calendar
+
 import falcon
+from monasca_common.rest import exceptions as rest_exceptions
 from monasca_common.rest import utils as rest_utils
 from oslo_log import log
+from oslo_utils import timeutils
 
 from monasca_log_api.api import exceptions
+from monasca_log_api.monitoring import stages
+from monasca_log_api.reference.common import buffer_pool
 from monasca_log_api.reference.common import validation
 
 LOG = log.getLogger(__name__)
 
 
-def read_json_msg_body(req):
+def read_json_msg_body(req, stage_timer=stages.NULL_TIMER, interner=None,
+                       pool=None):
     """Read the json_msg from the http request body and return them as JSON.
 
     :param req: HTTP request object.
+    :param stage_timer: timer measuring reading and decoding
+    :param interning.Interner interner: interner of dimensions (optional)
+    :param buffer_pool.BufferPool pool: pool of buffers body is read
+                                        into (optional)
+    :return: Returns the metrics as a JSON object.
+    :raises falcon.HTTPBadRequest:
+    """
+    buffer = buffer_pool.acquire(pool, req.content_length)
+    try:
+        with stage_timer.stage(stages.READ):
+            msg = buffer_pool.read_into(req.stream, req.content_length,
+                                        buffer)
+        with stage_timer.stage(stages.DECODE):
+            return decode_json_msg_body(msg, interner)
+    finally:
+        buffer_pool.release(pool, buffer)
+
+
+def decode_json_msg_body(msg, interner=None):
+    """Decode the json_msg already read from the http request body.
+
+    :param msg: raw request body, bytes or memoryview
+    :param interning.Interner interner: interner of dimensions (optional)
     :return: Returns the metrics as a JSON object.
     :raises falcon.HTTPBadRequest:
     """
     try:
-        msg = req.stream.read()
-        json_msg = rest_utils.from_json(msg)
-        return json_msg
-    except ValueError as ex:
+        if isinstance(msg, memoryview):
+            msg = buffer_pool.to_text(msg)
+        request_body = rest_utils.from_json(msg)
+    except (ValueError, rest_exceptions.DataConversionException) as ex:
         LOG.debug(ex)
         raise falcon.HTTPBadRequest('Bad request',
                                     'Request body is not valid JSON')
+    if interner is not None:
+        interner.intern_bulk(request_body)
+    return request_body
 
 
 def get_global_dimensions(request_body):
@@ -55,3 +88,63 @@ def get_logs(request_body):
         raise exceptions.HTTPUnprocessableEntity(
             'Unprocessable Entity Logs not found')
     return request_body['logs']
+
+
+def parse_dimensions_filter(value):
+    """Parses dimensions query parameter of logs listing.
+
+    Value has form of ``key1:value1|value2,key2:value3,key3``, where
+    key without values matches any value of that dimension.
+
+    :param str value: value of query parameter
+    :return: dimension name to list of values
+    :rtype: dict
+    :raises falcon.HTTPInvalidParam: if value is malformed
+    """
+    dimensions = {}
+    if not value:
+        return dimensions
+    for item in value.split(','):
+        key, _, values = item.partition(':')
+        key = key.strip()
+        if not key:
+            raise falcon.HTTPInvalidParam('Dimension name cannot be empty',
+                                          'dimensions')
+        dimensions[key] = [v.strip() for v in values.split('|')
+                           if v.strip()]
+    return dimensions
+
+
+def get_dimensions_filter(req):
+    """Reads dimensions query parameter of logs listing.
+
+    Falcon splits query values on commas, hence the parts are
+    joined back before the value is parsed,
+    see :py:func:`parse_dimensions_filter`.
+
+    :param falcon.Request req: current request
+    :return: dimension name to list of values
+    :rtype: dict
+    :raises falcon.HTTPInvalidParam: if value is malformed
+    """
+    values = req.get_param_as_list('dimensions')
+    return parse_dimensions_filter(','.join(values) if values else None)
+
+
+def parse_time_param(req, name):
+    """Parses ISO 8601 time query parameter into timestamp.
+
+    :param falcon.Request req: current request
+    :param str name: name of query parameter
+    :return: timestamp or None if parameter is not set
+    :rtype: float
+    :raises falcon.HTTPInvalidParam: if value is not ISO 8601 time
+    """
+    value = req.get_param(name)
+    if value is None:
+        return None
+    try:
+        parsed = timeutils.normalize_time(timeutils.parse_isotime(value))
+    except ValueError:
+        raise falcon.HTTPInvalidParam('Expected ISO 8601 time', name)
+    return calendar.timegm(parsed.timetuple()) + parsed.microsecond / 1e6
@@ -14,56 +14,84 @@
 # under the License.
 
 import falcon
+from monasca_common.rest import utils as rest_utils
 from oslo_log import log
+from six.moves.urllib import parse
 
 from monasca_log_api.api import exceptions
 from monasca_log_api.api import logs_api
 from monasca_log_api.monitoring import metrics
+from monasca_log_api.monitoring import stages
+from monasca_log_api.reference.common import buffer_pool
+from monasca_log_api.reference.common import interning
+from monasca_log_api.reference.common import recent_logs
 from monasca_log_api.reference.common import validation
 from monasca_log_api.reference.v3.common import bulk_processor
 from monasca_log_api.reference.v3.common import helpers
 
 LOG = log.getLogger(__name__)
 
+_DEFAULT_LIMIT = 10
+_MAX_LIMIT = 1000
+_SORT_FIELDS = {'timestamp'}
+
 
 class Logs(logs_api.LogsApi):
 
     VERSION = 'v3.0'
     SUPPORTED_CONTENT_TYPES = {'application/json'}
+    CACHE_CONTROL = ['must-revalidate', 'no-cache', 'no-store']
 
-    def __init__(self):
+    def __init__(self, per_thread_producer=False):
         super(Logs, self).__init__()
 
         self._processor = bulk_processor.BulkProcessor(
             logs_in_counter=self._logs_in_counter,
-            logs_rejected_counter=self._logs_rejected_counter
+            logs_rejected_counter=self._logs_rejected_counter,
+            per_thread_producer=per_thread_producer
         )
         self._bulks_rejected_counter = self._statsd.get_counter(
             name=metrics.LOGS_BULKS_REJECTED_METRIC,
             dimensions=self._metrics_dimensions
         )
+        self._stage_timers = stages.StageTimers(
+            statsd=self._statsd,
+            dimensions=self._metrics_dimensions
+        )
+        self._recent_logs = recent_logs.get_recent_logs()
+        self._interner = interning.get_interner()
+        self._buffer_pool = buffer_pool.get_pool()
 
     def on_post(self, req, res):
-        with self._logs_processing_time.time(name=None):
+        with self._logs_processing_time.time(name=None), \
+                self._processing_time_histogram.time():
+            stage_timer = self._stage_timers.start()
             try:
-                req.validate(self.SUPPORTED_CONTENT_TYPES)
+                with stage_timer.stage(stages.VALIDATE_REQUEST):
+                    req.validate(self.SUPPORTED_CONTENT_TYPES)
 
-                request_body = helpers.read_json_msg_body(req)
+                request_body = helpers.read_json_msg_body(
+                    req, stage_timer, self._interner, self._buffer_pool)
 
-                log_list = self._get_logs(request_body)
-                global_dimensions = self._get_global_dimensions(request_body)
+                with stage_timer.stage(stages.VALIDATE):
+                    log_list = self._get_logs(request_body)
+                    global_dimensions = self._get_global_dimensions(
+                        request_body)
 
             except Exception as ex:
                 LOG.error('Entire bulk package has been rejected')
                 LOG.exception(ex)
 
                 self._bulks_rejected_counter.increment(value=1)
+                self._requests_rejected_counter.inc()
 
                 raise ex
 
             self._bulks_rejected_counter.increment(value=0)
             self._logs_size_gauge.send(name=None,
                                        value=int(req.content_length))
+            self._request_size_histogram.observe(int(req.content_length))
+            self._bulk_size_histogram.observe(len(log_list))
 
             tenant_id = (req.project_id if req.project_id
                          else req.cross_project_id)
@@ -72,14 +100,109 @@ class Logs(logs_api.LogsApi):
                 self._processor.send_message(
                     logs=log_list,
                     global_dimensions=global_dimensions,
-                    log_tenant_id=tenant_id
+                    log_tenant_id=tenant_id,
+                    stage_timer=stage_timer
                 )
             except Exception as ex:
                 res.status = getattr(ex, 'status', falcon.HTTP_500)
                 return
+            finally:
+                self._stage_timers.report(stage_timer, res)
 
             res.status = falcon.HTTP_204
 
+    def on_get(self, req, res):
+        """Lists recent logs of the tenant.
+
+        Logs are served from
+        :py:class:`monasca_log_api.reference.common.recent_logs.RecentLogs`,
+        hence only logs published within ``[recent_logs] max_age``
+        by workers of the node are listed. If store is not shared
+        by workers (``[recent_logs] path`` is empty), listing is
+        refused if WSGI server runs more than one worker process
+        (``wsgi.multiprocess``), as every request would see random
+        part of logs. Query parameters follow **GET /v3.0/logs**
+        of the specification.
+
+        :param falcon.Request req: current request
+        :param falcon.Response res: current response
+        """
+        if self._recent_logs is None:
+            raise falcon.HTTPNotFound(
+                title='Listing logs disabled',
+                description='Enable it with [recent_logs] enabled')
+        if (req.env.get('wsgi.multiprocess') and
+                not self._recent_logs.shared):
+            raise falcon.HTTPNotImplemented(
+                title='Listing logs not available',
+                description='Listing logs requires [recent_logs] path '
+                            'or API served by single worker process')
+
+        validation.validate_cross_tenant(
+            tenant_id=req.project_id,
+            roles=req.roles,
+            cross_tenant_id=req.cross_project_id
+        )
+        tenant_id = req.cross_project_id or req.project_id
+
+        offset = req.get_param_as_int('offset', min=0) or 0
+        limit = req.get_param_as_int('limit', min=1, max=_MAX_LIMIT)
+        limit = limit or _DEFAULT_LIMIT
+
+        found, has_more = self._recent_logs.query(
+            tenant_id,
+            dimensions=helpers.get_dimensions_filter(req),
+            start_time=helpers.parse_time_param(req, 'start_time'),
+            end_time=helpers.parse_time_param(req, 'end_time'),
+            offset=offset,
+            limit=limit,
+            ascending=self._is_ascending(req.get_param('sort_by'))
+        )
+
+        res.status = falcon.HTTP_OK
+        res.cache_control = self.CACHE_CONTROL
+        res.body = rest_utils.as_json({
+            'links': self._get_links(req, offset, limit, has_more),
+            'elements': [{'timestamp': recent_logs.isoformat(timestamp),
+                          'message': message,
+                          'dimensions': dimensions}
+                         for timestamp, message, dimensions in found]
+        })
+
+    @staticmethod
+    def _is_ascending(sort_by):
+        if not sort_by:
+            return False
+        field, _, direction = sort_by.strip().partition(' ')
+        direction = direction.strip().lower() or 'asc'
+        if field not in _SORT_FIELDS or direction not in ('asc', 'desc'):
+            raise falcon.HTTPInvalidParam(
+                'Allowed fields are %s, followed by asc or desc'
+                % ', '.join(sorted(_SORT_FIELDS)), 'sort_by')
+        return direction == 'asc'
+
+    @staticmethod
+    def _get_links(req, offset, limit, has_more):
+        params = [(name, value) for name, value
+                  in parse.parse_qsl(req.query_string)
+                  if name != 'offset']
+        base = '%s%s' % (req.prefix, req.path)
+
+        def link(rel, link_offset):
+            query = list(params)
+            if link_offset:
+                query.append(('offset', str(link_offset)))
+            href = '%s?%s' % (base, parse.urlencode(query)) if query else base
+            return {'rel': rel, 'href': href}
+
+        links = []
+        if offset:
+            links.append(link('prev', max(0, offset - limit)))
+        links.append(link('self', offset))
+        if has_more:
+            links.append(link('next', offset + limit))
+        return links
+
     @staticmethod
     def _get_global_dimensions(request_body):
         """Get the top level dimensions in the HTTP request body."""
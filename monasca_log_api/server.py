@@ -23,6 +23,9 @@ from oslo_log import log
 import paste.deploy
 
 from monasca_log_api.api.core import request
+from monasca_log_api import config_reload
+from monasca_log_api import green
+from monasca_log_api.monitoring import profiler
 from monasca_log_api.reference.common import error_handlers
 from monasca_log_api import uri_map
 
@@ -44,7 +47,19 @@ dispatcher_opts = [
                help='Healthchecks endpoint'),
     cfg.StrOpt('logs_v3',
                default=None,
-               help='Logs')
+               help='Logs'),
+    cfg.StrOpt('metrics',
+               default=None,
+               help='Metrics endpoint, disabled if not set'),
+    cfg.StrOpt('profiler',
+               default=None,
+               help='Profiler endpoint, disabled if not set'),
+    cfg.StrOpt('heavy_hitters',
+               default=None,
+               help='Heavy hitters endpoint, disabled if not set'),
+    cfg.StrOpt('tail',
+               default=None,
+               help='Logs tail endpoint, disabled if not set')
 ]
 dispatcher_group = cfg.OptGroup(name='dispatcher', title='dispatcher')
 CONF.register_group(dispatcher_group)
@@ -52,7 +67,13 @@ CONF.register_opts(dispatcher_opts, dispatcher_group)
 log.register_options(CONF)
 
 
-def launch(conf, config_file='/etc/monasca/log-api-config.conf'):
+def configure(conf, config_file='/etc/monasca/log-api-config.conf'):
+    """Loads configuration and sets up logging.
+
+    :param dict conf: paste global configuration, may point at
+                      **config_file**
+    :param str config_file: default configuration file
+    """
     if conf and 'config_file' in conf:
         config_file = conf.get('config_file')
 
@@ -62,14 +83,26 @@ def launch(conf, config_file='/etc/monasca/log-api-config.conf'):
          default_config_files=[config_file])
     log.setup(CONF, 'monasca_log_api')
 
-    app = falcon.API(request_type=request.Request)
+
+def launch(conf, config_file='/etc/monasca/log-api-config.conf'):
+    configure(conf, config_file)
+
+    app = falcon.API(request_type=request.Request,
+                     middleware=get_middleware())
 
     load_versions_resource(app)
     load_logs_resource(app)
     load_healthcheck_resource(app)
+    load_metrics_resource(app)
+    load_profiler_resource(app)
+    load_heavy_hitters_resource(app)
+    load_tail_resource(app)
     error_handlers.register_error_handlers(app)
+    config_reload.setup()
 
     LOG.debug('Dispatcher drivers have been added to the routes!')
+    LOG.info('Green threads mode %s',
+             'enabled' if green.is_patched() else 'disabled')
 
     return app
 
@@ -79,6 +112,42 @@ def load_healthcheck_resource(app):
     app.add_route(uri_map.HEALTHCHECK_URI, healthchecks)
 
 
+def load_metrics_resource(app):
+    if not CONF.dispatcher.metrics:
+        return
+    metrics = simport.load(CONF.dispatcher.metrics)()
+    app.add_route(uri_map.METRICS_URI, metrics)
+
+
+def load_profiler_resource(app):
+    if not CONF.dispatcher.profiler:
+        return
+    profiler_resource = simport.load(CONF.dispatcher.profiler)()
+    app.add_route(uri_map.PROFILER_URI, profiler_resource)
+
+
+def load_heavy_hitters_resource(app):
+    if not CONF.dispatcher.heavy_hitters:
+        return
+    heavy_hitters = simport.load(CONF.dispatcher.heavy_hitters)()
+    app.add_route(uri_map.HEAVY_HITTERS_URI, heavy_hitters)
+
+
+def load_tail_resource(app):
+    if not CONF.dispatcher.tail:
+        return
+    tail = simport.load(CONF.dispatcher.tail)()
+    app.add_route(uri_map.V3_LOGS_TAIL_URI, tail)
+
+
+def get_middleware():
+    middleware = []
+    if CONF.dispatcher.profiler:
+        middleware.append(
+            profiler.ProfilingHook(skip_path=uri_map.PROFILER_URI))
+    return middleware
+
+
 def load_logs_resource(app):
     logs = simport.load(CONF.dispatcher.logs)()
     app.add_route(uri_map.V2_LOGS_URI, logs)
@@ -0,0 +1,240 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import mock
+from oslotest import base as os_test
+from webob import request
+from webob import response
+
+from monasca_log_api.middleware import admission_middleware as am
+from monasca_log_api.tests import base
+
+
+def _stats(latency=None, in_flight=0):
+    stats = mock.Mock()
+    stats.snapshot.return_value = {'latency': latency,
+                                   'in_flight': in_flight}
+    return stats
+
+
+def _controller(stats=None, target_latency=1.0, max_bytes=1000,
+                max_requests=4, agent_weight=0, user_weight=1):
+    return am.AdmissionController(max_bytes=max_bytes,
+                                  max_requests=max_requests,
+                                  target_latency=target_latency,
+                                  min_budget=0.25,
+                                  adjust_interval=1.0,
+                                  weights={am.AGENT_LANE: agent_weight,
+                                           am.USER_LANE: user_weight},
+                                  stats=stats or _stats())
+
+
+class TestAdmissionController(os_test.BaseTestCase):
+
+    def setUp(self):
+        super(TestAdmissionController, self).setUp()
+        base.mock_config(self)
+
+    def test_should_limit_requests_in_flight(self):
+        controller = _controller()
+        for _ in range(4):
+            self.assertTrue(controller.acquire(10, now=0))
+        self.assertFalse(controller.acquire(10, now=0))
+
+        controller.release(10)
+        self.assertTrue(controller.acquire(10, now=0))
+
+    def test_should_limit_bytes_in_flight(self):
+        controller = _controller()
+        self.assertTrue(controller.acquire(600, now=0))
+        self.assertFalse(controller.acquire(600, now=0))
+        self.assertTrue(controller.acquire(400, now=0))
+
+    def test_should_always_admit_request_to_idle_worker(self):
+        controller = _controller()
+        self.assertTrue(controller.acquire(5000, now=0))
+        self.assertFalse(controller.acquire(1, now=0))
+
+    def test_should_tighten_budget_if_latency_is_high(self):
+        stats = _stats(latency=2.0)
+        controller = _controller(stats)
+
+        for expected in (0.5, 0.25, 0.25):
+            controller.acquire(0, now=controller._adjusted + 1)
+            controller.release(0)
+            self.assertEqual(expected, controller.budget)
+
+        self.assertTrue(controller.acquire(0, now=controller._adjusted))
+        self.assertFalse(controller.acquire(0, now=controller._adjusted))
+
+    def test_should_tighten_budget_if_producer_is_saturated(self):
+        controller = _controller(_stats(latency=0.1, in_flight=100))
+        controller.acquire(0, now=controller._adjusted + 1)
+        self.assertEqual(0.5, controller.budget)
+
+    def test_should_restore_budget_gradually(self):
+        stats = _stats(latency=2.0)
+        controller = _controller(stats)
+        controller.acquire(0, now=controller._adjusted + 1)
+        controller.release(0)
+
+        stats.snapshot.return_value = {'latency': 0.1, 'in_flight': 0}
+        controller.acquire(0, now=controller._adjusted + 1)
+        controller.release(0)
+        self.assertAlmostEqual(0.5 + am._INCREASE_STEP, controller.budget)
+
+    def test_should_adjust_once_per_interval(self):
+        stats = _stats(latency=2.0)
+        controller = _controller(stats)
+        start = controller._adjusted
+        controller.acquire(0, now=start + 0.5)
+        controller.acquire(0, now=start + 0.9)
+        self.assertEqual(1.0, controller.budget)
+        stats.snapshot.assert_not_called()
+
+    def test_should_not_adjust_if_disabled(self):
+        stats = _stats(latency=2.0)
+        controller = _controller(stats, target_latency=0.0)
+        controller.acquire(0, now=controller._adjusted + 10)
+        self.assertEqual(1.0, controller.budget)
+
+    def test_should_lend_share_of_idle_lane(self):
+        controller = _controller(agent_weight=3, user_weight=1)
+        for _ in range(4):
+            self.assertTrue(controller.acquire(10, am.AGENT_LANE, now=0))
+        self.assertFalse(controller.acquire(10, am.AGENT_LANE, now=0))
+
+    def test_should_stop_lending_once_lane_is_busy(self):
+        controller = _controller(agent_weight=1, user_weight=1)
+        for _ in range(4):
+            self.assertTrue(controller.acquire(10, am.USER_LANE, now=0))
+
+        self.assertTrue(controller.acquire(10, am.AGENT_LANE, now=0))
+        self.assertTrue(controller.acquire(10, am.AGENT_LANE, now=0))
+        self.assertFalse(controller.acquire(10, am.AGENT_LANE, now=0))
+
+        controller.release(10, am.USER_LANE)
+        self.assertFalse(controller.acquire(10, am.USER_LANE, now=0))
+        controller.release(10, am.USER_LANE)
+        controller.release(10, am.USER_LANE)
+        self.assertTrue(controller.acquire(10, am.USER_LANE, now=0))
+
+    def test_should_split_budget_by_weights(self):
+        controller = _controller(agent_weight=1, user_weight=3)
+        self.assertTrue(controller.acquire(10, am.AGENT_LANE, now=0))
+        for _ in range(3):
+            self.assertTrue(controller.acquire(10, am.USER_LANE, now=0))
+        self.assertFalse(controller.acquire(10, am.USER_LANE, now=0))
+        self.assertFalse(controller.acquire(10, am.AGENT_LANE, now=0))
+
+        controller.release(10, am.USER_LANE)
+        self.assertTrue(controller.acquire(10, am.USER_LANE, now=0))
+
+    def test_should_split_bytes_by_weights(self):
+        controller = _controller(agent_weight=1, user_weight=1)
+        self.assertTrue(controller.acquire(100, am.AGENT_LANE, now=0))
+        self.assertTrue(controller.acquire(400, am.USER_LANE, now=0))
+        self.assertFalse(controller.acquire(200, am.USER_LANE, now=0))
+        self.assertTrue(controller.acquire(400, am.AGENT_LANE, now=0))
+
+    def test_should_favour_agents_by_default(self):
+        self.assertGreater(am.CONF.admission.agent_weight,
+                           am.CONF.admission.user_weight)
+
+
+class TestAdmissionMiddleware(os_test.BaseTestCase):
+
+    def setUp(self):
+        super(TestAdmissionMiddleware, self).setUp()
+        base.mock_config(self)
+
+    @staticmethod
+    def _request(path='/v3.0/logs', method='POST'):
+        req = request.Request.blank(path)
+        req.method = method
+        req.body = b'{"logs": []}'
+        return req
+
+    def test_should_reject_with_503_if_not_admitted(self):
+        controller = mock.Mock()
+        controller.acquire.return_value = False
+        app = mock.Mock()
+        instance = am.AdmissionMiddleware(app, controller=controller)
+
+        res = self._request().get_response(instance)
+
+        self.assertEqual(503, res.status_code)
+        self.assertEqual('5', res.headers['Retry-After'])
+        app.assert_not_called()
+        controller.release.assert_not_called()
+
+    def test_should_release_after_response(self):
+        controller = mock.Mock()
+        controller.acquire.return_value = True
+        instance = am.AdmissionMiddleware(response.Response(status=204),
+                                          controller=controller)
+
+        res = self._request().get_response(instance)
+
+        self.assertEqual(204, res.status_code)
+        controller.acquire.assert_called_once_with(12, am.USER_LANE)
+        controller.release.assert_called_once_with(12, am.USER_LANE)
+
+    def test_should_release_if_application_failed(self):
+        controller = mock.Mock()
+        controller.acquire.return_value = True
+        app = mock.Mock(side_effect=RuntimeError)
+        instance = am.AdmissionMiddleware(app, controller=controller)
+
+        self.assertRaises(RuntimeError,
+                          self._request().get_response, instance)
+        controller.release.assert_called_once_with(12, am.USER_LANE)
+
+    def test_should_count_chunked_request_as_max_log_size(self):
+        controller = mock.Mock()
+        controller.acquire.return_value = True
+        instance = am.AdmissionMiddleware(response.Response(status=204),
+                                          controller=controller)
+        req = self._request()
+        del req.headers['Content-Length']
+        req.headers['Transfer-Encoding'] = 'chunked'
+
+        req.get_response(instance)
+
+        max_log_size = am.CONF.service.max_log_size
+        controller.acquire.assert_called_once_with(max_log_size,
+                                                   am.USER_LANE)
+        controller.release.assert_called_once_with(max_log_size,
+                                                   am.USER_LANE)
+
+    def test_should_use_agent_lane_for_agent_requests(self):
+        controller = mock.Mock()
+        controller.acquire.return_value = True
+        instance = am.AdmissionMiddleware(response.Response(status=204),
+                                          controller=controller)
+        req = self._request()
+        req.environ['X-MONASCA-LOG-AGENT'] = True
+
+        req.get_response(instance)
+
+        controller.acquire.assert_called_once_with(12, am.AGENT_LANE)
+        controller.release.assert_called_once_with(12, am.AGENT_LANE)
+
+    def test_should_skip_other_requests(self):
+        controller = mock.Mock()
+        instance = am.AdmissionMiddleware(response.Response(status=200),
+                                          controller=controller)
+        self._request('/healthcheck').get_response(instance)
+        self._request(method='GET').get_response(instance)
+        controller.acquire.assert_not_called()
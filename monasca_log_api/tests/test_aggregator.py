@@ -0,0 +1,132 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import weakref
+
+import fixtures
+import mock
+from oslotest import base
+
+from monasca_log_api.monitoring import aggregator
+
+
+class TestAggregatingClient(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestAggregatingClient, self).setUp()
+        self.statsd = mock.Mock()
+        self.client = aggregator.AggregatingClient(client=self.statsd,
+                                                   interval=3600)
+
+    def test_should_sum_counter_increments(self):
+        counter = self.client.get_counter(name='foo')
+        statsd_counter = self.statsd.get_counter.return_value
+
+        for _ in range(5000):
+            counter.increment()
+        counter.increment(value=3, dimensions={'a': 'b'})
+
+        self.assertFalse(statsd_counter.increment.called)
+
+        self.client.flush()
+
+        statsd_counter.increment.assert_has_calls([
+            mock.call(value=5000, dimensions=None),
+            mock.call(value=3, dimensions={'a': 'b'})
+        ], any_order=True)
+        self.assertEqual(2, statsd_counter.increment.call_count)
+
+    def test_should_round_sampled_counter_increments(self):
+        counter = self.client.get_counter(name='foo')
+        statsd_counter = self.statsd.get_counter.return_value
+
+        for _ in range(2):
+            counter.increment(sample_rate=0.3)
+
+        self.client.flush()
+
+        statsd_counter.increment.assert_called_once_with(value=7,
+                                                         dimensions=None)
+
+    def test_should_send_maximum_gauge_value(self):
+        gauge = self.client.get_gauge(name='foo')
+        statsd_gauge = self.statsd.get_gauge.return_value
+
+        for value in (0, 120, 0, 0):
+            gauge.send(name=None, value=value)
+
+        self.client.flush()
+
+        statsd_gauge.send.assert_called_once_with(name=None, value=120,
+                                                  dimensions=None)
+
+    def test_should_summarize_timings(self):
+        timer = self.client.get_timer(name='foo')
+        statsd_timer = self.statsd.get_timer.return_value
+
+        for value in (1, 2, 6):
+            timer.timing(name=None, value=value)
+
+        self.client.flush()
+
+        statsd_timer.timing.assert_has_calls([
+            mock.call(None, 3.0, dimensions=None),
+            mock.call(aggregator.TIMER_MAX_SUFFIX, 6, dimensions=None)
+        ])
+        self.assertEqual(2, statsd_timer.timing.call_count)
+        self.statsd.get_counter.assert_called_once_with(
+            name='foo.count', connection=None, dimensions=None)
+        self.statsd.get_counter.return_value.increment.assert_called_once_with(
+            value=3, dimensions=None)
+
+    def test_should_time_block(self):
+        timer = self.client.get_timer(name='foo')
+        statsd_timer = self.statsd.get_timer.return_value
+
+        with timer.time(name=None):
+            pass
+
+        self.client.flush()
+
+        self.assertEqual(2, statsd_timer.timing.call_count)
+
+    def test_should_not_send_anything_if_nothing_recorded(self):
+        self.client.get_counter(name='foo')
+        self.client.flush()
+        self.assertFalse(self.statsd.get_counter.return_value.increment.called)
+
+    @mock.patch('monasca_log_api.monitoring.aggregator.atexit')
+    @mock.patch('monasca_log_api.monitoring.aggregator.threading.Thread')
+    def test_should_flush_periodically(self, thread, atexit):
+        other_client = aggregator.AggregatingClient(client=self.statsd,
+                                                    interval=10)
+        self.useFixture(fixtures.MockPatchObject(aggregator, '_FLUSHING',
+                                                 []))
+        self.useFixture(fixtures.MockPatchObject(
+            aggregator, '_FLUSHED_CLIENTS', weakref.WeakSet()))
+
+        aggregator.flush_periodically(self.client)
+        aggregator.flush_periodically(other_client)
+
+        thread.assert_called_once_with(target=aggregator._flush_every,
+                                       args=(3600,))
+        atexit.register.assert_called_once_with(aggregator.flush_all)
+
+        counter = other_client.get_counter(name='foo')
+        counter.increment()
+        with mock.patch('monasca_log_api.monitoring.aggregator.time.sleep',
+                        side_effect=[None, RuntimeError]):
+            self.assertRaises(RuntimeError, aggregator._flush_every, 10)
+        self.statsd.get_counter.return_value.increment.assert_called_once_with(
+            value=1, dimensions=None)
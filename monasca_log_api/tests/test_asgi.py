@@ -0,0 +1,280 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import threading
+import unittest
+
+import mock
+from oslotest import base as os_test
+import simplejson as json
+import six
+
+from monasca_log_api.tests import base
+
+if six.PY3:
+    import asyncio
+    from concurrent import futures
+
+    from monasca_log_api.asgi import app as asgi_app
+
+ENDPOINT = '/v3.0/logs'
+TENANT_ID = 'a4e8a3e5f6c34e8b8f3a9c4b3d2e1f00'
+REQUEST_ID = 'req-c0ffee'
+
+
+def _scope(path=ENDPOINT, method='POST', body=b'', headers=None,
+           query_string=b''):
+    all_headers = [(b'content-type', b'application/json'),
+                   (b'content-length', str(len(body)).encode('latin-1'))]
+    all_headers.extend(headers or [])
+    return {
+        'type': 'http',
+        'method': method,
+        'path': path,
+        'query_string': query_string,
+        'headers': all_headers
+    }
+
+
+def _receive_from(*chunks):
+    messages = [{'type': 'http.request', 'body': chunk,
+                 'more_body': i < len(chunks) - 1}
+                for i, chunk in enumerate(chunks)]
+    receive = mock.Mock(side_effect=messages)
+
+    def _receive():
+        return asyncio.sleep(0, receive())
+
+    _receive.mock = receive
+    return _receive
+
+
+def _authorized_app(environ, start_response):
+    environ[asgi_app._AUTHORIZED_KEY] = True
+    environ['HTTP_X_PROJECT_ID'] = TENANT_ID
+    environ['HTTP_X_ROLES'] = 'monasca-user'
+    start_response('204 No Content',
+                   [('X-OpenStack-Request-Id', REQUEST_ID)])
+    return []
+
+
+def _unauthorized_app(environ, start_response):
+    start_response('401 Unauthorized', [('Content-Type', 'text/plain')])
+    return [b'Authentication required']
+
+
+def _body(*messages):
+    return json.dumps({
+        'dimensions': {'hostname': 'devstack'},
+        'logs': [{'message': m, 'dimensions': {}} for m in messages]
+    }).encode('utf-8')
+
+
+@unittest.skipIf(six.PY2, 'ASGI application requires Python 3')
+@mock.patch('monasca_log_api.reference.common.log_publisher.producer'
+            '.KafkaProducer')
+class TestApplication(os_test.BaseTestCase):
+
+    def setUp(self):
+        super(TestApplication, self).setUp()
+        self.conf = base.mock_config(self)
+        self.executor = futures.ThreadPoolExecutor(4)
+        self.addCleanup(self.executor.shutdown)
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+        self.wsgi_app = mock.Mock()
+
+    def _app(self, auth_app=_authorized_app):
+        return asgi_app.Application(auth_app, self.wsgi_app, self.executor)
+
+    def _call(self, app, scope, receive):
+        sent = []
+
+        def send(message):
+            sent.append(message)
+            return asyncio.sleep(0)
+
+        self.loop.run_until_complete(app(scope, receive, send))
+        start, body = sent
+        return start['status'], dict(start['headers']), body['body']
+
+    def test_should_publish_logs(self, kafka_producer):
+        body = _body('foo', 'bar')
+        app = self._app()
+
+        status, headers, _ = self._call(app, _scope(body=body),
+                                        _receive_from(body[:10], body[10:]))
+
+        self.assertEqual(204, status)
+        self.assertEqual(REQUEST_ID.encode('latin-1'),
+                         headers[b'x-openstack-request-id'])
+        publish = kafka_producer.return_value.publish
+        self.assertEqual(1, publish.call_count)
+        topic, messages = publish.call_args[0]
+        self.assertEqual(2, len(messages))
+        envelope = json.loads(messages[0])
+        self.assertEqual(TENANT_ID, envelope['meta']['tenantId'])
+        self.assertEqual('devstack', envelope['log']['dimensions']['hostname'])
+
+    def test_should_not_read_body_if_not_authorized(self, kafka_producer):
+        receive = _receive_from(_body('foo'))
+        app = self._app(auth_app=_unauthorized_app)
+
+        status, _, body = self._call(app, _scope(body=_body('foo')), receive)
+
+        self.assertEqual(401, status)
+        self.assertEqual(b'Authentication required', body)
+        self.assertFalse(receive.mock.called)
+        self.assertFalse(kafka_producer.return_value.publish.called)
+
+    def test_should_reject_invalid_json(self, kafka_producer):
+        body = b'{"logs": '
+        app = self._app()
+
+        status, headers, _ = self._call(app, _scope(body=body),
+                                        _receive_from(body))
+
+        self.assertEqual(400, status)
+        self.assertEqual(b'application/json', headers[b'content-type'])
+        self.assertFalse(kafka_producer.return_value.publish.called)
+
+    def test_should_reject_body_longer_than_declared(self, kafka_producer):
+        body = _body('foo')
+        scope = _scope(body=body[:5])
+        app = self._app()
+
+        status, _, _ = self._call(app, scope, _receive_from(body))
+
+        self.assertEqual(400, status)
+
+    def test_should_reject_cross_tenant_without_delegate_role(self, _):
+        body = _body('foo')
+        scope = _scope(body=body, query_string=b'tenant_id=other')
+        app = self._app()
+
+        status, _, _ = self._call(app, scope, _receive_from(body))
+
+        self.assertEqual(403, status)
+
+    def test_should_delegate_other_endpoints_to_wsgi(self, _):
+        def wsgi_app(environ, start_response):
+            payload = environ['wsgi.input'].read()
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            return [environ['PATH_INFO'].encode('utf-8'), b' ', payload]
+
+        self.wsgi_app = wsgi_app
+        app = self._app()
+
+        status, _, body = self._call(
+            app, _scope(path='/v2.0/log/single', body=b'abc'),
+            _receive_from(b'abc'))
+
+        self.assertEqual(200, status)
+        self.assertEqual(b'/v2.0/log/single abc', body)
+
+    def test_should_give_each_thread_own_producer(self, kafka_producer):
+        both_publishing = threading.Barrier(2, timeout=5)
+        used_by = {}
+
+        def new_producer(**_):
+            producer = mock.Mock()
+
+            def publish(*_):
+                used_by.setdefault(id(producer), set()).add(
+                    threading.current_thread().ident)
+                both_publishing.wait()
+
+            producer.publish.side_effect = publish
+            return producer
+
+        kafka_producer.side_effect = new_producer
+        app = self._app()
+        body = _body('foo')
+
+        def send(message):
+            return asyncio.sleep(0)
+
+        posts = [self.loop.create_task(
+            app(_scope(body=body), _receive_from(body), send))
+            for _ in range(2)]
+        self.loop.run_until_complete(asyncio.wait_for(
+            asyncio.gather(*posts), 10))
+
+        self.assertEqual(2, len(used_by))
+        self.assertEqual(2, len(set.union(*used_by.values())))
+        for threads in used_by.values():
+            self.assertEqual(1, len(threads))
+
+    def test_should_not_block_loop_while_publishing(self, kafka_producer):
+        publishing = threading.Event()
+        release = threading.Event()
+
+        def slow_publish(*_):
+            publishing.set()
+            release.wait(5)
+
+        kafka_producer.return_value.publish.side_effect = slow_publish
+
+        def wsgi_app(environ, start_response):
+            start_response('204 No Content', [])
+            return []
+
+        self.wsgi_app = wsgi_app
+        app = self._app()
+        body = _body('foo')
+        order = []
+
+        def send(message):
+            return asyncio.sleep(0)
+
+        def healthcheck(_):
+            checked = self.loop.create_task(
+                app(_scope(path='/healthcheck', method='HEAD'),
+                    _receive_from(b''), send))
+            checked.add_done_callback(on_checked)
+
+        def on_checked(_):
+            order.append('healthcheck')
+            release.set()
+
+        posted = self.loop.create_task(
+            app(_scope(body=body), _receive_from(body), send))
+        posted.add_done_callback(lambda _: order.append('logs'))
+        published = self.loop.run_in_executor(None, publishing.wait, 5)
+        published.add_done_callback(healthcheck)
+
+        self.loop.run_until_complete(asyncio.wait_for(posted, 10))
+
+        self.assertEqual(['healthcheck', 'logs'], order)
+
+
+@unittest.skipIf(six.PY2, 'ASGI application requires Python 3')
+class TestToEnviron(os_test.BaseTestCase):
+
+    def test_should_convert_scope(self):
+        scope = _scope(body=b'abc',
+                       headers=[(b'x-auth-token', b'token'),
+                                (b'x-roles', b'a'), (b'x-roles', b'b')],
+                       query_string=b'tenant_id=1')
+
+        environ = asgi_app.to_environ(scope, b'abc')
+
+        self.assertEqual('POST', environ['REQUEST_METHOD'])
+        self.assertEqual(ENDPOINT, environ['PATH_INFO'])
+        self.assertEqual('tenant_id=1', environ['QUERY_STRING'])
+        self.assertEqual('application/json', environ['CONTENT_TYPE'])
+        self.assertEqual('3', environ['CONTENT_LENGTH'])
+        self.assertEqual('token', environ['HTTP_X_AUTH_TOKEN'])
+        self.assertEqual('a,b', environ['HTTP_X_ROLES'])
+        self.assertEqual(b'abc', environ['wsgi.input'].read())
@@ -0,0 +1,125 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import json
+
+from oslotest import base as os_test
+
+import mock
+
+from monasca_log_api.benchmark import load
+from monasca_log_api.benchmark import micro
+
+
+class TestLoad(os_test.BaseTestCase):
+
+    def test_should_make_v3_request(self):
+        path, headers, body = load.make_request('v3', bulk_size=3,
+                                                message_size=10,
+                                                dimensions=2)
+        body = json.loads(body.decode('utf-8'))
+
+        self.assertEqual('/v3.0/logs', path)
+        self.assertEqual('Confirmed', headers['X-Identity-Status'])
+        self.assertEqual(3, len(body['logs']))
+        self.assertEqual(10, len(body['logs'][0]['message']))
+        self.assertEqual(2, len(body['logs'][0]['dimensions']))
+
+    def test_should_make_v2_request(self):
+        path, headers, body = load.make_request('v2', bulk_size=3,
+                                                message_size=10,
+                                                dimensions=2)
+
+        self.assertEqual('/v2.0/log/single', path)
+        self.assertEqual(2, len(headers['X-Dimensions'].split(',')))
+        self.assertEqual(10, len(json.loads(body.decode('utf-8'))['message']))
+
+    def test_should_calculate_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(50, load.percentile(values, 50))
+        self.assertEqual(99, load.percentile(values, 99))
+        self.assertIsNone(load.percentile([], 50))
+
+    def test_should_report_throughput(self):
+        environs = []
+
+        def app(environ, start_response):
+            environs.append(environ)
+            start_response('204 No Content', [])
+            return []
+
+        request = load.make_request('v3', 2, 10, 1)
+        report = load.run(app, request, logs_per_request=2, concurrency=2,
+                          duration=10, requests=5)
+
+        self.assertEqual(10, report['requests'])
+        self.assertEqual({'204': 10}, report['statuses'])
+        self.assertAlmostEqual(2 * report['req_per_s'], report['logs_per_s'])
+        self.assertIsNotNone(report['latency_p99'])
+        self.assertEqual(request[2], environs[0]['wsgi.input'].read())
+        self.assertIn('req/s', load.format_report(report))
+
+    def test_should_count_null_producer_messages(self):
+        producer = load.NullProducer()
+        producer.publish('logs', [b'ab', b'c'])
+        self.assertEqual(2, producer.messages)
+        self.assertEqual(3, producer.bytes)
+
+
+class TestMicro(os_test.BaseTestCase):
+
+    def test_should_detect_regression_beyond_tolerance(self):
+        comparison = micro.compare({'a': 1.2, 'b': 1.05, 'c': 1.0},
+                                   {'a': 1.0, 'b': 1.0}, 0.1)
+
+        self.assertEqual([('a', True), ('b', False), ('c', False)],
+                         [(c[0], c[4]) for c in comparison])
+        self.assertIsNone(comparison[2][3])
+        self.assertIn('REGRESSION', micro.format_comparison(comparison))
+
+    def test_should_apply_tolerance_of_case(self):
+        comparison = micro.compare({'a': 1.2, 'b': 1.2},
+                                   {'a': 1.0, 'b': 1.0}, 0.1, {'a': 0.3})
+
+        self.assertEqual([('a', False), ('b', True)],
+                         [(c[0], c[4]) for c in comparison])
+
+    def test_should_take_median(self):
+        self.assertEqual(2, micro.median([9, 1, 2]))
+        self.assertEqual(2.5, micro.median([4, 1, 2, 3]))
+
+    @mock.patch('monasca_log_api.benchmark.micro._MIN_TIME', 0.001)
+    def test_should_normalize_with_reference(self):
+        cases = {'reference': lambda: micro.reference,
+                 'batch': lambda: (micro.reference, 1)}
+        with mock.patch.object(micro, 'CASES', cases):
+            results = micro.run(['reference'], rounds=1)
+
+        self.assertEqual(['reference'], list(results))
+        self.assertLess(0.5, results['reference'])
+        self.assertGreater(2, results['reference'])
+
+    def test_should_cover_hot_functions(self):
+        self.assertEqual({'LogPublisher._truncate',
+                          'BulkProcessor._transform_message',
+                          'validation.validate_dimensions',
+                          'service.parse_dimensions',
+                          'LogCreator.new_log',
+                          'Envelope.new_envelope',
+                          'helpers.read_json_msg_body',
+                          'Interner.intern_bulk'},
+                         set(micro.CASES))
+        with open(micro.BASELINE_FILE) as f:
+            self.assertEqual(set(micro.CASES),
+                             set(json.load(f)['results']))
@@ -0,0 +1,166 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import io
+
+import falcon
+import mock
+from monasca_common.rest import exceptions as rest_exceptions
+from oslotest import base as os_test
+
+from monasca_log_api.reference.common import buffer_pool
+from monasca_log_api.reference.v2.common import service
+from monasca_log_api.reference.v3.common import helpers
+from monasca_log_api.tests import base
+
+
+class _Stream(object):
+    """Stream without readinto, returning at most 3 bytes at once."""
+
+    def __init__(self, data):
+        self._data = io.BytesIO(data)
+
+    def read(self, size=-1):
+        return self._data.read(3 if size < 0 else min(size, 3))
+
+
+def _request(body):
+    req = mock.Mock()
+    req.stream = io.BytesIO(body)
+    req.content_length = len(body)
+    return req
+
+
+class TestBufferPool(os_test.BaseTestCase):
+
+    def test_should_reuse_released_buffer(self):
+        pool = buffer_pool.BufferPool(buffer_size=16, max_buffers=2)
+
+        buffer = pool.acquire(10)
+        self.assertEqual(16, len(buffer))
+        pool.release(buffer)
+        self.assertIs(buffer, pool.acquire(16))
+        self.assertEqual(1, pool.allocated)
+
+    def test_should_not_allocate_above_max_buffers(self):
+        pool = buffer_pool.BufferPool(buffer_size=16, max_buffers=2)
+        buffers = [pool.acquire(10) for _ in range(3)]
+
+        self.assertIsNone(buffers[2])
+        self.assertEqual(2, pool.allocated)
+        for buffer in buffers[:2]:
+            pool.release(buffer)
+        self.assertEqual(2, pool.idle)
+
+    def test_should_not_lend_buffer_if_body_does_not_fit(self):
+        pool = buffer_pool.BufferPool(buffer_size=16, max_buffers=2)
+
+        self.assertIsNone(pool.acquire(17))
+        self.assertIsNone(pool.acquire(None))
+        self.assertEqual(0, pool.allocated)
+
+    def test_should_not_lend_buffer_for_small_body(self):
+        pool = buffer_pool.BufferPool(buffer_size=16, max_buffers=2,
+                                      min_size=8)
+        self.assertIsNone(pool.acquire(7))
+        self.assertIsNotNone(pool.acquire(8))
+
+    def test_should_lend_nothing_if_there_is_no_pool(self):
+        self.assertIsNone(buffer_pool.acquire(None, 10))
+        buffer_pool.release(None, None)
+
+    def test_should_read_into_buffer(self):
+        buffer = bytearray(16)
+        body = buffer_pool.read_into(io.BytesIO(b'hello'), 5, buffer)
+
+        self.assertIsInstance(body, memoryview)
+        self.assertEqual(b'hello', body.tobytes())
+        self.assertEqual(b'hello', bytes(buffer[:5]))
+
+    def test_should_read_into_buffer_in_chunks(self):
+        buffer = bytearray(16)
+        body = buffer_pool.read_into(_Stream(b'hello world'), 11, buffer)
+        self.assertEqual(b'hello world', body.tobytes())
+
+    def test_should_stop_at_end_of_stream(self):
+        buffer = bytearray(16)
+        body = buffer_pool.read_into(io.BytesIO(b'hello'), 10, buffer)
+        self.assertEqual(b'hello', body.tobytes())
+
+    def test_should_read_without_buffer_if_body_does_not_fit(self):
+        stream = io.BytesIO(b'x' * 20)
+        self.assertEqual(b'x' * 20,
+                         buffer_pool.read_into(stream, 20, bytearray(16)))
+        stream = io.BytesIO(b'hello')
+        self.assertEqual(b'hello',
+                         buffer_pool.read_into(stream, None, bytearray(16)))
+
+    def test_should_decode_view(self):
+        body = memoryview(bytearray(u'\u0142\xff'.encode('utf-8')))
+        self.assertEqual(u'\u0142\xff', buffer_pool.to_text(body))
+        self.assertEqual(u'a\ufffd', buffer_pool.to_text(
+            memoryview(bytearray(b'a\xff')), 'replace'))
+
+    def test_should_return_pool_if_enabled(self):
+        conf = base.mock_config(self)
+        with mock.patch.object(buffer_pool, '_POOL', None):
+            pool = buffer_pool.get_pool()
+            self.assertIsInstance(pool, buffer_pool.BufferPool)
+            self.assertIs(pool, buffer_pool.get_pool())
+
+            conf.config(enabled=False, group='buffer_pool')
+            self.assertIsNone(buffer_pool.get_pool())
+
+
+class TestReadBody(os_test.BaseTestCase):
+
+    def setUp(self):
+        super(TestReadBody, self).setUp()
+        self.pool = buffer_pool.BufferPool(buffer_size=64, max_buffers=1)
+
+    def test_should_read_json_msg_body_into_pooled_buffer(self):
+        req = _request(b'{"logs": [{"message": "msg"}]}')
+
+        self.assertEqual({'logs': [{'message': 'msg'}]},
+                         helpers.read_json_msg_body(req, pool=self.pool))
+        self.assertEqual(1, self.pool.idle)
+
+    def test_should_release_buffer_if_body_is_invalid(self):
+        for body in (b'{"logs": ', b'{"logs": "\xff"}'):
+            self.assertRaises(falcon.HTTPBadRequest,
+                              helpers.read_json_msg_body,
+                              _request(body), pool=self.pool)
+        self.assertEqual(1, self.pool.idle)
+
+    def test_should_read_v2_body_into_buffer(self):
+        self.assertEqual({'message': 'msg'}, service.read_json_body(
+            io.BytesIO(b'{"message": "msg"}'), 18, self.pool))
+        self.assertIsNone(service.read_json_body(
+            io.BytesIO(b''), 0, self.pool))
+        self.assertEqual(1, self.pool.idle)
+
+    def test_should_read_v2_body_without_buffer(self):
+        pool = buffer_pool.BufferPool(buffer_size=64, max_buffers=1,
+                                      min_size=32)
+        self.assertEqual({'message': 'msg'}, service.read_json_body(
+            io.BytesIO(b'{"message": "msg"}'), 18, pool))
+        self.assertEqual({'message': 'msg'}, service.read_json_body(
+            io.BytesIO(b'{"message": "msg"}'), None, pool))
+        self.assertEqual(0, pool.allocated)
+
+    def test_should_reject_invalid_v2_body(self):
+        self.assertRaises(rest_exceptions.DataConversionException,
+                          service.read_json_body, io.BytesIO(b'"\xff"'),
+                          3, self.pool)
+        self.assertEqual(1, self.pool.idle)
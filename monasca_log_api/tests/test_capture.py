@@ -0,0 +1,171 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import glob
+import json
+import os
+
+import fixtures
+import mock
+from oslotest import base as os_test
+from webob import request
+
+from monasca_log_api.benchmark import replay
+from monasca_log_api.middleware import capture_middleware as cm
+from monasca_log_api.tests import base
+
+
+def _create_request(path='/v3.0/logs', method='POST', body=b'{"logs": []}'):
+    req = request.Request.blank(path)
+    req.method = method
+    req.body = body
+    req.headers['Content-Type'] = 'application/json'
+    req.headers['X-Auth-Token'] = 'secret'
+    req.headers['X-Tenant-Id'] = 'abc'
+    return req
+
+
+class TestCaptureMiddleware(os_test.BaseTestCase):
+
+    def setUp(self):
+        super(TestCaptureMiddleware, self).setUp()
+        self.conf = base.mock_config(self)
+        self.directory = self.useFixture(fixtures.TempDir()).path
+        self.conf.config(directory=self.directory, sample_rate=1.0,
+                         group='capture')
+
+    def _captured(self):
+        return cm.read_captures(
+            glob.glob(os.path.join(self.directory, '*.jsonl.gz')))
+
+    def test_should_capture_logs_request_without_credentials(self):
+        instance = cm.CaptureMiddleware(None)
+        req = _create_request()
+
+        self.assertIsNone(instance.process_request(req))
+        instance._writer.close()
+
+        captured = self._captured()
+        self.assertEqual(1, len(captured))
+        self.assertEqual('/v3.0/logs', captured[0]['path'])
+        self.assertEqual('{"logs": []}', captured[0]['body'])
+        self.assertEqual('abc', captured[0]['headers']['X-Tenant-Id'])
+        self.assertNotIn('X-Auth-Token', captured[0]['headers'])
+        self.assertEqual(b'{"logs": []}', req.body_file.read())
+
+    def test_should_skip_other_requests(self):
+        instance = cm.CaptureMiddleware(None, writer=mock.Mock())
+        instance.process_request(_create_request('/healthcheck'))
+        instance.process_request(_create_request(method='GET'))
+        instance._writer.write.assert_not_called()
+
+    def test_should_sample_requests(self):
+        self.conf.config(sample_rate=0.0, group='capture')
+        instance = cm.CaptureMiddleware(None, writer=mock.Mock())
+        instance.process_request(_create_request())
+        instance._writer.write.assert_not_called()
+
+    def test_should_not_fail_request_if_writing_failed(self):
+        writer = mock.Mock()
+        writer.write.side_effect = IOError()
+        instance = cm.CaptureMiddleware(None, writer=writer)
+        self.assertIsNone(instance.process_request(_create_request()))
+
+    def test_should_rotate_and_keep_newest_files(self):
+        writer = cm.CaptureWriter(self.directory, max_file_size=1,
+                                  max_files=2)
+        for i in range(4):
+            writer.write({'time': i, 'path': '/v3.0/logs'})
+        writer.close()
+
+        self.assertEqual(2, len(glob.glob(
+            os.path.join(self.directory, '*.jsonl.gz'))))
+        self.assertEqual([2, 3], [c['time'] for c in self._captured()])
+
+    def test_should_rotate_old_file(self):
+        writer = cm.CaptureWriter(self.directory, max_file_size=1024,
+                                  max_files=2, max_file_age=60)
+        with mock.patch.object(cm, 'time') as clock:
+            for i, now in enumerate([0, 30, 61]):
+                clock.time.return_value = now
+                writer.write({'time': i, 'path': '/v3.0/logs'})
+        writer.close()
+
+        self.assertEqual(2, len(glob.glob(
+            os.path.join(self.directory, '*.jsonl.gz'))))
+        self.assertEqual([0, 1, 2], [c['time'] for c in self._captured()])
+
+    def test_should_read_truncated_file(self):
+        writer = cm.CaptureWriter(self.directory, max_file_size=1024 ** 2,
+                                  max_files=1)
+        for i in range(100):
+            writer.write({'time': i, 'path': '/v3.0/logs'})
+        writer.close()
+        path, = glob.glob(os.path.join(self.directory, '*.jsonl.gz'))
+        with open(path, 'rb') as f:
+            data = f.read()
+        with open(path, 'wb') as f:
+            f.write(data[:len(data) - 20])
+
+        captured = self._captured()
+
+        self.assertLess(0, len(captured))
+        self.assertEqual(list(range(len(captured))),
+                         [c['time'] for c in captured])
+
+
+class TestReplay(os_test.BaseTestCase):
+
+    def _record(self, time, path='/v3.0/logs', logs=2):
+        return {'time': time, 'method': 'POST', 'path': path, 'query': '',
+                'headers': {'Content-Type': 'application/json'},
+                'body': json.dumps({'logs': [{}] * logs})}
+
+    def test_should_scale_schedule(self):
+        captures = [self._record(10), self._record(12), self._record(16)]
+        self.assertEqual([0, 1, 3],
+                         [o for o, _ in replay.schedule(captures, 2)])
+        self.assertEqual([0, 0, 0],
+                         [o for o, _ in replay.schedule(captures, 0)])
+
+    def test_should_count_logs(self):
+        self.assertEqual(2, replay.count_logs(self._record(0)))
+        self.assertEqual(1, replay.count_logs(
+            self._record(0, path='/v2.0/log/single')))
+        record = self._record(0)
+        record['body'] = 'not json'
+        self.assertEqual(0, replay.count_logs(record))
+
+    def test_should_replay_all_requests(self):
+        send = mock.Mock(side_effect=['204', '204', '503'])
+        captures = [self._record(0), self._record(0.01), self._record(0.02)]
+
+        report = replay.replay(captures, send, speed=1.0, concurrency=2)
+
+        self.assertEqual(3, send.call_count)
+        self.assertEqual({'204': 2, '503': 1}, report['statuses'])
+        self.assertAlmostEqual(4, report['logs_per_s'] * report['elapsed'])
+        self.assertLessEqual(0.02, report['elapsed'])
+
+    def test_should_send_to_app_with_identity(self):
+        app = mock.Mock(return_value=[])
+        app.side_effect = lambda environ, start_response: (
+            start_response('204 No Content', []) or [])
+        sender = replay.AppSender(app, {'X-Tenant-Id': 'xyz'})
+
+        self.assertEqual('204', sender(self._record(0)))
+        environ = app.call_args[0][0]
+        self.assertEqual('Confirmed', environ['HTTP_X_IDENTITY_STATUS'])
+        self.assertEqual('xyz', environ['HTTP_X_TENANT_ID'])
+        self.assertEqual('application/json', environ['CONTENT_TYPE'])
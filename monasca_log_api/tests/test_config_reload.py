@@ -0,0 +1,161 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import os
+import signal
+import tempfile
+
+import mock
+from oslo_config import cfg
+from oslotest import base as os_test
+
+from monasca_log_api import config_reload
+from monasca_log_api import publisher
+from monasca_log_api.reference.common import log_publisher
+from monasca_log_api.tests import base
+
+cfg.CONF.import_group('service', 'monasca_log_api.reference.v2.common.service')
+
+_CONFIG = """
+[log_publisher]
+topics = %s
+max_message_size = %d
+
+[service]
+max_log_size = %d
+"""
+
+
+class TestConfigReload(os_test.BaseTestCase):
+
+    def setUp(self):
+        super(TestConfigReload, self).setUp()
+        base.mock_config(self)
+        fd, self.config_file = tempfile.mkstemp(suffix='.conf')
+        os.close(fd)
+        self.addCleanup(os.remove, self.config_file)
+        # options required by other modules are irrelevant here
+        required = mock.patch.object(cfg.CONF, '_check_required_opts')
+        required.start()
+        self.addCleanup(required.stop)
+
+    def _write(self, topics, max_message_size, max_log_size):
+        with open(self.config_file, 'w') as f:
+            f.write(_CONFIG % (topics, max_message_size, max_log_size))
+
+    def _load(self):
+        cfg.CONF(args=[], default_config_files=[self.config_file])
+
+    @mock.patch('monasca_log_api.reference.common.log_publisher.producer.'
+                'KafkaProducer')
+    def test_should_reload_publisher_and_limits(self, _):
+        self._write('logs', 1000, 2000)
+        self._load()
+        instance = log_publisher.LogPublisher()
+        self.assertEqual(['logs'], instance._topics)
+
+        self._write('logs-v2', 3000, 4000)
+        self.assertTrue(config_reload.reload_config())
+
+        self.assertEqual(['logs-v2'], instance._topics)
+        self.assertEqual(3000, instance.max_message_size)
+        self.assertEqual(4000, cfg.CONF.service.max_log_size)
+
+    def test_should_not_reload_immutable_options(self):
+        self._write('logs', 1000, 2000)
+        with open(self.config_file, 'a') as f:
+            f.write('\n[reload]\ncheck_interval = 5\n')
+        self._load()
+
+        with open(self.config_file, 'a') as f:
+            f.write('\n[reload]\ncheck_interval = 10\n')
+        config_reload.reload_config()
+
+        self.assertEqual(5, cfg.CONF.reload.check_interval)
+
+    def test_should_keep_configuration_if_reload_failed(self):
+        self._write('logs', 1000, 2000)
+        self._load()
+
+        with open(self.config_file, 'w') as f:
+            f.write('[service\nmax_log_size = 1')
+        self.assertFalse(config_reload.reload_config())
+
+        self.assertEqual(2000, cfg.CONF.service.max_log_size)
+
+    def test_should_update_ring_publisher_topics(self):
+        instance = publisher.RingPublisher(ring=mock.Mock(),
+                                           kafka=mock.Mock(),
+                                           topics=['logs'],
+                                           batch_size=1,
+                                           linger=0,
+                                           max_retries=0)
+        instance.set_topics(['logs-v2'])
+        instance._ring.peek.return_value = ([b'msg'], 1)
+
+        instance.run_once()
+
+        instance._kafka.publish.assert_called_once_with('logs-v2', [b'msg'])
+
+
+class TestSetup(os_test.BaseTestCase):
+
+    def setUp(self):
+        super(TestSetup, self).setUp()
+        self.conf = base.mock_config(self)
+        setup_done = mock.patch.object(config_reload, '_SETUP_DONE', False)
+        setup_done.start()
+        self.addCleanup(setup_done.stop)
+
+    @mock.patch('monasca_log_api.config_reload.threading')
+    @mock.patch('monasca_log_api.config_reload.signal.signal')
+    def test_should_install_sighup_handler_once(self, signal_mock, _):
+        config_reload.setup()
+        config_reload.setup()
+
+        signal_mock.assert_called_once_with(signal.SIGHUP,
+                                            config_reload._on_sighup)
+
+    @mock.patch('monasca_log_api.config_reload.threading')
+    @mock.patch('monasca_log_api.config_reload.signal.signal')
+    def test_should_watch_files_if_enabled(self, signal_mock, threading_mock):
+        self.conf.config(on_sighup=False, check_interval=5, group='reload')
+
+        config_reload.setup()
+
+        signal_mock.assert_not_called()
+        threading_mock.Thread.assert_called_once_with(
+            target=config_reload._watch, args=(mock.ANY, 5))
+
+
+class TestFilesWatcher(os_test.BaseTestCase):
+
+    def test_should_detect_modification(self):
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        watcher = config_reload.FilesWatcher([path])
+
+        self.assertFalse(watcher.changed())
+        stat = os.stat(path)
+        os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+        self.assertTrue(watcher.changed())
+        self.assertFalse(watcher.changed())
+
+    def test_should_detect_removal(self):
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        watcher = config_reload.FilesWatcher([path])
+        os.remove(path)
+        self.assertTrue(watcher.changed())
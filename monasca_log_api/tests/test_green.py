@@ -0,0 +1,130 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import subprocess
+import sys
+import threading
+
+import eventlet
+from eventlet import tpool
+import mock
+from oslotest import base as os_test
+
+from monasca_log_api import green
+from monasca_log_api.reference.common import log_publisher
+from monasca_log_api.tests import base
+
+
+class TestGreen(os_test.BaseTestCase):
+
+    def test_should_not_be_patched_in_tests(self):
+        self.assertFalse(green.is_patched())
+
+    def test_should_call_function_if_not_patched(self):
+        fn = mock.Mock(return_value=1)
+        self.assertEqual(1, green.execute(fn, 2, a=3))
+        fn.assert_called_once_with(2, a=3)
+
+    @mock.patch('eventlet.monkey_patch')
+    @mock.patch('monasca_log_api.green.is_patched')
+    def test_should_monkey_patch_once(self, is_patched, monkey_patch):
+        is_patched.side_effect = [False, True]
+        green.monkey_patch()
+        green.monkey_patch()
+        self.assertEqual(1, monkey_patch.call_count)
+
+    def test_should_not_require_eventlet(self):
+        # import of eventlet fails in the child process
+        code = ('import sys; '
+                'sys.modules[\'eventlet\'] = None; '
+                'from monasca_log_api.reference.common import log_publisher; '
+                'from monasca_log_api import green; '
+                'sys.exit(green.is_patched() or green.execute(int, \'0\'))')
+        self.assertEqual(0, subprocess.call([sys.executable, '-c', code]))
+
+
+@mock.patch('monasca_log_api.green.is_patched', return_value=True)
+@mock.patch('monasca_log_api.reference.common.log_publisher.producer'
+            '.KafkaProducer')
+class TestCooperativePublish(os_test.BaseTestCase):
+
+    def setUp(self):
+        super(TestCooperativePublish, self).setUp()
+        self.conf = base.mock_config(self)
+        self.addCleanup(tpool.killall)
+        self.release = threading.Event()
+        self.ticks = []
+
+    def _ticker(self):
+        for i in range(5):
+            self.ticks.append(i)
+            eventlet.sleep(0.01)
+        self.release.set()
+
+    def _publish_with_blocked_broker(self, kafka_producer, timeout):
+        instance = log_publisher.LogPublisher()
+        kafka_producer.return_value.publish.side_effect = (
+            lambda *_: self.release.wait(timeout))
+        ticks_when_published = []
+
+        def publish():
+            instance._publish(['message'])
+            ticks_when_published.extend(self.ticks)
+
+        publisher = eventlet.spawn(publish)
+        ticker = eventlet.spawn(self._ticker)
+        publisher.wait()
+        ticker.wait()
+
+        self.assertEqual(1, kafka_producer.return_value.publish.call_count)
+        return ticks_when_published
+
+    def test_should_not_stall_other_greenlets(self, kafka_producer, _):
+        ticks = self._publish_with_blocked_broker(kafka_producer, timeout=5)
+        # broker is released by other greenlet, that progressed
+        # while publishing greenlet was waiting
+        self.assertEqual([0, 1, 2, 3, 4], ticks)
+
+    def test_should_stall_other_greenlets_without_tpool(self,
+                                                        kafka_producer, _):
+        self.conf.config(publish_in_tpool=False, group='log_publisher')
+        ticks = self._publish_with_blocked_broker(kafka_producer,
+                                                  timeout=0.2)
+        # whole worker is blocked until broker times out
+        self.assertEqual([], ticks)
+
+    def test_should_create_producer_in_native_thread(self, kafka_producer,
+                                                     _):
+        created_in = {}
+        used_in = []
+
+        def new_producer(**_):
+            kafka_publisher = mock.Mock()
+            kafka_publisher.publish.side_effect = lambda *_: used_in.append(
+                (kafka_publisher, threading.current_thread()))
+            created_in[kafka_publisher] = threading.current_thread()
+            return kafka_publisher
+
+        kafka_producer.side_effect = new_producer
+        instance = log_publisher.LogPublisher()
+        self.assertFalse(kafka_producer.called)
+
+        for _ in range(3):
+            instance._publish(['message'])
+
+        self.assertEqual(3, len(used_in))
+        self.assertNotIn(threading.current_thread(), created_in.values())
+        # producer is used only by the thread that created it
+        for kafka_publisher, thread in used_in:
+            self.assertIs(created_in[kafka_publisher], thread)
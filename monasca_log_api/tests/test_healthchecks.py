@@ -18,6 +18,8 @@ import mock
 import simplejson as json
 
 from monasca_log_api.healthcheck import kafka_check as healthcheck
+from monasca_log_api.healthcheck import prober
+from monasca_log_api.healthcheck import publisher_check
 from monasca_log_api.reference import healthchecks
 from monasca_log_api.tests import base
 
@@ -28,6 +30,10 @@ class TestHealthChecks(testing.TestBase):
     def before(self):
         self.conf = base.mock_config(self)
         self.resource = healthchecks.HealthChecks()
+        # do not inherit publishing statistics of other tests
+        self.resource._publisher_check = (
+            publisher_check.PublisherHealthCheck(
+                publisher_check.PublisherStats()))
         self.api.add_route(
             ENDPOINT,
             self.resource
@@ -74,3 +80,55 @@ class TestHealthChecks(testing.TestBase):
         ret = json.loads(ret)
         self.assertIn('kafka', ret)
         self.assertEqual(err_str, ret.get('kafka'))
+
+    @mock.patch('monasca_log_api.healthcheck.kafka_check.KafkaHealthCheck')
+    def test_should_report_age_of_cached_result(self, kafka_check):
+        kafka_check.healthcheck.return_value = healthcheck.CheckResult(
+            True, 'OK', 2.5)
+        self.resource._kafka_check = kafka_check
+
+        ret = self.simulate_request(ENDPOINT, decode='utf8', method='GET')
+        self.assertEqual(falcon.HTTP_OK, self.srmock.status)
+
+        ret = json.loads(ret)
+        self.assertEqual('OK', ret.get('kafka'))
+        self.assertEqual(2.5, ret.get('kafka_age'))
+
+    def test_should_use_prober_if_interval_set(self):
+        self.assertIsInstance(self.resource._kafka_check, prober.Prober)
+        self.conf.config(probe_interval=0, group='kafka_healthcheck')
+        self.assertIsInstance(healthchecks.HealthChecks()._kafka_check,
+                              healthcheck.KafkaHealthCheck)
+
+    @mock.patch('monasca_log_api.healthcheck.kafka_check.KafkaHealthCheck')
+    def test_should_report_unhealthy_if_publisher_saturated(self,
+                                                            kafka_check):
+        kafka_check.healthcheck.return_value = healthcheck.CheckResult(True,
+                                                                       'OK')
+        self.resource._kafka_check = kafka_check
+        self.resource._publisher_check = publisher = mock.Mock()
+        publisher.stats.return_value = {'in_flight': 10}
+        publisher.healthcheck.return_value = healthcheck.CheckResult(
+            False, 'Publisher: 10 batches in flight')
+
+        ret = self.simulate_request(ENDPOINT, decode='utf8', method='GET')
+        self.assertEqual(falcon.HTTP_SERVICE_UNAVAILABLE, self.srmock.status)
+
+        ret = json.loads(ret)
+        self.assertEqual('OK', ret.get('kafka'))
+        self.assertEqual('Publisher: 10 batches in flight',
+                         ret.get('publisher'))
+        self.assertEqual({'in_flight': 10}, ret.get('publisher_stats'))
+
+    @mock.patch('monasca_log_api.healthcheck.kafka_check.KafkaHealthCheck')
+    def test_should_trust_publisher_over_kafka_check(self, kafka_check):
+        kafka_check.healthcheck.return_value = healthcheck.CheckResult(
+            False, 'Kafka: healthcheck pending')
+        self.resource._kafka_check = kafka_check
+        self.resource._publisher_check = publisher = mock.Mock()
+        publisher.stats.return_value = {}
+        publisher.healthcheck.return_value = healthcheck.CheckResult(True,
+                                                                     'OK')
+
+        self.simulate_request(ENDPOINT, method='GET')
+        self.assertEqual(falcon.HTTP_OK, self.srmock.status)
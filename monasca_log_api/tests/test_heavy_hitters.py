@@ -0,0 +1,211 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import json
+
+import falcon
+from falcon import testing
+import mock
+from oslotest import base as os_test
+
+from monasca_log_api.monitoring import heavy_hitters
+from monasca_log_api.reference.common import log_publisher
+from monasca_log_api.reference.common import model
+from monasca_log_api.reference import heavy_hitters as heavy_hitters_resource
+from monasca_log_api.tests import base
+
+ENDPOINT = '/heavy_hitters'
+
+
+class TestSpaceSaving(os_test.BaseTestCase):
+
+    def test_should_count_exactly_below_capacity(self):
+        sketch = heavy_hitters.SpaceSaving(3)
+        for key in ('a', 'b', 'a', 'c', 'a'):
+            sketch.offer(key)
+
+        self.assertEqual([('a', 3, 0), ('b', 1, 0), ('c', 1, 0)],
+                         sorted(sketch.top(), key=lambda i: (-i[1], i[0])))
+        self.assertEqual(5, sketch.total)
+
+    def test_should_replace_lightest_key(self):
+        sketch = heavy_hitters.SpaceSaving(2)
+        sketch.offer('a', 10)
+        sketch.offer('b', 2)
+        sketch.offer('c', 1)
+
+        self.assertEqual([('a', 10, 0), ('c', 3, 2)], sketch.top())
+
+    def test_should_keep_heavy_hitter(self):
+        sketch = heavy_hitters.SpaceSaving(5)
+        for i in range(1000):
+            sketch.offer('noisy')
+            sketch.offer('quiet-%d' % i)
+
+        self.assertEqual('noisy', sketch.top(1)[0][0])
+        self.assertEqual(5, len(sketch.top()))
+
+    def test_should_replace_lightest_key_after_updates(self):
+        sketch = heavy_hitters.SpaceSaving(3)
+        for key, weight in (('a', 1), ('b', 2), ('c', 3), ('a', 5),
+                            ('b', 5), ('d', 1)):
+            sketch.offer(key, weight)
+
+        self.assertEqual([('b', 7, 0), ('a', 6, 0), ('d', 4, 3)],
+                         sketch.top())
+        self.assertEqual(3, len(sketch._heap))
+
+
+@mock.patch('monasca_log_api.monitoring.heavy_hitters.timeutils')
+class TestAccounting(os_test.BaseTestCase):
+
+    def _accounting(self, timeutils, top_n=1):
+        timeutils.now.return_value = 0
+        self.statsd = mock.Mock()
+        return heavy_hitters.Accounting(capacity=10, window=60,
+                                        top_n=top_n, statsd=self.statsd)
+
+    def test_should_account_tenant_and_dimensions(self, timeutils):
+        accounting = self._accounting(timeutils)
+        accounting.record('t1', {'component': 'nova', 'hostname': 'h1'}, 10)
+        accounting.record('t1', {'component': 'nova'}, 20)
+        accounting.record('t2', None, 5)
+
+        current = accounting.report()['current']
+
+        self.assertEqual([{'key': 't1', 'value': 2, 'error': 0},
+                          {'key': 't2', 'value': 1, 'error': 0}],
+                         current['tenant']['logs']['top'])
+        self.assertEqual(35, current['tenant']['bytes']['total'])
+        self.assertEqual(30, current['component']['bytes']['top'][0]['value'])
+        self.assertEqual(1, current['hostname']['logs']['total'])
+
+    def test_should_report_top_n_when_window_ends(self, timeutils):
+        accounting = self._accounting(timeutils)
+        gauge = self.statsd.get_gauge.return_value
+        accounting.record('t1', {}, 10)
+        accounting.record('t1', {}, 10)
+        accounting.record('t2', {}, 10)
+        self.assertFalse(gauge.send.called)
+
+        timeutils.now.return_value = 60
+        accounting.record('t3', {}, 10)
+
+        gauge.send.assert_any_call(name=None, value=2,
+                                   dimensions={'by': 'tenant', 'key': 't1'})
+        gauge.send.assert_any_call(name=None, value=20,
+                                   dimensions={'by': 'tenant', 'key': 't1'})
+        self.assertEqual(2, gauge.send.call_count)
+
+        report = accounting.report()
+        self.assertEqual(1, report['current']['tenant']['logs']['total'])
+        self.assertEqual(3, report['previous']['tenant']['logs']['total'])
+
+    def test_should_report_without_new_logs(self, timeutils):
+        accounting = self._accounting(timeutils)
+        gauge = self.statsd.get_gauge.return_value
+        accounting.record('t1', {}, 10)
+
+        accounting.rotate()
+        self.assertFalse(gauge.send.called)
+
+        timeutils.now.return_value = 60
+        accounting.rotate()
+        self.assertEqual(2, gauge.send.call_count)
+        self.assertEqual(
+            1, accounting.report()['previous']['tenant']['logs']['total'])
+
+    @mock.patch('monasca_log_api.monitoring.heavy_hitters.time')
+    def test_should_rotate_periodically(self, time, timeutils):
+        accounting = self._accounting(timeutils)
+        timeutils.now.return_value = 45
+        time.sleep.side_effect = [None, RuntimeError]
+
+        with mock.patch.object(accounting, 'rotate') as rotate:
+            self.assertRaises(RuntimeError,
+                              accounting._rotate_periodically)
+
+        time.sleep.assert_any_call(15)
+        rotate.assert_called_once_with()
+
+    def test_should_limit_report(self, timeutils):
+        accounting = self._accounting(timeutils)
+        for tenant in ('t1', 't2', 't3'):
+            accounting.record(tenant, {}, 1)
+
+        report = accounting.report(limit=2)
+
+        self.assertEqual(2, len(report['current']['tenant']['logs']['top']))
+        self.assertIsNone(report['previous'])
+
+
+class TestLogPublisherAccounting(os_test.BaseTestCase):
+
+    def setUp(self):
+        super(TestLogPublisherAccounting, self).setUp()
+        self.conf = base.mock_config(self)
+
+    @mock.patch('monasca_log_api.reference.common.log_publisher.producer'
+                '.KafkaProducer')
+    def test_should_not_account_if_disabled(self, _):
+        self.assertIsNone(log_publisher.LogPublisher()._accounting)
+
+    @mock.patch('monasca_log_api.reference.common.log_publisher'
+                '.heavy_hitters')
+    @mock.patch('monasca_log_api.reference.common.log_publisher.producer'
+                '.KafkaProducer')
+    def test_should_account_transformed_message(self, _, hh):
+        accounting = hh.get_accounting.return_value
+        instance = log_publisher.LogPublisher()
+        envelope = model.Envelope.new_envelope(
+            log={'message': 'test', 'dimensions': {'hostname': 'h1'}},
+            tenant_id='t1',
+            region='pl'
+        )
+
+        msg = instance._transform_message(envelope)
+
+        accounting.record.assert_called_once_with('t1', {'hostname': 'h1'},
+                                                  len(msg))
+
+
+class TestHeavyHitters(testing.TestBase):
+
+    def before(self):
+        self.conf = base.mock_config(self)
+        self.resource = heavy_hitters_resource.HeavyHitters()
+        self.api.add_route(ENDPOINT, self.resource)
+
+    def test_should_forbid_non_admin_request(self):
+        self.simulate_request(ENDPOINT, method='GET')
+        self.assertEqual(falcon.HTTP_403, self.srmock.status)
+
+    @mock.patch('monasca_log_api.reference.heavy_hitters.role_middleware')
+    def test_should_return_not_found_if_disabled(self, rm):
+        rm.is_admin_request.return_value = True
+        self.simulate_request(ENDPOINT, method='GET')
+        self.assertEqual(falcon.HTTP_404, self.srmock.status)
+
+    @mock.patch('monasca_log_api.reference.heavy_hitters.role_middleware')
+    def test_should_return_report(self, rm):
+        rm.is_admin_request.return_value = True
+        self.resource._accounting = accounting = mock.Mock()
+        accounting.report.return_value = {'window': 60}
+
+        ret = self.simulate_request(ENDPOINT, method='GET',
+                                    query_string='limit=5', decode='utf8')
+
+        self.assertEqual(falcon.HTTP_OK, self.srmock.status)
+        self.assertEqual({'window': 60}, json.loads(ret))
+        accounting.report.assert_called_once_with(5)
@@ -0,0 +1,108 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import json
+
+import mock
+from oslotest import base as os_test
+
+from monasca_log_api.reference.common import interning
+from monasca_log_api.reference.v3.common import helpers
+from monasca_log_api.tests import base
+
+
+def _decode(dimensions):
+    # decoding creates new instances of strings every time
+    return json.loads(json.dumps(dimensions))
+
+
+class TestInterner(os_test.BaseTestCase):
+
+    def test_should_share_strings_across_requests(self):
+        interner = interning.Interner(max_size=100, max_length=64)
+        first, hits, misses = interner.intern_dimensions(
+            _decode({'hostname': 'devstack'}))
+        second, hits, misses = interner.intern_dimensions(
+            _decode({'hostname': 'devstack'}))
+
+        self.assertEqual({'hostname': 'devstack'}, second)
+        self.assertIs(list(first)[0], list(second)[0])
+        self.assertIs(first['hostname'], second['hostname'])
+        self.assertEqual((2, 0), (hits, misses))
+
+    def test_should_not_intern_long_strings(self):
+        interner = interning.Interner(max_size=100, max_length=4)
+        value = _decode('x' * 5)
+        self.assertIs(value, interner.intern(value))
+        self.assertEqual(0, len(interner))
+
+    def test_should_leave_invalid_dimensions(self):
+        interner = interning.Interner(max_size=100, max_length=64)
+        dimensions = {'hostname': ['a']}
+        self.assertEqual((dimensions, 0, 0),
+                         interner.intern_dimensions(dimensions))
+        self.assertEqual(('a', 0, 0), interner.intern_dimensions('a'))
+        self.assertEqual(1, interner.intern(1))
+
+    def test_should_bound_pool_size(self):
+        interner = interning.Interner(max_size=4, max_length=64)
+        for i in range(10):
+            interner.intern('value-%d' % i)
+        self.assertLessEqual(len(interner), 4)
+
+    def test_should_keep_frequent_strings(self):
+        interner = interning.Interner(max_size=4, max_length=64)
+        frequent = interner.intern(_decode('frequent'))
+        for i in range(10):
+            interner.intern('value-%d' % i)
+            self.assertIs(frequent, interner.intern(_decode('frequent')))
+
+    def test_should_intern_bulk_and_report_hit_rate(self):
+        counter = mock.Mock()
+        interner = interning.Interner(max_size=100, max_length=64,
+                                      counter=counter)
+        body = {'dimensions': {'hostname': 'h1'},
+                'logs': [{'message': 'a', 'dimensions': {'hostname': 'h1'}},
+                         {'message': 'b'},
+                         'invalid']}
+
+        interner.intern_bulk(body)
+
+        self.assertIs(body['dimensions']['hostname'],
+                      body['logs'][0]['dimensions']['hostname'])
+        counter.increment.assert_has_calls([
+            mock.call(value=2, dimensions={'result': 'hit'}),
+            mock.call(value=2, dimensions={'result': 'miss'})
+        ])
+
+
+class TestGetInterner(os_test.BaseTestCase):
+
+    def setUp(self):
+        super(TestGetInterner, self).setUp()
+        self.conf = base.mock_config(self)
+        patcher = mock.patch.object(interning, '_INTERNER', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_should_return_none_if_disabled(self):
+        self.conf.config(enabled=False, group='interning')
+        self.assertIsNone(interning.get_interner())
+
+    def test_should_intern_decoded_body(self):
+        interner = interning.get_interner()
+        body = helpers.decode_json_msg_body(
+            '{"dimensions": {"hostname": "h1"}}', interner)
+        self.assertEqual({'dimensions': {'hostname': 'h1'}}, body)
+        self.assertEqual(2, len(interner))
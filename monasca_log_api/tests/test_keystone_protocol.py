@@ -32,6 +32,15 @@ class TestKeystoneProtocol(base.BaseTestCase):
 
         self.assertIsNone(ret_val)
 
+    def test_should_return_none_if_metrics(self):
+        instance = keystone_protocol.SkippingAuthProtocol(_APP, _CONF)
+        request = mock.Mock()
+        request.path = '/metrics'
+
+        ret_val = instance.process_request(request)
+
+        self.assertIsNone(ret_val)
+
     @mock.patch('keystonemiddleware.auth_token.AuthProtocol.process_request')
     def test_should_enter_keystone_auth_if_not_healthcheck(self, proc_request):
         instance = keystone_protocol.SkippingAuthProtocol(_APP, _CONF)
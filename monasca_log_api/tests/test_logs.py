@@ -171,8 +171,7 @@ class TestLogs(testing.TestBase):
             headers={
                 headers.X_ROLES.name: logs_api.MONITORING_DELEGATE_ROLE,
                 headers.X_DIMENSIONS.name: '',
-                'Content-Type': 'application/json',
-                'Content-Length': '0'
+                'Content-Type': 'application/json'
             },
             body='{"message":"test"}'
         )
@@ -273,3 +272,71 @@ class TestLogs(testing.TestBase):
             }
         )
         self.assertEqual(falcon.HTTP_411, self.srmock.status)
+
+
+@mock.patch('monasca_log_api.reference.common.log_publisher.producer.'
+            'KafkaProducer')
+class TestLogsSplitPlainText(testing.TestBase):
+
+    api_class = base.MockedAPI
+
+    def before(self):
+        self.conf = base.mock_config(self)
+        self.conf.config(split_plain_text=True, group='service')
+
+    def _post(self, body, content_type='text/plain'):
+        self.simulate_request(
+            '/log/single',
+            method='POST',
+            body=body,
+            headers={
+                headers.X_ROLES.name: 'some_role',
+                headers.X_TENANT_ID.name: 't1',
+                headers.X_DIMENSIONS.name: 'hostname:h1',
+                headers.X_APPLICATION_TYPE.name: 'nova',
+                'Content-Type': content_type,
+                'Content-Length': str(len(body))
+            }
+        )
+
+    def test_should_publish_lines_as_bulk(self, _):
+        resource = _init_resource(self)
+        resource._processor = mock.Mock()
+
+        self._post('first\nsecond\n  continued\n\nthird\n')
+
+        self.assertEqual(falcon.HTTP_204, self.srmock.status)
+        kwargs = resource._processor.send_message.call_args[1]
+        self.assertEqual(['first', 'second\n  continued', 'third'],
+                         [log['message'] for log in kwargs['logs']])
+        self.assertEqual({'hostname': 'h1', 'component': 'nova'},
+                         kwargs['global_dimensions'])
+
+    def test_should_publish_envelopes_of_each_line(self, kafka_producer):
+        resource = _init_resource(self)
+
+        self._post('first\nsecond\n')
+
+        self.assertEqual(falcon.HTTP_204, self.srmock.status)
+        sent = resource._processor._kafka_publisher.publish.call_args[0][1]
+        self.assertEqual(2, len(sent))
+
+    def test_should_not_split_json(self, _):
+        resource = _init_resource(self)
+        resource._processor = mock.Mock()
+        resource._kafka_publisher = mock.Mock()
+
+        self._post('{"message": "a\\nb"}', content_type='application/json')
+
+        self.assertEqual(falcon.HTTP_204, self.srmock.status)
+        resource._processor.send_message.assert_not_called()
+        self.assertEqual(1, resource._kafka_publisher.send_message.call_count)
+
+    def test_should_reject_blank_body(self, _):
+        resource = _init_resource(self)
+        resource._processor = mock.Mock()
+
+        self._post('\n  \n')
+
+        self.assertEqual(falcon.HTTP_422, self.srmock.status)
+        resource._processor.send_message.assert_not_called()
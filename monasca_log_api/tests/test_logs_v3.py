@@ -204,3 +204,29 @@ class TestLogsMonitoring(testing.TestBase):
         self.assertEqual(1, size_gauge.call_count)
         self.assertEqual(content_length,
                          size_gauge.mock_calls[0][2]['value'])
+
+    def test_should_report_server_timing_if_enabled(self, __, _):
+        conf = base.mock_config(self)
+        conf.config(sample_rate=1.0, server_timing_header=True,
+                    group='stage_timing')
+        _init_resource(self)
+
+        v3_body, _ = _generate_v3_payload(3)
+        payload = json.dumps(v3_body)
+
+        self.simulate_request(
+            ENDPOINT,
+            method='POST',
+            headers={
+                headers.X_ROLES.name: logs_api.MONITORING_DELEGATE_ROLE,
+                headers.X_TENANT_ID.name: TENANT_ID,
+                'Content-Type': 'application/json',
+                'Content-Length': str(len(payload))
+            },
+            body=payload
+        )
+
+        server_timing = self.srmock.headers_dict['Server-Timing']
+        for stage in ('validate_request', 'read', 'decode', 'validate',
+                      'envelope', 'serialize', 'produce'):
+            self.assertIn('%s;dur=' % stage, server_timing)
@@ -13,9 +13,10 @@
 # under the License.
 
 import mock
-
+from oslo_config import fixture as oo_cfg
 from oslotest import base
 
+from monasca_log_api.monitoring import aggregator
 from monasca_log_api.monitoring import client
 
 
@@ -50,3 +51,22 @@ class TestMonitoring(base.BaseTestCase):
 
         self.assertEqual(1, statsd_client.call_count)
         self.assertEqual(expected_dimensions, actual_dimensions)
+
+    @mock.patch('monasca_log_api.monitoring.client.monascastatsd')
+    def test_should_not_aggregate_by_default(self, monascastatsd):
+        statsd_client = client.get_client()
+        self.assertEqual(monascastatsd.Client.return_value, statsd_client)
+
+    @mock.patch('monasca_log_api.monitoring.client.aggregator.'
+                'flush_periodically')
+    @mock.patch('monasca_log_api.monitoring.client.monascastatsd')
+    def test_should_aggregate_if_enabled(self, monascastatsd,
+                                         flush_periodically):
+        conf = self.useFixture(oo_cfg.Config())
+        conf.config(aggregate=True, aggregation_interval=5,
+                    group='monitoring')
+
+        statsd_client = client.get_client()
+
+        self.assertIsInstance(statsd_client, aggregator.AggregatingClient)
+        flush_periodically.assert_called_once_with(statsd_client)
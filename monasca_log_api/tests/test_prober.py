@@ -0,0 +1,105 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import threading
+
+import mock
+from oslotest import base as os_test
+
+from monasca_log_api.healthcheck import kafka_check
+from monasca_log_api.healthcheck import prober
+
+
+class TestProber(os_test.BaseTestCase):
+
+    def setUp(self):
+        super(TestProber, self).setUp()
+        self.check = mock.Mock()
+        self.check.healthcheck.return_value = kafka_check.CheckResult(
+            healthy=True, message='OK')
+
+    @mock.patch('monasca_log_api.healthcheck.prober.threading.Thread')
+    def test_should_probe_synchronously_on_first_healthcheck(self, thread):
+        instance = prober.Prober(self.check, 10)
+
+        result = instance.healthcheck()
+
+        self.assertTrue(result.healthy)
+        self.assertEqual('OK', result.message)
+        self.assertEqual(1, thread.return_value.start.call_count)
+        self.assertEqual(1, self.check.healthcheck.call_count)
+
+    @mock.patch('monasca_log_api.healthcheck.prober.timeutils')
+    @mock.patch('monasca_log_api.healthcheck.prober.threading.Thread')
+    def test_should_serve_cached_result_with_age(self, thread, timeutils):
+        instance = prober.Prober(self.check, 10)
+        timeutils.now.return_value = 100
+        instance.healthcheck()
+
+        timeutils.now.return_value = 104
+        for _ in range(3):
+            result = instance.healthcheck()
+
+        self.assertTrue(result.healthy)
+        self.assertEqual('OK', result.message)
+        self.assertEqual(4, result.age)
+        self.assertEqual(1, self.check.healthcheck.call_count)
+        self.assertEqual(1, thread.call_count)
+
+    @mock.patch('monasca_log_api.healthcheck.prober.timeutils')
+    @mock.patch('monasca_log_api.healthcheck.prober.threading.Thread')
+    def test_should_report_stale_result(self, _, timeutils):
+        instance = prober.Prober(self.check, 10)
+        timeutils.now.return_value = 0
+        instance.healthcheck()
+
+        timeutils.now.return_value = 31
+        result = instance.healthcheck()
+
+        self.assertFalse(result.healthy)
+        self.assertIn('stale', result.message)
+
+    def test_should_report_failing_check(self):
+        self.check.healthcheck.side_effect = Exception('boom')
+        instance = prober.Prober(self.check, 10)
+
+        result = instance.healthcheck()
+
+        self.assertFalse(result.healthy)
+        self.assertIn('boom', result.message)
+
+    @mock.patch('monasca_log_api.healthcheck.prober.os')
+    @mock.patch('monasca_log_api.healthcheck.prober.threading.Thread')
+    def test_should_restart_thread_after_fork(self, thread, os):
+        instance = prober.Prober(self.check, 10)
+
+        os.getpid.return_value = 1
+        instance.healthcheck()
+        instance.healthcheck()
+        os.getpid.return_value = 2
+        instance.healthcheck()
+
+        self.assertEqual(2, thread.return_value.start.call_count)
+        self.assertEqual(2, self.check.healthcheck.call_count)
+
+    def test_should_probe_in_background(self):
+        probed = threading.Event()
+        self.check.healthcheck.side_effect = (
+            lambda: (self.check.healthcheck.call_count > 1 and
+                     probed.set()) or kafka_check.CheckResult(True, 'OK'))
+        instance = prober.Prober(self.check, 0.01)
+
+        instance.healthcheck()
+
+        self.assertTrue(probed.wait(5))
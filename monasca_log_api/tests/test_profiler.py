@@ -0,0 +1,221 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import signal
+import threading
+import time
+
+import falcon
+from falcon import testing
+import fixtures
+import mock
+from oslotest import base as os_test
+
+from monasca_log_api.monitoring import profiler
+from monasca_log_api.reference import profiler as profiler_resource
+from monasca_log_api.tests import base
+
+ENDPOINT = '/profiler'
+
+
+def busy_handler(duration):
+    end_time = time.time() + duration
+    while time.time() < end_time:
+        pass
+
+
+class _SlowResource(object):
+
+    def on_get(self, req, res):
+        busy_handler(0.3)
+        res.status = falcon.HTTP_204
+
+
+class TestStackSampler(os_test.BaseTestCase):
+
+    def test_should_sample_main_thread_with_signal(self):
+        previous_handler = signal.getsignal(signal.SIGALRM)
+        done = []
+
+        profiler.StackSampler(0.001, done.append).start(0.2)
+        busy_handler(0.3)
+
+        self.assertEqual(previous_handler, signal.getsignal(signal.SIGALRM))
+        rendered = profiler.StackSampler.render(done[0])
+        self.assertIn('test_profiler.py:busy_handler', rendered)
+
+    def test_should_sample_other_threads_in_thread(self):
+        stop = threading.Event()
+        done = threading.Event()
+        result = []
+
+        def busy_worker():
+            stop.wait(5)
+
+        def on_done(stacks):
+            result.append(stacks)
+            done.set()
+
+        worker = threading.Thread(target=busy_worker)
+        worker.start()
+        starter = threading.Thread(
+            target=profiler.StackSampler(0.001, on_done).start,
+            args=(0.05,))
+        try:
+            starter.start()
+            starter.join()
+            done.wait(5)
+        finally:
+            stop.set()
+            worker.join()
+
+        rendered = profiler.StackSampler.render(result[0])
+
+        self.assertIn('test_profiler.py:busy_worker', rendered)
+        self.assertNotIn('_sample_threads', rendered)
+
+
+class TestOneShotProfile(os_test.BaseTestCase):
+
+    def test_should_not_profile_if_not_armed(self):
+        one_shot = profiler.OneShotProfile()
+        self.assertIsNone(one_shot.take())
+
+    def test_should_profile_single_request(self):
+        one_shot = profiler.OneShotProfile()
+        hook = profiler.ProfilingHook(one_shot, skip_path=ENDPOINT)
+        result = []
+        one_shot.arm(5, result.append)
+
+        req = mock.Mock(path='/v3.0/logs', env={})
+        hook.process_request(req, None)
+        self.assertFalse(one_shot.armed)
+        self.assertRaises(profiler.ProfilerBusyException,
+                          one_shot.arm, 5, result.append)
+        hook.process_response(req, None, None)
+
+        self.assertIn('cumulative', result[0])
+        self.assertNotIn(profiler._PROFILE_ENV_KEY, req.env)
+        one_shot.arm(5, result.append)
+
+    @mock.patch('monasca_log_api.monitoring.profiler.timeutils')
+    def test_should_not_profile_once_expired(self, timeutils):
+        timeutils.now.return_value = 0
+        one_shot = profiler.OneShotProfile()
+        one_shot.arm(5, mock.Mock())
+
+        self.assertRaises(profiler.ProfilerBusyException,
+                          one_shot.arm, 5, mock.Mock())
+        timeutils.now.return_value = 5
+        self.assertIsNone(one_shot.take())
+
+
+class TestProfiler(testing.TestBase):
+
+    def before(self):
+        self.conf = base.mock_config(self)
+        self.report_dir = self.useFixture(fixtures.TempDir()).path
+        self.conf.config(report_dir=self.report_dir, group='profiler')
+        self.resource = profiler_resource.Profiler()
+        self.resource._one_shot = profiler.OneShotProfile()
+        self.api = falcon.API(middleware=[profiler.ProfilingHook(
+            self.resource._one_shot, skip_path=ENDPOINT)])
+        self.api.add_route(ENDPOINT, self.resource)
+        self.api.add_route('/slow', _SlowResource())
+
+    def _start(self, query_string):
+        name = self.simulate_request(ENDPOINT, method='POST',
+                                     query_string=query_string,
+                                     decode='utf8')
+        self.assertEqual(falcon.HTTP_202, self.srmock.status)
+        return name
+
+    def _report(self, name, timeout=5):
+        end_time = time.time() + timeout
+        while (profiler.read_report(name) is None and
+               time.time() < end_time):
+            time.sleep(0.01)
+        return self.simulate_request(ENDPOINT, method='GET',
+                                     query_string='report=%s' % name,
+                                     decode='utf8')
+
+    def test_should_forbid_non_admin_request(self):
+        self.simulate_request(ENDPOINT, method='POST')
+        self.assertEqual(falcon.HTTP_403, self.srmock.status)
+        self.simulate_request(ENDPOINT, method='GET',
+                              query_string='report=sample-1-1.txt')
+        self.assertEqual(falcon.HTTP_403, self.srmock.status)
+
+    @mock.patch('monasca_log_api.reference.profiler.role_middleware')
+    def test_should_reject_unknown_mode(self, rm):
+        rm.is_admin_request.return_value = True
+        self.simulate_request(ENDPOINT, method='POST',
+                              query_string='mode=foo')
+        self.assertEqual(falcon.HTTP_400, self.srmock.status)
+
+    @mock.patch('monasca_log_api.reference.profiler.role_middleware')
+    def test_should_reject_too_long_duration(self, rm):
+        rm.is_admin_request.return_value = True
+        self.conf.config(max_duration=5, group='profiler')
+        self.simulate_request(ENDPOINT, method='POST',
+                              query_string='duration=6')
+        self.assertEqual(falcon.HTTP_400, self.srmock.status)
+
+    @mock.patch('monasca_log_api.reference.profiler.role_middleware')
+    def test_should_sample_request_served_meanwhile(self, rm):
+        rm.is_admin_request.return_value = True
+
+        name = self._start('duration=1&interval=1')
+        self.simulate_request('/slow', method='GET')
+        self.assertEqual(falcon.HTTP_204, self.srmock.status)
+        report = self._report(name)
+
+        self.assertEqual(falcon.HTTP_OK, self.srmock.status)
+        self.assertIn('test_profiler.py:on_get;test_profiler.py:'
+                      'busy_handler', report)
+        self.assertTrue(self.resource._sampling_lock.acquire(False))
+
+    @mock.patch('monasca_log_api.reference.profiler.role_middleware')
+    def test_should_profile_request_served_meanwhile(self, rm):
+        rm.is_admin_request.return_value = True
+
+        name = self._start('mode=cprofile&duration=5')
+        self.simulate_request('/slow', method='GET')
+        report = self._report(name)
+
+        self.assertEqual(falcon.HTTP_OK, self.srmock.status)
+        self.assertIn('cumulative', report)
+        self.assertIn('busy_handler', report)
+
+    @mock.patch('monasca_log_api.reference.profiler.role_middleware')
+    def test_should_return_conflict_if_sampling(self, rm):
+        rm.is_admin_request.return_value = True
+        self.resource._sampling_lock.acquire()
+        try:
+            self.simulate_request(ENDPOINT, method='POST')
+        finally:
+            self.resource._sampling_lock.release()
+        self.assertEqual(falcon.HTTP_409, self.srmock.status)
+
+    @mock.patch('monasca_log_api.reference.profiler.role_middleware')
+    def test_should_return_not_found_if_no_report(self, rm):
+        rm.is_admin_request.return_value = True
+
+        self.simulate_request(ENDPOINT, method='GET',
+                              query_string='report=cprofile-1-1.txt')
+        self.assertEqual(falcon.HTTP_404, self.srmock.status)
+
+        self.simulate_request(ENDPOINT, method='GET',
+                              query_string='report=../../etc/passwd')
+        self.assertEqual(falcon.HTTP_404, self.srmock.status)
@@ -0,0 +1,171 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import json
+import os
+
+import falcon
+from falcon import testing
+import fixtures
+import mock
+from oslotest import base as os_test
+
+from monasca_log_api.monitoring import prometheus
+from monasca_log_api.reference import metrics
+from monasca_log_api.tests import base
+
+ENDPOINT = '/metrics'
+
+
+class TestRegistry(os_test.BaseTestCase):
+
+    def setUp(self):
+        super(TestRegistry, self).setUp()
+        self.conf = base.mock_config(self)
+        self.registry = prometheus.Registry()
+
+    def test_should_render_counter(self):
+        counter = self.registry.counter('foo_total', 'Foo',
+                                        labels={'version': 'v3.0'})
+        counter.inc()
+        counter.inc(2)
+
+        rendered = self.registry.render()
+
+        self.assertIn('# HELP foo_total Foo', rendered)
+        self.assertIn('# TYPE foo_total counter', rendered)
+        self.assertIn('foo_total{version="v3.0"} 3', rendered)
+
+    def test_should_render_cumulative_histogram(self):
+        histogram = self.registry.histogram('bar', 'Bar', buckets=(1, 10))
+        for value in (0.5, 1, 5, 50):
+            histogram.observe(value)
+
+        rendered = self.registry.render().splitlines()
+
+        self.assertIn('bar_bucket{le="1.0"} 2', rendered)
+        self.assertIn('bar_bucket{le="10.0"} 3', rendered)
+        self.assertIn('bar_bucket{le="+Inf"} 4', rendered)
+        self.assertIn('bar_sum 56.5', rendered)
+        self.assertIn('bar_count 4', rendered)
+
+    def test_should_time_block(self):
+        histogram = self.registry.histogram('baz', 'Baz', buckets=(1,))
+        with histogram.time():
+            pass
+        self.assertIn('baz_count 1', self.registry.render())
+
+    def test_should_share_family_between_labels(self):
+        self.registry.counter('foo_total', 'Foo', {'version': 'v2.0'}).inc()
+        self.registry.counter('foo_total', 'Foo', {'version': 'v3.0'}).inc()
+
+        rendered = self.registry.render()
+
+        self.assertEqual(1, rendered.count('# TYPE foo_total'))
+        self.assertIn('foo_total{version="v2.0"} 1', rendered)
+        self.assertIn('foo_total{version="v3.0"} 1', rendered)
+
+    def test_should_not_allow_changing_type(self):
+        self.registry.counter('foo', 'Foo')
+        self.assertRaises(ValueError,
+                          self.registry.histogram, 'foo', 'Foo', (1,))
+
+    def test_should_aggregate_metrics_of_all_workers(self):
+        mp_dir = self.useFixture(fixtures.TempDir()).path
+        self.conf.config(multiprocess_dir=mp_dir, group='prometheus')
+
+        self.registry.counter('foo_total', 'Foo').inc(2)
+        self.registry.histogram('bar', 'Bar', buckets=(1,)).observe(0.5)
+
+        other_worker = prometheus.Registry()
+        other_worker.counter('foo_total', 'Foo').inc(3)
+        other_worker.histogram('bar', 'Bar', buckets=(1,)).observe(5)
+        with open(os.path.join(mp_dir, 'metrics_1.json'), 'w') as f:
+            json.dump(other_worker.snapshot(), f)
+
+        rendered = self.registry.render().splitlines()
+
+        self.assertTrue(os.path.exists(
+            os.path.join(mp_dir, 'metrics_%d.json' % os.getpid())))
+        self.assertIn('foo_total 5', rendered)
+        self.assertIn('bar_bucket{le="1.0"} 1', rendered)
+        self.assertIn('bar_count 2', rendered)
+
+    @mock.patch('monasca_log_api.monitoring.prometheus._is_alive')
+    def test_should_remove_dumps_of_gone_workers(self, is_alive):
+        mp_dir = self.useFixture(fixtures.TempDir()).path
+        self.conf.config(multiprocess_dir=mp_dir, group='prometheus')
+        is_alive.side_effect = lambda pid: pid != 1
+        gone_worker = prometheus.Registry()
+        gone_worker.counter('foo_total', 'Foo').inc(3)
+        gone_path = os.path.join(mp_dir, 'metrics_1.json')
+        with open(gone_path, 'w') as f:
+            json.dump(gone_worker.snapshot(), f)
+        self.registry.counter('foo_total', 'Foo').inc(2)
+
+        rendered = self.registry.render().splitlines()
+
+        self.assertIn('foo_total 2', rendered)
+        self.assertFalse(os.path.exists(gone_path))
+
+    @mock.patch('monasca_log_api.monitoring.prometheus.atexit')
+    @mock.patch('monasca_log_api.monitoring.prometheus.threading.Thread')
+    def test_should_dump_periodically(self, thread, atexit):
+        mp_dir = self.useFixture(fixtures.TempDir()).path
+        self.conf.config(multiprocess_dir=mp_dir, dump_interval=5,
+                         group='prometheus')
+        path = os.path.join(mp_dir, 'metrics_%d.json' % os.getpid())
+        with open(path, 'w') as f:
+            f.write('{}')
+
+        self.registry.start_dumping()
+
+        self.assertFalse(os.path.exists(path))
+        thread.assert_called_once_with(
+            target=self.registry._dump_periodically, args=(5,))
+        atexit.register.assert_called_once_with(self.registry.remove_dump)
+
+        with mock.patch('monasca_log_api.monitoring.prometheus.time.sleep',
+                        side_effect=[None, RuntimeError]):
+            self.assertRaises(RuntimeError,
+                              self.registry._dump_periodically, 5)
+        self.assertTrue(os.path.exists(path))
+
+        self.registry.remove_dump()
+        self.assertFalse(os.path.exists(path))
+
+    def test_should_not_dump_without_multiprocess_dir(self):
+        with mock.patch('monasca_log_api.monitoring.prometheus.threading.'
+                        'Thread') as thread:
+            self.registry.start_dumping()
+        self.assertFalse(thread.called)
+
+
+class TestMetrics(testing.TestBase):
+
+    def before(self):
+        self.conf = base.mock_config(self)
+        self.resource = metrics.Metrics()
+        self.api.add_route(ENDPOINT, self.resource)
+
+    def test_should_return_metrics(self):
+        self.resource._registry = registry = prometheus.Registry()
+        registry.counter('foo_total', 'Foo').inc()
+
+        ret = self.simulate_request(ENDPOINT, method='GET', decode='utf8')
+
+        self.assertEqual(falcon.HTTP_OK, self.srmock.status)
+        self.assertEqual(prometheus.CONTENT_TYPE,
+                         self.srmock.headers_dict['Content-Type'])
+        self.assertIn('foo_total 1', ret)
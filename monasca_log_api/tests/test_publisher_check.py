@@ -0,0 +1,174 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import math
+
+import mock
+from oslotest import base as os_test
+
+from monasca_log_api.healthcheck import publisher_check
+from monasca_log_api.reference.common import log_publisher
+from monasca_log_api.tests import base
+
+
+@mock.patch('monasca_log_api.healthcheck.publisher_check.timeutils')
+class TestPublisherStats(os_test.BaseTestCase):
+
+    def setUp(self):
+        super(TestPublisherStats, self).setUp()
+        self.conf = base.mock_config(self)
+        self.conf.config(window=60, group='publisher_healthcheck')
+
+    def _stats(self, timeutils):
+        timeutils.now.return_value = 0
+        return publisher_check.PublisherStats()
+
+    def test_should_track_in_flight_batches(self, timeutils):
+        stats = self._stats(timeutils)
+
+        start_time = stats.begin(10)
+        stats.begin(5)
+        snapshot = stats.snapshot()
+        self.assertEqual(2, snapshot['in_flight'])
+        self.assertEqual(15, snapshot['queue_depth'])
+
+        stats.end(start_time, 10)
+        snapshot = stats.snapshot()
+        self.assertEqual(1, snapshot['in_flight'])
+        self.assertEqual(5, snapshot['queue_depth'])
+
+    def test_should_calculate_success_rate_and_last_error(self, timeutils):
+        stats = self._stats(timeutils)
+        for error in (None, None, None, ValueError('boom')):
+            stats.end(stats.begin(1), 1, error)
+
+        timeutils.now.return_value = 5
+        snapshot = stats.snapshot()
+
+        self.assertEqual(0.75, snapshot['success_rate'])
+        self.assertEqual(3, snapshot['published'])
+        self.assertEqual(1, snapshot['failed'])
+        self.assertIn('boom', snapshot['last_error'])
+        self.assertEqual(5, snapshot['last_error_age'])
+
+    def test_should_forget_old_windows(self, timeutils):
+        stats = self._stats(timeutils)
+        stats.end(stats.begin(1), 1, ValueError())
+
+        timeutils.now.return_value = 70
+        self.assertEqual(0.0, stats.snapshot()['success_rate'])
+
+        timeutils.now.return_value = 200
+        self.assertIsNone(stats.snapshot()['success_rate'])
+
+    def test_should_average_latency(self, timeutils):
+        stats = self._stats(timeutils)
+        timeutils.now.side_effect = [0, 1, 1, 3]
+
+        stats.end(stats.begin(1), 1)
+        stats.end(stats.begin(1), 1)
+
+        timeutils.now.side_effect = None
+        timeutils.now.return_value = 3
+        latency = stats.snapshot()['latency']
+        self.assertAlmostEqual(0.2 * 2 + 0.8 * math.exp(-0.2), latency)
+
+    def test_should_decay_latency_if_idle(self, timeutils):
+        stats = self._stats(timeutils)
+        timeutils.now.side_effect = [0, 10]
+        stats.end(stats.begin(1), 1)
+
+        timeutils.now.side_effect = None
+        timeutils.now.return_value = 10
+        self.assertAlmostEqual(10, stats.snapshot()['latency'])
+        timeutils.now.return_value = 40
+        self.assertAlmostEqual(10 * math.exp(-3),
+                               stats.snapshot()['latency'])
+
+
+class TestPublisherHealthCheck(os_test.BaseTestCase):
+
+    def setUp(self):
+        super(TestPublisherHealthCheck, self).setUp()
+        self.conf = base.mock_config(self)
+        self.conf.config(min_success_rate=0.9,
+                         max_in_flight=2,
+                         max_latency=1.0,
+                         group='publisher_healthcheck')
+        self.check = publisher_check.PublisherHealthCheck(mock.Mock())
+
+    @staticmethod
+    def _stats(**kwargs):
+        stats = {
+            'in_flight': 0,
+            'success_rate': 1.0,
+            'latency': 0.1,
+            'last_error': None
+        }
+        stats.update(kwargs)
+        return stats
+
+    def test_should_be_healthy(self):
+        self.assertTrue(self.check.healthcheck(self._stats()).healthy)
+
+    def test_should_be_unknown_if_idle(self):
+        result = self.check.healthcheck(self._stats(success_rate=None,
+                                                    latency=None))
+        self.assertIsNone(result.healthy)
+
+    def test_should_be_unhealthy_if_saturated(self):
+        for stats in (self._stats(in_flight=3),
+                      self._stats(in_flight=3, success_rate=None)):
+            result = self.check.healthcheck(stats)
+            self.assertFalse(result.healthy)
+            self.assertIn('in flight', result.message)
+
+    def test_should_be_unhealthy_if_slow(self):
+        result = self.check.healthcheck(self._stats(latency=1.5))
+        self.assertFalse(result.healthy)
+
+    def test_should_be_unhealthy_if_failing(self):
+        result = self.check.healthcheck(self._stats(success_rate=0.5,
+                                                    last_error='boom'))
+        self.assertFalse(result.healthy)
+        self.assertIn('boom', result.message)
+
+
+@mock.patch('monasca_log_api.reference.common.log_publisher.producer'
+            '.KafkaProducer')
+class TestLogPublisherStats(os_test.BaseTestCase):
+
+    def setUp(self):
+        super(TestLogPublisherStats, self).setUp()
+        self.conf = base.mock_config(self)
+
+    def test_should_record_publishing(self, _):
+        instance = log_publisher.LogPublisher()
+        instance._publisher_stats = stats = mock.Mock()
+        stats.begin.return_value = 1.0
+
+        instance._publish(['a', 'b'])
+
+        stats.begin.assert_called_once_with(2)
+        stats.end.assert_called_once_with(1.0, 2, None)
+
+    def test_should_record_failure(self, _):
+        instance = log_publisher.LogPublisher()
+        instance._publisher_stats = stats = mock.Mock()
+        error = Exception()
+        instance._kafka_publisher.publish.side_effect = error
+
+        self.assertRaises(Exception, instance._publish, ['a'])
+
+        stats.end.assert_called_once_with(stats.begin.return_value, 1, error)
@@ -0,0 +1,179 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import multiprocessing
+import os
+
+import fixtures
+from oslotest import base as os_test
+from webob import request
+
+from monasca_log_api.middleware import rate_limit_middleware as rlm
+from monasca_log_api.tests import base
+
+
+def _create_request(path='/v3.0/logs', method='POST', body=b'{"logs": []}',
+                    tenant_id='abc', dimensions=None):
+    req = request.Request.blank(path)
+    req.method = method
+    req.body = body
+    req.headers['Content-Type'] = 'application/json'
+    if tenant_id:
+        req.headers['X-Tenant-Id'] = tenant_id
+    if dimensions:
+        req.headers['X-Dimensions'] = dimensions
+    return req
+
+
+def _buckets(path=None, requests_rate=1.0, requests_burst=2.0,
+             bytes_rate=0.0, bytes_burst=100.0, slots=64):
+    return rlm.TokenBuckets(slots=slots,
+                            requests_rate=requests_rate,
+                            requests_burst=requests_burst,
+                            bytes_rate=bytes_rate,
+                            bytes_burst=bytes_burst,
+                            path=path)
+
+
+def _consume(path, key, results):
+    results.put(_buckets(path).consume(key, 0, now=100.0))
+
+
+class TestTokenBuckets(os_test.BaseTestCase):
+
+    def test_should_allow_burst_and_reject_afterwards(self):
+        buckets = _buckets()
+        self.assertEqual(0, buckets.consume('abc', 0, now=100.0))
+        self.assertEqual(0, buckets.consume('abc', 0, now=100.0))
+        self.assertAlmostEqual(1.0, buckets.consume('abc', 0, now=100.0))
+
+    def test_should_refill_tokens(self):
+        buckets = _buckets()
+        buckets.consume('abc', 0, now=100.0)
+        buckets.consume('abc', 0, now=100.0)
+        self.assertAlmostEqual(0.5, buckets.consume('abc', 0, now=100.5))
+        self.assertEqual(0, buckets.consume('abc', 0, now=101.0))
+
+    def test_should_keep_buckets_per_key(self):
+        buckets = _buckets(requests_burst=1.0)
+        self.assertEqual(0, buckets.consume('abc', 0, now=100.0))
+        self.assertEqual(0, buckets.consume('def', 0, now=100.0))
+        self.assertNotEqual(0, buckets.consume('abc', 0, now=100.0))
+
+    def test_should_limit_bytes(self):
+        buckets = _buckets(requests_rate=0.0, bytes_rate=10.0,
+                           bytes_burst=100.0)
+        self.assertEqual(0, buckets.consume('abc', 80, now=100.0))
+        self.assertAlmostEqual(6.0, buckets.consume('abc', 80, now=100.0))
+        self.assertEqual(0, buckets.consume('abc', 80, now=106.0))
+
+    def test_should_not_take_tokens_of_rejected_request(self):
+        buckets = _buckets(requests_rate=10.0, requests_burst=10.0,
+                           bytes_rate=10.0, bytes_burst=100.0)
+        self.assertEqual(0, buckets.consume('abc', 100, now=100.0))
+        self.assertNotEqual(0, buckets.consume('abc', 100, now=100.0))
+        self.assertEqual(0, buckets.consume('abc', 0, now=100.0))
+
+    def test_should_reject_request_bigger_than_burst(self):
+        buckets = _buckets(requests_rate=0.0, bytes_rate=10.0,
+                           bytes_burst=100.0)
+        self.assertEqual(rlm.TOO_LARGE,
+                         buckets.consume('abc', 101, now=100.0))
+        self.assertEqual(0, buckets.consume('abc', 100, now=100.0))
+
+    def test_should_reuse_refilled_slot_if_table_is_full(self):
+        buckets = _buckets(slots=rlm._PROBES, requests_burst=1.0)
+        for i in range(rlm._PROBES):
+            buckets.consume('key-%d' % i, 0, now=100.0 + i)
+        self.assertEqual(0, buckets.consume('other', 0, now=200.0))
+        self.assertNotEqual(0, buckets.consume('other', 0, now=200.0))
+
+    def test_should_share_oldest_bucket_if_table_is_busy(self):
+        buckets = _buckets(slots=rlm._PROBES, requests_rate=0.01,
+                           requests_burst=2.0)
+        for i in range(rlm._PROBES):
+            buckets.consume('key-%d' % i, 0, now=100.0 + i)
+        # key-0 has a token left and is not evicted by other key
+        self.assertEqual(0, buckets.consume('other', 0, now=110.0))
+        self.assertNotEqual(0, buckets.consume('key-0', 0, now=110.0))
+
+    def test_should_share_buckets_between_processes(self):
+        path = os.path.join(self.useFixture(fixtures.TempDir()).path,
+                            'buckets')
+        _buckets(path).consume('abc', 0, now=100.0)
+
+        results = multiprocessing.Queue()
+        process = multiprocessing.Process(target=_consume,
+                                          args=(path, 'abc', results))
+        process.start()
+        process.join()
+        self.assertEqual(0, results.get(timeout=5))
+
+        self.assertNotEqual(0, _buckets(path).consume('abc', 0, now=100.0))
+
+
+class TestRateLimitMiddleware(os_test.BaseTestCase):
+
+    def setUp(self):
+        super(TestRateLimitMiddleware, self).setUp()
+        self.conf = base.mock_config(self)
+        self.conf.config(path='', requests_rate=1.0, requests_burst=1.0,
+                         group='rate_limit')
+
+    def test_should_reject_with_retry_after(self):
+        instance = rlm.RateLimitMiddleware(None)
+        self.assertIsNone(instance.process_request(_create_request()))
+
+        res = instance.process_request(_create_request())
+
+        self.assertEqual(429, res.status_code)
+        self.assertEqual('1', res.headers['Retry-After'])
+        self.assertEqual('application/json', res.content_type)
+
+    def test_should_reject_request_bigger_than_burst(self):
+        self.conf.config(bytes_rate=10.0, bytes_burst=5.0,
+                         group='rate_limit')
+        instance = rlm.RateLimitMiddleware(None)
+
+        res = instance.process_request(_create_request())
+
+        self.assertEqual(413, res.status_code)
+        self.assertEqual('application/json', res.content_type)
+
+    def test_should_limit_tenants_separately(self):
+        instance = rlm.RateLimitMiddleware(None)
+        self.assertIsNone(instance.process_request(_create_request()))
+        self.assertIsNone(instance.process_request(
+            _create_request(tenant_id='def')))
+
+    def test_should_skip_other_requests(self):
+        instance = rlm.RateLimitMiddleware(None)
+        for _ in range(3):
+            self.assertIsNone(instance.process_request(
+                _create_request('/healthcheck')))
+            self.assertIsNone(instance.process_request(
+                _create_request(method='GET')))
+            self.assertIsNone(instance.process_request(
+                _create_request(tenant_id=None)))
+
+    def test_should_limit_per_dimension(self):
+        self.conf.config(dimension='hostname', group='rate_limit')
+        instance = rlm.RateLimitMiddleware(None)
+
+        self.assertIsNone(instance.process_request(_create_request(
+            '/v2.0/log/single', dimensions='hostname:a')))
+        self.assertIsNone(instance.process_request(_create_request(
+            '/v2.0/log/single', dimensions='hostname:b')))
+        self.assertIsNotNone(instance.process_request(_create_request(
+            '/v2.0/log/single', dimensions='hostname:a')))
@@ -0,0 +1,355 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import json
+import os
+
+import falcon
+from falcon import testing
+import fixtures
+import mock
+from oslo_config import cfg
+from oslotest import base as os_test
+
+from monasca_log_api.api import headers
+from monasca_log_api.api import logs_api
+from monasca_log_api.reference.common import recent_logs
+from monasca_log_api.reference.common import ring_buffer
+from monasca_log_api.reference.v3.common import helpers
+from monasca_log_api.reference.v3 import logs
+from monasca_log_api.tests import base
+
+ENDPOINT = '/logs'
+
+cfg.CONF.import_group('service', 'monasca_log_api.reference.v2.common.service')
+
+
+def _fill(tenant_logs, count=10):
+    for i in range(count):
+        tenant_logs.record(100.0 + i, 'msg-%d' % i,
+                           {'hostname': 'host-%d' % (i % 2),
+                            'component': 'nova' if i < 5 else 'glance'})
+
+
+def _messages(found):
+    return [message for _, message, _ in found[0]]
+
+
+class TestTenantLogs(os_test.BaseTestCase):
+
+    def test_should_return_newest_first(self):
+        tenant_logs = recent_logs.TenantLogs(100)
+        _fill(tenant_logs)
+
+        found = tenant_logs.query(limit=3)
+
+        self.assertEqual(['msg-9', 'msg-8', 'msg-7'], _messages(found))
+        self.assertTrue(found[1])
+
+    def test_should_return_oldest_first(self):
+        tenant_logs = recent_logs.TenantLogs(100)
+        _fill(tenant_logs)
+
+        found = tenant_logs.query(limit=2, offset=1, ascending=True)
+
+        self.assertEqual(['msg-1', 'msg-2'], _messages(found))
+
+    def test_should_filter_by_dimensions(self):
+        tenant_logs = recent_logs.TenantLogs(100)
+        _fill(tenant_logs)
+
+        found = tenant_logs.query(dimensions={'hostname': ['host-1'],
+                                              'component': ['nova']})
+
+        self.assertEqual(['msg-3', 'msg-1'], _messages(found))
+        self.assertFalse(found[1])
+
+    def test_should_filter_by_any_of_values(self):
+        tenant_logs = recent_logs.TenantLogs(100)
+        _fill(tenant_logs)
+        tenant_logs.record(200.0, 'other', {'hostname': 'host-2'})
+
+        found = tenant_logs.query(
+            dimensions={'hostname': ['host-0', 'host-2']}, limit=3)
+
+        self.assertEqual(['other', 'msg-8', 'msg-6'], _messages(found))
+
+    def test_should_filter_by_dimension_presence(self):
+        tenant_logs = recent_logs.TenantLogs(100)
+        _fill(tenant_logs)
+        tenant_logs.record(200.0, 'other', {'service': 'compute'})
+
+        self.assertEqual(['other'], _messages(
+            tenant_logs.query(dimensions={'service': []})))
+        self.assertEqual([], _messages(
+            tenant_logs.query(dimensions={'path': []})))
+
+    def test_should_filter_by_time_range(self):
+        tenant_logs = recent_logs.TenantLogs(100)
+        _fill(tenant_logs)
+
+        self.assertEqual(['msg-5', 'msg-4', 'msg-3'], _messages(
+            tenant_logs.query(start_time=103.0, end_time=105.0)))
+        self.assertEqual(['msg-4', 'msg-2'], _messages(
+            tenant_logs.query(dimensions={'hostname': ['host-0']},
+                              start_time=101.5, end_time=104.0)))
+        self.assertEqual(['msg-2', 'msg-4'], _messages(
+            tenant_logs.query(dimensions={'hostname': ['host-0']},
+                              start_time=101.5, end_time=104.0,
+                              ascending=True)))
+
+    def test_should_evict_oldest_logs(self):
+        tenant_logs = recent_logs.TenantLogs(4)
+        _fill(tenant_logs)
+
+        self.assertEqual(4, len(tenant_logs))
+        self.assertEqual(['msg-6', 'msg-7', 'msg-8', 'msg-9'], _messages(
+            tenant_logs.query(ascending=True)))
+        self.assertEqual([], _messages(
+            tenant_logs.query(dimensions={'component': ['nova']})))
+        self.assertNotIn(('component', 'nova'), tenant_logs._postings)
+
+    def test_should_compact_storage(self):
+        tenant_logs = recent_logs.TenantLogs(10)
+        count = recent_logs._COMPACT_THRESHOLD * 3
+        _fill(tenant_logs, count)
+
+        self.assertLess(len(tenant_logs._entries), count)
+        self.assertEqual(['msg-%d' % (count - 1)], _messages(
+            tenant_logs.query(dimensions={'hostname': ['host-1']},
+                              limit=1)))
+
+    def test_should_expire_old_logs(self):
+        tenant_logs = recent_logs.TenantLogs(100)
+        _fill(tenant_logs)
+
+        tenant_logs.expire(108.0)
+
+        self.assertEqual(['msg-8', 'msg-9'], _messages(
+            tenant_logs.query(ascending=True)))
+
+
+class TestRecentLogs(os_test.BaseTestCase):
+
+    def test_should_keep_logs_per_tenant(self):
+        store = recent_logs.RecentLogs(capacity=10, max_tenants=10,
+                                       max_age=60)
+        store.record('t1', [{'message': 'a', 'dimensions': {}}])
+        store.record('t2', [{'message': 'b'}])
+
+        self.assertEqual(['a'], _messages(store.query('t1')))
+        self.assertEqual(['b'], _messages(store.query('t2')))
+        self.assertEqual(([], False), store.query('t3'))
+
+    def test_should_evict_least_recent_tenant(self):
+        store = recent_logs.RecentLogs(capacity=10, max_tenants=2,
+                                       max_age=60)
+        for tenant_id in ('t1', 't2', 't1', 't3'):
+            store.record(tenant_id, [{'message': 'msg'}])
+
+        self.assertEqual(2, len(_messages(store.query('t1'))))
+        self.assertEqual([], _messages(store.query('t2')))
+
+    def test_should_evict_oldest_logs_over_byte_budget(self):
+        store = recent_logs.RecentLogs(capacity=10, max_tenants=10,
+                                       max_age=60, max_bytes=10)
+        store.record('t1', [{'message': 'aaa', 'dimensions': {'h': '1'}}])
+        store.record('t2', [{'message': 'bbb'}])
+        self.assertEqual(8, store.size)
+
+        store.record('t2', [{'message': 'ccc'}])
+
+        self.assertEqual([], _messages(store.query('t1')))
+        self.assertEqual(['ccc', 'bbb'], _messages(store.query('t2')))
+        self.assertEqual(6, store.size)
+        self.assertNotIn('t1', store._tenants)
+
+    def test_should_share_logs_through_journal(self):
+        path = os.path.join(self.useFixture(fixtures.TempDir()).path,
+                            'recent')
+
+        def store():
+            journal = ring_buffer.RingBuffer(path, 1024)
+            self.addCleanup(journal.close)
+            return recent_logs.RecentLogs(capacity=10, max_tenants=10,
+                                          max_age=60, journal=journal)
+
+        first, second = store(), store()
+        first.record('t1', [{'message': 'a', 'dimensions': {'h': '1'}}])
+        second.record('t1', [{'message': 'b'}])
+        third = store()
+
+        for instance in (first, second, third):
+            self.assertTrue(instance.shared)
+            self.assertEqual(['b', 'a'], _messages(instance.query('t1')))
+        self.assertEqual(
+            ['a'], _messages(third.query('t1', dimensions={'h': ['1']})))
+
+    def test_should_format_timestamp(self):
+        self.assertEqual('2017-04-11T10:01:02.345Z',
+                         recent_logs.isoformat(1491904862.345678))
+
+
+class TestHelpers(os_test.BaseTestCase):
+
+    def test_should_parse_dimensions_filter(self):
+        self.assertEqual({'a': ['1', '2'], 'b': ['3'], 'c': []},
+                         helpers.parse_dimensions_filter('a:1|2,b:3,c'))
+        self.assertEqual({}, helpers.parse_dimensions_filter(None))
+        self.assertRaises(falcon.HTTPInvalidParam,
+                          helpers.parse_dimensions_filter, ':1')
+
+    def test_should_parse_time_param(self):
+        req = mock.Mock()
+        req.get_param.return_value = '2017-04-11T10:01:02.5Z'
+        self.assertEqual(1491904862.5,
+                         helpers.parse_time_param(req, 'start_time'))
+
+        req.get_param.return_value = 'yesterday'
+        self.assertRaises(falcon.HTTPInvalidParam,
+                          helpers.parse_time_param, req, 'start_time')
+
+
+@mock.patch('monasca_log_api.reference.common.log_publisher.producer.'
+            'KafkaProducer')
+class TestListLogs(testing.TestBase):
+
+    api_class = base.MockedAPI
+
+    def before(self):
+        self.conf = base.mock_config(self)
+        self.path = os.path.join(self.useFixture(fixtures.TempDir()).path,
+                                 'recent')
+        self.conf.config(path=self.path, group='recent_logs')
+        patcher = mock.patch.object(recent_logs, '_RECENT_LOGS', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _resource(self):
+        resource = logs.Logs()
+        self.api.add_route(ENDPOINT, resource)
+        return resource
+
+    def _get(self, query_string='', tenant_id='t1',
+             roles='monasca-user', multiprocess=False):
+        environ = testing.create_environ(
+            ENDPOINT, method='GET', query_string=query_string,
+            headers={headers.X_ROLES.name: roles,
+                     headers.X_TENANT_ID.name: tenant_id})
+        environ['wsgi.multiprocess'] = multiprocess
+        ret = self.api(environ, self.srmock)
+        return json.loads(ret[0].decode('utf8')) if ret else None
+
+    def test_should_return_not_found_if_disabled(self, _):
+        self._resource()
+        self._get()
+        self.assertEqual(falcon.HTTP_404, self.srmock.status)
+
+    def test_should_refuse_listing_if_multiple_workers_not_shared(self, _):
+        self.conf.config(enabled=True, path='', group='recent_logs')
+        self._resource()
+        self._get(multiprocess=True)
+        self.assertEqual(falcon.HTTP_501, self.srmock.status)
+
+    def test_should_list_logs_of_all_workers(self, _):
+        self.conf.config(enabled=True, group='recent_logs')
+        self._resource()
+        journal = ring_buffer.RingBuffer(self.path, 1024)
+        self.addCleanup(journal.close)
+        other_worker = recent_logs.RecentLogs(capacity=10, max_tenants=10,
+                                              max_age=3600, journal=journal)
+        other_worker.record('t1', [{'message': 'hello',
+                                    'dimensions': {'hostname': 'h1'}}])
+
+        body = self._get('dimensions=hostname:h1', multiprocess=True)
+
+        self.assertEqual(falcon.HTTP_OK, self.srmock.status)
+        self.assertEqual(['hello'],
+                         [e['message'] for e in body['elements']])
+
+    def test_should_list_logs(self, _):
+        self.conf.config(enabled=True, group='recent_logs')
+        resource = self._resource()
+        store = resource._recent_logs = recent_logs.RecentLogs(
+            capacity=10, max_tenants=10, max_age=3600)
+        tenant_logs = mock.Mock(size=0)
+        store._tenants['t1'] = tenant_logs
+        tenant_logs.query.return_value = (
+            [(1491904862.345, 'msg', {'hostname': 'h1'})], True)
+
+        body = self._get('dimensions=hostname:h1|h2'
+                         '&start_time=2017-04-11T10:00:00Z'
+                         '&sort_by=timestamp%20asc&offset=2&limit=1')
+
+        self.assertEqual(falcon.HTTP_OK, self.srmock.status)
+        self.assertEqual([{'timestamp': '2017-04-11T10:01:02.345Z',
+                           'message': 'msg',
+                           'dimensions': {'hostname': 'h1'}}],
+                         body['elements'])
+        self.assertEqual(['prev', 'self', 'next'],
+                         [link['rel'] for link in body['links']])
+        self.assertIn('offset=3', body['links'][2]['href'])
+        tenant_logs.query.assert_called_once_with(
+            dimensions={'hostname': ['h1', 'h2']},
+            start_time=1491904800.0, end_time=None,
+            offset=2, limit=1, ascending=True)
+
+    def test_should_list_logs_published_by_worker(self, _):
+        self.conf.config(enabled=True, group='recent_logs')
+        resource = self._resource()
+        resource._processor.send_message(
+            logs=[{'message': 'hello', 'dimensions': {'hostname': 'h1'}}],
+            global_dimensions={'service': 'compute'},
+            log_tenant_id='t1')
+
+        body = self._get('dimensions=hostname:h1')
+        self.assertEqual(['hello'],
+                         [e['message'] for e in body['elements']])
+
+        body = self._get('dimensions=hostname:h1', tenant_id='t2')
+        self.assertEqual([], body['elements'])
+
+    def test_should_filter_by_many_dimensions(self, _):
+        self.conf.config(enabled=True, group='recent_logs')
+        resource = self._resource()
+        resource._processor.send_message(
+            logs=[{'message': 'h1', 'dimensions': {'hostname': 'h1'}},
+                  {'message': 'h2', 'dimensions': {'hostname': 'h2'}},
+                  {'message': 'h1-glance',
+                   'dimensions': {'hostname': 'h1', 'service': 'glance'}}],
+            global_dimensions={'service': 'compute'},
+            log_tenant_id='t1')
+
+        body = self._get('dimensions=hostname:h1,service:compute')
+        self.assertEqual(['h1'], [e['message'] for e in body['elements']])
+
+        body = self._get('dimensions=service:compute,hostname:h1|h2'
+                         '&sort_by=timestamp%20asc')
+        self.assertEqual(['h1', 'h2'],
+                         [e['message'] for e in body['elements']])
+
+    def test_should_reject_cross_tenant_listing(self, _):
+        self.conf.config(enabled=True, group='recent_logs')
+        self._resource()
+        self._get('tenant_id=t2')
+        self.assertEqual(falcon.HTTP_403, self.srmock.status)
+
+        self._get('tenant_id=t2', roles=logs_api.MONITORING_DELEGATE_ROLE)
+        self.assertEqual(falcon.HTTP_OK, self.srmock.status)
+
+    def test_should_reject_invalid_sort_by(self, _):
+        self.conf.config(enabled=True, group='recent_logs')
+        self._resource()
+        self._get('sort_by=message')
+        self.assertEqual(falcon.HTTP_400, self.srmock.status)
@@ -46,6 +46,26 @@ class TestRequest(os_test.BaseTestCase):
         self.assertEqual('333', req.project_id)
         self.assertEqual(['terminator', 'predator'], req.roles)
 
+    @mock.patch('oslo_context.context.RequestContext.from_environ')
+    def test_should_create_context_lazily(self, from_environ):
+        req = request.Request(testing.create_environ(path='/healthcheck'))
+
+        self.assertFalse(from_environ.called)
+
+        self.assertIs(req.context, req.context)
+        self.assertEqual(1, from_environ.call_count)
+
+    def test_should_cache_cross_project_id(self):
+        req = request.Request(
+            testing.create_environ(query_string='tenant_id=444')
+        )
+
+        with mock.patch.object(req, 'get_param',
+                               wraps=req.get_param) as get_param:
+            self.assertEqual('444', req.cross_project_id)
+            self.assertEqual('444', req.cross_project_id)
+            self.assertEqual(1, get_param.call_count)
+
     def test_validate_context_type(self):
         with mock.patch.object(validation,
                                'validate_content_type') as vc_type, \
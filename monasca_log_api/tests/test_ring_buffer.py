@@ -0,0 +1,239 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import multiprocessing
+import os
+
+import falcon
+import fixtures
+import mock
+from oslotest import base as os_test
+
+from monasca_log_api import publisher
+from monasca_log_api.reference.common import log_publisher
+from monasca_log_api.reference.common import ring_buffer
+from monasca_log_api.tests import base
+
+
+def _produce(path, producer_id, count):
+    ring = ring_buffer.RingBuffer(path, 1024 * 1024)
+    for i in range(count):
+        ring.put(['%d-%d' % (producer_id, i)])
+    ring.close()
+
+
+class TestRingBuffer(os_test.BaseTestCase):
+
+    def setUp(self):
+        super(TestRingBuffer, self).setUp()
+        self.path = os.path.join(
+            self.useFixture(fixtures.TempDir()).path, 'ring')
+
+    def _ring(self, size=1024):
+        ring = ring_buffer.RingBuffer(self.path, size)
+        self.addCleanup(ring.close)
+        return ring
+
+    def test_should_peek_and_commit_messages(self):
+        ring = self._ring()
+        ring.put([u'a', b'bb'])
+        ring.put(['ccc'])
+
+        messages, position = ring.peek(2)
+        self.assertEqual([b'a', b'bb'], messages)
+        self.assertEqual(messages, ring.peek(2)[0])
+
+        ring.commit(position)
+        messages, position = ring.peek(10)
+        self.assertEqual([b'ccc'], messages)
+        ring.commit(position)
+        self.assertEqual(0, ring.usage())
+
+    def test_should_follow_journal_with_own_position(self):
+        ring = self._ring()
+        ring.append(['a', 'bb'])
+        start = ring.head()
+        ring.append(['ccc'])
+
+        self.assertEqual(([b'a', b'bb', b'ccc'], ring.head(), False),
+                         ring.read(0))
+        messages, position, skipped = ring.read(start)
+        self.assertEqual([b'ccc'], messages)
+        self.assertFalse(skipped)
+        self.assertEqual(([], position, False), ring.read(position))
+
+    def test_should_evict_oldest_messages_when_appending(self):
+        ring = self._ring(size=64)
+        ring.append(['%010d' % i for i in range(3)])
+        messages, position, _ = ring.read(0)
+
+        ring.append(['%010d' % i for i in range(3, 10)])
+
+        messages, position, skipped = ring.read(position)
+        self.assertTrue(skipped)
+        self.assertEqual([b'%010d' % i for i in range(6, 10)], messages)
+        ring.append(['x' * 100])
+        self.assertEqual([], ring.read(position)[0])
+
+    def test_should_share_messages_between_instances(self):
+        self._ring().put(['a'])
+        self.assertEqual([b'a'], self._ring(size=2048).peek(1)[0])
+        self.assertEqual(1024, self._ring(size=2048).capacity)
+
+    def test_should_limit_bytes_of_batch(self):
+        ring = self._ring()
+        ring.put(['aaa', 'bbb', 'ccc'])
+        self.assertEqual([b'aaa', b'bbb'], ring.peek(10, max_bytes=7)[0])
+
+    def test_should_wrap_around(self):
+        ring = self._ring()
+        message = 'x' * 300
+        for i in range(10):
+            ring.put([message + str(i)])
+            messages, position = ring.peek(10)
+            self.assertEqual([(message + str(i)).encode('utf-8')], messages)
+            ring.commit(position)
+
+    def test_should_reject_all_messages_if_full(self):
+        ring = self._ring()
+        ring.put(['x' * 600])
+        self.assertRaises(ring_buffer.RingBufferFullException,
+                          ring.put, ['y', 'z' * 500])
+        self.assertEqual(1, len(ring.peek(10)[0]))
+
+    def test_should_reject_message_exceeding_capacity(self):
+        self.assertRaises(ring_buffer.RingBufferFullException,
+                          self._ring().put, ['x' * 2000])
+
+    def test_should_allow_single_consumer(self):
+        self._ring().acquire_consumer()
+        self.assertRaises(ring_buffer.RingBufferBusyException,
+                          self._ring().acquire_consumer)
+
+    def test_should_accept_messages_of_many_processes(self):
+        producers = [multiprocessing.Process(target=_produce,
+                                             args=(self.path, i, 50))
+                     for i in range(4)]
+        for p in producers:
+            p.start()
+        for p in producers:
+            p.join()
+
+        messages, _ = self._ring(1024 * 1024).peek(1000)
+        self.assertEqual(set(('%d-%d' % (p, i)).encode('utf-8')
+                             for p in range(4) for i in range(50)),
+                         set(messages))
+        self.assertEqual(200, len(messages))
+
+
+class TestRingPublisher(os_test.BaseTestCase):
+
+    def setUp(self):
+        super(TestRingPublisher, self).setUp()
+        self.ring = mock.Mock()
+        self.kafka = mock.Mock()
+
+    def _publisher(self, batch_size=2, linger=10, max_retries=2):
+        return publisher.RingPublisher(self.ring, self.kafka,
+                                       ['logs', 'audit'], batch_size, linger,
+                                       max_retries)
+
+    def test_should_publish_full_batch_to_all_topics(self):
+        self.ring.peek.return_value = ([b'a', b'b'], 10)
+        self.assertEqual(2, self._publisher().run_once())
+        self.kafka.publish.assert_has_calls([mock.call('logs', [b'a', b'b']),
+                                             mock.call('audit', [b'a', b'b'])])
+        self.ring.commit.assert_called_once_with(10)
+
+    @mock.patch('monasca_log_api.publisher.timeutils')
+    def test_should_linger_with_partial_batch(self, timeutils):
+        timeutils.now.side_effect = [0, 5, 10]
+        self.ring.peek.return_value = ([b'a'], 5)
+        instance = self._publisher()
+
+        self.assertEqual(0, instance.run_once())
+        self.assertEqual(0, instance.run_once())
+        self.kafka.publish.assert_not_called()
+        self.assertEqual(1, instance.run_once())
+        self.ring.commit.assert_called_once_with(5)
+
+    @mock.patch('monasca_log_api.publisher.time')
+    def test_should_not_commit_if_publishing_failed(self, _):
+        self.ring.peek.return_value = ([b'a', b'b'], 10)
+        self.kafka.publish.side_effect = [None, Exception('down')]
+        self.assertEqual(0, self._publisher().run_once())
+        self.ring.commit.assert_not_called()
+
+    @mock.patch('monasca_log_api.publisher.time')
+    def test_should_back_off_with_cap(self, time):
+        self.ring.peek.return_value = ([b'a', b'b'], 10)
+        self.kafka.publish.side_effect = Exception('down')
+        instance = self._publisher(max_retries=7)
+
+        for _ in range(7):
+            self.assertEqual(0, instance.run_once())
+
+        time.sleep.assert_has_calls([mock.call(1), mock.call(2),
+                                     mock.call(4), mock.call(8),
+                                     mock.call(16), mock.call(30),
+                                     mock.call(30)])
+        self.ring.commit.assert_not_called()
+
+    @mock.patch('monasca_log_api.publisher.time')
+    def test_should_drop_message_failing_after_retries(self, _):
+        def publish(topic, messages):
+            if b'poison' in messages:
+                raise Exception('too large')
+
+        self.ring.peek.return_value = ([b'a', b'poison'], 10)
+        self.kafka.publish.side_effect = publish
+        instance = self._publisher(max_retries=2)
+
+        self.assertEqual(0, instance.run_once())
+        self.assertEqual(0, instance.run_once())
+        self.ring.commit.assert_not_called()
+
+        self.assertEqual(1, instance.run_once())
+        self.ring.commit.assert_called_once_with(10)
+        self.kafka.publish.assert_has_calls([mock.call('logs', [b'a']),
+                                             mock.call('audit', [b'a'])])
+
+
+@mock.patch('monasca_log_api.reference.common.log_publisher.producer'
+            '.KafkaProducer')
+class TestLogPublisherRingTransport(os_test.BaseTestCase):
+
+    def setUp(self):
+        super(TestLogPublisherRingTransport, self).setUp()
+        self.conf = base.mock_config(self)
+        self.conf.config(
+            transport=log_publisher.RING_BUFFER_TRANSPORT,
+            group='log_publisher')
+        self.conf.config(
+            path=os.path.join(self.useFixture(fixtures.TempDir()).path,
+                              'ring'),
+            size=1024,
+            group='ring_buffer')
+
+    def test_should_write_to_ring_buffer(self, kafka_producer):
+        instance = log_publisher.LogPublisher()
+        instance._publish(['{"log": 1}'])
+
+        kafka_producer.assert_not_called()
+        self.assertEqual([b'{"log": 1}'], instance._ring_buffer.peek(10)[0])
+
+    def test_should_be_unavailable_if_ring_buffer_full(self, _):
+        instance = log_publisher.LogPublisher()
+        self.assertRaises(falcon.HTTPServiceUnavailable,
+                          instance._publish, ['x' * 2000])
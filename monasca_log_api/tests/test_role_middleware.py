@@ -329,3 +329,61 @@ class RolesMiddlewareLogicTest(base.BaseTestCase):
 
         self.assertIn('Failed to authenticate request for', message)
         self.assertEqual(401, status)
+
+
+class RolesMiddlewareAdminPathTest(base.BaseTestCase):
+
+    def _create_instance(self):
+        instance = rm.RoleMiddleware(None)
+        instance._path = ['/']
+        instance._default_roles = ['monasca-user']
+        instance._agent_roles = ['monasca-agent']
+        instance._admin_path = ['/profiler']
+        instance._admin_roles = ['monasca-log-api-admin']
+        return instance
+
+    @staticmethod
+    def _create_request(roles, path='/profiler'):
+        req = mock.Mock()
+        req.method = 'GET'
+        req.path = path
+        req.environ = {}
+        req.headers = {
+            rm._X_IDENTITY_STATUS: rm._CONFIRMED_STATUS,
+            rm._X_ROLES: roles,
+            'X-Tenant-Id': '11111111'
+        }
+        return req
+
+    def test_should_not_treat_any_path_as_admin_by_default(self):
+        instance = rm.RoleMiddleware(None)
+        req = self._create_request('monasca-user')
+        self.assertFalse(instance._is_admin_path(req))
+
+    def test_should_authorize_admin(self):
+        instance = self._create_instance()
+        req = self._create_request('monasca-log-api-admin')
+
+        self.assertIsNone(instance.process_request(req))
+        self.assertTrue(rm.is_admin_request(req.environ))
+        self.assertFalse(rm.is_agent_request(req.environ))
+
+    def test_should_reject_default_and_agent_roles(self):
+        instance = self._create_instance()
+
+        for roles in ('monasca-user', 'monasca-agent'):
+            req = self._create_request(roles)
+            result = instance.process_request(req)
+
+            self.assertIsInstance(result, response.Response)
+            self.assertEqual(401, result.status_code)
+            self.assertFalse(rm.is_admin_request(req.environ))
+
+    def test_should_not_mark_regular_path_as_admin(self):
+        instance = self._create_instance()
+        req = self._create_request('monasca-log-api-admin,monasca-agent',
+                                   path='/v3.0/logs')
+
+        self.assertIsNone(instance.process_request(req))
+        self.assertFalse(rm.is_admin_request(req.environ))
+        self.assertTrue(rm.is_agent_request(req.environ))
@@ -415,6 +415,133 @@ class LogsCreatorNewLog(os_test.BaseTestCase):
         ))
 
 
+class LogCreatorHeadersCache(os_test.BaseTestCase):
+    def setUp(self):
+        super(LogCreatorHeadersCache, self).setUp()
+        self.conf = base.mock_config(self)
+
+    def _new_log(self, instance, dimensions='hostname:devstack',
+                 app_type='monasca'):
+        payload = mock.Mock()
+        payload.read.return_value = u'Hello World'
+        return instance.new_log(application_type=app_type,
+                                dimensions=dimensions,
+                                payload=payload,
+                                content_type='text/plain')
+
+    def test_should_share_validated_dimensions(self):
+        instance = common_service.LogCreator()
+
+        first = self._new_log(instance)
+        second = self._new_log(instance)
+        other = self._new_log(instance, app_type='other')
+
+        self.assertIs(first['dimensions'], second['dimensions'])
+        self.assertEqual({'hostname': 'devstack', 'component': 'other'},
+                         other['dimensions'])
+        self.assertRaises(TypeError, first['dimensions'].update, {})
+        self.assertRaises(TypeError, first['dimensions'].__setitem__,
+                          'a', 'b')
+
+    @mock.patch('monasca_log_api.reference.v2.common.service.'
+                'parse_dimensions')
+    def test_should_parse_header_once(self, parse_dimensions):
+        parse_dimensions.return_value = {'hostname': 'devstack'}
+        instance = common_service.LogCreator()
+
+        for _ in range(3):
+            self._new_log(instance)
+
+        parse_dimensions.assert_called_once_with('hostname:devstack')
+
+    def test_should_not_cache_invalid_headers(self):
+        instance = common_service.LogCreator()
+        for _ in range(2):
+            self.assertRaises(exceptions.HTTPUnprocessableEntity,
+                              self._new_log, instance, 'hostname')
+        self.assertEqual(0, len(instance._dimensions))
+
+    def test_should_not_cache_if_disabled(self):
+        self.conf.config(headers_cache_size=0, group='service')
+        instance = common_service.LogCreator()
+
+        first = self._new_log(instance)
+        second = self._new_log(instance)
+
+        self.assertEqual(first['dimensions'], second['dimensions'])
+        self.assertIsNot(first['dimensions'], second['dimensions'])
+
+    def test_should_evict_least_recently_used(self):
+        cache = common_service.LRUCache(2)
+        for key in ('a', 'b', 'a', 'c'):
+            cache.get_or_create(key, lambda k: k.upper())
+
+        factory = mock.Mock(return_value='B')
+        cache.get_or_create('a', factory)
+        cache.get_or_create('b', factory)
+
+        factory.assert_called_once_with('b')
+        self.assertEqual(2, len(cache))
+
+
+class SplitLines(os_test.BaseTestCase):
+    def setUp(self):
+        super(SplitLines, self).setUp()
+        self.conf = base.mock_config(self)
+
+    def _continuation(self):
+        return common_service.compile_patterns(
+            common_service.CONF.service.continuation_patterns)
+
+    def test_should_split_lines(self):
+        self.assertEqual(['a', 'b'],
+                         common_service.split_lines('a\r\n\nb\n'))
+
+    def test_should_reassemble_stack_trace(self):
+        text = ('ERROR failed\n'
+                'Traceback (most recent call last):\n'
+                '  File "a.py", line 1, in <module>\n'
+                'ValueError: boom\n'
+                'Exception in thread "main" java.lang.Error\n'
+                '\tat Main.main(Main.java:1)\n'
+                'Caused by: java.lang.Error\n'
+                'INFO done')
+
+        messages = common_service.split_lines(text, self._continuation())
+
+        self.assertEqual([
+            'ERROR failed\n'
+            'Traceback (most recent call last):\n'
+            '  File "a.py", line 1, in <module>',
+            'ValueError: boom',
+            'Exception in thread "main" java.lang.Error\n'
+            '\tat Main.main(Main.java:1)\n'
+            'Caused by: java.lang.Error',
+            'INFO done'
+        ], messages)
+
+    def test_should_not_continue_first_line(self):
+        self.assertEqual(['  indented', 'b'], common_service.split_lines(
+            '  indented\nb', self._continuation()))
+
+    def test_should_compile_no_patterns(self):
+        self.assertIsNone(common_service.compile_patterns([]))
+
+    def test_should_create_logs_sharing_dimensions(self):
+        payload = mock.Mock()
+        payload.read.return_value = u'a\nb'
+
+        logs, dimensions = common_service.LogCreator().new_logs(
+            application_type='nova',
+            dimensions='hostname:h1',
+            payload=payload)
+
+        self.assertEqual([{'message': 'a', 'dimensions': {}},
+                          {'message': 'b', 'dimensions': {}}], logs)
+        self.assertEqual({'hostname': 'h1', 'component': 'nova'},
+                         dimensions)
+
+
 class LogCreatorNewEnvelope(os_test.BaseTestCase):
     def setUp(self):
         super(LogCreatorNewEnvelope, self).setUp()
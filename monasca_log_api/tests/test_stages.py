@@ -0,0 +1,92 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import mock
+from oslotest import base as os_test
+
+from monasca_log_api.monitoring import stages
+from monasca_log_api.tests import base
+
+
+class TestStageTimer(os_test.BaseTestCase):
+
+    @mock.patch('monasca_log_api.monitoring.stages.timeutils')
+    def test_should_accumulate_stage_durations(self, timeutils):
+        timeutils.now.side_effect = [0, 1, 1, 3, 10, 14]
+        timer = stages.StageTimer()
+
+        for stage in ('read', 'validate', 'validate'):
+            with timer.stage(stage):
+                pass
+
+        self.assertEqual(['read', 'validate'], list(timer.durations))
+        self.assertEqual(1, timer.durations['read'])
+        self.assertEqual(6, timer.durations['validate'])
+        self.assertEqual('read;dur=1000.000, validate;dur=6000.000',
+                         timer.server_timing())
+
+    def test_null_timer_should_not_measure(self):
+        with stages.NULL_TIMER.stage('read'):
+            pass
+        self.assertEqual({}, stages.NULL_TIMER.durations)
+
+
+class TestStageTimers(os_test.BaseTestCase):
+
+    def setUp(self):
+        super(TestStageTimers, self).setUp()
+        self.conf = base.mock_config(self)
+        self.statsd = mock.Mock()
+        self.timers = stages.StageTimers(statsd=self.statsd,
+                                         dimensions={'version': 'v3.0'})
+
+    def test_should_not_sample_by_default(self):
+        self.assertIs(stages.NULL_TIMER, self.timers.start())
+
+    def test_should_sample_if_enabled(self):
+        self.conf.config(sample_rate=1.0, group='stage_timing')
+        self.assertIsInstance(self.timers.start(), stages.StageTimer)
+
+    def test_should_report_durations(self):
+        self.conf.config(sample_rate=1.0, group='stage_timing')
+        timer = self.timers.start()
+        with timer.stage(stages.READ):
+            pass
+        res = mock.Mock()
+
+        self.timers.report(timer, res)
+
+        statsd_timer = self.statsd.get_timer.return_value
+        self.assertEqual(1, statsd_timer.timing.call_count)
+        self.assertEqual({'stage': stages.READ},
+                         statsd_timer.timing.call_args[1]['dimensions'])
+        self.assertFalse(res.append_header.called)
+
+    def test_should_add_server_timing_header_if_enabled(self):
+        self.conf.config(sample_rate=1.0, server_timing_header=True,
+                         group='stage_timing')
+        timer = self.timers.start()
+        with timer.stage(stages.READ):
+            pass
+        res = mock.Mock()
+
+        self.timers.report(timer, res)
+
+        res.append_header.assert_called_once_with(
+            stages.SERVER_TIMING_HEADER, timer.server_timing())
+
+    def test_should_not_report_null_timer(self):
+        self.timers.report(stages.NULL_TIMER, mock.Mock())
+        statsd_timer = self.statsd.get_timer.return_value
+        self.assertFalse(statsd_timer.timing.called)
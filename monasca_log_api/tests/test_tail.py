@@ -0,0 +1,329 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import collections
+import json
+import os
+import threading
+
+import falcon
+from falcon import testing
+import fixtures
+import mock
+from oslo_config import cfg
+from oslotest import base as os_test
+
+from monasca_log_api.api import headers
+from monasca_log_api.reference.common import ring_buffer
+from monasca_log_api.reference.common import tail
+from monasca_log_api.reference import tail as tail_resource
+from monasca_log_api.reference.v3 import logs
+from monasca_log_api.tests import base
+
+ENDPOINT = '/logs/tail'
+
+cfg.CONF.import_group('service', 'monasca_log_api.reference.v2.common.service')
+
+
+def _log(message, **dimensions):
+    return {'message': message, 'dimensions': dimensions}
+
+
+def _events(body):
+    events = []
+    for chunk in body.strip().split('\n\n'):
+        lines = dict(line.split(': ', 1) for line in chunk.split('\n'))
+        events.append((lines.get('event'), lines.get('data')))
+    return events
+
+
+class TestCompileFilter(os_test.BaseTestCase):
+
+    def test_should_match_everything_without_dimensions(self):
+        self.assertTrue(tail.compile_filter({})({}))
+        self.assertTrue(tail.compile_filter(None)({'a': '1'}))
+
+    def test_should_match_any_of_values(self):
+        matches = tail.compile_filter({'hostname': ['h1', 'h2'],
+                                       'component': []})
+        self.assertTrue(matches({'hostname': 'h2', 'component': 'nova'}))
+        self.assertFalse(matches({'hostname': 'h3', 'component': 'nova'}))
+        self.assertFalse(matches({'hostname': 'h1'}))
+
+
+class TestTailHub(os_test.BaseTestCase):
+
+    def test_should_deliver_matching_logs_of_tenant(self):
+        hub = tail.TailHub(buffer_size=10, max_subscribers=10)
+        subscription = hub.subscribe('t1', {'hostname': ['h1']})
+
+        hub.publish('t1', [_log('a', hostname='h1'),
+                           _log('b', hostname='h2')])
+        hub.publish('t2', [_log('c', hostname='h1')])
+
+        self.assertEqual(['a'], [message for _, message, _
+                                 in subscription.poll(0)])
+        self.assertEqual([], subscription.poll(0))
+
+    def test_should_drop_oldest_logs_if_buffer_is_full(self):
+        hub = tail.TailHub(buffer_size=2, max_subscribers=10)
+        subscription = hub.subscribe('t1')
+
+        hub.publish('t1', [_log('a'), _log('b'), _log('c')])
+
+        self.assertEqual(['b', 'c'], [message for _, message, _
+                                      in subscription.poll(0)])
+        self.assertEqual(1, subscription.take_dropped())
+        self.assertEqual(0, subscription.take_dropped())
+
+    def test_should_count_dropped_logs_offered_concurrently(self):
+        subscription = tail.Subscription('t1', None, buffer_size=1)
+
+        def offer():
+            for _ in range(1000):
+                subscription.offer(0, _log('a'))
+
+        threads = [threading.Thread(target=offer) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(3999, subscription.take_dropped())
+        self.assertEqual(1, len(subscription.poll(0)))
+
+    def test_should_limit_subscribers(self):
+        hub = tail.TailHub(buffer_size=2, max_subscribers=1)
+        subscription = hub.subscribe('t1')
+        self.assertRaises(tail.TooManySubscribersException,
+                          hub.subscribe, 't2')
+
+        hub.unsubscribe(subscription)
+        hub.unsubscribe(subscription)
+        hub.subscribe('t2')
+        self.assertEqual(['t2'], list(hub._subscribers))
+
+    def test_should_not_touch_logs_without_subscribers(self):
+        hub = tail.TailHub(buffer_size=2, max_subscribers=1)
+        log_element = mock.Mock()
+        hub.publish('t1', [log_element])
+        log_element.get.assert_not_called()
+
+
+class TestSharedTailHub(os_test.BaseTestCase):
+
+    def setUp(self):
+        super(TestSharedTailHub, self).setUp()
+        self.path = os.path.join(self.useFixture(fixtures.TempDir()).path,
+                                 'tail')
+
+    def _hub(self):
+        hub = tail.TailHub(buffer_size=10, max_subscribers=10,
+                           journal=ring_buffer.RingBuffer(self.path, 4096),
+                           watch=tail.Watch(self.path + '.watched'))
+        self.addCleanup(hub.close)
+        return hub
+
+    @mock.patch.object(tail.TailHub, '_ensure_reading')
+    def test_should_deliver_logs_published_by_other_worker(self, _):
+        worker, other_worker = self._hub(), self._hub()
+        subscription = worker.subscribe('t1', {'hostname': ['h1']})
+        position = worker._journal.head()
+
+        other_worker.publish('t1', [_log('a', hostname='h1'),
+                                    _log('b', hostname='h2')])
+        other_worker.publish('t2', [_log('c', hostname='h1')])
+        worker.read_journal(position)
+
+        self.assertTrue(worker.shared)
+        self.assertEqual(['a'], [message for _, message, _
+                                 in subscription.poll(0)])
+
+    def test_should_not_journal_logs_if_nobody_watches(self):
+        hub = self._hub()
+        log_element = mock.Mock()
+        hub.publish('t1', [log_element])
+        log_element.get.assert_not_called()
+        self.assertEqual(0, hub._journal.head())
+
+    def test_should_read_journal_in_background(self):
+        worker, other_worker = self._hub(), self._hub()
+        subscription = worker.subscribe('t1')
+
+        other_worker.publish('t1', [_log('a')])
+
+        self.assertEqual(['a'], [message for _, message, _
+                                 in subscription.poll(5)])
+        worker.unsubscribe(subscription)
+
+
+@mock.patch('monasca_log_api.reference.common.log_publisher.producer.'
+            'KafkaProducer')
+class TestTail(testing.TestBase):
+
+    api_class = base.MockedAPI
+
+    def before(self):
+        self.conf = base.mock_config(self)
+        self.path = os.path.join(self.useFixture(fixtures.TempDir()).path,
+                                 'tail')
+        self.conf.config(path=self.path, group='tail')
+        patcher = mock.patch.object(tail, '_HUB', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _resource(self):
+        resource = tail_resource.Tail()
+        self.api.add_route(ENDPOINT, resource)
+        return resource
+
+    def _get(self, query_string='', tenant_id='t1',
+             roles='monasca-user', multiprocess=False, multithread=True):
+        environ = testing.create_environ(
+            ENDPOINT, method='GET', query_string=query_string,
+            headers={headers.X_ROLES.name: roles,
+                     headers.X_TENANT_ID.name: tenant_id})
+        environ['wsgi.multiprocess'] = multiprocess
+        environ['wsgi.multithread'] = multithread
+        ret = self.api(environ, self.srmock)
+        return b''.join(ret).decode('utf8')
+
+    def test_should_return_not_found_if_disabled(self, _):
+        self._resource()
+        self._get()
+        self.assertEqual(falcon.HTTP_404, self.srmock.status)
+
+    def test_should_refuse_if_multiple_workers_not_shared(self, _):
+        self.conf.config(enabled=True, path='', group='tail')
+        self._resource()
+        self._get(multiprocess=True)
+        self.assertEqual(falcon.HTTP_501, self.srmock.status)
+
+    def test_should_stream_logs_of_all_workers(self, _):
+        self.conf.config(enabled=True, group='tail')
+        resource = self._resource()
+        hub = resource._hub
+        self.addCleanup(hub.close)
+        other_worker = tail.TailHub(
+            buffer_size=10, max_subscribers=10,
+            journal=ring_buffer.RingBuffer(self.path, 4096),
+            watch=tail.Watch(self.path + '.watched'))
+        self.addCleanup(other_worker.close)
+
+        def subscribe(tenant_id, dimensions):
+            subscription = tail.TailHub.subscribe(hub, tenant_id,
+                                                  dimensions)
+            other_worker.publish('t1', [_log('hello', hostname='h1')])
+            return subscription
+
+        with mock.patch.object(hub, 'subscribe', side_effect=subscribe), \
+                mock.patch.object(tail_resource, 'timeutils') as timeutils:
+            timeutils.now.side_effect = [0, 0, 10000]
+            body = self._get('dimensions=hostname:h1', multiprocess=True)
+
+        self.assertEqual(falcon.HTTP_200, self.srmock.status)
+        self.assertEqual(['hello'], [json.loads(data)['message']
+                                     for _, data in _events(body)])
+
+    @mock.patch('monasca_log_api.reference.tail.green')
+    def test_should_refuse_if_worker_is_single_threaded(self, green, _):
+        self.conf.config(enabled=True, group='tail')
+        self._resource()
+        green.is_patched.return_value = False
+        self._get(multithread=False)
+        self.assertEqual(falcon.HTTP_501, self.srmock.status)
+
+        green.is_patched.return_value = True
+        with mock.patch.object(tail_resource.Tail, '_events',
+                               return_value=iter([b''])):
+            self._get(multithread=False)
+        self.assertEqual(falcon.HTTP_200, self.srmock.status)
+
+    def test_should_stream_logs_published_by_worker(self, _):
+        self.conf.config(enabled=True, group='tail')
+        resource = self._resource()
+        processor = logs.Logs()._processor
+        hub = resource._hub
+
+        def subscribe(tenant_id, dimensions):
+            subscription = tail.TailHub.subscribe(hub, tenant_id,
+                                                  dimensions)
+            processor.send_message(
+                logs=[_log('hello', hostname='h1'),
+                      _log('skipped', hostname='h2')],
+                global_dimensions={'service': 'compute'},
+                log_tenant_id='t1')
+            return subscription
+
+        with mock.patch.object(hub, 'subscribe', side_effect=subscribe), \
+                mock.patch.object(tail_resource, 'timeutils') as timeutils:
+            timeutils.now.side_effect = [0, 0, 10000]
+            body = self._get('dimensions=hostname:h1')
+
+        self.assertEqual(falcon.HTTP_OK, self.srmock.status)
+        self.assertIn(('content-type', 'text/event-stream'),
+                      self.srmock.headers)
+        events = _events(body)
+        self.assertEqual(1, len(events))
+        self.assertEqual({'message': 'hello',
+                          'dimensions': {'hostname': 'h1',
+                                         'service': 'compute'}},
+                         {key: value for key, value
+                          in json.loads(events[0][1]).items()
+                          if key != 'timestamp'})
+        self.assertEqual({}, hub._subscribers)
+
+    def test_should_filter_by_many_dimensions(self, _):
+        self.conf.config(enabled=True, group='tail')
+        resource = self._resource()
+
+        with mock.patch.object(resource._hub, 'subscribe') as subscribe, \
+                mock.patch.object(tail_resource.Tail, '_events',
+                                  return_value=iter([b''])):
+            self._get('dimensions=hostname:h1|h2,service:compute')
+
+        self.assertEqual(falcon.HTTP_200, self.srmock.status)
+        subscribe.assert_called_once_with(
+            't1', {'hostname': ['h1', 'h2'], 'service': ['compute']})
+
+    def test_should_report_dropped_logs(self, _):
+        self.conf.config(enabled=True, group='tail')
+        resource = self._resource()
+        subscription = resource._hub.subscribe('t1')
+        subscription._buffer = collections.deque(maxlen=1)
+        subscription.offer(0, _log('a'))
+        subscription.offer(0, _log('b'))
+
+        events = resource._events(subscription)
+
+        event = next(events)
+        self.assertIn(b'event: dropped\ndata: {"count": 1}', event)
+        self.assertIn(b'"message": "b"', event)
+        events.close()
+        self.assertEqual({}, resource._hub._subscribers)
+
+    def test_should_reject_cross_tenant_tail(self, _):
+        self.conf.config(enabled=True, group='tail')
+        self._resource()
+        self._get('tenant_id=t2')
+        self.assertEqual(falcon.HTTP_403, self.srmock.status)
+
+    def test_should_reject_if_too_many_subscribers(self, _):
+        self.conf.config(enabled=True, max_subscribers=1, group='tail')
+        resource = self._resource()
+        resource._hub.subscribe('t2')
+
+        self._get()
+
+        self.assertEqual(falcon.HTTP_503, self.srmock.status)
@@ -80,8 +80,7 @@ class SameV2V3Output(testing.TestBase):
                 headers.X_DIMENSIONS.name: v2_dimensions,
                 headers.X_APPLICATION_TYPE.name: component,
                 headers.X_TENANT_ID.name: tenant_id,
-                'Content-Type': 'application/json',
-                'Content-Length': '100'
+                'Content-Type': 'application/json'
             },
             body=json.dumps(v2_body)
         )
@@ -92,8 +91,7 @@ class SameV2V3Output(testing.TestBase):
             headers={
                 headers.X_ROLES.name: logs_api.MONITORING_DELEGATE_ROLE,
                 headers.X_TENANT_ID.name: tenant_id,
-                'Content-Type': 'application/json',
-                'Content-Length': '100'
+                'Content-Type': 'application/json'
             },
             body=json.dumps(v3_body)
         )
@@ -0,0 +1,103 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from oslotest import base as os_test
+from webob import request
+
+from monasca_log_api.middleware import validation_middleware as vm
+from monasca_log_api.reference.v2.common import service  # noqa
+from monasca_log_api.tests import base
+
+
+def _create_request(path, method='POST', content_type='application/json',
+                    content_length=10):
+    req = request.Request.blank(path)
+    req.method = method
+    if content_type is not None:
+        req.headers['Content-Type'] = content_type
+    if content_length is not None:
+        req.headers['Content-Length'] = str(content_length)
+    return req
+
+
+class TestValidationMiddleware(os_test.BaseTestCase):
+
+    def setUp(self):
+        super(TestValidationMiddleware, self).setUp()
+        self.conf = base.mock_config(self)
+        self.instance = vm.ValidationMiddleware(None)
+
+    def test_should_skip_not_logs_path(self):
+        req = _create_request('/healthcheck', method='GET',
+                              content_type=None, content_length=None)
+        self.assertIsNone(self.instance.process_request(req))
+
+    def test_should_skip_options_request(self):
+        req = _create_request('/v3.0/logs', method='OPTIONS',
+                              content_type=None, content_length=None)
+        self.assertIsNone(self.instance.process_request(req))
+
+    def test_should_pass_valid_request(self):
+        for path, content_type in (('/v2.0/log/single', 'text/plain'),
+                                   ('/v2.0/log/single', 'application/json'),
+                                   ('/v3.0/logs', 'application/json'),
+                                   ('/v3.0/logs/', 'application/json')):
+            req = _create_request(path, content_type=content_type)
+            self.assertIsNone(self.instance.process_request(req))
+
+    def test_should_reject_not_allowed_method(self):
+        req = _create_request('/v2.0/log/single', method='GET')
+        res = self.instance.process_request(req)
+
+        self.assertEqual(405, res.status_code)
+        self.assertEqual('POST', res.headers['Allow'])
+
+        req = _create_request('/v3.0/logs', method='PUT')
+        res = self.instance.process_request(req)
+
+        self.assertEqual(405, res.status_code)
+        self.assertEqual('GET, POST', res.headers['Allow'])
+
+    def test_should_pass_listing_request_without_body(self):
+        req = _create_request('/v3.0/logs', method='GET',
+                              content_type=None, content_length=None)
+        self.assertIsNone(self.instance.process_request(req))
+
+    def test_should_reject_missing_content_type(self):
+        req = _create_request('/v3.0/logs', content_type=None)
+        res = self.instance.process_request(req)
+
+        self.assertEqual(400, res.status_code)
+
+    def test_should_reject_unsupported_content_type(self):
+        req = _create_request('/v3.0/logs', content_type='text/plain')
+        res = self.instance.process_request(req)
+
+        self.assertEqual(415, res.status_code)
+        self.assertEqual('application/json', res.content_type)
+
+    def test_should_reject_missing_content_length(self):
+        req = _create_request('/v2.0/log/single', content_length=None)
+        res = self.instance.process_request(req)
+
+        self.assertEqual(411, res.status_code)
+
+    def test_should_reject_too_big_payload(self):
+        self.conf.config(max_log_size=100, group='service')
+
+        req = _create_request('/v3.0/logs', content_length=100)
+        res = self.instance.process_request(req)
+
+        self.assertEqual(413, res.status_code)
+        self.assertIn('title', res.json_body)
@@ -1,3 +1,7 @@
 V2_LOGS_URI = '/v2.0/log/single'
 V3_LOGS_URI = '/v3.0/logs'
 HEALTHCHECK_URI = '/healthcheck'
+METRICS_URI = '/metrics'
+PROFILER_URI = '/profiler'
+HEAVY_HITTERS_URI = '/heavy_hitters'
+V3_LOGS_TAIL_URI = '/v3.0/logs/tail'